@@ -4,7 +4,7 @@ API Router Module
 """
 
 from fastapi import APIRouter
-from app.api import auth, users, pets, services, orders, boardings, health_records, dashboard
+from app.api import auth, users, pets, services, orders, boardings, health_records, dashboard, events, export, imports, debug
 
 # 创建API路由器
 api_router = APIRouter()
@@ -33,3 +33,15 @@ api_router.include_router(health_records.router, prefix="/health-records", tags=
 
 # 仪表盘模块
 api_router.include_router(dashboard.router, prefix="/dashboard", tags=["仪表盘"])
+
+# 实时推送模块
+api_router.include_router(events.router, prefix="/events", tags=["实时推送"])
+
+# 数据导出模块
+api_router.include_router(export.router, prefix="/export", tags=["数据导出"])
+
+# 批量导入模块
+api_router.include_router(imports.router, prefix="/import", tags=["批量导入"])
+
+# 调试模块
+api_router.include_router(debug.router, prefix="/debug", tags=["调试"])
@@ -9,18 +9,24 @@ from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.core.security import create_access_token, timedelta
 from app.core.deps import get_current_active_user
+from app.core.exceptions import ConflictError
 from app.core.response import ApiResponse
+from app.core.metrics import TimedRoute
+from app.core.rate_limit import RateLimit, body_field, client_ip, combine
 from app.schemas import UserLogin, UserRegister, UserResponse, TokenResponse
 from app.service import UserService
 
 # 创建路由器
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
-@router.post("/register", response_model=ApiResponse[UserResponse], summary="用户注册")
+@router.post(
+    "/register", response_model=ApiResponse[UserResponse], summary="用户注册",
+    dependencies=[Depends(RateLimit("auth.register", "5/minute"))]
+)
 async def register(
     user_data: UserRegister,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     """
     用户注册接口
@@ -35,7 +41,8 @@ async def register(
         ApiResponse[UserResponse]: 注册成功的用户信息
         
     Raises:
-        400: 两次密码不一致、用户名已存在
+        400: 两次密码不一致、用户名已存在、手机号或邮箱已被使用
+        429: 同一IP注册过于频繁
     """
     # 验证两次密码是否一致
     if user_data.password != user_data.confirm_password:
@@ -63,13 +70,23 @@ async def register(
         error_msg = str(e)
         if "用户名已存在" in error_msg or "exists" in error_msg.lower():
             return ApiResponse[UserResponse](code=400, msg="用户名已存在", data=None)
+        # 手机号、邮箱已被使用
+        if isinstance(e, ConflictError):
+            return ApiResponse[UserResponse](code=400, msg=e.msg, data=None)
         return ApiResponse[UserResponse](code=500, msg="注册失败，请稍后重试", data=None)
 
 
-@router.post("/login", response_model=ApiResponse[TokenResponse], summary="用户登录")
+@router.post(
+    "/login", response_model=ApiResponse[TokenResponse], summary="用户登录",
+    dependencies=[
+        Depends(RateLimit("auth.login", "20/minute")),
+        # 按 (用户名, IP) 计数：同一用户名只限制发起尝试的客户端，其他客户端无法借此锁定该用户
+        Depends(RateLimit("auth.login.username", "5/minute", key=combine(body_field("username"), client_ip))),
+    ]
+)
 async def login(
     credentials: UserLogin,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db, scope="function")
 ):
     """
     用户登录接口
@@ -86,6 +103,7 @@ async def login(
     Raises:
         401: 用户名或密码错误
         400: 账号已被禁用
+        429: 同一IP或同一用户名登录尝试过于频繁
     """
     # 调用服务层进行用户认证
     user = UserService.authenticate(db, credentials.username, credentials.password)
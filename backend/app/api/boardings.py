@@ -7,13 +7,19 @@ from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.core.database import get_db
-from app.core.deps import get_current_active_user, require_staff
+from app.core.deps import get_current_active_user, require_staff, get_idempotent_request, get_if_match
 from app.core.response import ApiResponse, PageResponse
-from app.schemas import BoardingCreate, BoardingUpdate, BoardingResponse
+from app.core.metrics import TimedRoute
+from app.schemas import (
+    BoardingCreate, BoardingUpdate, BoardingResponse,
+    BoardingBookingCreate, BoardingBookingResponse, OrderResponse,
+    BulkIdsRequest, BoardingBulkStatusUpdate, BulkResult
+)
 from app.service import BoardingService
+from app.service.idempotency import IdempotentRequest
 from app.db.models import User
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.get("", response_model=PageResponse[List[BoardingResponse]], summary="获取寄养列表")
@@ -23,7 +29,7 @@ async def get_boardings(
     status: Optional[str] = Query(None, description="寄养状态"),
     page: int = Query(1, ge=1, description="页码"),
     size: int = Query(10, ge=1, le=100, description="每页数量"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user: User = Depends(get_current_active_user)
 ):
     """获取寄养记录列表（分页）"""
@@ -42,7 +48,7 @@ async def get_boardings(
 @router.get("/{boarding_id}", response_model=ApiResponse[BoardingResponse], summary="获取寄养详情")
 async def get_boarding(
     boarding_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user: User = Depends(get_current_active_user)
 ):
     """获取寄养详情"""
@@ -54,32 +60,94 @@ async def get_boarding(
 async def create_boarding(
     boarding: BoardingCreate,
     order_id: int = Query(..., description="订单ID"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_staff)
+    db: Session = Depends(get_db, scope="function"),
+    current_user: User = Depends(require_staff),
+    idempotency: IdempotentRequest = Depends(get_idempotent_request, scope="function")
 ):
-    """创建寄养记录 - 需要员工或管理员权限"""
+    """
+    创建寄养记录 - 需要员工或管理员权限
+
+    支持 Idempotency-Key 请求头，超时重试不会重复创建寄养记录
+    """
+    if idempotency.replay is not None:
+        return idempotency.replay
+    
     new_boarding = BoardingService.create_boarding_info(db, boarding, order_id)
-    return ApiResponse[BoardingResponse](data=BoardingResponse.model_validate(new_boarding))
+    return idempotency.save(ApiResponse[BoardingResponse](data=BoardingResponse.model_validate(new_boarding)))
+
+
+@router.post("/book", response_model=ApiResponse[BoardingBookingResponse], summary="预订寄养")
+async def book_boarding(
+    booking: BoardingBookingCreate,
+    db: Session = Depends(get_db, scope="function"),
+    current_user: User = Depends(require_staff),
+    idempotency: IdempotentRequest = Depends(get_idempotent_request, scope="function")
+):
+    """
+    预订寄养 - 需要员工或管理员权限
+
+    一次请求内校验宠物、服务价格和档期，并在同一事务中创建订单和寄养记录，
+    替代先 POST /orders 再 POST /boardings 的两次调用。
+    支持 Idempotency-Key 请求头，超时重试不会重复预订
+    """
+    if idempotency.replay is not None:
+        return idempotency.replay
+    
+    order, boarding = BoardingService.book_boarding(db, booking)
+    return idempotency.save(ApiResponse[BoardingBookingResponse](
+        data=BoardingBookingResponse(
+            order=OrderResponse.model_validate(order),
+            boarding=BoardingResponse.model_validate(boarding)
+        )
+    ))
 
 
 @router.put("/{boarding_id}", response_model=ApiResponse[BoardingResponse], summary="更新寄养记录")
 async def update_boarding(
     boarding_id: int,
     boarding_update: BoardingUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_staff)
+    db: Session = Depends(get_db, scope="function"),
+    current_user: User = Depends(require_staff),
+    if_match: Optional[int] = Depends(get_if_match)
 ):
     """更新寄养信息 - 需要员工或管理员权限"""
-    updated_boarding = BoardingService.update_boarding_info(db, boarding_id, boarding_update)
+    updated_boarding = BoardingService.update_boarding_info(db, boarding_id, boarding_update, if_match)
     return ApiResponse[BoardingResponse](data=BoardingResponse.model_validate(updated_boarding))
 
 
 @router.delete("/{boarding_id}", response_model=ApiResponse[bool], summary="删除寄养记录")
 async def delete_boarding(
     boarding_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user: User = Depends(require_staff)
 ):
     """删除寄养记录 - 需要员工或管理员权限"""
     BoardingService.remove_boarding(db, boarding_id)
     return ApiResponse[bool](data=True)
+
+
+@router.post("/bulk-delete", response_model=ApiResponse[BulkResult], summary="批量删除寄养")
+async def bulk_delete_boardings(
+    payload: BulkIdsRequest,
+    db: Session = Depends(get_db, scope="function"),
+    current_user: User = Depends(require_staff)
+):
+    """批量删除寄养（软删除）- 需要员工或管理员权限"""
+    requested, affected = BoardingService.bulk_remove_boardings(db, payload.ids)
+    return ApiResponse[BulkResult](data=BulkResult(requested=requested, affected=affected))
+
+
+@router.post("/bulk-status", response_model=ApiResponse[BulkResult], summary="批量更新寄养状态")
+async def bulk_update_boarding_status(
+    payload: BoardingBulkStatusUpdate,
+    db: Session = Depends(get_db, scope="function"),
+    current_user: User = Depends(require_staff)
+):
+    """
+    批量更新寄养状态 - 需要员工或管理员权限
+
+    只有当前状态允许流转到目标状态的记录会被更新，其余记录跳过，
+    返回实际更新的记录数
+    """
+    requested, affected = BoardingService.bulk_update_status(db, payload.ids, payload.status)
+    return ApiResponse[BulkResult](data=BulkResult(requested=requested, affected=affected))
@@ -9,16 +9,17 @@ from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.core.deps import require_staff
 from app.core.response import ApiResponse
+from app.core.metrics import TimedRoute
 from app.schemas import DashboardStats
 from app.service import DashboardService
 
 # 创建路由器
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.get("/stats", response_model=ApiResponse[DashboardStats], summary="获取统计数据")
 async def get_stats(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user = Depends(require_staff)
 ):
     """
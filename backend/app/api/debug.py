@@ -0,0 +1,75 @@
+"""
+调试API模块
+Debug API
+查看 SQL 分析结果和慢查询日志，仅管理员可用
+"""
+
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from app.core.config import settings
+from app.core.deps import require_admin
+from app.core.response import ApiResponse
+from app.core.metrics import TimedRoute
+from app.core.profiler import query_profiler
+from app.core.slow_query import slow_query_log
+from app.schemas import QueryProfileReport, SlowQueryReport
+from app.db.models import User
+
+router = APIRouter(route_class=TimedRoute)
+
+
+@router.get("/queries", response_model=ApiResponse[QueryProfileReport], summary="SQL 分析报表")
+async def get_query_profile(
+    limit: int = Query(20, ge=1, le=200, description="每个列表返回的条数"),
+    current_user: User = Depends(require_admin)
+):
+    """
+    查看最近请求的 SQL 分析结果 - 需要管理员权限
+
+    需设置 SQL_PROFILER_ENABLED=true 开启记录。返回：
+    - worst_requests：查询次数最多的请求及其疑似 N+1 语句
+    - top_statements：累计耗时最高的语句
+    - n_plus_one：同一请求内同形 SELECT 执行次数达到阈值的语句及所在接口
+    """
+    report = query_profiler.report(limit)
+    return ApiResponse[QueryProfileReport](
+        data=QueryProfileReport(enabled=settings.SQL_PROFILER_ENABLED, **report)
+    )
+
+
+@router.delete("/queries", response_model=ApiResponse[bool], summary="清空 SQL 分析记录")
+async def clear_query_profile(current_user: User = Depends(require_admin)):
+    """
+    清空已记录的 SQL 分析结果 - 需要管理员权限
+    """
+    query_profiler.clear()
+    return ApiResponse[bool](data=True)
+
+
+@router.get("/slow-queries", response_model=ApiResponse[SlowQueryReport], summary="慢查询日志")
+async def get_slow_queries(
+    query: Optional[str] = Query(None, description="列表函数名，如 get_orders"),
+    limit: int = Query(50, ge=1, le=500, description="返回的最近记录条数"),
+    current_user: User = Depends(require_admin)
+):
+    """
+    查看列表查询的慢查询日志 - 需要管理员权限
+
+    列表查询耗时超过 SLOW_QUERY_THRESHOLD_MS 时记录。返回：
+    - groups：按列表函数 + 筛选条件组合聚合，可据此判断哪些组合缺少索引
+    - entries：最近的慢查询，包含实际执行的 SQL、绑定参数和 EXPLAIN 结果
+    """
+    return ApiResponse[SlowQueryReport](data=SlowQueryReport(
+        threshold_ms=slow_query_log.threshold_ms,
+        groups=slow_query_log.summary(),
+        entries=slow_query_log.entries(query, limit),
+    ))
+
+
+@router.delete("/slow-queries", response_model=ApiResponse[bool], summary="清空慢查询日志")
+async def clear_slow_queries(current_user: User = Depends(require_admin)):
+    """
+    清空慢查询日志 - 需要管理员权限
+    """
+    slow_query_log.clear()
+    return ApiResponse[bool](data=True)
@@ -0,0 +1,53 @@
+"""
+实时推送API模块
+Event Stream API
+员工端仪表盘、订单看板通过 Server-Sent Events 接收变更
+"""
+
+from typing import Optional
+from fastapi import APIRouter, Depends, Header
+from fastapi.responses import StreamingResponse
+from app.core.deps import get_stream_user, require_staff
+from app.core.metrics import TimedRoute
+from app.db.models import User
+from app.service.stream import event_stream_hub
+
+# 创建路由器
+router = APIRouter(route_class=TimedRoute)
+
+
+@router.get("/stream", summary="订阅实时变更（SSE）", response_class=StreamingResponse)
+async def stream_events(
+    last_event_id: Optional[str] = Header(
+        None, alias="Last-Event-ID", description="断线重连时浏览器自动携带，补发之后的事件"
+    ),
+    current_user: User = Depends(get_stream_user)
+):
+    """
+    订阅订单、寄养变更和仪表盘统计数据（text/event-stream）
+
+    需要员工或管理员权限，Token 可通过 access_token 查询参数传递（浏览器 EventSource 无法设置请求头）
+
+    事件类型：
+    - stats：仪表盘统计数据，连接后立即推送一次完整数据，之后在数据变化时推送（stats 为完整数据，delta 为增量）
+    - order：订单事件（type 为 OrderCreated / OrderStatusChanged / OrderUpdated / OrderDeleted）
+    - boarding：寄养事件（type 为 BoardingCreated / BoardingStatusChanged / BoardingDeleted）
+
+    Args:
+        last_event_id: 客户端收到的最后一个事件ID
+        current_user: 当前用户（需要员工或管理员权限）
+
+    Returns:
+        StreamingResponse: SSE 文本流
+    """
+    require_staff(current_user)
+    after_id = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    return StreamingResponse(
+        event_stream_hub.stream(after_id),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # 关闭 Nginx 等反向代理的响应缓冲，事件即时到达
+            "X-Accel-Buffering": "no",
+        }
+    )
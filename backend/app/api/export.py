@@ -0,0 +1,71 @@
+"""
+数据导出API模块
+Data Export API
+以 CSV / NDJSON 流式导出订单、宠物和健康记录
+"""
+
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from app.core.deps import require_staff
+from app.core.metrics import TimedRoute
+from app.service import ExportService
+from app.db.models import User
+
+router = APIRouter(route_class=TimedRoute)
+
+
+class ExportEntity(str, Enum):
+    """可导出的实体"""
+    orders = "orders"
+    pets = "pets"
+    health_records = "health-records"
+
+
+class ExportFormat(str, Enum):
+    """导出格式"""
+    csv = "csv"
+    ndjson = "ndjson"
+
+
+# 导出格式对应的响应类型
+MEDIA_TYPES = {
+    ExportFormat.csv: "text/csv; charset=utf-8",
+    ExportFormat.ndjson: "application/x-ndjson; charset=utf-8",
+}
+
+
+@router.get("/{entity}", summary="流式导出数据")
+async def export_entity(
+    entity: ExportEntity,
+    format: ExportFormat = Query(ExportFormat.csv, description="导出格式：csv / ndjson"),
+    user_id: Optional[int] = Query(None, description="用户ID（订单）"),
+    pet_id: Optional[int] = Query(None, description="宠物ID（订单、健康记录）"),
+    status: Optional[str] = Query(None, description="订单状态（订单）"),
+    owner_id: Optional[int] = Query(None, description="主人ID（宠物）"),
+    name: Optional[str] = Query(None, description="宠物名称筛选（宠物）"),
+    species: Optional[str] = Query(None, description="物种筛选（宠物）"),
+    gender: Optional[str] = Query(None, description="性别筛选（宠物）"),
+    vet_id: Optional[int] = Query(None, description="兽医ID（健康记录）"),
+    record_type: Optional[str] = Query(None, description="记录类型（健康记录）"),
+    current_user: User = Depends(require_staff)
+):
+    """
+    流式导出数据 - 需要员工或管理员权限
+
+    筛选参数与对应的列表接口一致，不分页，数据通过服务端游标分批输出，
+    导出任意行数时内存占用保持恒定
+    """
+    filters = {
+        "user_id": user_id, "pet_id": pet_id, "status": status,
+        "owner_id": owner_id, "name": name, "species": species, "gender": gender,
+        "vet_id": vet_id, "record_type": record_type,
+    }
+    filename = f"{entity.value}-{datetime.now().strftime('%Y%m%d%H%M%S')}.{format.value}"
+    return StreamingResponse(
+        ExportService.stream(entity.value, format.value, filters),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -7,13 +7,14 @@ from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.core.database import get_db
-from app.core.deps import get_current_active_user, require_staff
+from app.core.deps import get_current_active_user, require_staff, get_if_match
 from app.core.response import ApiResponse, PageResponse
+from app.core.metrics import TimedRoute
 from app.schemas import HealthRecordCreate, HealthRecordUpdate, HealthRecordResponse
 from app.service import HealthRecordService
 from app.db.models import User
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.get("", response_model=PageResponse[List[HealthRecordResponse]], summary="获取健康记录列表")
@@ -23,7 +24,7 @@ async def get_health_records(
     record_type: Optional[str] = Query(None, description="记录类型"),
     page: int = Query(1, ge=1, description="页码"),
     size: int = Query(10, ge=1, le=100, description="每页数量"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user: User = Depends(get_current_active_user)
 ):
     """获取健康记录列表（分页）"""
@@ -42,7 +43,7 @@ async def get_health_records(
 @router.get("/{record_id}", response_model=ApiResponse[HealthRecordResponse], summary="获取健康记录详情")
 async def get_health_record(
     record_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user: User = Depends(get_current_active_user)
 ):
     """获取健康记录详情"""
@@ -53,7 +54,7 @@ async def get_health_record(
 @router.post("", response_model=ApiResponse[HealthRecordResponse], summary="创建健康记录")
 async def create_health_record(
     record: HealthRecordCreate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user: User = Depends(require_staff)
 ):
     """创建健康记录 - 需要员工或管理员权限"""
@@ -65,18 +66,19 @@ async def create_health_record(
 async def update_health_record(
     record_id: int,
     record_update: HealthRecordUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_staff)
+    db: Session = Depends(get_db, scope="function"),
+    current_user: User = Depends(require_staff),
+    if_match: Optional[int] = Depends(get_if_match)
 ):
     """更新健康记录 - 需要员工或管理员权限"""
-    updated_record = HealthRecordService.update_health_record_info(db, record_id, record_update)
+    updated_record = HealthRecordService.update_health_record_info(db, record_id, record_update, if_match)
     return ApiResponse[HealthRecordResponse](data=HealthRecordResponse.model_validate(updated_record))
 
 
 @router.delete("/{record_id}", response_model=ApiResponse[bool], summary="删除健康记录")
 async def delete_health_record(
     record_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user: User = Depends(require_staff)
 ):
     """删除健康记录 - 需要员工或管理员权限"""
@@ -0,0 +1,47 @@
+"""
+批量导入API模块
+Bulk Import API
+上传 CSV / JSONL 文件批量导入宠物主人和宠物
+"""
+
+from enum import Enum
+from typing import Optional
+from fastapi import APIRouter, Depends, File, Query, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from app.core.deps import require_admin
+from app.core.response import ApiResponse
+from app.core.metrics import TimedRoute
+from app.schemas import ImportReport
+from app.service import ImportService
+from app.db.models import User
+
+router = APIRouter(route_class=TimedRoute)
+
+
+class ImportEntity(str, Enum):
+    """可导入的实体"""
+    owners = "owners"
+    pets = "pets"
+
+
+@router.post("/{entity}", response_model=ApiResponse[ImportReport], summary="批量导入")
+async def import_entity(
+    entity: ImportEntity,
+    file: UploadFile = File(..., description="CSV 或 JSONL 文件"),
+    format: Optional[str] = Query(None, description="文件格式：csv / jsonl，默认按文件扩展名判断"),
+    current_user: User = Depends(require_admin)
+):
+    """
+    批量导入宠物主人或宠物 - 需要管理员权限
+
+    - owners：列 username, password, email, phone, real_name
+    - pets：列 owner_username 或 owner_id, name, species, breed, gender, birth_date, weight, color,
+      health_status, special_notes
+
+    文件按块校验和写入，每块一个事务；校验失败或冲突的行不影响其他行，
+    在结果中逐行报告原因
+    """
+    fmt = format or ("jsonl" if (file.filename or "").lower().endswith((".jsonl", ".ndjson")) else "csv")
+    # 导入耗时较长，放到线程池中执行，避免阻塞事件循环
+    report = await run_in_threadpool(ImportService.run, entity.value, file.file, fmt)
+    return ApiResponse[ImportReport](data=ImportReport(**report))
@@ -5,15 +5,23 @@ Order Management API
 
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
+from datetime import datetime
 from typing import List, Optional
 from app.core.database import get_db
-from app.core.deps import get_current_active_user, require_staff
+from app.core.deps import get_current_active_user, require_staff, get_idempotent_request, get_if_match
 from app.core.response import ApiResponse, PageResponse
-from app.schemas import OrderCreate, OrderUpdate, OrderResponse
+from app.core.metrics import TimedRoute
+from app.schemas import (
+    OrderCreate, OrderUpdate, OrderResponse, AppointmentSlot, SlotAvailability,
+    BulkIdsRequest, OrderBulkStatusUpdate, BulkResult
+)
 from app.service import OrderService
+from app.service.assignment import AssignmentService
+from app.service.slots import SlotService
+from app.service.idempotency import IdempotentRequest
 from app.db.models import User
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.get("", response_model=PageResponse[List[OrderResponse]], summary="获取订单列表")
@@ -23,7 +31,7 @@ async def get_orders(
     status: Optional[str] = Query(None, description="订单状态"),
     page: int = Query(1, ge=1, description="页码"),
     size: int = Query(10, ge=1, le=100, description="每页数量"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -46,10 +54,46 @@ async def get_orders(
     )
 
 
+@router.get("/slots", response_model=ApiResponse[List[AppointmentSlot]], summary="查找可预约时段")
+async def get_slots(
+    service_id: int = Query(..., description="服务ID"),
+    start: Optional[datetime] = Query(None, description="最早开始时间，默认当前时间"),
+    count: int = Query(10, ge=1, le=50, description="返回的时段数"),
+    staff_id: Optional[int] = Query(None, description="只查该员工的空闲时段"),
+    db: Session = Depends(get_db, scope="function"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    查找最近的可预约时段
+
+    按服务时长在营业时间内以固定间隔列出候选时段，返回有员工空闲的前 count 个，
+    每个时段附带空闲的员工ID
+    """
+    slots = SlotService.find_slots(db, service_id, start, count, staff_id)
+    return ApiResponse[List[AppointmentSlot]](
+        data=[AppointmentSlot.model_validate(slot) for slot in slots]
+    )
+
+
+@router.get("/slots/check", response_model=ApiResponse[SlotAvailability], summary="查询时段是否空闲")
+async def check_slot(
+    service_id: int = Query(..., description="服务ID"),
+    start: datetime = Query(..., description="开始时间"),
+    staff_id: Optional[int] = Query(None, description="只查该员工"),
+    db: Session = Depends(get_db, scope="function"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """查询从 start 开始、持续服务时长的时段内哪些员工空闲"""
+    slot = SlotService.check_slot(db, service_id, start, staff_id)
+    return ApiResponse[SlotAvailability](
+        data=SlotAvailability(start=slot.start, end=slot.end, staff_ids=slot.staff_ids, available=bool(slot.staff_ids))
+    )
+
+
 @router.get("/{order_id}", response_model=ApiResponse[OrderResponse], summary="获取订单详情")
 async def get_order(
     order_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user: User = Depends(get_current_active_user)
 ):
     """获取订单详情"""
@@ -64,36 +108,53 @@ async def get_order(
 @router.post("", response_model=ApiResponse[OrderResponse], summary="创建订单")
 async def create_order(
     order: OrderCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: Session = Depends(get_db, scope="function"),
+    current_user: User = Depends(get_current_active_user),
+    idempotency: IdempotentRequest = Depends(get_idempotent_request, scope="function")
 ):
-    """创建新订单"""
+    """
+    创建新订单
+
+    支持 Idempotency-Key 请求头，超时重试不会重复创建订单
+    """
+    if idempotency.replay is not None:
+        return idempotency.replay
+    
     user_id = current_user.id if current_user.role.value == "owner" else order.user_id
     new_order = OrderService.create_order_info(db, order, user_id)
-    return ApiResponse[OrderResponse](data=OrderResponse.model_validate(new_order))
+    return idempotency.save(ApiResponse[OrderResponse](data=OrderResponse.model_validate(new_order)))
 
 
 @router.put("/{order_id}", response_model=ApiResponse[OrderResponse], summary="更新订单")
 async def update_order(
     order_id: int,
     order_update: OrderUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: Session = Depends(get_db, scope="function"),
+    current_user: User = Depends(get_current_active_user),
+    idempotency: IdempotentRequest = Depends(get_idempotent_request, scope="function"),
+    if_match: Optional[int] = Depends(get_if_match)
 ):
-    """更新订单信息"""
+    """
+    更新订单信息
+
+    支持 Idempotency-Key 请求头，金额、状态等修改在超时重试时只执行一次
+    """
+    if idempotency.replay is not None:
+        return idempotency.replay
+    
     order = OrderService.get_order_detail(db, order_id)
     
     if current_user.role.value == "owner" and order.user_id != current_user.id:
         return ApiResponse[OrderResponse](code=403, msg="无权限修改此订单", data=None)
     
-    updated_order = OrderService.update_order_info(db, order_id, order_update)
-    return ApiResponse[OrderResponse](data=OrderResponse.model_validate(updated_order))
+    updated_order = OrderService.update_order_info(db, order_id, order_update, if_match)
+    return idempotency.save(ApiResponse[OrderResponse](data=OrderResponse.model_validate(updated_order)))
 
 
 @router.delete("/{order_id}", response_model=ApiResponse[bool], summary="删除订单")
 async def delete_order(
     order_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user: User = Depends(get_current_active_user)
 ):
     """删除订单"""
@@ -104,3 +165,50 @@ async def delete_order(
     
     OrderService.remove_order(db, order_id)
     return ApiResponse[bool](data=True)
+
+
+@router.post("/bulk-delete", response_model=ApiResponse[BulkResult], summary="批量删除订单")
+async def bulk_delete_orders(
+    payload: BulkIdsRequest,
+    db: Session = Depends(get_db, scope="function"),
+    current_user: User = Depends(require_staff)
+):
+    """批量删除订单（软删除）- 需要员工或管理员权限"""
+    requested, affected = OrderService.bulk_remove_orders(db, payload.ids)
+    return ApiResponse[BulkResult](data=BulkResult(requested=requested, affected=affected))
+
+
+@router.post("/auto-assign", response_model=ApiResponse[BulkResult], summary="自动指派员工")
+async def auto_assign_orders(
+    limit: Optional[int] = Query(None, ge=1, le=5000, description="本批最多处理的订单数，默认 ASSIGNMENT_BATCH_SIZE"),
+    db: Session = Depends(get_db, scope="function"),
+    current_user: User = Depends(require_staff)
+):
+    """
+    为待确认且未指派员工的订单自动指派员工 - 需要员工或管理员权限
+
+    优先分配给工作量（未结束订单的服务时长 + 寄养）最小的员工，有预约时间的订单跳过该时段已有预约的员工；
+    requested 为本批处理的订单数，affected 为实际指派的订单数
+    """
+    requested, affected = AssignmentService.assign_pending_orders(db, limit)
+    return ApiResponse[BulkResult](data=BulkResult(requested=requested, affected=affected))
+
+
+@router.post("/bulk-status", response_model=ApiResponse[BulkResult], summary="批量更新订单状态")
+async def bulk_update_order_status(
+    payload: OrderBulkStatusUpdate,
+    db: Session = Depends(get_db, scope="function"),
+    current_user: User = Depends(require_staff),
+    idempotency: IdempotentRequest = Depends(get_idempotent_request, scope="function")
+):
+    """
+    批量更新订单状态 - 需要员工或管理员权限
+
+    只有当前状态允许流转到目标状态的记录会被更新，其余记录跳过，
+    返回实际更新的记录数。支持 Idempotency-Key 请求头，重试时返回首次的更新结果
+    """
+    if idempotency.replay is not None:
+        return idempotency.replay
+    
+    requested, affected = OrderService.bulk_update_status(db, payload.ids, payload.status)
+    return idempotency.save(ApiResponse[BulkResult](data=BulkResult(requested=requested, affected=affected)))
@@ -7,13 +7,14 @@ from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.core.database import get_db
-from app.core.deps import get_current_active_user, require_staff
+from app.core.deps import get_current_active_user, require_staff, get_if_match
 from app.core.response import ApiResponse, PageResponse
+from app.core.metrics import TimedRoute
 from app.schemas import PetCreate, PetUpdate, PetResponse
 from app.service import PetService
 from app.db.models import User
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.get("", response_model=PageResponse[List[PetResponse]], summary="获取宠物列表")
@@ -24,7 +25,7 @@ async def get_pets(
     name: str = Query(None, description="宠物名称筛选"),
     species: str = Query(None, description="物种筛选"),
     gender: str = Query(None, description="性别筛选"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -50,7 +51,7 @@ async def get_pets(
 @router.get("/{pet_id}", response_model=ApiResponse[PetResponse], summary="获取宠物详情")
 async def get_pet(
     pet_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user: User = Depends(get_current_active_user)
 ):
     """获取宠物详情"""
@@ -65,7 +66,7 @@ async def get_pet(
 @router.post("", response_model=ApiResponse[PetResponse], summary="创建宠物")
 async def create_pet(
     pet: PetCreate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user: User = Depends(get_current_active_user)
 ):
     """创建宠物档案"""
@@ -78,8 +79,9 @@ async def create_pet(
 async def update_pet(
     pet_id: int,
     pet_update: PetUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: Session = Depends(get_db, scope="function"),
+    current_user: User = Depends(get_current_active_user),
+    if_match: Optional[int] = Depends(get_if_match)
 ):
     """更新宠物信息"""
     pet = PetService.get_pet_detail(db, pet_id)
@@ -87,14 +89,14 @@ async def update_pet(
     if current_user.role.value == "owner" and pet.owner_id != current_user.id:
         return ApiResponse[PetResponse](code=403, msg="无权限修改此宠物信息", data=None)
     
-    updated_pet = PetService.update_pet_info(db, pet_id, pet_update)
+    updated_pet = PetService.update_pet_info(db, pet_id, pet_update, if_match)
     return ApiResponse[PetResponse](data=PetResponse.model_validate(updated_pet))
 
 
 @router.delete("/{pet_id}", response_model=ApiResponse[bool], summary="删除宠物")
 async def delete_pet(
     pet_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user: User = Depends(get_current_active_user)
 ):
     """删除宠物"""
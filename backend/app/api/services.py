@@ -7,13 +7,14 @@ from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.core.database import get_db
-from app.core.deps import get_current_active_user, require_staff
+from app.core.deps import get_current_active_user, require_staff, get_if_match
 from app.core.response import ApiResponse, PageResponse
+from app.core.metrics import TimedRoute
 from app.schemas import ServiceCreate, ServiceUpdate, ServiceResponse
 from app.service import ServiceService
 from app.db.models import User
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.get("", response_model=PageResponse[List[ServiceResponse]], summary="获取服务列表")
@@ -22,7 +23,7 @@ async def get_services(
     is_available: Optional[bool] = Query(None, description="是否上架"),
     page: int = Query(1, ge=1, description="页码"),
     size: int = Query(10, ge=1, le=100, description="每页数量"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user: User = Depends(get_current_active_user)
 ):
     """获取服务列表（分页）"""
@@ -41,7 +42,7 @@ async def get_services(
 @router.get("/{service_id}", response_model=ApiResponse[ServiceResponse], summary="获取服务详情")
 async def get_service(
     service_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user: User = Depends(get_current_active_user)
 ):
     """获取服务详情"""
@@ -52,7 +53,7 @@ async def get_service(
 @router.post("", response_model=ApiResponse[ServiceResponse], summary="创建服务")
 async def create_service(
     service: ServiceCreate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user: User = Depends(require_staff)
 ):
     """创建新服务 - 需要员工或管理员权限"""
@@ -64,18 +65,19 @@ async def create_service(
 async def update_service(
     service_id: int,
     service_update: ServiceUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(require_staff)
+    db: Session = Depends(get_db, scope="function"),
+    current_user: User = Depends(require_staff),
+    if_match: Optional[int] = Depends(get_if_match)
 ):
     """更新服务信息 - 需要员工或管理员权限"""
-    updated_service = ServiceService.update_service_info(db, service_id, service_update)
+    updated_service = ServiceService.update_service_info(db, service_id, service_update, if_match)
     return ApiResponse[ServiceResponse](data=ServiceResponse.model_validate(updated_service))
 
 
 @router.delete("/{service_id}", response_model=ApiResponse[bool], summary="删除服务")
 async def delete_service(
     service_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user: User = Depends(require_staff)
 ):
     """删除服务 - 需要员工或管理员权限"""
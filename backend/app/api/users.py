@@ -5,15 +5,16 @@ User Management API
 
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from app.core.database import get_db
-from app.core.deps import get_current_active_user, require_admin
+from app.core.deps import get_current_active_user, require_admin, require_staff, get_if_match
 from app.core.response import ApiResponse, PageResponse
-from app.schemas import UserCreate, UserUpdate, UserResponse
+from app.core.metrics import TimedRoute
+from app.schemas import UserCreate, UserUpdate, UserResponse, OwnerLookupResponse
 from app.service import UserService
 from app.db.models import User
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 
 @router.get("", response_model=PageResponse[List[UserResponse]], summary="获取用户列表")
@@ -22,7 +23,7 @@ async def get_users(
     size: int = Query(10, ge=1, le=100, description="每页数量"),
     username: str = Query(None, description="用户名筛选"),
     role: str = Query(None, description="角色筛选"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user: User = Depends(require_admin)
 ):
     """
@@ -42,10 +43,29 @@ async def get_users(
     )
 
 
+@router.get("/lookup", response_model=ApiResponse[List[OwnerLookupResponse]], summary="按手机号或邮箱查找主人")
+async def lookup_owners(
+    q: str = Query(..., min_length=1, max_length=100, description="手机号或邮箱（可只输入前几位）"),
+    limit: int = Query(10, ge=1, le=50, description="最多返回数量"),
+    db: Session = Depends(get_db, scope="function"),
+    current_user: User = Depends(require_staff)
+):
+    """
+    前台按手机号或邮箱查找宠物主人
+    
+    需要员工权限；输入会规范化（去掉空格、横线、+86，邮箱不区分大小写），
+    精确匹配排在最前，其余为前缀匹配，每个主人附带其宠物
+    """
+    owners = UserService.lookup_owners(db, q, limit)
+    return ApiResponse[List[OwnerLookupResponse]](
+        data=[OwnerLookupResponse.model_validate(owner) for owner in owners]
+    )
+
+
 @router.get("/{user_id}", response_model=ApiResponse[UserResponse], summary="获取用户详情")
 async def get_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user: User = Depends(get_current_active_user)
 ):
     """获取用户详情"""
@@ -59,7 +79,7 @@ async def get_user(
 @router.post("", response_model=ApiResponse[UserResponse], summary="创建用户")
 async def create_user(
     user: UserCreate,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user: User = Depends(require_admin)
 ):
     """创建新用户 - 需要管理员权限"""
@@ -71,21 +91,22 @@ async def create_user(
 async def update_user(
     user_id: int,
     user_update: UserUpdate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    db: Session = Depends(get_db, scope="function"),
+    current_user: User = Depends(get_current_active_user),
+    if_match: Optional[int] = Depends(get_if_match)
 ):
     """更新用户信息"""
     if current_user.role.value != "admin" and current_user.id != user_id:
         return ApiResponse[UserResponse](code=403, msg="无权限修改其他用户信息", data=None)
     
-    user = UserService.update_user_info(db, user_id, user_update)
+    user = UserService.update_user_info(db, user_id, user_update, if_match)
     return ApiResponse[UserResponse](data=UserResponse.model_validate(user))
 
 
 @router.delete("/{user_id}", response_model=ApiResponse[bool], summary="删除用户")
 async def delete_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db, scope="function"),
     current_user: User = Depends(require_admin)
 ):
     """删除用户 - 需要管理员权限"""
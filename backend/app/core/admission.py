@@ -0,0 +1,307 @@
+"""
+准入控制
+按路由类别（普通增删改查、仪表盘、导入导出、认证）限制同时处理的请求数，
+超出时在有界队列中按先来先服务等待，队列已满或等待超过期限时立即返回 503 和 Retry-After。
+
+过载时如果不加限制，所有请求都堆积在数据库连接池上，连健康检查这样的轻量请求延迟也一起上升。
+分类限流后，导出、仪表盘统计等重负载请求只占用各自的名额，饱和时只有该类别降级，
+普通页面的请求仍然能在较低的延迟内完成。
+
+纯 ASGI 中间件，在路由匹配之前按路径前缀分类；名额在响应体发送完毕后才释放，
+流式导出在整个传输期间占用名额。
+
+各类别并发数之和不超过数据库连接池的容量（扣除进程内后台任务占用的连接）：
+异步接口在事件循环中同步访问数据库，等待连接池会阻塞整个事件循环，
+名额必须在拿不到连接之前用完，让多出来的请求在这里排队或快速失败。
+"""
+
+import asyncio
+import logging
+import math
+from collections import deque
+from dataclasses import dataclass, replace
+from typing import Deque, Dict, List, Optional, Tuple
+
+from starlette.responses import JSONResponse
+from app.core.config import settings
+from app.core.deadline import current_deadline
+from app.core.metrics import register_collector
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class AdmissionLimit:
+    """
+    路由类别的准入限额
+
+    Attributes:
+        concurrency: 同时处理的请求数
+        queue_size: 最多排队等待的请求数
+        max_wait: 排队的最长时间（秒）
+    """
+    concurrency: int
+    queue_size: int
+    max_wait: float
+
+
+# 路径前缀 -> 路由类别，按顺序匹配，未匹配的 /api 请求归入 interactive
+ROUTE_CLASSES: Tuple[Tuple[str, str], ...] = (
+    ("/api/auth/", "auth"),
+    ("/api/dashboard/", "dashboard"),
+    ("/api/export/", "export"),
+    ("/api/import/", "export"),
+    ("/api/", "interactive"),
+)
+
+# 不受准入控制的路径前缀：SSE 长连接不占用数据库连接，调试接口需要在过载时可用
+EXEMPT_PREFIXES: Tuple[str, ...] = ("/api/events/stream", "/api/debug/")
+
+# 默认限额，可由 ADMISSION_LIMITS 按类别覆盖；并发数之和与默认连接池容量（5 + 10 - 3）相同
+DEFAULT_LIMITS: Dict[str, AdmissionLimit] = {
+    "interactive": AdmissionLimit(concurrency=8, queue_size=64, max_wait=2.0),
+    "dashboard": AdmissionLimit(concurrency=2, queue_size=16, max_wait=3.0),
+    "export": AdmissionLimit(concurrency=1, queue_size=4, max_wait=5.0),
+    "auth": AdmissionLimit(concurrency=1, queue_size=32, max_wait=2.0),
+}
+
+# 进程内后台任务（事件分发、定时流转、实时推送）各自占用的主库连接
+BACKGROUND_CONNECTIONS = 3
+
+
+def parse_limits(spec: str) -> Dict[str, AdmissionLimit]:
+    """
+    解析 ADMISSION_LIMITS 并与默认限额合并
+
+    Args:
+        spec: 逗号分隔的 "类别=并发数/队列长度/最长等待秒数"，如 "export=1/2/10,dashboard=8/32/3"
+
+    Raises:
+        ValueError: 格式不正确或类别未知时抛出
+
+    Returns:
+        Dict[str, AdmissionLimit]: 类别 -> 限额
+    """
+    limits = dict(DEFAULT_LIMITS)
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, values = item.partition("=")
+        name = name.strip()
+        parts = values.split("/")
+        if name not in limits or len(parts) != 3:
+            raise ValueError(f"无效的准入限额: {item}")
+        limits[name] = AdmissionLimit(int(parts[0]), int(parts[1]), float(parts[2]))
+    return limits
+
+
+def pool_capacity() -> int:
+    """
+    请求可以同时使用的主库连接数
+
+    Returns:
+        int: DATABASE_POOL_SIZE + DATABASE_MAX_OVERFLOW 扣除后台任务占用的连接
+    """
+    return max(1, settings.DATABASE_POOL_SIZE + settings.DATABASE_MAX_OVERFLOW - BACKGROUND_CONNECTIONS)
+
+
+def cap_limits(limits: Dict[str, AdmissionLimit], capacity: int) -> Dict[str, AdmissionLimit]:
+    """
+    并发数之和超过连接数时按比例缩减各类别的并发数（每类至少 1 个）
+
+    Args:
+        limits: 类别 -> 限额
+        capacity: 可用的连接数
+
+    Returns:
+        Dict[str, AdmissionLimit]: 缩减后的限额，未超出时原样返回
+    """
+    total = sum(limit.concurrency for limit in limits.values())
+    if total <= capacity:
+        return limits
+    # 每类先保留 1 个，其余连接按超出 1 的部分分配（向下取整，总数不会超过 capacity）
+    spare, extra = max(0, capacity - len(limits)), total - len(limits)
+    capped = {
+        name: replace(limit, concurrency=1 + (limit.concurrency - 1) * spare // extra)
+        for name, limit in limits.items()
+    }
+    logger.warning(
+        "准入并发数之和 %d 超过数据库连接数 %d，已按比例缩减：%s",
+        total, capacity, {name: limit.concurrency for name, limit in capped.items()}
+    )
+    return capped
+
+
+def classify(path: str) -> Optional[str]:
+    """
+    请求路径所属的路由类别
+
+    Args:
+        path: 请求路径
+
+    Returns:
+        Optional[str]: 路由类别，不受准入控制时返回None
+    """
+    if path.startswith(EXEMPT_PREFIXES):
+        return None
+    for prefix, name in ROUTE_CLASSES:
+        if path.startswith(prefix):
+            return name
+    return None
+
+
+class Rejected(Exception):
+    """请求未被准入"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class AdmissionGate:
+    """
+    单个路由类别的并发闸门
+
+    请求结束时如果有人排队，名额直接交给队首的请求（in_flight 不变），
+    排队的请求不会被新到达的请求插队。只在事件循环线程中使用，不需要加锁。
+    """
+
+    def __init__(self, name: str, limit: AdmissionLimit):
+        self.name = name
+        self.limit = limit
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # 拒绝原因 -> 次数
+        self.rejected: Dict[str, int] = {"queue_full": 0, "timeout": 0}
+
+    @property
+    def queued(self) -> int:
+        """正在排队的请求数"""
+        return len(self._waiters)
+
+    async def acquire(self) -> None:
+        """
+        获取名额
+
+        Raises:
+            Rejected: 队列已满（queue_full）或排队超时（timeout，等待超过 max_wait 或请求的剩余期限）时抛出
+        """
+        if self.in_flight < self.limit.concurrency and not self._waiters:
+            self.in_flight += 1
+            return
+        if len(self._waiters) >= self.limit.queue_size:
+            self.rejected["queue_full"] += 1
+            raise Rejected("queue_full")
+
+        # 排队时间不超过请求的剩余期限
+        max_wait = self.limit.max_wait
+        deadline = current_deadline()
+        if deadline is not None:
+            max_wait = min(max_wait, deadline.remaining())
+            if max_wait <= 0:
+                self.rejected["timeout"] += 1
+                raise Rejected("timeout")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as exc:
+            if waiter.done() and not waiter.cancelled():
+                # 超时的同时刚好拿到了名额，交还给下一个排队的请求
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            if isinstance(exc, asyncio.CancelledError):
+                raise
+            self.rejected["timeout"] += 1
+            raise Rejected("timeout")
+
+    def release(self) -> None:
+        """释放名额，有人排队时直接交给队首"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def retry_after(self) -> int:
+        """建议客户端重试前等待的秒数"""
+        return max(1, math.ceil(self.limit.max_wait))
+
+
+class AdmissionController:
+    """按路由类别管理并发闸门"""
+
+    def __init__(self, limits: Dict[str, AdmissionLimit]):
+        self.gates = {name: AdmissionGate(name, limit) for name, limit in limits.items()}
+
+    def render_metrics(self) -> List[str]:
+        """
+        输出 Prometheus 文本格式的准入指标
+
+        Returns:
+            List[str]: 文本行列表
+        """
+        lines = [
+            "# HELP http_admission_in_flight Requests being processed per route class",
+            "# TYPE http_admission_in_flight gauge",
+        ]
+        lines += [f'http_admission_in_flight{{class="{name}"}} {gate.in_flight}' for name, gate in self.gates.items()]
+        lines += [
+            "# HELP http_admission_queued Requests waiting for admission per route class",
+            "# TYPE http_admission_queued gauge",
+        ]
+        lines += [f'http_admission_queued{{class="{name}"}} {gate.queued}' for name, gate in self.gates.items()]
+        lines += [
+            "# HELP http_admission_rejected_total Requests shed with 503 per route class and reason",
+            "# TYPE http_admission_rejected_total counter",
+        ]
+        for name, gate in self.gates.items():
+            lines += [
+                f'http_admission_rejected_total{{class="{name}",reason="{reason}"}} {count}'
+                for reason, count in gate.rejected.items()
+            ]
+        return lines
+
+
+admission_controller = AdmissionController(cap_limits(parse_limits(settings.ADMISSION_LIMITS), pool_capacity()))
+register_collector(admission_controller.render_metrics)
+
+
+class AdmissionMiddleware:
+    """
+    准入控制中间件（纯 ASGI 实现）
+    应放在 CORS 中间件内侧，503 响应同样带上跨域响应头，前端才能读取 Retry-After。
+    """
+
+    def __init__(self, app, controller: AdmissionController = admission_controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        name = classify(scope["path"]) if scope["type"] == "http" else None
+        gate = self.controller.gates.get(name) if name else None
+        if gate is None or not settings.ADMISSION_CONTROL_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await gate.acquire()
+        except Rejected as exc:
+            response = JSONResponse(
+                {"detail": "服务繁忙，请稍后重试"},
+                status_code=503,
+                headers={
+                    "Retry-After": str(gate.retry_after()),
+                    "X-Admission-Class": name,
+                    "X-Admission-Reason": exc.reason,
+                },
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
@@ -3,26 +3,139 @@
 配置 SQLAlchemy 数据库连接和会话管理
 """
 
-from sqlalchemy import create_engine
+import itertools
+from typing import List, Optional
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql import Select
 from app.core.config import settings
+from app.core.metrics import mark_commit_end, mark_commit_start
+
+
+def _build_engine(url: str) -> Engine:
+    """
+    根据连接地址创建数据库引擎
+
+    SQLite 连接默认禁止跨线程使用，FastAPI 的线程池会在不同线程中复用连接，
+    因此本地使用 SQLite 时关闭该检查。连接池容量由 DATABASE_POOL_SIZE 和
+    DATABASE_MAX_OVERFLOW 决定，准入控制据此限制同时处理的请求数。
+
+    Args:
+        url: 数据库连接地址
+
+    Returns:
+        Engine: SQLAlchemy 数据库引擎
+    """
+    connect_args = {}
+    if url.startswith("sqlite"):
+        connect_args["check_same_thread"] = False
+    return create_engine(
+        url,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+        pool_size=settings.DATABASE_POOL_SIZE,
+        max_overflow=settings.DATABASE_MAX_OVERFLOW,
+        echo=settings.DEBUG,
+        connect_args=connect_args
+    )
+
 
 # ==================== 创建数据库引擎 ====================
 # pool_pre_ping=True: 连接池ping检查，避免连接断开问题
 # pool_recycle=3600: 连接回收时间，3600秒后回收连接
+# pool_size / max_overflow: 常驻连接数和临时超出的连接数
 # echo=settings.DEBUG: 开发环境下输出SQL语句，便于调试
-engine = create_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True,
-    pool_recycle=3600,
-    echo=settings.DEBUG
-)
+engine = _build_engine(settings.DATABASE_URL)
+
+# ==================== 只读副本引擎 ====================
+# 未配置副本时为空列表，此时所有查询都走主库
+replica_engines: List[Engine] = [
+    _build_engine(url.strip())
+    for url in settings.DATABASE_REPLICA_URLS.split(",")
+    if url.strip()
+]
+
+
+# ==================== 后台任务队列引擎 ====================
+# 未单独配置时任务表与业务数据在同一个库中，入队可与业务写操作在同一事务中提交；
+# 也可以指向本地 SQLite 文件，把队列的读写压力与业务库隔离
+jobs_engine = _build_engine(settings.JOBS_DATABASE_URL) if settings.JOBS_DATABASE_URL else engine
+
+
+# ==================== 读写分离会话 ====================
+
+class RoutingSession(Session):
+    """
+    读写分离会话
+    普通 SELECT 查询轮询路由到只读副本，写操作、加锁查询以及 flush 都走主库。
+
+    会话在一次请求内一旦发生写操作就会"粘"在主库上，之后的读取也走主库，
+    保证同一请求内能读到自己刚写入的数据（read-your-writes）。
+    """
+
+    def __init__(self, primary: Optional[Engine] = None, replicas: Optional[List[Engine]] = None, **kwargs):
+        """
+        初始化读写分离会话
+
+        Args:
+            primary: 主库引擎，默认使用全局 engine
+            replicas: 副本引擎列表，默认使用全局 replica_engines
+        """
+        super().__init__(**kwargs)
+        self.primary = primary if primary is not None else engine
+        self.replicas = replicas if replicas is not None else replica_engines
+        self._replica_cycle = itertools.cycle(self.replicas) if self.replicas else None
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        """
+        选择执行语句的数据库引擎
+
+        Returns:
+            Engine: 主库或某个只读副本
+        """
+        if self._replica_cycle is not None and not self._flushing and not self.info.get("use_primary"):
+            if isinstance(clause, Select) and clause._for_update_arg is None:
+                return next(self._replica_cycle)
+        return self.primary
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _stick_to_primary_after_flush(session, flush_context):
+    """ORM flush 写入后，本会话后续读取改走主库"""
+    session.info["use_primary"] = True
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _stick_to_primary_after_dml(orm_execute_state):
+    """批量 UPDATE / DELETE / INSERT 语句执行后，本会话后续读取改走主库"""
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info["use_primary"] = True
+
+
+def use_primary(db: Session) -> Session:
+    """
+    强制会话后续所有查询走主库
+    用于对复制延迟敏感的读取（如写入前的校验查询）
+
+    Args:
+        db: 数据库会话
+
+    Returns:
+        Session: 传入的会话本身
+    """
+    db.info["use_primary"] = True
+    return db
+
 
 # ==================== 创建会话工厂 ====================
 # autocommit=False: 不自动提交事务
 # autoflush=False: 不自动刷新session
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False)
+
+# 任务队列会话工厂：只访问任务表，不做读写分离
+JobsSessionLocal = sessionmaker(bind=jobs_engine, autoflush=False)
 
 # ==================== 创建模型基类 ====================
 # 所有 SQLAlchemy 模型都继承自这个基类
@@ -34,19 +147,34 @@ def get_db():
     """
     获取数据库会话的依赖注入函数
     用于 FastAPI 的依赖注入系统
-    
+
     使用示例:
     ```python
     @app.get("/users")
-    def get_users(db: Session = Depends(get_db)):
+    def get_users(db: Session = Depends(get_db, scope="function")):
         return db.query(User).all()
     ```
-    
+
+    整个请求处于同一个工作单元中：请求正常结束时统一提交一次，
+    出现异常时整体回滚。
+
+    必须以 scope="function" 注入（包括依赖 get_db 的生成器依赖）：
+    默认作用域下退出代码在响应发送之后才执行，提交失败时客户端已经收到成功响应，
+    客户端紧接着的读取也可能早于提交。function 作用域在接口函数返回、响应序列化完成之后，
+    开始发送响应之前提交，提交失败时返回错误响应。提交（flush 与 COMMIT）的耗时
+    计入请求计时的 commit 阶段，不混入 serialize。
+    作用域是依赖缓存键的一部分，混用两种作用域会在同一请求中打开两个会话。
+
     Returns:
         Session: SQLAlchemy 数据库会话
     """
+    from app.service.unit_of_work import UnitOfWork
+
     db = SessionLocal()
     try:
-        yield db
+        with UnitOfWork(db):
+            yield db
+            mark_commit_start()
     finally:
+        mark_commit_end()
         db.close()
@@ -0,0 +1,210 @@
+"""
+请求期限
+每个请求进入时确定一个截止时间，保存在上下文变量中，随着处理推进剩余时间不断减少。
+请求内执行的每条数据库语句都以剩余时间作为执行时间上限：
+
+- MySQL：在 SELECT 后插入优化器提示 /*+ MAX_EXECUTION_TIME(毫秒) */，超时由服务端中止查询
+- SQLite：连接上注册进度回调，每执行一批虚拟机指令检查一次是否超时，超时则中断语句
+
+超时的查询被中止后连接仍然可用，由工作单元回滚后归还连接池，
+请求返回 504（DeadlineExceededError），不会因为某个罕见的筛选组合长时间占住连接。
+截止时间已过时不再向数据库发送语句。后台任务等没有期限的上下文不受影响。
+"""
+
+import math
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.core.config import settings
+from app.core.exceptions import DeadlineExceededError
+
+# SQLite 进度回调的检查间隔（虚拟机指令数）
+_SQLITE_PROGRESS_STEPS = 10000
+
+# MySQL 超过 MAX_EXECUTION_TIME 时的错误码
+_MYSQL_EXECUTION_TIMEOUT = 3024
+
+_SELECT = re.compile(r"^\s*SELECT\b", re.IGNORECASE)
+
+
+class Deadline:
+    """请求的截止时间（基于单调时钟）"""
+
+    __slots__ = ("expires_at",)
+
+    def __init__(self, seconds: float):
+        """
+        Args:
+            seconds: 从现在起的可用时间（秒）
+        """
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """剩余时间（秒），已超时时为负数"""
+        return self.expires_at - time.monotonic()
+
+    def expired(self) -> bool:
+        """是否已超时"""
+        return self.remaining() <= 0
+
+
+_current_deadline: ContextVar[Optional[Deadline]] = ContextVar("request_deadline", default=None)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """当前上下文的截止时间，没有期限时返回None"""
+    return _current_deadline.get()
+
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]) -> Iterator[Optional[Deadline]]:
+    """
+    在代码块内设置截止时间（已有更早的截止时间时保持不变）
+
+    Args:
+        seconds: 可用时间（秒），None 或 0 表示不限
+
+    Yields:
+        Optional[Deadline]: 生效的截止时间
+    """
+    deadline = current_deadline()
+    if seconds:
+        candidate = Deadline(seconds)
+        if deadline is None or candidate.expires_at < deadline.expires_at:
+            deadline = candidate
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def route_timeouts() -> Dict[str, float]:
+    """
+    REQUEST_TIMEOUTS 中按路径前缀覆盖的期限
+
+    Returns:
+        Dict[str, float]: 路径前缀 -> 秒数
+    """
+    timeouts = {}
+    for item in settings.REQUEST_TIMEOUTS.split(","):
+        prefix, sep, seconds = item.partition("=")
+        if sep:
+            timeouts[prefix.strip()] = float(seconds)
+    return timeouts
+
+
+def request_timeout(path: str, header: Optional[str] = None) -> Optional[float]:
+    """
+    请求的可用时间
+
+    Args:
+        path: 请求路径，匹配 REQUEST_TIMEOUTS 中最长的前缀，未匹配时使用 REQUEST_TIMEOUT_SECONDS
+        header: X-Request-Timeout 请求头（秒），客户端放弃等待的时间，只能缩短服务端的期限
+
+    Returns:
+        Optional[float]: 秒数，None 表示不限
+    """
+    timeouts = route_timeouts()
+    matched = [prefix for prefix in timeouts if path.startswith(prefix)]
+    timeout = timeouts[max(matched, key=len)] if matched else settings.REQUEST_TIMEOUT_SECONDS
+    timeout = timeout or None
+    try:
+        requested = float(header) if header else None
+    except ValueError:
+        requested = None
+    if requested is not None and requested > 0 and math.isfinite(requested):
+        timeout = min(timeout, requested) if timeout else requested
+    return timeout
+
+
+class DeadlineMiddleware:
+    """
+    请求期限中间件（纯 ASGI 实现）
+    放在准入控制中间件外侧，排队等待的时间同样计入期限。流式响应在发送期间期限仍然有效。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        header = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-timeout":
+                header = value.decode("latin-1")
+                break
+        with deadline_scope(request_timeout(scope["path"], header)):
+            await self.app(scope, receive, send)
+
+
+# ==================== 数据库语句超时 ====================
+
+def with_max_execution_time(statement: str, milliseconds: int) -> str:
+    """
+    给 MySQL 的 SELECT 语句加上执行时间上限提示（其他语句原样返回，MySQL 只对只读 SELECT 生效）
+
+    Args:
+        statement: SQL 语句
+        milliseconds: 执行时间上限（毫秒）
+
+    Returns:
+        str: 改写后的语句
+    """
+    return _SELECT.sub(f"SELECT /*+ MAX_EXECUTION_TIME({milliseconds}) */", statement, count=1)
+
+
+def _sqlite_progress() -> int:
+    """SQLite 进度回调：当前上下文已超时时返回非零值中断语句"""
+    deadline = _current_deadline.get()
+    return 1 if deadline is not None and deadline.expired() else 0
+
+
+@event.listens_for(Engine, "before_cursor_execute", retval=True)
+def _apply_deadline(conn, cursor, statement, parameters, context, executemany):
+    """
+    按剩余时间限制语句的执行时间
+
+    Raises:
+        DeadlineExceededError: 截止时间已过时抛出，不再发送语句
+    """
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return statement, parameters
+    remaining = deadline.remaining()
+    if remaining <= 0:
+        raise DeadlineExceededError()
+
+    dbapi_connection = conn.connection.driver_connection
+    if conn.dialect.name == "mysql":
+        statement = with_max_execution_time(statement, max(1, math.ceil(remaining * 1000)))
+    elif isinstance(dbapi_connection, sqlite3.Connection) and not conn.connection.info.get("deadline_progress"):
+        # 回调读取的是执行语句时的上下文变量，每个连接只需注册一次，连接复用到没有期限的上下文时不生效
+        dbapi_connection.set_progress_handler(_sqlite_progress, _SQLITE_PROGRESS_STEPS)
+        conn.connection.info["deadline_progress"] = True
+    return statement, parameters
+
+
+@event.listens_for(Engine, "handle_error")
+def _translate_timeout(context):
+    """
+    语句因超时被中止时改为抛出 DeadlineExceededError
+
+    Raises:
+        DeadlineExceededError: 语句因请求超时被中止时抛出
+    """
+    if isinstance(context.original_exception, DeadlineExceededError):
+        return
+    deadline = _current_deadline.get()
+    args = getattr(context.original_exception, "args", ())
+    if (deadline is not None and deadline.expired()) or (args and args[0] == _MYSQL_EXECUTION_TIMEOUT):
+        raise DeadlineExceededError() from context.original_exception
@@ -3,35 +3,35 @@
 定义 FastAPI 的依赖注入函数，用于认证和权限控制
 """
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, Query, Request, Response, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from app.core.database import get_db
 from app.core.security import decode_access_token
 from app.db.models import User
+from app.service.idempotency import IdempotencyService, IdempotentRequest
 from typing import Optional, List
 
 # HTTP Bearer Token 认证方案
 security = HTTPBearer()
 
+# 可选的 Bearer Token（未携带时不报错，由依赖自行处理）
+optional_security = HTTPBearer(auto_error=False)
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
+
+def _get_user_by_token(token: Optional[str], db: Session) -> User:
     """
-    获取当前登录用户
-    从 HTTP Bearer Token 中解析用户信息
-    
+    解析 Token 并查询对应的用户
+
     Args:
-        credentials: HTTP Bearer Token 凭证
+        token: 访问令牌
         db: 数据库会话
-        
+
     Raises:
         HTTPException: 认证失败时抛出401异常
-        
+
     Returns:
-        User: 当前用户对象
+        User: 用户对象
     """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -39,11 +39,8 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    # 获取Token
-    token = credentials.credentials
-    
     # 解码Token
-    payload = decode_access_token(token)
+    payload = decode_access_token(token) if token else None
     
     if payload is None:
         raise credentials_exception
@@ -61,6 +58,49 @@ async def get_current_user(
     return user
 
 
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db, scope="function")
+) -> User:
+    """
+    获取当前登录用户
+    从 HTTP Bearer Token 中解析用户信息
+    
+    Args:
+        credentials: HTTP Bearer Token 凭证
+        db: 数据库会话
+        
+    Raises:
+        HTTPException: 认证失败时抛出401异常
+        
+    Returns:
+        User: 当前用户对象
+    """
+    return _get_user_by_token(credentials.credentials, db)
+
+
+async def get_stream_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    access_token: Optional[str] = Query(
+        None, description="访问令牌，浏览器 EventSource 无法设置请求头时通过查询参数传递"
+    ),
+    db: Session = Depends(get_db, scope="function")
+) -> User:
+    """
+    获取长连接（SSE）的当前用户
+    Token 可以放在 Authorization 请求头或 access_token 查询参数中。
+    数据库会话在接口函数返回时即关闭，不会在整个推送期间占用连接。
+
+    Raises:
+        HTTPException: 认证失败时抛出401异常，用户被禁用时抛出400异常
+
+    Returns:
+        User: 当前活跃用户对象
+    """
+    token = credentials.credentials if credentials else access_token
+    return await get_current_active_user(_get_user_by_token(token, db))
+
+
 async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
     """
     获取当前活跃用户
@@ -138,3 +178,75 @@ require_staff = RoleChecker(["admin", "staff"])
 
 # 宠物主人权限（包含员工和管理员）
 require_owner = RoleChecker(["admin", "staff", "owner"])
+
+
+# ==================== 乐观锁依赖 ====================
+
+def get_if_match(
+    if_match: Optional[str] = Header(
+        None, alias="If-Match",
+        description="读取时的版本号（响应中的 version），与当前版本不一致时返回 409"
+    )
+) -> Optional[int]:
+    """
+    解析 If-Match 请求头中的版本号
+    接受 `3`、`"3"` 和弱校验形式 `W/"3"`
+
+    Raises:
+        HTTPException: 请求头不是版本号时抛出400异常
+
+    Returns:
+        Optional[int]: 期望的版本号，未携带请求头时为None
+    """
+    if if_match is None:
+        return None
+    value = if_match.strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    value = value.strip('"')
+    if not value.isdigit():
+        raise HTTPException(status_code=400, detail="If-Match 必须是版本号")
+    return int(value)
+
+
+# ==================== 幂等请求依赖 ====================
+
+async def get_idempotent_request(
+    request: Request,
+    response: Response,
+    idempotency_key: Optional[str] = Header(
+        None, alias="Idempotency-Key", min_length=1, max_length=100,
+        description="幂等键，超时重试时携带相同的值，写操作只会执行一次"
+    ),
+    db: Session = Depends(get_db, scope="function"),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    幂等请求依赖
+    请求携带 Idempotency-Key 时在当前事务中占用该键；键已被同一请求使用过时
+    返回已保存的响应供接口直接重放，并在响应头中标记 Idempotent-Replayed。
+
+    接口未调用 save 就正常返回（如无权限提示）时释放该键，
+    接口抛出异常时键随事务一起回滚，两种情况客户端都可以用同一个键重试。
+
+    Raises:
+        ConflictError: 键已用于不同的请求，或相同请求仍在处理中
+
+    Returns:
+        IdempotentRequest: 幂等请求对象
+    """
+    if idempotency_key is None:
+        yield IdempotentRequest(db)
+        return
+
+    request_hash = IdempotencyService.fingerprint(
+        request.method, request.url.path, request.url.query, await request.body()
+    )
+    record_id, replay = IdempotencyService.begin(db, current_user.id, idempotency_key, request_hash)
+    if replay is not None:
+        response.headers["Idempotent-Replayed"] = "true"
+
+    idempotency = IdempotentRequest(db, record_id, replay)
+    yield idempotency
+    if idempotency.record_id is not None and not idempotency.saved:
+        IdempotencyService.release(db, idempotency.record_id)
@@ -63,6 +63,12 @@ class ConflictError(BusinessException):
         super().__init__(code=409, msg=msg)
 
 
+class DeadlineExceededError(BusinessException):
+    """请求处理超时异常 (504)"""
+    def __init__(self, msg: str = "请求处理超时，请缩小查询范围后重试"):
+        super().__init__(code=504, msg=msg)
+
+
 # ==================== 全局异常处理器 ====================
 
 async def business_exception_handler(request: Request, exc: BusinessException):
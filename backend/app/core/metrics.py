@@ -0,0 +1,399 @@
+"""
+请求耗时统计
+记录每个路由的延迟直方图以及分阶段耗时（依赖解析、数据库、业务处理、序列化、提交），
+以 Prometheus 文本格式在 /metrics 暴露，并通过 Server-Timing 响应头返回给前端
+"""
+
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+# ==================== 直方图 ====================
+
+# 延迟分桶（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# 分阶段耗时的名称，顺序即 Server-Timing 头中的顺序
+PHASES = ("deps", "db", "handler", "serialize", "commit")
+
+
+def _escape(value: str) -> str:
+    """转义 Prometheus 标签值"""
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Histogram:
+    """
+    线程安全的 Prometheus 直方图
+    每组标签值维护一组累计桶计数、总和与总数
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str],
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        """
+        初始化直方图
+
+        Args:
+            name: 指标名称
+            documentation: 指标说明（HELP 行）
+            labelnames: 标签名列表
+            buckets: 分桶上界（升序）
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        """
+        记录一次观测值
+
+        Args:
+            labels: 与 labelnames 一一对应的标签值
+            value: 观测值（秒）
+        """
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # [各桶计数（最后一个为 +Inf）, 总和, 总数]
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def clear(self) -> None:
+        """清空所有观测值"""
+        with self._lock:
+            self._series.clear()
+
+    def render(self) -> List[str]:
+        """
+        输出 Prometheus 文本格式
+
+        Returns:
+            List[str]: 文本行列表
+        """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(labels, list(s[0]), s[1], s[2]) for labels, s in sorted(self._series.items())]
+
+        for labels, counts, total, count in snapshot:
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {count}')
+            lines.append(f"{self.name}_sum{{{base}}} {total}")
+            lines.append(f"{self.name}_count{{{base}}} {count}")
+        return lines
+
+
+# 请求总耗时（从进入中间件到响应体发送完毕）
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency in seconds",
+    ("method", "route", "status"),
+)
+
+# 请求各阶段耗时
+REQUEST_PHASE_LATENCY = Histogram(
+    "http_request_phase_duration_seconds",
+    "HTTP request latency by phase (deps, db, handler, serialize, commit) in seconds",
+    ("method", "route", "phase"),
+)
+
+
+# 其他模块注册的指标输出函数，每个返回 Prometheus 文本行列表
+_collectors: List[Callable[[], List[str]]] = []
+
+
+def register_collector(collector: Callable[[], List[str]]) -> None:
+    """
+    注册额外的指标输出函数，/metrics 输出时依次调用
+
+    Args:
+        collector: 返回 Prometheus 文本行列表的函数
+    """
+    _collectors.append(collector)
+
+
+def render_metrics() -> str:
+    """
+    输出全部指标的 Prometheus 文本
+
+    注意指标保存在进程内，多 worker 部署时每个 worker 单独暴露自己的数据。
+
+    Returns:
+        str: Prometheus 文本格式内容
+    """
+    lines = REQUEST_LATENCY.render() + REQUEST_PHASE_LATENCY.render()
+    for collector in _collectors:
+        lines += collector()
+    return "\n".join(lines) + "\n"
+
+
+# ==================== 请求内计时上下文 ====================
+
+class RequestTimings:
+    """
+    单个请求的计时点
+    由中间件创建并放入 contextvar，路由端点包装器、get_db 与数据库事件向其中写入时间
+    """
+
+    __slots__ = (
+        "start", "handler_start", "handler_end", "commit_start", "commit_end", "response_start", "db", "db_count"
+    )
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.handler_start: Optional[float] = None
+        self.handler_end: Optional[float] = None
+        self.commit_start: Optional[float] = None
+        self.commit_end: Optional[float] = None
+        self.response_start: Optional[float] = None
+        self.db = 0.0
+        self.db_count = 0
+
+    def phases(self) -> Dict[str, float]:
+        """
+        计算各阶段耗时（秒）
+
+        - deps: 进入请求到端点函数被调用（路由匹配、参数解析、依赖注入）
+        - db: 请求内所有 SQL 语句的执行时间之和（与其他阶段有重叠）
+        - handler: 端点函数本身
+        - serialize: 端点返回到开始提交（响应模型校验与 JSON 编码，以及其他依赖的退出代码）；
+          没有提交阶段时到开始发送响应为止
+        - commit: 请求工作单元的 flush 与 COMMIT（FastAPI 在响应序列化之后、发送之前退出
+          function 作用域的依赖，见 get_db）
+
+        Returns:
+            Dict[str, float]: 阶段名到耗时的映射，未到达的阶段不返回
+        """
+        result = {"db": self.db}
+        if self.handler_start is not None:
+            result["deps"] = self.handler_start - self.start
+            if self.handler_end is not None:
+                result["handler"] = self.handler_end - self.handler_start
+                serialize_end = self.commit_start if self.commit_start is not None else self.response_start
+                if serialize_end is not None:
+                    result["serialize"] = serialize_end - self.handler_end
+        if self.commit_start is not None and self.commit_end is not None:
+            result["commit"] = self.commit_end - self.commit_start
+        return result
+
+
+_current_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def mark_commit_start() -> None:
+    """记录请求工作单元开始提交的时间（由 get_db 在接口函数和响应序列化完成后调用）"""
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.commit_start = time.perf_counter()
+
+
+def mark_commit_end() -> None:
+    """记录请求工作单元提交结束的时间，未开始提交（请求出错回滚）时忽略"""
+    timings = _current_timings.get()
+    if timings is not None and timings.commit_start is not None:
+        timings.commit_end = time.perf_counter()
+
+
+# ==================== 语句计时 ====================
+
+# 其他模块注册的语句耗时回调，参数为 (conn, cursor, statement, parameters, 耗时秒)
+QueryListener = Callable[[object, object, str, object, float], None]
+_query_listeners: List[QueryListener] = []
+
+# conn.info 中保存 (执行上下文, 开始时间) 的栈（嵌套执行时后进先出）
+_QUERY_START_KEY = "query_start"
+
+
+def add_query_listener(listener: QueryListener) -> None:
+    """
+    注册语句耗时回调，每条语句执行成功后调用一次
+
+    所有模块共用同一对引擎事件计时，不再各自在 conn.info 中维护开始时间。
+
+    Args:
+        listener: 接收 (conn, cursor, statement, parameters, 耗时秒) 的函数
+    """
+    if listener not in _query_listeners:
+        _query_listeners.append(listener)
+
+
+def remove_query_listener(listener: QueryListener) -> None:
+    """
+    移除语句耗时回调（未注册时忽略）
+
+    Args:
+        listener: add_query_listener() 注册的函数
+    """
+    if listener in _query_listeners:
+        _query_listeners.remove(listener)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """记录语句开始时间"""
+    conn.info.setdefault(_QUERY_START_KEY, []).append((context, time.perf_counter()))
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    """将语句耗时累加到当前请求，并通知已注册的回调"""
+    elapsed = time.perf_counter() - conn.info[_QUERY_START_KEY].pop()[1]
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.db += elapsed
+        timings.db_count += 1
+    for listener in _query_listeners:
+        listener(conn, cursor, statement, parameters, elapsed)
+
+
+@event.listens_for(Engine, "handle_error")
+def _discard_query_start(context):
+    """
+    语句执行失败时不会触发 after_cursor_execute，在此弹出其开始时间，避免栈在连接上累积
+
+    只弹出属于失败语句的条目：其他 before_cursor_execute 监听器（如请求期限检查）
+    可能在本模块记录开始时间之前就抛出异常，此时栈顶属于外层语句，不能弹出。
+    """
+    conn = context.connection
+    if conn is None or conn.invalidated:
+        return
+    starts = conn.info.get(_QUERY_START_KEY)
+    if starts and starts[-1][0] is context.execution_context:
+        starts.pop()
+
+
+# ==================== 路由端点计时 ====================
+
+def _timed_endpoint(endpoint):
+    """
+    包装路由端点函数，记录其开始与结束时间
+    保持原函数的同步 / 异步属性和签名，FastAPI 的参数解析不受影响
+    """
+    if inspect.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            timings = _current_timings.get()
+            if timings is not None:
+                timings.handler_start = time.perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                if timings is not None:
+                    timings.handler_end = time.perf_counter()
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            timings = _current_timings.get()
+            if timings is not None:
+                timings.handler_start = time.perf_counter()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                if timings is not None:
+                    timings.handler_end = time.perf_counter()
+    return wrapper
+
+
+class TimedRoute(APIRoute):
+    """
+    带计时的路由类
+    用法: router = APIRouter(route_class=TimedRoute)
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+
+def route_template(scope) -> str:
+    """
+    取得请求匹配到的路由模板（如 /api/pets/{pet_id}），避免以真实路径作标签导致基数爆炸
+
+    路由对象上的 path 可能不含 include_router 的前缀，
+    因此用请求路径中对应数量的前缀段补齐。
+    """
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    template_segments = template.strip("/").split("/") if template.strip("/") else []
+    path_segments = scope["path"].strip("/").split("/")
+    prefix = path_segments[:max(len(path_segments) - len(template_segments), 0)]
+    return "/" + "/".join(prefix + template_segments)
+
+
+# ==================== 计时中间件 ====================
+
+class TimingMiddleware:
+    """
+    请求计时中间件（纯 ASGI 实现，不缓冲响应体，对流式响应同样适用）
+    开始发送响应时写入 Server-Timing 头，响应体发送完毕后记录直方图。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current_timings.set(timings)
+        status = "500"
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                timings.response_start = time.perf_counter()
+                status = str(message["status"])
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", _server_timing(timings).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_timings.reset(token)
+            total = time.perf_counter() - timings.start
+            method = scope["method"]
+            route = route_template(scope)
+            REQUEST_LATENCY.observe((method, route, status), total)
+            for phase, value in timings.phases().items():
+                REQUEST_PHASE_LATENCY.observe((method, route, phase), value)
+
+
+def _server_timing(timings: RequestTimings) -> str:
+    """
+    生成 Server-Timing 头，单位毫秒
+
+    示例: deps;dur=1.20, db;dur=3.45;desc="2 queries", handler;dur=4.10, serialize;dur=0.80, commit;dur=2.10, app;dur=8.40
+    """
+    phases = timings.phases()
+    parts = []
+    for phase in PHASES:
+        if phase not in phases:
+            continue
+        part = f"{phase};dur={phases[phase] * 1000:.2f}"
+        if phase == "db":
+            part += f';desc="{timings.db_count} queries"'
+        parts.append(part)
+    parts.append(f"app;dur={(timings.response_start - timings.start) * 1000:.2f}")
+    return ", ".join(parts)
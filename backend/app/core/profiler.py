@@ -0,0 +1,297 @@
+"""
+SQL 查询分析器
+基于 SQLAlchemy 引擎事件记录每个请求执行的全部语句（归一化文本、耗时、行数），
+将同一请求内反复出现的同形查询标记为疑似 N+1，
+结果写入结构化日志，并保留最近的请求供管理员接口查看
+"""
+
+import json
+import logging
+import re
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from sqlalchemy.engine import Engine
+from app.core.config import settings
+from app.core.metrics import add_query_listener, remove_query_listener, route_template
+
+logger = logging.getLogger(__name__)
+
+
+# ==================== 语句归一化 ====================
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST_RE = re.compile(r"\(\s*(?:\?|%s|:\w+)(?:\s*,\s*(?:\?|%s|:\w+))+\s*\)")
+_POSTCOMPILE_RE = re.compile(r"\(?__\[POSTCOMPILE_\w+\]\)?")
+
+
+def normalize_statement(statement: str) -> str:
+    """
+    将 SQL 语句归一化为"形状"：合并空白，字面量替换为 ?，IN 列表折叠为 (?...)
+
+    同一段代码在循环中执行的查询归一化后文本相同，据此识别 N+1。
+
+    Args:
+        statement: 原始 SQL 语句
+
+    Returns:
+        str: 归一化后的语句
+    """
+    text = _WHITESPACE_RE.sub(" ", statement).strip()
+    text = _STRING_RE.sub("?", text)
+    text = _NUMBER_RE.sub("?", text)
+    text = _POSTCOMPILE_RE.sub("(?...)", text)
+    return _PLACEHOLDER_LIST_RE.sub("(?...)", text)
+
+
+# ==================== 请求内记录 ====================
+
+class QueryRecord:
+    """单条语句的执行记录"""
+
+    __slots__ = ("statement", "duration", "rowcount")
+
+    def __init__(self, statement: str, duration: float, rowcount: Optional[int]):
+        self.statement = statement
+        self.duration = duration
+        self.rowcount = rowcount
+
+
+class RequestProfile:
+    """单个请求内执行的全部语句"""
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self.queries: List[QueryRecord] = []
+
+    def summarize(self, n_plus_one_threshold: int) -> dict:
+        """
+        汇总请求内的语句
+
+        Args:
+            n_plus_one_threshold: 同形 SELECT 在一个请求内出现多少次视为疑似 N+1
+
+        Returns:
+            dict: 请求汇总，statements 按总耗时降序排列
+        """
+        shapes: Dict[str, dict] = {}
+        for query in self.queries:
+            shape = shapes.get(query.statement)
+            if shape is None:
+                shape = shapes[query.statement] = {
+                    "statement": query.statement, "count": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0
+                }
+            duration_ms = query.duration * 1000
+            shape["count"] += 1
+            shape["total_ms"] += duration_ms
+            shape["max_ms"] = max(shape["max_ms"], duration_ms)
+            if query.rowcount is not None:
+                shape["rows"] += query.rowcount
+
+        statements = sorted(shapes.values(), key=lambda s: s["total_ms"], reverse=True)
+        for shape in statements:
+            shape["total_ms"] = round(shape["total_ms"], 3)
+            shape["max_ms"] = round(shape["max_ms"], 3)
+
+        suspects = [
+            s for s in statements
+            if s["count"] >= n_plus_one_threshold and s["statement"].upper().startswith("SELECT")
+        ]
+        return {
+            "method": self.method,
+            "path": self.path,
+            "started_at": self.started_at,
+            "query_count": len(self.queries),
+            "total_ms": round(sum(q.duration for q in self.queries) * 1000, 3),
+            "n_plus_one": suspects,
+            "statements": statements,
+        }
+
+
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("sql_profile", default=None)
+
+
+# ==================== 分析器 ====================
+
+class QueryProfiler:
+    """
+    SQL 查询分析器
+    attach() 挂载到引擎上，ProfilerMiddleware 为每个请求开启和结束一次记录。
+    """
+
+    def __init__(self, history: int = 200, n_plus_one_threshold: int = 5):
+        """
+        初始化分析器
+
+        Args:
+            history: 保留的最近请求数
+            n_plus_one_threshold: 疑似 N+1 的同形查询次数阈值
+        """
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self._recent: deque = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._engines: List[Engine] = []
+
+    # ---------- 引擎事件 ----------
+
+    def attach(self, engine: Engine) -> None:
+        """
+        记录该引擎上执行的语句（重复调用无副作用）
+        计时复用 metrics 模块的语句计时事件，这里只注册耗时回调
+
+        Args:
+            engine: 数据库引擎
+        """
+        if engine in self._engines:
+            return
+        self._engines.append(engine)
+        add_query_listener(self._on_query)
+
+    def detach(self) -> None:
+        """停止记录所有引擎上的语句"""
+        remove_query_listener(self._on_query)
+        self._engines.clear()
+
+    def _on_query(self, conn, cursor, statement, parameters, elapsed):
+        profile = _current_profile.get()
+        if profile is None or conn.engine not in self._engines:
+            return
+        # 部分驱动对 SELECT 返回 -1，表示行数未知
+        rowcount = cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else None
+        profile.queries.append(QueryRecord(normalize_statement(statement), elapsed, rowcount))
+
+    # ---------- 请求边界 ----------
+
+    def start(self, method: str, path: str) -> object:
+        """
+        开始记录一个请求
+
+        Returns:
+            object: 结束记录时需要传回的令牌
+        """
+        return _current_profile.set(RequestProfile(method, path))
+
+    def finish(self, token, route: Optional[str] = None) -> Optional[dict]:
+        """
+        结束记录，写入结构化日志并保存到最近请求列表
+
+        Args:
+            token: start() 返回的令牌
+            route: 匹配到的路由模板，传入时替换请求路径，便于按接口聚合
+
+        Returns:
+            Optional[dict]: 请求汇总，没有执行任何语句时返回 None
+        """
+        profile = _current_profile.get()
+        _current_profile.reset(token)
+        if profile is None or not profile.queries:
+            return None
+        if route is not None:
+            profile.path = route
+
+        summary = profile.summarize(self.n_plus_one_threshold)
+        with self._lock:
+            self._recent.append(summary)
+
+        log = {
+            "event": "sql_profile",
+            "method": summary["method"],
+            "path": summary["path"],
+            "query_count": summary["query_count"],
+            "total_ms": summary["total_ms"],
+            "n_plus_one": [{"statement": s["statement"], "count": s["count"]} for s in summary["n_plus_one"]],
+        }
+        if summary["n_plus_one"]:
+            logger.warning(json.dumps(log, ensure_ascii=False))
+        else:
+            logger.info(json.dumps(log, ensure_ascii=False))
+        return summary
+
+    # ---------- 报表 ----------
+
+    def report(self, limit: int = 20) -> dict:
+        """
+        生成最差请求与最差语句报表
+
+        Args:
+            limit: 每个列表返回的条数
+
+        Returns:
+            dict: worst_requests 按查询次数降序；top_statements 按全部请求中的累计耗时降序；
+                n_plus_one 为出现过疑似 N+1 的语句及其出现的路径
+        """
+        with self._lock:
+            recent = list(self._recent)
+
+        statements: Dict[str, dict] = {}
+        n_plus_one: Dict[str, dict] = {}
+        for summary in recent:
+            for shape in summary["statements"]:
+                agg = statements.setdefault(shape["statement"], {
+                    "statement": shape["statement"], "count": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0
+                })
+                agg["count"] += shape["count"]
+                agg["total_ms"] = round(agg["total_ms"] + shape["total_ms"], 3)
+                agg["max_ms"] = max(agg["max_ms"], shape["max_ms"])
+                agg["rows"] += shape["rows"]
+            for shape in summary["n_plus_one"]:
+                suspect = n_plus_one.setdefault(shape["statement"], {
+                    "statement": shape["statement"], "requests": 0, "max_count": 0, "paths": []
+                })
+                suspect["requests"] += 1
+                suspect["max_count"] = max(suspect["max_count"], shape["count"])
+                route = f"{summary['method']} {summary['path']}"
+                if route not in suspect["paths"]:
+                    suspect["paths"].append(route)
+
+        worst_requests = sorted(recent, key=lambda s: (s["query_count"], s["total_ms"]), reverse=True)
+        return {
+            "requests_sampled": len(recent),
+            "n_plus_one_threshold": self.n_plus_one_threshold,
+            "worst_requests": [
+                {k: v for k, v in s.items() if k != "statements"} for s in worst_requests[:limit]
+            ],
+            "top_statements": sorted(statements.values(), key=lambda s: s["total_ms"], reverse=True)[:limit],
+            "n_plus_one": sorted(n_plus_one.values(), key=lambda s: s["max_count"], reverse=True)[:limit],
+        }
+
+    def clear(self) -> None:
+        """清空已记录的请求"""
+        with self._lock:
+            self._recent.clear()
+
+
+# 全局分析器实例
+query_profiler = QueryProfiler(
+    history=settings.SQL_PROFILER_HISTORY,
+    n_plus_one_threshold=settings.SQL_PROFILER_N_PLUS_ONE_THRESHOLD,
+)
+
+
+# ==================== 分析中间件 ====================
+
+class ProfilerMiddleware:
+    """
+    为每个 HTTP 请求开启一次 SQL 记录（纯 ASGI 实现）
+    """
+
+    def __init__(self, app, profiler: QueryProfiler = query_profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = self.profiler.start(scope["method"], scope["path"])
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.profiler.finish(token, route_template(scope))
@@ -0,0 +1,531 @@
+"""
+接口限流
+按客户端 IP 或用户对接口做令牌桶限流，超出时直接返回 429，
+作为路由级依赖在数据库会话、请求体校验之外的昂贵工作（查库、bcrypt 校验密码）之前执行。
+
+令牌桶的存储：
+- shm（默认）：同一台主机上所有 uvicorn worker 共享的内存映射文件，
+  桶按键的哈希分布在固定数量的槽位中，读改写期间对槽位加 fcntl 字节范围锁
+- redis：多台主机共享，一个 Lua 脚本原子地完成取令牌；Redis 不可用时退回本机 shm 存储
+- memory：仅当前进程内有效，用于测试或不支持 fcntl 的平台
+
+限额写作 "次数/周期"（周期为 second、minute、hour、day），例如 "10/minute"：
+桶容量为 10，每 6 秒补充 1 个令牌。RATE_LIMITS 可按限流名称覆盖代码中的默认限额。
+"""
+
+import hashlib
+import logging
+import math
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional, Tuple, Union
+
+from fastapi import HTTPException, Request, status
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.security import decode_access_token
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 周期名称 -> 秒数
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+@dataclass(frozen=True)
+class Limit:
+    """
+    令牌桶限额
+
+    Attributes:
+        capacity: 桶容量（允许的突发次数）
+        rate: 每秒补充的令牌数
+    """
+    capacity: float
+    rate: float
+
+
+_limit_cache: Dict[str, Optional[Limit]] = {}
+
+
+def parse_limit(spec: str) -> Optional[Limit]:
+    """
+    解析限额字符串
+
+    Args:
+        spec: "次数/周期"，如 "10/minute"、"5/second"；"off" 或空字符串表示不限流
+
+    Raises:
+        ValueError: 格式不正确时抛出
+
+    Returns:
+        Optional[Limit]: 限额，不限流时返回None
+    """
+    spec = spec.strip().lower()
+    if spec in ("", "off"):
+        return None
+    if spec not in _limit_cache:
+        count, _, period = spec.partition("/")
+        if period not in _PERIODS or not count.strip().isdigit() or int(count) <= 0:
+            raise ValueError(f"无效的限额: {spec}")
+        _limit_cache[spec] = Limit(capacity=int(count), rate=int(count) / _PERIODS[period])
+    return _limit_cache[spec]
+
+
+def configured_limits() -> Dict[str, str]:
+    """
+    RATE_LIMITS 中按名称覆盖的限额
+
+    Returns:
+        Dict[str, str]: 限流名称 -> 限额字符串
+    """
+    overrides = {}
+    for item in settings.RATE_LIMITS.split(","):
+        name, sep, spec = item.partition("=")
+        if sep:
+            overrides[name.strip()] = spec.strip()
+    return overrides
+
+
+def _refill(tokens: float, updated: float, now: float, limit: Limit, cost: float) -> Tuple[float, bool, float]:
+    """
+    补充令牌并尝试取出 cost 个
+
+    Returns:
+        Tuple[float, bool, float]: 剩余令牌数、是否允许、被拒绝时需等待的秒数
+    """
+    tokens = min(limit.capacity, tokens + max(0.0, now - updated) * limit.rate)
+    if tokens >= cost:
+        return tokens - cost, True, 0.0
+    return tokens, False, (cost - tokens) / limit.rate
+
+
+# ==================== 令牌桶存储 ====================
+
+class MemoryBucketStore:
+    """进程内令牌桶存储"""
+
+    # 取令牌是否需要网络访问（需要时放到线程池执行，避免阻塞事件循环）
+    remote = False
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, limit: Limit, cost: float = 1, now: Optional[float] = None) -> Tuple[bool, float]:
+        """
+        从桶中取出令牌
+
+        Args:
+            key: 桶的键
+            limit: 限额
+            cost: 本次消耗的令牌数
+            now: 当前时间戳，默认取系统时间
+
+        Returns:
+            Tuple[bool, float]: 是否允许、被拒绝时需等待的秒数
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (limit.capacity, now))
+            tokens, allowed, retry_after = _refill(tokens, updated, now, limit, cost)
+            self._buckets[key] = (tokens, now)
+        return allowed, retry_after
+
+
+class SharedMemoryBucketStore:
+    """
+    同一主机多进程共享的令牌桶存储
+
+    文件由固定数量的槽位组成，每个槽位为 (键哈希 u64, 令牌数 f64, 更新时间 f64, 补满时间 f64)。
+    键按哈希定位到槽位，向后最多探测 PROBE 个：命中同一个键、空槽位，或已过补满时间的槽位
+    （补满的桶与新桶等价，可直接复用）。探测范围都被占用时复用第一个槽位，
+    此时两个键共用一个桶，只会让限流偏严，不会放过超额请求。
+
+    fcntl 锁是进程级的，同一进程的多个线程之间再用线程锁互斥。
+    """
+
+    remote = False
+
+    _SLOT = struct.Struct("<Qddd")
+    PROBE = 4
+
+    def __init__(self, path: str, slots: int = 65536):
+        """
+        打开（不存在时创建）共享文件并映射到内存
+
+        Args:
+            path: 共享文件路径，同一主机上的 worker 必须使用同一路径
+            slots: 槽位数，所有 worker 必须一致
+        """
+        self.slots = slots
+        size = slots * self._SLOT.size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        """键的 64 位哈希，0 保留给空槽位"""
+        return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little") or 1
+
+    def take(self, key: str, limit: Limit, cost: float = 1, now: Optional[float] = None) -> Tuple[bool, float]:
+        """
+        从桶中取出令牌
+
+        Args:
+            key: 桶的键
+            limit: 限额
+            cost: 本次消耗的令牌数
+            now: 当前时间戳，默认取系统时间
+
+        Returns:
+            Tuple[bool, float]: 是否允许、被拒绝时需等待的秒数
+        """
+        now = time.time() if now is None else now
+        key_hash = self._hash(key)
+        first = key_hash % self.slots
+        indexes = [(first + i) % self.slots for i in range(self.PROBE)]
+        with self._lock:
+            self._lock_slots(indexes, fcntl.LOCK_EX)
+            try:
+                index, tokens, updated = self._find(key_hash, indexes, limit, now)
+                tokens, allowed, retry_after = _refill(tokens, updated, now, limit, cost)
+                full_at = now + (limit.capacity - tokens) / limit.rate
+                self._SLOT.pack_into(self._map, index * self._SLOT.size, key_hash, tokens, now, full_at)
+            finally:
+                self._lock_slots(indexes, fcntl.LOCK_UN)
+        return allowed, retry_after
+
+    def _lock_slots(self, indexes, operation) -> None:
+        """对探测范围加锁或解锁（回绕到文件开头时分两段）"""
+        size = self._SLOT.size
+        if indexes[0] <= indexes[-1]:
+            fcntl.lockf(self._fd, operation, len(indexes) * size, indexes[0] * size)
+        else:
+            fcntl.lockf(self._fd, operation, (self.slots - indexes[0]) * size, indexes[0] * size)
+            fcntl.lockf(self._fd, operation, (indexes[-1] + 1) * size, 0)
+
+    def _find(self, key_hash: int, indexes, limit: Limit, now: float) -> Tuple[int, float, float]:
+        """
+        在探测范围中找到键所在的槽位
+
+        Returns:
+            Tuple[int, float, float]: 槽位下标，以及桶的令牌数和更新时间（新桶为满桶）
+        """
+        reusable = None
+        for index in indexes:
+            slot_hash, tokens, updated, full_at = self._SLOT.unpack_from(self._map, index * self._SLOT.size)
+            if slot_hash == key_hash:
+                return index, tokens, updated
+            if reusable is None and (slot_hash == 0 or full_at <= now):
+                reusable = index
+        if reusable is None:
+            index = indexes[0]
+            _, tokens, updated, _ = self._SLOT.unpack_from(self._map, index * self._SLOT.size)
+            return index, tokens, updated
+        return reusable, limit.capacity, now
+
+    def close(self) -> None:
+        """解除映射并关闭文件"""
+        self._map.close()
+        os.close(self._fd)
+
+
+class RedisBucketStore:
+    """
+    多主机共享的令牌桶存储（需要安装 redis）
+
+    桶保存在 Redis 哈希中，由 Lua 脚本原子地补充并取出令牌，
+    键在补满所需时间后过期，不活跃的客户端不会长期占用内存。
+    """
+
+    remote = True
+
+    _SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local now = tonumber(ARGV[4])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(retry_after)}
+"""
+
+    def __init__(self, client, prefix: str = "rate_limit:"):
+        """
+        Args:
+            client: redis.Redis 客户端（测试时可传入 fakeredis 客户端）
+            prefix: 键前缀
+        """
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(self._SCRIPT)
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisBucketStore":
+        """根据连接地址创建"""
+        import redis
+        return cls(redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5))
+
+    def take(self, key: str, limit: Limit, cost: float = 1, now: Optional[float] = None) -> Tuple[bool, float]:
+        """
+        从桶中取出令牌
+
+        Args:
+            key: 桶的键
+            limit: 限额
+            cost: 本次消耗的令牌数
+            now: 当前时间戳，默认取系统时间
+
+        Returns:
+            Tuple[bool, float]: 是否允许、被拒绝时需等待的秒数
+        """
+        now = time.time() if now is None else now
+        allowed, retry_after = self._script(
+            keys=[self.prefix + key], args=[limit.capacity, limit.rate, cost, now]
+        )
+        return bool(int(allowed)), float(retry_after)
+
+
+class RateLimiter:
+    """
+    限流器
+    主存储出错（如 Redis 不可达）时退回备用存储，限流降级为按主机计数而不是放行所有请求。
+    """
+
+    def __init__(self, store, fallback=None):
+        """
+        Args:
+            store: 令牌桶存储
+            fallback: 主存储出错时使用的备用存储
+        """
+        self.store = store
+        self.fallback = fallback
+
+    @property
+    def remote(self) -> bool:
+        """主存储是否需要网络访问"""
+        return self.store.remote
+
+    def hit(self, key: str, limit: Limit, cost: float = 1) -> Tuple[bool, float]:
+        """
+        记录一次请求
+
+        Args:
+            key: 桶的键
+            limit: 限额
+            cost: 本次消耗的令牌数
+
+        Returns:
+            Tuple[bool, float]: 是否允许、被拒绝时需等待的秒数
+        """
+        try:
+            return self.store.take(key, limit, cost)
+        except Exception:
+            if self.fallback is None:
+                raise
+            logger.warning("限流存储不可用，使用本机存储", exc_info=True)
+            return self.fallback.take(key, limit, cost)
+
+
+def _local_store():
+    """本机存储：支持 fcntl 时使用共享内存文件，否则仅进程内"""
+    if fcntl is None:
+        return MemoryBucketStore()
+    path = settings.RATE_LIMIT_SHM_PATH
+    if not path:
+        directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+        path = os.path.join(directory, "pet_management_rate_limit")
+    return SharedMemoryBucketStore(path, settings.RATE_LIMIT_SHM_SLOTS)
+
+
+def create_rate_limiter() -> RateLimiter:
+    """
+    按配置创建限流器
+
+    Returns:
+        RateLimiter: 限流器
+    """
+    backend = settings.RATE_LIMIT_BACKEND
+    if backend == "memory":
+        return RateLimiter(MemoryBucketStore())
+    if backend == "redis":
+        return RateLimiter(RedisBucketStore.from_url(settings.RATE_LIMIT_REDIS_URL), fallback=_local_store())
+    return RateLimiter(_local_store())
+
+
+_rate_limiter: Optional[RateLimiter] = None
+_rate_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """全局限流器，首次使用时创建（避免导入时创建共享文件或连接 Redis）"""
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _rate_limiter_lock:
+            if _rate_limiter is None:
+                _rate_limiter = create_rate_limiter()
+    return _rate_limiter
+
+
+def set_rate_limiter(limiter: Optional[RateLimiter]) -> None:
+    """替换全局限流器（None 表示下次使用时按配置重新创建）"""
+    global _rate_limiter
+    _rate_limiter = limiter
+
+
+# ==================== 限流键 ====================
+
+KeyFunc = Callable[[Request], Awaitable[Optional[str]]]
+
+
+async def client_ip(request: Request) -> Optional[str]:
+    """
+    客户端 IP
+
+    RATE_LIMIT_TRUST_FORWARDED 开启时取 X-Forwarded-For 的第一个地址（仅在可信反向代理之后开启，
+    否则客户端可以伪造该请求头绕过限流）。
+    """
+    if settings.RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return "ip:" + forwarded.split(",")[0].strip()
+    return "ip:" + (request.client.host if request.client else "unknown")
+
+
+async def token_user(request: Request) -> Optional[str]:
+    """
+    Token 中的用户ID，只校验签名不查询数据库；未携带有效 Token 时按客户端 IP
+    """
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token:
+        payload = decode_access_token(token)
+        if payload and payload.get("sub"):
+            return f"user:{payload['sub']}"
+    return await client_ip(request)
+
+
+def body_field(field: str) -> KeyFunc:
+    """
+    按 JSON 请求体中的字段限流，例如登录接口按用户名限制尝试次数
+
+    FastAPI 在执行依赖之前已经读取了请求体，这里读取的是缓存，不会重复接收。
+
+    Args:
+        field: 字段名
+
+    Returns:
+        KeyFunc: 限流键函数，字段缺失时不限流
+    """
+    async def key(request: Request) -> Optional[str]:
+        try:
+            body = await request.json()
+        except ValueError:
+            return None
+        value = body.get(field) if isinstance(body, dict) else None
+        if not isinstance(value, str) or not value:
+            return None
+        return f"{field}:{value.strip().lower()}"
+    return key
+
+
+def combine(*keys: KeyFunc) -> KeyFunc:
+    """
+    组合多个限流键，例如登录接口按 (用户名, 客户端IP) 计数，
+    避免他人用同一用户名刷满计数把真实用户锁在登录之外
+
+    Args:
+        keys: 限流键函数
+
+    Returns:
+        KeyFunc: 限流键函数，任一键缺失时不限流
+    """
+    async def key(request: Request) -> Optional[str]:
+        parts = [await k(request) for k in keys]
+        if any(part is None for part in parts):
+            return None
+        return "|".join(parts)
+    return key
+
+
+_KEYS: Dict[str, KeyFunc] = {"ip": client_ip, "user": token_user}
+
+
+class RateLimit:
+    """
+    限流依赖
+
+    作为路由级依赖使用，在端点参数的依赖（数据库会话等）之前执行：
+    ```python
+    @router.post("/login", dependencies=[Depends(RateLimit("auth.login", "10/minute"))])
+    ```
+    """
+
+    def __init__(self, name: str, default: str, key: Union[str, KeyFunc] = "ip", cost: float = 1):
+        """
+        Args:
+            name: 限流名称，RATE_LIMITS 按该名称覆盖限额，同时作为桶的键前缀
+            default: 默认限额，如 "10/minute"
+            key: "ip"（按客户端 IP）、"user"（按 Token 中的用户，未登录按 IP）或自定义键函数
+            cost: 每次请求消耗的令牌数
+        """
+        parse_limit(default)
+        self.name = name
+        self.default = default
+        self.key = _KEYS[key] if isinstance(key, str) else key
+        self.cost = cost
+
+    def limit(self) -> Optional[Limit]:
+        """当前生效的限额"""
+        return parse_limit(configured_limits().get(self.name, self.default))
+
+    async def __call__(self, request: Request) -> None:
+        """
+        记录一次请求，超出限额时拒绝
+
+        Raises:
+            HTTPException: 超出限额时抛出429异常，Retry-After 为需等待的秒数
+        """
+        if not settings.RATE_LIMIT_ENABLED:
+            return
+        limit = self.limit()
+        identity = await self.key(request) if limit else None
+        if identity is None:
+            return
+
+        limiter = get_rate_limiter()
+        key = f"{self.name}:{identity}"
+        if limiter.remote:
+            allowed, retry_after = await run_in_threadpool(limiter.hit, key, limit, self.cost)
+        else:
+            allowed, retry_after = limiter.hit(key, limit, self.cost)
+        if not allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="请求过于频繁，请稍后再试",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
@@ -0,0 +1,231 @@
+"""
+慢查询日志
+CRUD 列表查询耗时超过阈值时，记录其实际执行的 SQL 与绑定参数，
+在后台线程中用独立连接执行 EXPLAIN，并连同产生该查询的筛选条件组合
+保存到环形缓冲区，供管理员分析哪些筛选组合需要补充索引
+"""
+
+import functools
+import inspect
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+from sqlalchemy.engine import Engine
+from app.core.config import settings
+from app.core.metrics import add_query_listener
+
+logger = logging.getLogger(__name__)
+
+# 不属于筛选条件的列表参数
+_PAGING_ARGS = ("db", "skip", "limit")
+
+
+class _Capture:
+    """列表函数执行期间捕获到的语句"""
+
+    __slots__ = ("statements",)
+
+    def __init__(self):
+        # (engine, statement, parameters, 耗时秒)
+        self.statements: List[tuple] = []
+
+
+_current_capture: ContextVar[Optional[_Capture]] = ContextVar("slow_query_capture", default=None)
+
+
+def _on_query(conn, cursor, statement, parameters, elapsed):
+    """保存语句、参数与耗时（仅在慢查询捕获期间）"""
+    capture = _current_capture.get()
+    if capture is not None:
+        capture.statements.append((conn.engine, statement, parameters, elapsed))
+
+
+add_query_listener(_on_query)
+
+
+def _explain(engine: Engine, statement: str, parameters) -> List[dict]:
+    """
+    在独立连接上获取语句的执行计划
+
+    Args:
+        engine: 原语句执行所在的引擎（主库或副本）
+        statement: 驱动层 SQL
+        parameters: 驱动层绑定参数
+
+    Returns:
+        List[dict]: 执行计划的每一行
+    """
+    prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    with engine.connect() as conn:
+        result = conn.exec_driver_sql(prefix + statement, parameters)
+        return [{k: v for k, v in row.items()} for row in result.mappings()]
+
+
+class SlowQueryLog:
+    """
+    慢查询环形缓冲区
+    超过阈值的列表调用在后台线程中补充执行计划后写入，请求本身不等待 EXPLAIN。
+    """
+
+    def __init__(self, threshold_ms: float = 200, size: int = 100):
+        """
+        初始化慢查询日志
+
+        Args:
+            threshold_ms: 慢查询阈值（毫秒），列表函数总耗时达到该值即记录
+            size: 环形缓冲区容量
+        """
+        self.threshold_ms = threshold_ms
+        self._entries: deque = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+        self._pending = []
+
+    def record(self, query: str, filters: dict, paging: dict, elapsed: float, statements: List[tuple]) -> None:
+        """
+        提交一条慢查询，由后台线程补充 EXPLAIN 后写入缓冲区
+
+        Args:
+            query: 列表函数名
+            filters: 非空的筛选条件
+            paging: 分页参数
+            elapsed: 列表函数总耗时（秒）
+            statements: 捕获到的语句
+        """
+        future = self._executor.submit(self._build_entry, query, filters, paging, elapsed, statements)
+        with self._lock:
+            self._pending = [f for f in self._pending if not f.done()] + [future]
+
+    def _build_entry(self, query: str, filters: dict, paging: dict, elapsed: float, statements: List[tuple]) -> None:
+        details = []
+        for engine, statement, parameters, duration in statements:
+            try:
+                plan = _explain(engine, statement, parameters)
+                plan_error = None
+            except Exception as exc:
+                plan, plan_error = [], str(exc)
+            details.append({
+                "sql": statement,
+                "params": [str(p) for p in (parameters.values() if isinstance(parameters, dict) else parameters or ())],
+                "duration_ms": round(duration * 1000, 3),
+                "plan": [{k: str(v) for k, v in row.items()} for row in plan],
+                "plan_error": plan_error,
+            })
+
+        with self._lock:
+            entry = {
+                "id": self._next_id,
+                "recorded_at": time.time(),
+                "query": query,
+                "filter_key": "+".join(sorted(filters)) or "(none)",
+                "filters": {k: str(v) for k, v in filters.items()},
+                "skip": paging.get("skip"),
+                "limit": paging.get("limit"),
+                "elapsed_ms": round(elapsed * 1000, 3),
+                "statements": details,
+            }
+            self._next_id += 1
+            self._entries.append(entry)
+        logger.warning(
+            "慢查询 %s filters=%s skip=%s 耗时 %.1fms",
+            query, entry["filter_key"], entry["skip"], entry["elapsed_ms"]
+        )
+
+    def wait(self) -> None:
+        """等待所有已提交的 EXPLAIN 完成"""
+        with self._lock:
+            pending = list(self._pending)
+        for future in pending:
+            future.result()
+
+    def entries(self, query: Optional[str] = None, limit: int = 50) -> List[dict]:
+        """
+        最近的慢查询，最新的在前
+
+        Args:
+            query: 只返回指定列表函数的记录
+            limit: 返回条数
+        """
+        with self._lock:
+            entries = list(self._entries)
+        if query:
+            entries = [e for e in entries if e["query"] == query]
+        return entries[::-1][:limit]
+
+    def summary(self) -> List[dict]:
+        """
+        按列表函数 + 筛选组合聚合，耗时最高的组合在前
+
+        Returns:
+            List[dict]: 每个组合的次数、最大 / 平均耗时和最近一条记录的 ID
+        """
+        groups: Dict[tuple, dict] = {}
+        for entry in self.entries(limit=len(self._entries)):
+            key = (entry["query"], entry["filter_key"])
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = {
+                    "query": entry["query"], "filter_key": entry["filter_key"],
+                    "count": 0, "max_ms": 0.0, "total_ms": 0.0, "latest_id": entry["id"],
+                }
+            group["count"] += 1
+            group["max_ms"] = max(group["max_ms"], entry["elapsed_ms"])
+            group["total_ms"] += entry["elapsed_ms"]
+
+        result = []
+        for group in groups.values():
+            group["avg_ms"] = round(group.pop("total_ms") / group["count"], 3)
+            result.append(group)
+        return sorted(result, key=lambda g: g["max_ms"], reverse=True)
+
+    def clear(self) -> None:
+        """清空缓冲区"""
+        with self._lock:
+            self._entries.clear()
+
+
+# 全局慢查询日志
+slow_query_log = SlowQueryLog(
+    threshold_ms=settings.SLOW_QUERY_THRESHOLD_MS,
+    size=settings.SLOW_QUERY_LOG_SIZE,
+)
+
+
+def log_slow_list_query(func):
+    """
+    列表查询装饰器：函数总耗时超过阈值时记录到慢查询日志
+
+    被装饰函数的第一个参数必须是数据库会话，其余参数中除 skip / limit 外
+    值不为空的视为筛选条件。
+    """
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not settings.SLOW_QUERY_LOG_ENABLED or _current_capture.get() is not None:
+            return func(*args, **kwargs)
+
+        capture = _Capture()
+        token = _current_capture.set(capture)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current_capture.reset(token)
+            if elapsed * 1000 >= slow_query_log.threshold_ms and capture.statements:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                filters = {
+                    k: v for k, v in bound.arguments.items()
+                    if k not in _PAGING_ARGS and v is not None and v != ""
+                }
+                paging = {k: bound.arguments.get(k) for k in ("skip", "limit")}
+                slow_query_log.record(func.__name__, filters, paging, elapsed, capture.statements)
+
+    return wrapper
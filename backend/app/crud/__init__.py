@@ -2,22 +2,28 @@
 数据访问层 (CRUD)
 Data Access Layer
 提供所有数据库操作的CRUD函数
+
+写操作只 flush 不提交，事务由业务层的工作单元 (UnitOfWork) 在请求边界统一提交
 """
 
-from typing import List, Optional, Tuple
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func, desc, asc
-from app.db.models import User, Pet, Service, Order, Boarding, HealthRecord
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import and_, or_, func, desc, asc, update, delete, insert, select, case
+from app.db.models import (
+    User, Pet, Service, Order, Boarding, HealthRecord, IdempotencyKey, OutboxEvent, Job, JobStatus
+)
+from app.core.slow_query import log_slow_list_query
 from app.schemas import (
     UserCreate, UserUpdate,
     PetCreate, PetUpdate,
     ServiceCreate, ServiceUpdate,
     OrderCreate, OrderUpdate,
-    BoardingCreate, BoardingUpdate,
+    BoardingCreate, BoardingUpdate, BoardingBookingCreate,
     HealthRecordCreate, HealthRecordUpdate
 )
 from datetime import datetime
 import random
+import re
 import string
 
 
@@ -36,6 +42,308 @@ def generate_order_no() -> str:
     return f"ORD{timestamp}{random_str}"
 
 
+def versioned_update(
+    db: Session,
+    model,
+    record_id: int,
+    values: dict,
+    expected_version: Optional[int] = None,
+    allowed_from: Optional[List[str]] = None
+) -> bool:
+    """
+    乐观锁更新
+    用一条 UPDATE ... WHERE id = ? AND version = ? 同时完成版本校验和写入，并将版本号加一，
+    不需要先查询再修改，也不需要加行锁。未传入期望版本时只按主键更新（仍会递增版本号）。
+
+    Args:
+        db: 数据库会话
+        model: 模型类，如 Order、Pet
+        record_id: 记录ID
+        values: 要更新的字段，枚举值会转换为字符串
+        expected_version: 客户端读取时的版本号
+        allowed_from: 更新包含状态流转时，允许的来源状态（同样放在 WHERE 条件中）
+
+    Returns:
+        bool: 是否更新成功（False 表示记录不存在、版本已变化或当前状态不允许流转）
+    """
+    stmt = update(model).where(model.id == record_id, model.is_deleted == False)
+    if expected_version is not None:
+        stmt = stmt.where(model.version == expected_version)
+    if allowed_from is not None:
+        stmt = stmt.where(model.status.in_(allowed_from))
+
+    values = {key: getattr(value, "value", value) for key, value in values.items()}
+    result = db.execute(stmt.values(**values, version=model.version + 1))
+    return result.rowcount == 1
+
+
+# ==================== 状态流转规则 ====================
+# 目标状态 -> 允许流转到该状态的来源状态
+
+ORDER_STATUS_TRANSITIONS = {
+    "confirmed": ["pending"],
+    "in_progress": ["confirmed"],
+    "completed": ["confirmed", "in_progress"],
+    "cancelled": ["pending", "confirmed"],
+}
+
+BOARDING_STATUS_TRANSITIONS = {
+    "in_progress": ["scheduled"],
+    "completed": ["in_progress"],
+    "cancelled": ["scheduled"],
+}
+
+
+def update_returning_ids(
+    db: Session,
+    model,
+    conditions: tuple,
+    values: dict,
+    synchronize_session="auto"
+) -> List[int]:
+    """
+    条件更新并返回实际更新的记录ID
+
+    支持 UPDATE ... RETURNING 的数据库一次往返完成；MySQL 不支持 RETURNING，
+    改为先 SELECT ... FOR UPDATE 锁定命中的记录再按ID更新。
+
+    Args:
+        db: 数据库会话
+        model: 模型类
+        conditions: 选取记录的过滤条件
+        values: 更新的值
+        synchronize_session: 同步会话中已加载对象的方式，值无法在 Python 中求值（如 CASE）时传 False
+
+    Returns:
+        List[int]: 实际更新的记录ID
+    """
+    if db.get_bind().dialect.update_returning:
+        return list(db.execute(
+            update(model).where(*conditions).values(**values)
+            .returning(model.id).execution_options(synchronize_session=synchronize_session)
+        ).scalars())
+
+    matched = list(db.execute(select(model.id).where(*conditions).with_for_update()).scalars())
+    if matched:
+        db.execute(
+            update(model).where(model.id.in_(matched)).values(**values)
+            .execution_options(synchronize_session=synchronize_session)
+        )
+    return matched
+
+
+def bulk_soft_delete(db: Session, model, ids: List[int]) -> List[int]:
+    """
+    批量软删除
+    使用一条 UPDATE ... WHERE id IN (...) 语句完成，已删除的记录不会再次删除
+
+    Args:
+        db: 数据库会话
+        model: 模型类，如 Order、Boarding
+        ids: 记录ID列表
+
+    Returns:
+        List[int]: 实际被删除的记录ID（用于发布删除事件）
+    """
+    if not ids:
+        return []
+    return update_returning_ids(
+        db, model, (model.id.in_(ids), model.is_deleted == False),
+        {"is_deleted": True, "version": model.version + 1}
+    )
+
+
+def transition_status(
+    db: Session,
+    model,
+    ids: Optional[List[int]],
+    status: str,
+    allowed_from: List[str],
+    returning_ids: bool = False,
+    criteria: tuple = ()
+) -> Tuple[int, Optional[List[int]]]:
+    """
+    条件状态流转
+    状态合法性校验放在 SQL 中：一条 UPDATE ... WHERE status IN (来源状态) 完成校验和写入，
+    只有当前状态属于允许来源的记录才会被更新，并发流转不会互相覆盖
+
+    需要知道实际流转了哪些记录时（returning_ids=True），由 update_returning_ids 按数据库能力
+    选择 UPDATE ... RETURNING 或加锁查询。
+
+    Args:
+        db: 数据库会话
+        model: 模型类，如 Order、Boarding
+        ids: 记录ID列表，为None时按 criteria 选取记录
+        status: 目标状态
+        allowed_from: 允许流转到目标状态的来源状态
+        returning_ids: 是否返回实际流转的记录ID
+        criteria: 附加的过滤条件，如 Boarding.start_date <= now
+
+    Returns:
+        Tuple[int, Optional[List[int]]]: 实际流转的记录数，以及记录ID（未要求时为None）
+    """
+    if ids is not None and not ids:
+        return 0, [] if returning_ids else None
+
+    conditions = (model.is_deleted == False, model.status.in_(allowed_from), *criteria)
+    if ids is not None:
+        conditions = (model.id.in_(ids), *conditions)
+    values = {"status": status, "version": model.version + 1}
+
+    if not returning_ids:
+        result = db.execute(update(model).where(*conditions).values(**values))
+        return result.rowcount, None
+
+    matched = update_returning_ids(db, model, conditions, values)
+    return len(matched), matched
+
+
+def get_due_times(db: Session, column, statuses: List[str], after: datetime, until: datetime) -> List[datetime]:
+    """
+    查询某个时间列落在 (after, until] 区间内的记录的时间点（去重）
+
+    按 (status, 时间列) 复合索引做范围扫描，只读取区间内的记录，不扫描全表。
+
+    Args:
+        db: 数据库会话
+        column: 时间列，如 Boarding.start_date
+        statuses: 记录需要处于的状态
+        after: 区间起点（不含）
+        until: 区间终点（含）
+
+    Returns:
+        List[datetime]: 升序排列的时间点
+    """
+    model = column.class_
+    return list(db.execute(
+        select(column).distinct().where(
+            model.status.in_(statuses),
+            model.is_deleted == False,
+            column > after,
+            column <= until
+        ).order_by(column)
+    ).scalars())
+
+
+# ==================== 联系方式查找键 ====================
+
+# 国际区号前缀：+86 / 0086
+_PHONE_COUNTRY_PREFIX = re.compile(r"^\s*(\+|00)86")
+
+
+def normalize_phone(phone: Optional[str]) -> Optional[str]:
+    """
+    规范化手机号：去掉 +86 / 0086 区号，只保留数字
+    "+86 138-0013-8000"、"(138) 0013 8000" 都得到 "13800138000"
+
+    Args:
+        phone: 手机号（任意格式，也可以是前缀）
+
+    Returns:
+        Optional[str]: 查找键，没有数字时返回None
+    """
+    if not phone:
+        return None
+    digits = re.sub(r"\D", "", _PHONE_COUNTRY_PREFIX.sub("", phone))
+    if len(digits) == 13 and digits.startswith("86"):
+        digits = digits[2:]
+    return digits or None
+
+
+def normalize_email(email: Optional[str]) -> Optional[str]:
+    """
+    规范化邮箱：去掉首尾空白并转为小写
+
+    Args:
+        email: 邮箱（也可以是前缀）
+
+    Returns:
+        Optional[str]: 查找键，为空时返回None
+    """
+    key = (email or "").strip().lower()
+    return key or None
+
+
+def contact_keys(values: dict) -> dict:
+    """
+    根据写入的字段计算对应的查找键，写入 phone / email 时都要同时写入 phone_key / email_key
+
+    Args:
+        values: 要写入的用户字段
+
+    Returns:
+        dict: values 中出现的 phone / email 对应的 phone_key / email_key
+    """
+    keys = {}
+    if "phone" in values:
+        keys["phone_key"] = normalize_phone(values["phone"])
+    if "email" in values:
+        keys["email_key"] = normalize_email(values["email"])
+    return keys
+
+
+def get_contact_key_owners(
+    db: Session,
+    phone_keys: List[str],
+    email_keys: List[str]
+) -> List[Tuple[int, Optional[str], Optional[str]]]:
+    """
+    查询已占用这些查找键的用户（走 uk_phone_key / uk_email_key 唯一索引）
+
+    Args:
+        db: 数据库会话
+        phone_keys: 手机号查找键
+        email_keys: 邮箱查找键
+
+    Returns:
+        List[Tuple[int, Optional[str], Optional[str]]]: (用户ID, phone_key, email_key) 列表
+    """
+    conditions = []
+    if phone_keys:
+        conditions.append(User.phone_key.in_(phone_keys))
+    if email_keys:
+        conditions.append(User.email_key.in_(email_keys))
+    if not conditions:
+        return []
+    return [tuple(row) for row in db.execute(select(User.id, User.phone_key, User.email_key).where(or_(*conditions)))]
+
+
+def _prefix_upper_bound(prefix: str) -> str:
+    """前缀范围的上界：最后一个字符加一，[prefix, 上界) 即所有以 prefix 开头的字符串"""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def lookup_owners(db: Session, column, key: str, limit: int = 10) -> List[User]:
+    """
+    按查找键精确或前缀查找宠物主人，并在同一条查询中取出其宠物
+
+    前缀条件写成 key >= 前缀 AND key < 上界，在唯一索引上做范围扫描并按索引顺序返回，
+    精确匹配的键最短，自然排在最前面。宠物通过 LEFT OUTER JOIN 预加载（子查询先对用户分页）。
+
+    Args:
+        db: 数据库会话
+        column: User.phone_key 或 User.email_key
+        key: 规范化后的完整键或前缀
+        limit: 最多返回的主人数
+
+    Returns:
+        List[User]: 主人列表，pets 只包含未删除的宠物
+    """
+    stmt = (
+        select(User)
+        .where(
+            column >= key,
+            column < _prefix_upper_bound(key),
+            User.role == "owner",
+            User.is_deleted == False
+        )
+        .order_by(column)
+        .limit(limit)
+        .options(joinedload(User.pets.and_(Pet.is_deleted == False)))
+    )
+    return list(db.execute(stmt).unique().scalars())
+
+
 # ==================== 用户 CRUD 操作 ====================
 
 def get_user(db: Session, user_id: int) -> Optional[User]:
@@ -52,6 +360,40 @@ def get_user(db: Session, user_id: int) -> Optional[User]:
     return db.query(User).filter(User.id == user_id, User.is_deleted == False).first()
 
 
+def lock_user(db: Session, user_id: int) -> Optional[User]:
+    """
+    加锁读取用户（SELECT ... FOR UPDATE，走主库）
+    给同一员工指派预约时在此排队，校验时段和写入之间不会被其他事务插入重叠的预约
+
+    Args:
+        db: 数据库会话
+        user_id: 用户ID
+
+    Returns:
+        User: 用户对象，不存在返回None
+    """
+    return db.query(User).filter(User.id == user_id, User.is_deleted == False).with_for_update().first()
+
+
+def lock_users(db: Session, user_ids: List[int]) -> List[User]:
+    """
+    按ID升序加锁读取一批用户（SELECT ... FOR UPDATE，走主库）
+    与 lock_user 使用同一把行锁，多个员工一起加锁时按固定顺序获取，避免事务之间互相等待形成死锁
+
+    Args:
+        db: 数据库会话
+        user_ids: 用户ID列表
+
+    Returns:
+        List[User]: 按ID升序的用户列表（不含已删除的用户）
+    """
+    if not user_ids:
+        return []
+    return db.query(User).filter(
+        User.id.in_(user_ids), User.is_deleted == False
+    ).order_by(User.id).with_for_update().all()
+
+
 def get_user_by_username(db: Session, username: str) -> Optional[User]:
     """
     根据用户名获取用户
@@ -66,6 +408,7 @@ def get_user_by_username(db: Session, username: str) -> Optional[User]:
     return db.query(User).filter(User.username == username, User.is_deleted == False).first()
 
 
+@log_slow_list_query
 def get_users(
     db: Session,
     skip: int = 0,
@@ -129,44 +472,43 @@ def create_user(db: Session, user: UserCreate) -> User:
         email=user.email,
         phone=user.phone,
         real_name=user.real_name,
-        role=user.role.value  # 枚举值转字符串
+        # UserCreate 启用了 use_enum_values，role 通常已是字符串
+        role=getattr(user.role, "value", user.role),
+        **contact_keys({"phone": user.phone, "email": user.email})
     )
     
-    # 添加到数据库
+    # 添加到数据库（仅 flush 获取主键，由工作单元统一提交）
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    db.flush()
     
     return db_user
 
 
-def update_user(db: Session, user_id: int, user_update: UserUpdate) -> Optional[User]:
+def update_user(
+    db: Session,
+    user_id: int,
+    user_update: UserUpdate,
+    expected_version: Optional[int] = None
+) -> Optional[User]:
     """
-    更新用户信息
+    更新用户信息（乐观锁）
     
     Args:
         db: 数据库会话
         user_id: 用户ID
         user_update: 更新数据
+        expected_version: 期望的版本号，为None时不校验版本
         
     Returns:
-        User: 更新后的用户对象，不存在返回None
+        User: 更新后的用户对象，不存在或版本不匹配返回None
     """
-    # 查询用户
-    db_user = get_user(db, user_id)
-    if not db_user:
+    # 获取非空字段，单条 UPDATE 完成版本校验与写入（由工作单元统一提交）
+    update_data = user_update.model_dump(exclude_unset=True, exclude={"version"})
+    update_data.update(contact_keys(update_data))
+    if not versioned_update(db, User, user_id, update_data, expected_version):
         return None
     
-    # 获取非空字段进行更新
-    update_data = user_update.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_user, key, value)
-    
-    # 提交更新
-    db.commit()
-    db.refresh(db_user)
-    
-    return db_user
+    return get_user(db, user_id)
 
 
 def delete_user(db: Session, user_id: int) -> bool:
@@ -185,9 +527,11 @@ def delete_user(db: Session, user_id: int) -> bool:
     if not db_user:
         return False
     
-    # 软删除
+    # 软删除，同时释放查找键，手机号 / 邮箱可以重新注册
     db_user.is_deleted = True
-    db.commit()
+    db_user.phone_key = None
+    db_user.email_key = None
+    db.flush()
     
     return True
 
@@ -208,32 +552,46 @@ def get_pet(db: Session, pet_id: int) -> Optional[Pet]:
     return db.query(Pet).filter(Pet.id == pet_id, Pet.is_deleted == False).first()
 
 
-def get_pets(
+def lock_pet(db: Session, pet_id: int) -> Optional[Pet]:
+    """
+    加锁读取宠物（SELECT ... FOR UPDATE，走主库）
+    同一宠物的寄养预订在此排队，校验档期和写入之间不会被其他事务插入重叠的寄养
+
+    Args:
+        db: 数据库会话
+        pet_id: 宠物ID
+
+    Returns:
+        Pet: 宠物对象，不存在返回None
+    """
+    return db.query(Pet).filter(Pet.id == pet_id, Pet.is_deleted == False).with_for_update().first()
+
+
+def build_pet_query(
     db: Session,
     owner_id: Optional[int] = None,
-    skip: int = 0,
-    limit: int = 10,
     name: Optional[str] = None,
     species: Optional[str] = None,
-    gender: Optional[str] = None
-) -> Tuple[List[Pet], int]:
+    gender: Optional[str] = None,
+    *,
+    columns: Optional[List] = None
+):
     """
-    获取宠物列表（分页+筛选）
+    构建带筛选条件的宠物查询（列表和导出共用）
     
     Args:
         db: 数据库会话
-        owner_id: 主人ID（筛选指定主人的宠物）
-        skip: 跳过记录数
-        limit: 返回记录数
+        owner_id: 主人ID筛选
         name: 宠物名称（模糊查询）
         species: 物种筛选
         gender: 性别筛选
+        columns: 只查询指定列（仅限关键字参数），为空时查询完整的宠物对象
         
     Returns:
-        Tuple[List[Pet], int]: 宠物列表和总记录数
+        Query: 未分页、未排序的查询对象
     """
-    # 构建查询
-    query = db.query(Pet).filter(Pet.is_deleted == False)
+    query = db.query(*columns) if columns else db.query(Pet)
+    query = query.filter(Pet.is_deleted == False)
     
     # 主人筛选
     if owner_id:
@@ -251,6 +609,37 @@ def get_pets(
     if gender:
         query = query.filter(Pet.gender == gender)
     
+    return query
+
+
+@log_slow_list_query
+def get_pets(
+    db: Session,
+    owner_id: Optional[int] = None,
+    skip: int = 0,
+    limit: int = 10,
+    name: Optional[str] = None,
+    species: Optional[str] = None,
+    gender: Optional[str] = None
+) -> Tuple[List[Pet], int]:
+    """
+    获取宠物列表（分页+筛选）
+    
+    Args:
+        db: 数据库会话
+        owner_id: 主人ID（筛选指定主人的宠物）
+        skip: 跳过记录数
+        limit: 返回记录数
+        name: 宠物名称（模糊查询）
+        species: 物种筛选
+        gender: 性别筛选
+        
+    Returns:
+        Tuple[List[Pet], int]: 宠物列表和总记录数
+    """
+    # 构建查询
+    query = build_pet_query(db, owner_id, name, species, gender)
+    
     # 获取总记录数
     total = query.count()
     
@@ -286,46 +675,37 @@ def create_pet(db: Session, pet: PetCreate, owner_id: int) -> Pet:
         special_notes=pet.special_notes
     )
     
-    # 添加到数据库
+    # 添加到数据库（仅 flush 获取主键，由工作单元统一提交）
     db.add(db_pet)
-    db.commit()
-    db.refresh(db_pet)
+    db.flush()
     
     return db_pet
 
 
-def update_pet(db: Session, pet_id: int, pet_update: PetUpdate) -> Optional[Pet]:
+def update_pet(
+    db: Session,
+    pet_id: int,
+    pet_update: PetUpdate,
+    expected_version: Optional[int] = None
+) -> Optional[Pet]:
     """
-    更新宠物信息
+    更新宠物信息（乐观锁）
     
     Args:
         db: 数据库会话
         pet_id: 宠物ID
         pet_update: 更新数据
+        expected_version: 期望的版本号，为None时不校验版本
         
     Returns:
-        Pet: 更新后的宠物对象，不存在返回None
+        Pet: 更新后的宠物对象，不存在或版本不匹配返回None
     """
-    # 查询宠物
-    db_pet = get_pet(db, pet_id)
-    if not db_pet:
+    # 获取非空字段，单条 UPDATE 完成版本校验与写入（由工作单元统一提交）
+    update_data = pet_update.model_dump(exclude_unset=True, exclude={"version"})
+    if not versioned_update(db, Pet, pet_id, update_data, expected_version):
         return None
     
-    # 获取非空字段进行更新
-    update_data = pet_update.model_dump(exclude_unset=True)
-    
-    # 如果gender字段存在，转换枚举值
-    if 'gender' in update_data and update_data['gender']:
-        update_data['gender'] = update_data['gender'].value
-    
-    for key, value in update_data.items():
-        setattr(db_pet, key, value)
-    
-    # 提交更新
-    db.commit()
-    db.refresh(db_pet)
-    
-    return db_pet
+    return get_pet(db, pet_id)
 
 
 def delete_pet(db: Session, pet_id: int) -> bool:
@@ -346,7 +726,7 @@ def delete_pet(db: Session, pet_id: int) -> bool:
     
     # 软删除
     db_pet.is_deleted = True
-    db.commit()
+    db.flush()
     
     return True
 
@@ -367,6 +747,7 @@ def get_service(db: Session, service_id: int) -> Optional[Service]:
     return db.query(Service).filter(Service.id == service_id, Service.is_deleted == False).first()
 
 
+@log_slow_list_query
 def get_services(
     db: Session,
     skip: int = 0,
@@ -427,41 +808,37 @@ def create_service(db: Session, service: ServiceCreate) -> Service:
         duration=service.duration
     )
     
-    # 添加到数据库
+    # 添加到数据库（仅 flush 获取主键，由工作单元统一提交）
     db.add(db_service)
-    db.commit()
-    db.refresh(db_service)
+    db.flush()
     
     return db_service
 
 
-def update_service(db: Session, service_id: int, service_update: ServiceUpdate) -> Optional[Service]:
+def update_service(
+    db: Session,
+    service_id: int,
+    service_update: ServiceUpdate,
+    expected_version: Optional[int] = None
+) -> Optional[Service]:
     """
-    更新服务信息
+    更新服务信息（乐观锁）
     
     Args:
         db: 数据库会话
         service_id: 服务ID
         service_update: 更新数据
+        expected_version: 期望的版本号，为None时不校验版本
         
     Returns:
-        Service: 更新后的服务对象，不存在返回None
+        Service: 更新后的服务对象，不存在或版本不匹配返回None
     """
-    # 查询服务
-    db_service = get_service(db, service_id)
-    if not db_service:
+    # 获取非空字段，单条 UPDATE 完成版本校验与写入（由工作单元统一提交）
+    update_data = service_update.model_dump(exclude_unset=True, exclude={"version"})
+    if not versioned_update(db, Service, service_id, update_data, expected_version):
         return None
     
-    # 获取非空字段进行更新
-    update_data = service_update.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_service, key, value)
-    
-    # 提交更新
-    db.commit()
-    db.refresh(db_service)
-    
-    return db_service
+    return get_service(db, service_id)
 
 
 def delete_service(db: Session, service_id: int) -> bool:
@@ -482,7 +859,7 @@ def delete_service(db: Session, service_id: int) -> bool:
     
     # 软删除
     db_service.is_deleted = True
-    db.commit()
+    db.flush()
     
     return True
 
@@ -503,30 +880,29 @@ def get_order(db: Session, order_id: int) -> Optional[Order]:
     return db.query(Order).filter(Order.id == order_id, Order.is_deleted == False).first()
 
 
-def get_orders(
+def build_order_query(
     db: Session,
     user_id: Optional[int] = None,
     pet_id: Optional[int] = None,
     status: Optional[str] = None,
-    skip: int = 0,
-    limit: int = 10
-) -> Tuple[List[Order], int]:
+    *,
+    columns: Optional[List] = None
+):
     """
-    获取订单列表（分页+筛选）
+    构建带筛选条件的订单查询（列表和导出共用）
     
     Args:
         db: 数据库会话
         user_id: 用户ID筛选
         pet_id: 宠物ID筛选
         status: 订单状态筛选
-        skip: 跳过记录数
-        limit: 返回记录数
+        columns: 只查询指定列（仅限关键字参数），为空时查询完整的订单对象
         
     Returns:
-        Tuple[List[Order], int]: 订单列表和总记录数
+        Query: 未分页、未排序的查询对象
     """
-    # 构建查询
-    query = db.query(Order).filter(Order.is_deleted == False)
+    query = db.query(*columns) if columns else db.query(Order)
+    query = query.filter(Order.is_deleted == False)
     
     # 用户筛选
     if user_id:
@@ -540,6 +916,35 @@ def get_orders(
     if status:
         query = query.filter(Order.status == status)
     
+    return query
+
+
+@log_slow_list_query
+def get_orders(
+    db: Session,
+    user_id: Optional[int] = None,
+    pet_id: Optional[int] = None,
+    status: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 10
+) -> Tuple[List[Order], int]:
+    """
+    获取订单列表（分页+筛选）
+    
+    Args:
+        db: 数据库会话
+        user_id: 用户ID筛选
+        pet_id: 宠物ID筛选
+        status: 订单状态筛选
+        skip: 跳过记录数
+        limit: 返回记录数
+        
+    Returns:
+        Tuple[List[Order], int]: 订单列表和总记录数
+    """
+    # 构建查询
+    query = build_order_query(db, user_id, pet_id, status)
+    
     # 获取总记录数
     total = query.count()
     
@@ -580,46 +985,39 @@ def create_order(db: Session, order: OrderCreate, user_id: int) -> Order:
         notes=order.notes
     )
     
-    # 添加到数据库
+    # 添加到数据库（仅 flush 获取主键，由工作单元统一提交）
     db.add(db_order)
-    db.commit()
-    db.refresh(db_order)
+    db.flush()
     
     return db_order
 
 
-def update_order(db: Session, order_id: int, order_update: OrderUpdate) -> Optional[Order]:
+def update_order(
+    db: Session,
+    order_id: int,
+    order_update: OrderUpdate,
+    expected_version: Optional[int] = None,
+    allowed_from: Optional[List[str]] = None
+) -> Optional[Order]:
     """
-    更新订单信息
+    更新订单信息（乐观锁）
     
     Args:
         db: 数据库会话
         order_id: 订单ID
         order_update: 更新数据
+        expected_version: 期望的版本号，为None时不校验版本
+        allowed_from: 修改状态时允许的来源状态，当前状态不在其中则不更新
         
     Returns:
-        Order: 更新后的订单对象，不存在返回None
+        Order: 更新后的订单对象，不存在或版本不匹配返回None
     """
-    # 查询订单
-    db_order = get_order(db, order_id)
-    if not db_order:
+    # 获取非空字段，单条 UPDATE 完成版本校验与写入（由工作单元统一提交）
+    update_data = order_update.model_dump(exclude_unset=True, exclude={"version"})
+    if not versioned_update(db, Order, order_id, update_data, expected_version, allowed_from):
         return None
     
-    # 获取非空字段进行更新
-    update_data = order_update.model_dump(exclude_unset=True)
-    
-    # 如果status字段存在，转换枚举值
-    if 'status' in update_data and update_data['status']:
-        update_data['status'] = update_data['status'].value
-    
-    for key, value in update_data.items():
-        setattr(db_order, key, value)
-    
-    # 提交更新
-    db.commit()
-    db.refresh(db_order)
-    
-    return db_order
+    return get_order(db, order_id)
 
 
 def delete_order(db: Session, order_id: int) -> bool:
@@ -640,17 +1038,199 @@ def delete_order(db: Session, order_id: int) -> bool:
     
     # 软删除
     db_order.is_deleted = True
-    db.commit()
+    db.flush()
     
     return True
 
 
-# ==================== 寄养 CRUD 操作 ====================
+# 占用员工时间的订单状态
+ACTIVE_APPOINTMENT_STATUSES = ["pending", "confirmed", "in_progress"]
 
-def get_boarding(db: Session, boarding_id: int) -> Optional[Boarding]:
+
+def get_staff_ids(db: Session, staff_ids: Optional[List[int]] = None) -> List[int]:
     """
-    根据ID获取寄养记录
-    
+    获取可接单的员工ID（启用中的员工账号）
+
+    Args:
+        db: 数据库会话
+        staff_ids: 只在这些ID中筛选，为None时返回全部员工
+
+    Returns:
+        List[int]: 按ID升序的员工ID列表
+    """
+    query = db.query(User.id).filter(
+        User.role == "staff",
+        User.is_active == True,
+        User.is_deleted == False
+    )
+    if staff_ids is not None:
+        query = query.filter(User.id.in_(staff_ids))
+    return [row.id for row in query.order_by(User.id)]
+
+
+def get_max_service_duration(db: Session) -> Optional[int]:
+    """
+    获取服务的最长时长（分钟），用于确定需要回看的预约范围
+
+    Args:
+        db: 数据库会话
+
+    Returns:
+        Optional[int]: 最长时长，没有设置时长的服务时返回None
+    """
+    return db.query(func.max(Service.duration)).filter(Service.is_deleted == False).scalar()
+
+
+def get_staff_appointments(
+    db: Session,
+    staff_ids: List[int],
+    start: datetime,
+    end: datetime,
+    exclude_order_id: Optional[int] = None
+) -> List[Tuple[int, datetime, Optional[int]]]:
+    """
+    获取员工在时间范围内开始的未结束预约（走 idx_staff_appointment 复合索引）
+
+    Args:
+        db: 数据库会话
+        staff_ids: 员工ID列表
+        start: 预约时间下限（含）
+        end: 预约时间上限（不含）
+        exclude_order_id: 排除的订单ID（修改订单时排除自身）
+
+    Returns:
+        List[Tuple[int, datetime, Optional[int]]]: (员工ID, 预约时间, 服务时长) 列表
+    """
+    if not staff_ids:
+        return []
+    query = db.query(Order.staff_id, Order.appointment_time, Service.duration).join(
+        Service, Order.service_id == Service.id
+    ).filter(
+        Order.staff_id.in_(staff_ids),
+        Order.appointment_time >= start,
+        Order.appointment_time < end,
+        Order.status.in_(ACTIVE_APPOINTMENT_STATUSES),
+        Order.is_deleted == False
+    )
+    if exclude_order_id is not None:
+        query = query.filter(Order.id != exclude_order_id)
+    return [tuple(row) for row in query]
+
+
+def get_staff_order_minutes(db: Session, staff_ids: List[int], default_duration: int) -> Dict[int, int]:
+    """
+    统计员工名下未结束订单的服务总时长（分钟），一条 GROUP BY 查询
+
+    Args:
+        db: 数据库会话
+        staff_ids: 员工ID列表
+        default_duration: 未设置时长的服务按该时长计算
+
+    Returns:
+        Dict[int, int]: 员工ID -> 总时长，没有订单的员工不在结果中
+    """
+    if not staff_ids:
+        return {}
+    rows = db.query(
+        Order.staff_id, func.sum(func.coalesce(Service.duration, default_duration))
+    ).join(Service, Order.service_id == Service.id).filter(
+        Order.staff_id.in_(staff_ids),
+        Order.status.in_(ACTIVE_APPOINTMENT_STATUSES),
+        Order.is_deleted == False
+    ).group_by(Order.staff_id)
+    return {staff_id: int(minutes or 0) for staff_id, minutes in rows}
+
+
+def get_staff_boarding_counts(
+    db: Session,
+    staff_ids: List[int],
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> Dict[int, int]:
+    """
+    统计员工负责的未结束寄养数，一条 GROUP BY 查询
+
+    Args:
+        db: 数据库会话
+        staff_ids: 员工ID列表
+        start: 只统计与 [start, end) 重叠的寄养，为None时统计全部
+        end: 时间段结束
+
+    Returns:
+        Dict[int, int]: 员工ID -> 寄养数，没有寄养的员工不在结果中
+    """
+    if not staff_ids:
+        return {}
+    query = db.query(Boarding.staff_id, func.count(Boarding.id)).filter(
+        Boarding.staff_id.in_(staff_ids),
+        Boarding.status.in_(["scheduled", "in_progress"]),
+        Boarding.is_deleted == False
+    )
+    if start is not None and end is not None:
+        query = query.filter(Boarding.start_date < end, Boarding.end_date > start)
+    return dict(query.group_by(Boarding.staff_id).all())
+
+
+def get_unassigned_orders(db: Session, limit: int) -> List[Tuple[int, Optional[datetime], Optional[int]]]:
+    """
+    获取待确认且未指派员工的订单，有预约时间的按时间先后在前
+
+    Args:
+        db: 数据库会话
+        limit: 最多返回的订单数
+
+    Returns:
+        List[Tuple[int, Optional[datetime], Optional[int]]]: (订单ID, 预约时间, 服务时长) 列表
+    """
+    rows = db.query(Order.id, Order.appointment_time, Service.duration).join(
+        Service, Order.service_id == Service.id
+    ).filter(
+        Order.staff_id.is_(None),
+        Order.status == "pending",
+        Order.is_deleted == False
+    ).order_by(Order.appointment_time.is_(None), Order.appointment_time, Order.id).limit(limit)
+    return [tuple(row) for row in rows]
+
+
+def bulk_assign_staff(db: Session, assignments: Dict[int, int]) -> List[int]:
+    """
+    批量指派员工：一条 UPDATE ... SET staff_id = CASE WHEN id IN (...) THEN 员工ID ... END
+
+    CASE 按员工分支（分支数等于员工数而不是订单数），语句编译和逐行求值都不随订单数线性增长。
+    只更新仍处于待确认且未指派的订单，期间已被手工指派的订单不会被覆盖。
+
+    Args:
+        db: 数据库会话
+        assignments: 订单ID -> 员工ID
+
+    Returns:
+        List[int]: 实际指派的订单ID（用于发布修改事件）
+    """
+    if not assignments:
+        return []
+    orders_by_staff: Dict[int, List[int]] = {}
+    for order_id, staff_id in assignments.items():
+        orders_by_staff.setdefault(staff_id, []).append(order_id)
+    staff_case = case(*[(Order.id.in_(order_ids), staff_id) for staff_id, order_ids in orders_by_staff.items()])
+    return update_returning_ids(
+        db, Order,
+        (
+            Order.id.in_(list(assignments)),
+            Order.staff_id.is_(None),
+            Order.status == "pending",
+            Order.is_deleted == False
+        ),
+        {"staff_id": staff_case, "version": Order.version + 1},
+        synchronize_session=False
+    )
+
+
+# ==================== 寄养 CRUD 操作 ====================
+
+def get_boarding(db: Session, boarding_id: int) -> Optional[Boarding]:
+    """
+    根据ID获取寄养记录
+    
     Args:
         db: 数据库会话
         boarding_id: 寄养记录ID
@@ -661,6 +1241,7 @@ def get_boarding(db: Session, boarding_id: int) -> Optional[Boarding]:
     return db.query(Boarding).filter(Boarding.id == boarding_id, Boarding.is_deleted == False).first()
 
 
+@log_slow_list_query
 def get_boardings(
     db: Session,
     staff_id: Optional[int] = None,
@@ -728,46 +1309,106 @@ def create_boarding(db: Session, boarding: BoardingCreate, order_id: int) -> Boa
         end_date=boarding.end_date
     )
     
-    # 添加到数据库
+    # 添加到数据库（仅 flush 获取主键，由工作单元统一提交）
     db.add(db_boarding)
-    db.commit()
-    db.refresh(db_boarding)
+    db.flush()
     
     return db_boarding
 
 
-def update_boarding(db: Session, boarding_id: int, boarding_update: BoardingUpdate) -> Optional[Boarding]:
+def has_overlapping_boarding(db: Session, pet_id: int, start_date: datetime, end_date: datetime) -> bool:
+    """
+    检查宠物在指定时间段内是否已有未结束的寄养
+
+    Args:
+        db: 数据库会话
+        pet_id: 宠物ID
+        start_date: 寄养开始时间
+        end_date: 寄养结束时间
+
+    Returns:
+        bool: 存在时间重叠的寄养返回True
+    """
+    overlapping = db.query(Boarding.id).filter(
+        Boarding.pet_id == pet_id,
+        Boarding.is_deleted == False,
+        Boarding.status.in_(["scheduled", "in_progress"]),
+        Boarding.start_date < end_date,
+        Boarding.end_date > start_date
+    )
+    return db.query(overlapping.exists()).scalar()
+
+
+def create_boarding_booking(
+    db: Session,
+    booking: BoardingBookingCreate,
+    service: Service,
+    user_id: int
+) -> Tuple[Order, Boarding]:
+    """
+    同时创建寄养订单和寄养记录
+    两条记录在一次 flush 中写入，由工作单元统一提交
+
+    Args:
+        db: 数据库会话
+        booking: 寄养预订数据
+        service: 已校验的寄养服务
+        user_id: 订单所属用户ID（宠物主人）
+
+    Returns:
+        Tuple[Order, Boarding]: 创建的订单和寄养记录
+    """
+    db_order = Order(
+        order_no=generate_order_no(),
+        user_id=user_id,
+        pet_id=booking.pet_id,
+        service_id=service.id,
+        staff_id=booking.staff_id,
+        appointment_time=booking.start_date,
+        total_amount=float(service.price),
+        notes=booking.notes
+    )
+    db_boarding = Boarding(
+        order=db_order,
+        pet_id=booking.pet_id,
+        staff_id=booking.staff_id,
+        start_date=booking.start_date,
+        end_date=booking.end_date
+    )
+
+    # 订单和寄养记录一起 flush，寄养记录的 order_id 由关系自动回填
+    db.add_all([db_order, db_boarding])
+    db.flush()
+
+    return db_order, db_boarding
+
+
+def update_boarding(
+    db: Session,
+    boarding_id: int,
+    boarding_update: BoardingUpdate,
+    expected_version: Optional[int] = None,
+    allowed_from: Optional[List[str]] = None
+) -> Optional[Boarding]:
     """
-    更新寄养记录信息
+    更新寄养记录信息（乐观锁）
     
     Args:
         db: 数据库会话
         boarding_id: 寄养记录ID
         boarding_update: 更新数据
+        expected_version: 期望的版本号，为None时不校验版本
+        allowed_from: 修改状态时允许的来源状态，当前状态不在其中则不更新
         
     Returns:
-        Boarding: 更新后的寄养记录对象，不存在返回None
+        Boarding: 更新后的寄养记录对象，不存在或版本不匹配返回None
     """
-    # 查询寄养记录
-    db_boarding = get_boarding(db, boarding_id)
-    if not db_boarding:
+    # 获取非空字段，单条 UPDATE 完成版本校验与写入（由工作单元统一提交）
+    update_data = boarding_update.model_dump(exclude_unset=True, exclude={"version"})
+    if not versioned_update(db, Boarding, boarding_id, update_data, expected_version, allowed_from):
         return None
     
-    # 获取非空字段进行更新
-    update_data = boarding_update.model_dump(exclude_unset=True)
-    
-    # 如果status字段存在，转换枚举值
-    if 'status' in update_data and update_data['status']:
-        update_data['status'] = update_data['status'].value
-    
-    for key, value in update_data.items():
-        setattr(db_boarding, key, value)
-    
-    # 提交更新
-    db.commit()
-    db.refresh(db_boarding)
-    
-    return db_boarding
+    return get_boarding(db, boarding_id)
 
 
 def delete_boarding(db: Session, boarding_id: int) -> bool:
@@ -788,7 +1429,7 @@ def delete_boarding(db: Session, boarding_id: int) -> bool:
     
     # 软删除
     db_boarding.is_deleted = True
-    db.commit()
+    db.flush()
     
     return True
 
@@ -812,30 +1453,29 @@ def get_health_record(db: Session, record_id: int) -> Optional[HealthRecord]:
     ).first()
 
 
-def get_health_records(
+def build_health_record_query(
     db: Session,
     pet_id: Optional[int] = None,
     vet_id: Optional[int] = None,
     record_type: Optional[str] = None,
-    skip: int = 0,
-    limit: int = 10
-) -> Tuple[List[HealthRecord], int]:
+    *,
+    columns: Optional[List] = None
+):
     """
-    获取健康记录列表（分页+筛选）
+    构建带筛选条件的健康记录查询（列表和导出共用）
     
     Args:
         db: 数据库会话
         pet_id: 宠物ID筛选
         vet_id: 兽医ID筛选
         record_type: 记录类型筛选
-        skip: 跳过记录数
-        limit: 返回记录数
+        columns: 只查询指定列（仅限关键字参数），为空时查询完整的健康记录对象
         
     Returns:
-        Tuple[List[HealthRecord], int]: 健康记录列表和总记录数
+        Query: 未分页、未排序的查询对象
     """
-    # 构建查询
-    query = db.query(HealthRecord).filter(HealthRecord.is_deleted == False)
+    query = db.query(*columns) if columns else db.query(HealthRecord)
+    query = query.filter(HealthRecord.is_deleted == False)
     
     # 宠物筛选
     if pet_id:
@@ -849,6 +1489,35 @@ def get_health_records(
     if record_type:
         query = query.filter(HealthRecord.type == record_type)
     
+    return query
+
+
+@log_slow_list_query
+def get_health_records(
+    db: Session,
+    pet_id: Optional[int] = None,
+    vet_id: Optional[int] = None,
+    record_type: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 10
+) -> Tuple[List[HealthRecord], int]:
+    """
+    获取健康记录列表（分页+筛选）
+    
+    Args:
+        db: 数据库会话
+        pet_id: 宠物ID筛选
+        vet_id: 兽医ID筛选
+        record_type: 记录类型筛选
+        skip: 跳过记录数
+        limit: 返回记录数
+        
+    Returns:
+        Tuple[List[HealthRecord], int]: 健康记录列表和总记录数
+    """
+    # 构建查询
+    query = build_health_record_query(db, pet_id, vet_id, record_type)
+    
     # 获取总记录数
     total = query.count()
     
@@ -881,46 +1550,37 @@ def create_health_record(db: Session, record: HealthRecordCreate) -> HealthRecor
         notes=record.notes
     )
     
-    # 添加到数据库
+    # 添加到数据库（仅 flush 获取主键，由工作单元统一提交）
     db.add(db_record)
-    db.commit()
-    db.refresh(db_record)
+    db.flush()
     
     return db_record
 
 
-def update_health_record(db: Session, record_id: int, record_update: HealthRecordUpdate) -> Optional[HealthRecord]:
+def update_health_record(
+    db: Session,
+    record_id: int,
+    record_update: HealthRecordUpdate,
+    expected_version: Optional[int] = None
+) -> Optional[HealthRecord]:
     """
-    更新健康记录信息
+    更新健康记录信息（乐观锁）
     
     Args:
         db: 数据库会话
         record_id: 健康记录ID
         record_update: 更新数据
+        expected_version: 期望的版本号，为None时不校验版本
         
     Returns:
-        HealthRecord: 更新后的健康记录对象，不存在返回None
+        HealthRecord: 更新后的健康记录对象，不存在或版本不匹配返回None
     """
-    # 查询健康记录
-    db_record = get_health_record(db, record_id)
-    if not db_record:
+    # 获取非空字段，单条 UPDATE 完成版本校验与写入（由工作单元统一提交）
+    update_data = record_update.model_dump(exclude_unset=True, exclude={"version"})
+    if not versioned_update(db, HealthRecord, record_id, update_data, expected_version):
         return None
     
-    # 获取非空字段进行更新
-    update_data = record_update.model_dump(exclude_unset=True)
-    
-    # 如果type字段存在，转换枚举值
-    if 'type' in update_data and update_data['type']:
-        update_data['type'] = update_data['type'].value
-    
-    for key, value in update_data.items():
-        setattr(db_record, key, value)
-    
-    # 提交更新
-    db.commit()
-    db.refresh(db_record)
-    
-    return db_record
+    return get_health_record(db, record_id)
 
 
 def delete_health_record(db: Session, record_id: int) -> bool:
@@ -941,11 +1601,489 @@ def delete_health_record(db: Session, record_id: int) -> bool:
     
     # 软删除
     db_record.is_deleted = True
-    db.commit()
+    db.flush()
     
     return True
 
 
+# ==================== 幂等键 CRUD 操作 ====================
+
+def insert_idempotency_key(
+    db: Session,
+    user_id: int,
+    key: str,
+    request_hash: str,
+    expires_at: datetime
+) -> Optional[int]:
+    """
+    占用幂等键（键已存在时不插入也不报错）
+
+    依赖 (user_id, idempotency_key) 唯一约束实现互斥：MySQL 使用 INSERT IGNORE，
+    并发的相同键插入会等待先到事务结束后再返回；SQLite 使用 ON CONFLICT DO NOTHING。
+    插入失败不会让当前事务失效，调用方可以继续读取已有记录。
+
+    Args:
+        db: 数据库会话
+        user_id: 用户ID
+        key: 幂等键
+        request_hash: 请求指纹
+        expires_at: 过期时间
+
+    Returns:
+        Optional[int]: 新记录ID，键已存在时返回None
+    """
+    values = {
+        "user_id": user_id,
+        "idempotency_key": key,
+        "request_hash": request_hash,
+        "created_at": datetime.utcnow(),
+        "expires_at": expires_at,
+    }
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        stmt = sqlite_insert(IdempotencyKey).values(**values).on_conflict_do_nothing()
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        stmt = pg_insert(IdempotencyKey).values(**values).on_conflict_do_nothing()
+    else:
+        stmt = insert(IdempotencyKey).values(**values).prefix_with("IGNORE")
+    result = db.execute(stmt)
+    return result.inserted_primary_key[0] if result.rowcount == 1 else None
+
+
+def get_idempotency_key(db: Session, user_id: int, key: str) -> Optional[IdempotencyKey]:
+    """
+    加锁读取幂等键记录
+
+    使用 SELECT ... FOR UPDATE：MySQL 可重复读隔离级别下普通读取看不到
+    事务开始后其他事务提交的记录，加锁读取总是读到最新提交的版本。
+
+    Args:
+        db: 数据库会话
+        user_id: 用户ID
+        key: 幂等键
+
+    Returns:
+        Optional[IdempotencyKey]: 记录，不存在返回None
+    """
+    return db.query(IdempotencyKey).filter(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.idempotency_key == key
+    ).with_for_update().first()
+
+
+def save_idempotency_response(db: Session, record_id: int, response_body: str) -> None:
+    """
+    保存幂等键对应的响应
+
+    Args:
+        db: 数据库会话
+        record_id: 幂等键记录ID
+        response_body: 紧凑 JSON 格式的响应
+    """
+    db.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.id == record_id)
+        .values(response_body=response_body)
+    )
+
+
+def delete_idempotency_key(db: Session, record_id: int) -> None:
+    """
+    删除幂等键记录
+
+    Args:
+        db: 数据库会话
+        record_id: 幂等键记录ID
+    """
+    db.execute(delete(IdempotencyKey).where(IdempotencyKey.id == record_id))
+
+
+def delete_expired_idempotency_keys(db: Session, now: Optional[datetime] = None) -> int:
+    """
+    删除已过期的幂等键
+
+    Args:
+        db: 数据库会话
+        now: 当前时间，默认 UTC 当前时间
+
+    Returns:
+        int: 删除的记录数
+    """
+    result = db.execute(
+        delete(IdempotencyKey).where(IdempotencyKey.expires_at <= (now or datetime.utcnow()))
+    )
+    return result.rowcount
+
+
+# ==================== 事件发件箱 CRUD 操作 ====================
+
+def insert_outbox_events(db: Session, rows: List[dict]) -> None:
+    """
+    批量写入发件箱事件，随当前事务一起提交
+
+    Args:
+        db: 数据库会话
+        rows: 事件行，包含 event_type、aggregate_type、aggregate_id、payload
+    """
+    if not rows:
+        return
+    now = datetime.utcnow()
+    db.execute(insert(OutboxEvent), [{**row, "created_at": now, "attempts": 0} for row in rows])
+
+
+def claim_outbox_events(db: Session, limit: int, max_attempts: int) -> List[OutboxEvent]:
+    """
+    按顺序取出一批待投递的事件并加锁
+
+    使用 FOR UPDATE SKIP LOCKED：多个分发器（多进程部署）同时运行时
+    各自取到不同的事件，不会重复投递也不会互相等待；SQLite 忽略该子句。
+
+    Args:
+        db: 数据库会话
+        limit: 最多取出的事件数
+        max_attempts: 失败次数达到该值的事件不再投递
+
+    Returns:
+        List[OutboxEvent]: 按ID升序的事件列表
+    """
+    return db.query(OutboxEvent).filter(
+        OutboxEvent.dispatched_at.is_(None),
+        OutboxEvent.attempts < max_attempts
+    ).order_by(OutboxEvent.id).limit(limit).with_for_update(skip_locked=True).all()
+
+
+def mark_outbox_dispatched(db: Session, ids: List[int]) -> None:
+    """
+    标记事件已投递
+
+    Args:
+        db: 数据库会话
+        ids: 事件ID列表
+    """
+    if ids:
+        db.execute(
+            update(OutboxEvent)
+            .where(OutboxEvent.id.in_(ids))
+            .values(dispatched_at=datetime.utcnow())
+        )
+
+
+def record_outbox_failure(db: Session, event_id: int, error: str) -> None:
+    """
+    记录一次投递失败，事件留在发件箱中等待下一轮重试
+
+    Args:
+        db: 数据库会话
+        event_id: 事件ID
+        error: 失败原因
+    """
+    db.execute(
+        update(OutboxEvent)
+        .where(OutboxEvent.id == event_id)
+        .values(attempts=OutboxEvent.attempts + 1, last_error=error[:500])
+    )
+
+
+def get_latest_outbox_event_id(db: Session) -> int:
+    """
+    获取发件箱中最大的事件ID
+
+    Args:
+        db: 数据库会话
+
+    Returns:
+        int: 最大事件ID，发件箱为空时返回0
+    """
+    return db.query(func.max(OutboxEvent.id)).scalar() or 0
+
+
+def get_outbox_events_after(
+    db: Session,
+    after_id: int,
+    limit: int,
+    aggregate_types: Optional[List[str]] = None
+) -> List[OutboxEvent]:
+    """
+    按ID顺序读取指定ID之后的事件（不加锁，不区分是否已投递），用于实时推送
+
+    Args:
+        db: 数据库会话
+        after_id: 只读取ID大于该值的事件
+        limit: 最多读取的事件数
+        aggregate_types: 只读取这些聚合类型的事件，为None时不过滤
+
+    Returns:
+        List[OutboxEvent]: 按ID升序的事件列表
+    """
+    query = db.query(OutboxEvent).filter(OutboxEvent.id > after_id)
+    if aggregate_types is not None:
+        query = query.filter(OutboxEvent.aggregate_type.in_(aggregate_types))
+    return query.order_by(OutboxEvent.id).limit(limit).all()
+
+
+def delete_dispatched_outbox_events(db: Session, before: datetime) -> int:
+    """
+    删除早于指定时间已投递的事件
+
+    Args:
+        db: 数据库会话
+        before: 投递时间早于该时间的事件被删除
+
+    Returns:
+        int: 删除的记录数
+    """
+    result = db.execute(
+        delete(OutboxEvent).where(OutboxEvent.dispatched_at < before)
+    )
+    return result.rowcount
+
+
+# ==================== 后台任务 CRUD 操作 ====================
+
+def create_jobs(db: Session, rows: List[dict]) -> List[int]:
+    """
+    批量入队
+
+    Args:
+        db: 数据库会话（任务队列所在的库）
+        rows: 任务行，包含 name、payload、priority、queue、run_at、max_attempts
+
+    Returns:
+        List[int]: 新任务ID列表
+    """
+    jobs = [Job(status=JobStatus.queued, attempts=0, **row) for row in rows]
+    db.add_all(jobs)
+    db.flush()
+    return [job.id for job in jobs]
+
+
+def claim_jobs(
+    db: Session,
+    token: str,
+    queues: List[str],
+    limit: int,
+    exclude_names: Optional[List[str]] = None
+) -> List[Job]:
+    """
+    领取一批到期的任务
+
+    先用 FOR UPDATE SKIP LOCKED 选出候选任务（多个工作进程各取各的，互不等待），
+    再以 status = 'queued' 为条件改为执行中并写入本次领取的标识，
+    最后按标识读回，只返回确实由本次领取的任务（不支持 SKIP LOCKED 的数据库上同样安全）。
+
+    Args:
+        db: 数据库会话
+        token: 本次领取的唯一标识
+        queues: 队列名称列表
+        limit: 最多领取的任务数
+        exclude_names: 不领取的任务名称（已达到并发上限）
+
+    Returns:
+        List[Job]: 按优先级降序、ID升序排列的任务
+    """
+    now = datetime.utcnow()
+    query = db.query(Job.id).filter(
+        Job.queue.in_(queues),
+        Job.status == JobStatus.queued,
+        Job.run_at <= now
+    )
+    if exclude_names:
+        query = query.filter(Job.name.notin_(exclude_names))
+    ids = [row.id for row in query.order_by(desc(Job.priority), Job.id).limit(limit).with_for_update(skip_locked=True)]
+    if not ids:
+        return []
+
+    db.execute(
+        update(Job)
+        .where(Job.id.in_(ids), Job.status == JobStatus.queued)
+        .values(status=JobStatus.running, locked_by=token, locked_at=now, attempts=Job.attempts + 1),
+        execution_options={"synchronize_session": False}
+    )
+    return db.query(Job).filter(Job.id.in_(ids), Job.locked_by == token).order_by(
+        desc(Job.priority), Job.id
+    ).populate_existing().all()
+
+
+def _held_by(job_id: int, token: str):
+    """任务仍由本次领取持有：未被回收，也未被其他工作进程重新领取"""
+    return and_(Job.id == job_id, Job.locked_by == token, Job.status == JobStatus.running)
+
+
+def complete_job(db: Session, job_id: int, token: str, result: Optional[str]) -> bool:
+    """
+    标记任务成功
+
+    Args:
+        db: 数据库会话
+        job_id: 任务ID
+        token: 领取时的唯一标识
+        result: 执行结果（JSON）
+
+    Returns:
+        bool: 是否更新成功；任务已超时被回收（可能已由其他工作进程重新领取）时为False
+    """
+    return db.execute(
+        update(Job)
+        .where(_held_by(job_id, token))
+        .values(status=JobStatus.succeeded, result=result, last_error=None, finished_at=datetime.utcnow())
+    ).rowcount > 0
+
+
+def fail_job(db: Session, job_id: int, token: str, error: str, retry_at: Optional[datetime]) -> bool:
+    """
+    记录任务失败：给出重试时间时重新排队，否则标记为失败
+
+    Args:
+        db: 数据库会话
+        job_id: 任务ID
+        token: 领取时的唯一标识
+        error: 失败原因
+        retry_at: 重试时间，为None表示不再重试
+
+    Returns:
+        bool: 是否更新成功；任务已超时被回收时为False
+    """
+    if retry_at is not None:
+        values = {"status": JobStatus.queued, "run_at": retry_at, "locked_by": None, "locked_at": None}
+    else:
+        values = {"status": JobStatus.failed, "finished_at": datetime.utcnow()}
+    return db.execute(
+        update(Job).where(_held_by(job_id, token)).values(last_error=error[:500], **values)
+    ).rowcount > 0
+
+
+def has_pending_job(db: Session, name: str) -> bool:
+    """
+    是否存在同名的待执行或执行中任务
+
+    Args:
+        db: 数据库会话（任务队列所在的库）
+        name: 任务名称
+
+    Returns:
+        bool: 存在时为True
+    """
+    return db.query(
+        db.query(Job.id).filter(Job.name == name, Job.status.in_([JobStatus.queued, JobStatus.running])).exists()
+    ).scalar()
+
+
+def requeue_stale_jobs(db: Session, before: datetime) -> int:
+    """
+    回收领取时间早于指定时间仍未完成的任务（工作进程已崩溃）
+
+    执行次数未用尽的重新排队，已用尽的标记为失败。
+
+    Args:
+        db: 数据库会话
+        before: 领取时间早于该时间的执行中任务被回收
+
+    Returns:
+        int: 回收的任务数
+    """
+    stale = and_(Job.status == JobStatus.running, Job.locked_at < before)
+    failed = db.execute(
+        update(Job)
+        .where(stale, Job.attempts >= Job.max_attempts)
+        .values(status=JobStatus.failed, last_error="执行超时，工作进程可能已退出", finished_at=datetime.utcnow())
+    ).rowcount
+    requeued = db.execute(
+        update(Job)
+        .where(stale)
+        .values(status=JobStatus.queued, locked_by=None, locked_at=None)
+    ).rowcount
+    return failed + requeued
+
+
+def release_jobs(db: Session, ids: List[int]) -> None:
+    """
+    把已领取但未执行的任务放回队列，不计入执行次数
+
+    Args:
+        db: 数据库会话
+        ids: 任务ID列表
+    """
+    db.execute(
+        update(Job)
+        .where(Job.id.in_(ids), Job.status == JobStatus.running)
+        .values(status=JobStatus.queued, locked_by=None, locked_at=None, attempts=Job.attempts - 1)
+    )
+
+
+def delete_jobs(db: Session, queue: str) -> int:
+    """
+    删除指定队列中的全部任务
+
+    Args:
+        db: 数据库会话
+        queue: 队列名称
+
+    Returns:
+        int: 删除的记录数
+    """
+    return db.execute(delete(Job).where(Job.queue == queue)).rowcount
+
+
+# ==================== 导出查询操作 ====================
+
+# 各实体导出的列（按输出顺序）
+EXPORT_COLUMNS = {
+    "orders": [
+        Order.id, Order.order_no, Order.user_id, Order.pet_id, Order.service_id, Order.staff_id,
+        Order.appointment_time, Order.status, Order.total_amount, Order.notes,
+        Order.created_at, Order.updated_at
+    ],
+    "pets": [
+        Pet.id, Pet.owner_id, Pet.name, Pet.species, Pet.breed, Pet.gender, Pet.birth_date,
+        Pet.weight, Pet.color, Pet.health_status, Pet.special_notes,
+        Pet.created_at, Pet.updated_at
+    ],
+    "health-records": [
+        HealthRecord.id, HealthRecord.pet_id, HealthRecord.vet_id, HealthRecord.check_date,
+        HealthRecord.type, HealthRecord.description, HealthRecord.diagnosis,
+        HealthRecord.prescription, HealthRecord.notes,
+        HealthRecord.created_at, HealthRecord.updated_at
+    ],
+}
+
+
+def iter_export_rows(db: Session, entity: str, filters: dict, batch_size: int = 1000):
+    """
+    流式读取导出数据
+    使用服务端游标 (stream_results) 分批拉取，内存占用与总行数无关
+
+    Args:
+        db: 数据库会话
+        entity: 导出实体，orders / pets / health-records
+        filters: 与对应列表接口相同的筛选条件
+        batch_size: 每批从游标拉取的行数
+
+    Yields:
+        Row: 只包含导出列的行对象
+    """
+    columns = EXPORT_COLUMNS[entity]
+    if entity == "orders":
+        query = build_order_query(
+            db, filters.get("user_id"), filters.get("pet_id"), filters.get("status"), columns=columns
+        )
+    elif entity == "pets":
+        query = build_pet_query(
+            db, filters.get("owner_id"), filters.get("name"), filters.get("species"),
+            filters.get("gender"), columns=columns
+        )
+    else:
+        query = build_health_record_query(
+            db, filters.get("pet_id"), filters.get("vet_id"), filters.get("record_type"), columns=columns
+        )
+
+    # 按主键顺序输出，yield_per 会同时开启 stream_results
+    query = query.order_by(columns[0]).yield_per(batch_size)
+    for row in query:
+        yield row
+
+
 # ==================== 统计查询操作 ====================
 
 def get_dashboard_stats(db: Session) -> dict:
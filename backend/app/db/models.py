@@ -1,16 +1,32 @@
 """
 数据库模型定义
 使用 SQLAlchemy ORM 定义所有数据库表模型
-对应数据库中的6张表
+对应数据库中的9张表
 """
 
-from sqlalchemy import Column, BigInteger, String, Boolean, DateTime, Text, Enum, ForeignKey, Date, Numeric, Integer
+from sqlalchemy import (
+    Column, BigInteger, String, Boolean, DateTime, Text, Enum, ForeignKey, Date, Numeric, Integer,
+    Index, UniqueConstraint
+)
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
 from app.core.database import Base
 
 
+# 主键类型：MySQL 中为 BIGINT，SQLite 只有 INTEGER 主键才会自增，本地测试库使用 INTEGER
+IdType = BigInteger().with_variant(Integer, "sqlite")
+
+
+def KeyType(length: int):
+    """
+    规范化查找键的列类型
+    MySQL 中使用二进制排序规则，前缀查找的范围条件按字节比较，与 Python 中的字符串顺序一致；
+    SQLite 默认即按二进制比较
+    """
+    return String(length).with_variant(String(length, collation="utf8mb4_bin"), "mysql")
+
+
 # ==================== 枚举类型定义 ====================
 
 class UserRole(str, enum.Enum):
@@ -51,6 +67,14 @@ class HealthRecordType(str, enum.Enum):
     surgery = "surgery"           # 手术
 
 
+class JobStatus(str, enum.Enum):
+    """后台任务状态枚举"""
+    queued = "queued"             # 排队中（含等待重试）
+    running = "running"           # 执行中
+    succeeded = "succeeded"       # 已成功
+    failed = "failed"             # 已失败（重试次数用尽）
+
+
 # ==================== 数据库模型定义 ====================
 
 class User(Base):
@@ -60,18 +84,26 @@ class User(Base):
     存储系统用户信息，包含管理员、宠物主人、员工三种角色
     """
     __tablename__ = "users"
+    __table_args__ = (
+        # 前台按手机号 / 邮箱精确或前缀查找宠物主人
+        UniqueConstraint("phone_key", name="uk_phone_key"),
+        UniqueConstraint("email_key", name="uk_email_key"),
+    )
     
     # 字段定义
-    id = Column(BigInteger, primary_key=True, autoincrement=True, comment="用户ID")
+    id = Column(IdType, primary_key=True, autoincrement=True, comment="用户ID")
     username = Column(String(50), unique=True, nullable=False, comment="用户名")
     password = Column(String(255), nullable=False, comment="密码")
     email = Column(String(100), nullable=True, comment="邮箱")
+    email_key = Column(KeyType(100), nullable=True, comment="规范化邮箱（去空白、小写），写入时维护")
     phone = Column(String(20), nullable=True, comment="手机号")
+    phone_key = Column(KeyType(20), nullable=True, comment="规范化手机号（只保留数字，去掉 +86），写入时维护")
     real_name = Column(String(50), nullable=True, comment="真实姓名")
     role = Column(Enum(UserRole), nullable=False, default=UserRole.owner, comment="角色")
     avatar = Column(String(255), nullable=True, comment="头像URL")
     is_active = Column(Boolean, default=True, nullable=False, comment="是否启用")
     is_deleted = Column(Boolean, default=False, nullable=False, comment="是否删除")
+    version = Column(Integer, default=1, nullable=False, comment="版本号（乐观锁），每次更新加一")
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False, comment="创建时间")
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False, comment="更新时间")
     
@@ -105,7 +137,7 @@ class Pet(Base):
     __tablename__ = "pets"
     
     # 字段定义
-    id = Column(BigInteger, primary_key=True, autoincrement=True, comment="宠物ID")
+    id = Column(IdType, primary_key=True, autoincrement=True, comment="宠物ID")
     owner_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, comment="主人ID")
     name = Column(String(50), nullable=False, comment="宠物名称")
     species = Column(String(50), nullable=False, comment="物种")
@@ -118,6 +150,7 @@ class Pet(Base):
     special_notes = Column(Text, nullable=True, comment="特殊备注")
     avatar = Column(String(255), nullable=True, comment="照片URL")
     is_deleted = Column(Boolean, default=False, nullable=False, comment="是否删除")
+    version = Column(Integer, default=1, nullable=False, comment="版本号（乐观锁），每次更新加一")
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False, comment="创建时间")
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False, comment="更新时间")
     
@@ -148,7 +181,7 @@ class Service(Base):
     __tablename__ = "services"
     
     # 字段定义
-    id = Column(BigInteger, primary_key=True, autoincrement=True, comment="服务ID")
+    id = Column(IdType, primary_key=True, autoincrement=True, comment="服务ID")
     name = Column(String(100), nullable=False, comment="服务名称")
     description = Column(Text, nullable=True, comment="服务描述")
     category = Column(String(50), nullable=False, comment="服务类别")
@@ -157,6 +190,7 @@ class Service(Base):
     image = Column(String(255), nullable=True, comment="服务图片URL")
     is_available = Column(Boolean, default=True, nullable=False, comment="是否上架")
     is_deleted = Column(Boolean, default=False, nullable=False, comment="是否删除")
+    version = Column(Integer, default=1, nullable=False, comment="版本号（乐观锁），每次更新加一")
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False, comment="创建时间")
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False, comment="更新时间")
     
@@ -176,9 +210,15 @@ class Order(Base):
     存储宠物服务的订单信息
     """
     __tablename__ = "orders"
+    __table_args__ = (
+        # 定时状态流转：按状态取预约时间落在某个区间内的订单
+        Index("idx_status_appointment", "status", "appointment_time"),
+        # 预约时段：按员工取某个时间范围内的预约
+        Index("idx_staff_appointment", "staff_id", "appointment_time"),
+    )
     
     # 字段定义
-    id = Column(BigInteger, primary_key=True, autoincrement=True, comment="订单ID")
+    id = Column(IdType, primary_key=True, autoincrement=True, comment="订单ID")
     order_no = Column(String(50), unique=True, nullable=False, comment="订单号")
     user_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, comment="用户ID")
     pet_id = Column(BigInteger, ForeignKey("pets.id", ondelete="CASCADE"), nullable=False, comment="宠物ID")
@@ -189,6 +229,7 @@ class Order(Base):
     total_amount = Column(Numeric(10, 2), nullable=False, comment="订单总额")
     notes = Column(Text, nullable=True, comment="备注")
     is_deleted = Column(Boolean, default=False, nullable=False, comment="是否删除")
+    version = Column(Integer, default=1, nullable=False, comment="版本号（乐观锁），每次更新加一")
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False, comment="创建时间")
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False, comment="更新时间")
     
@@ -220,9 +261,14 @@ class Boarding(Base):
     存储宠物寄养的详细信息
     """
     __tablename__ = "boardings"
+    __table_args__ = (
+        # 定时状态流转：按状态取开始 / 结束时间落在某个区间内的寄养
+        Index("idx_status_start", "status", "start_date"),
+        Index("idx_status_end", "status", "end_date"),
+    )
     
     # 字段定义
-    id = Column(BigInteger, primary_key=True, autoincrement=True, comment="寄养ID")
+    id = Column(IdType, primary_key=True, autoincrement=True, comment="寄养ID")
     order_id = Column(BigInteger, ForeignKey("orders.id", ondelete="CASCADE"), nullable=False, comment="订单ID")
     pet_id = Column(BigInteger, ForeignKey("pets.id", ondelete="CASCADE"), nullable=False, comment="宠物ID")
     staff_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, comment="饲养员ID")
@@ -233,6 +279,7 @@ class Boarding(Base):
     food_type = Column(String(100), nullable=True, comment="食物类型")
     feeding_schedule = Column(String(100), nullable=True, comment="喂食计划")
     is_deleted = Column(Boolean, default=False, nullable=False, comment="是否删除")
+    version = Column(Integer, default=1, nullable=False, comment="版本号（乐观锁），每次更新加一")
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False, comment="创建时间")
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False, comment="更新时间")
     
@@ -260,7 +307,7 @@ class HealthRecord(Base):
     __tablename__ = "health_records"
     
     # 字段定义
-    id = Column(BigInteger, primary_key=True, autoincrement=True, comment="健康记录ID")
+    id = Column(IdType, primary_key=True, autoincrement=True, comment="健康记录ID")
     pet_id = Column(BigInteger, ForeignKey("pets.id", ondelete="CASCADE"), nullable=False, comment="宠物ID")
     vet_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, comment="兽医ID")
     check_date = Column(DateTime, nullable=False, comment="检查日期")
@@ -270,6 +317,7 @@ class HealthRecord(Base):
     prescription = Column(Text, nullable=True, comment="处方信息")
     notes = Column(Text, nullable=True, comment="备注")
     is_deleted = Column(Boolean, default=False, nullable=False, comment="是否删除")
+    version = Column(Integer, default=1, nullable=False, comment="版本号（乐观锁），每次更新加一")
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False, comment="创建时间")
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False, comment="更新时间")
     
@@ -283,3 +331,92 @@ class HealthRecord(Base):
     def __repr__(self):
         """对象的字符串表示"""
         return f"<HealthRecord(id={self.id}, type='{self.type}', check_date='{self.check_date}')>"
+
+
+class IdempotencyKey(Base):
+    """
+    幂等键表模型
+    对应数据库表：idempotency_keys
+    保存客户端通过 Idempotency-Key 请求头提交的键和首次请求的响应，
+    重试请求直接返回已保存的响应，不再重复执行写操作
+    """
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        UniqueConstraint("user_id", "idempotency_key", name="uk_user_key"),
+        Index("idx_expires_at", "expires_at"),
+    )
+    
+    # 字段定义
+    id = Column(IdType, primary_key=True, autoincrement=True, comment="主键ID")
+    user_id = Column(BigInteger, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, comment="用户ID")
+    idempotency_key = Column(String(100), nullable=False, comment="客户端提供的幂等键")
+    request_hash = Column(String(64), nullable=False, comment="请求指纹（方法、路径和请求体的 SHA-256）")
+    response_body = Column(Text, nullable=True, comment="首次请求的响应（紧凑 JSON），处理中为空")
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, comment="创建时间")
+    expires_at = Column(DateTime, nullable=False, comment="过期时间")
+    
+    def __repr__(self):
+        """对象的字符串表示"""
+        return f"<IdempotencyKey(user_id={self.user_id}, key='{self.idempotency_key}')>"
+
+
+class OutboxEvent(Base):
+    """
+    事件发件箱表模型
+    对应数据库表：outbox_events
+    领域事件与触发它的写操作在同一事务中写入本表，
+    提交后由后台分发器按ID顺序分批投递给订阅者
+    """
+    __tablename__ = "outbox_events"
+    __table_args__ = (
+        Index("idx_dispatched_id", "dispatched_at", "id"),
+    )
+    
+    # 字段定义
+    id = Column(IdType, primary_key=True, autoincrement=True, comment="主键ID，即事件的全局顺序")
+    event_type = Column(String(100), nullable=False, comment="事件类型，如 OrderStatusChanged")
+    aggregate_type = Column(String(50), nullable=False, comment="聚合类型，如 order、boarding")
+    aggregate_id = Column(BigInteger, nullable=False, comment="聚合ID")
+    payload = Column(Text, nullable=False, comment="事件内容（紧凑 JSON）")
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, comment="创建时间")
+    dispatched_at = Column(DateTime, nullable=True, comment="投递完成时间，未投递为空")
+    attempts = Column(Integer, default=0, nullable=False, comment="投递失败次数")
+    last_error = Column(String(500), nullable=True, comment="最近一次投递失败的原因")
+    
+    def __repr__(self):
+        """对象的字符串表示"""
+        return f"<OutboxEvent(id={self.id}, type='{self.event_type}', aggregate_id={self.aggregate_id})>"
+
+
+class Job(Base):
+    """
+    后台任务表模型
+    对应数据库表：jobs
+    持久化的任务队列：工作进程按优先级取出到期的任务执行，失败后按退避时间重新排队
+    """
+    __tablename__ = "jobs"
+    __table_args__ = (
+        Index("idx_queue_status_priority", "queue", "status", "priority", "id"),
+        Index("idx_status_locked_at", "status", "locked_at"),
+    )
+    
+    # 字段定义
+    id = Column(IdType, primary_key=True, autoincrement=True, comment="主键ID")
+    queue = Column(String(50), default="default", nullable=False, comment="队列名称")
+    name = Column(String(100), nullable=False, comment="任务名称，对应已注册的任务函数")
+    payload = Column(Text, nullable=True, comment="任务参数（紧凑 JSON）")
+    priority = Column(Integer, default=0, nullable=False, comment="优先级，数值越大越先执行")
+    status = Column(Enum(JobStatus), default=JobStatus.queued, nullable=False, comment="任务状态")
+    attempts = Column(Integer, default=0, nullable=False, comment="已执行次数")
+    max_attempts = Column(Integer, default=3, nullable=False, comment="最多执行次数")
+    run_at = Column(DateTime, default=datetime.utcnow, nullable=False, comment="最早执行时间")
+    locked_by = Column(String(100), nullable=True, comment="领取任务的工作进程标识")
+    locked_at = Column(DateTime, nullable=True, comment="领取时间")
+    last_error = Column(String(500), nullable=True, comment="最近一次失败的原因")
+    result = Column(Text, nullable=True, comment="执行结果（紧凑 JSON）")
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, comment="创建时间")
+    finished_at = Column(DateTime, nullable=True, comment="完成时间")
+    
+    def __repr__(self):
+        """对象的字符串表示"""
+        return f"<Job(id={self.id}, name='{self.name}', status='{self.status}')>"
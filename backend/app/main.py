@@ -5,6 +5,7 @@ Pet Management System Backend
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from app.core.config import settings
 from app.core.exceptions import (
     business_exception_handler,
@@ -14,6 +15,15 @@ from app.core.exceptions import (
 )
 from sqlalchemy.exc import SQLAlchemyError
 from app.api import api_router
+from app.core.admission import AdmissionMiddleware
+from app.core.deadline import DeadlineMiddleware
+from app.core.metrics import TimingMiddleware, render_metrics
+from app.core.profiler import ProfilerMiddleware, query_profiler
+from app.core.database import engine, replica_engines
+from app.service.importer import shutdown_hash_pool
+from app.service.events import outbox_dispatcher
+from app.service.scheduler import transition_scheduler
+from app.service.stream import event_stream_hub
 
 # Create FastAPI application instance
 app = FastAPI(
@@ -25,6 +35,12 @@ app = FastAPI(
     openapi_url="/openapi.json"
 )
 
+# Admission control: per route class concurrency limits (added before CORS so 503s carry CORS headers)
+app.add_middleware(AdmissionMiddleware)
+
+# Request deadline: wraps admission so queueing time counts against the budget
+app.add_middleware(DeadlineMiddleware)
+
 # Configure CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -32,8 +48,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "Idempotent-Replayed", "Retry-After"],
 )
 
+# SQL profiler: record every statement per request (opt-in, see SQL_PROFILER_ENABLED)
+if settings.SQL_PROFILER_ENABLED:
+    for profiled_engine in [engine, *replica_engines]:
+        query_profiler.attach(profiled_engine)
+    app.add_middleware(ProfilerMiddleware)
+
+# Request timing middleware (added last so it wraps everything, including CORS)
+app.add_middleware(TimingMiddleware)
+
 # Register global exception handlers
 app.add_exception_handler(BusinessException, business_exception_handler)
 app.add_exception_handler(SQLAlchemyError, sqlalchemy_exception_handler)
@@ -65,6 +91,12 @@ async def health_check():
     }
 
 
+@app.get("/metrics", tags=["System"], response_class=PlainTextResponse)
+async def metrics():
+    """Per-route latency histograms in Prometheus text format"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 @app.on_event("startup")
 async def startup_event():
     """Application startup event"""
@@ -77,11 +109,19 @@ async def startup_event():
     Health: http://localhost:8000/health
     ========================================
     """)
+    if settings.OUTBOX_DISPATCHER_ENABLED:
+        outbox_dispatcher.start()
+    if settings.SCHEDULER_ENABLED:
+        transition_scheduler.start()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Application shutdown event"""
+    await event_stream_hub.stop()
+    await transition_scheduler.stop()
+    await outbox_dispatcher.stop()
+    shutdown_hash_pool()
     print("Application shutting down...")
 
 
@@ -3,7 +3,7 @@
 Pydantic Schemas for API request/response validation
 """
 
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 from pydantic import BaseModel, EmailStr, Field, ConfigDict
 from enum import Enum
@@ -62,6 +62,11 @@ class TimestampMixin(BaseModel):
     updated_at: datetime = Field(..., description="更新时间")
 
 
+class VersionMixin(BaseModel):
+    """版本号混入类，为响应模型添加乐观锁版本号"""
+    version: int = Field(1, description="版本号，更新时通过 If-Match 请求头或 version 字段回传")
+
+
 # ==================== 用户相关 Schema ====================
 
 class UserBase(BaseSchema):
@@ -85,9 +90,10 @@ class UserUpdate(BaseSchema):
     real_name: Optional[str] = None
     avatar: Optional[str] = None
     is_active: Optional[bool] = None
+    version: Optional[int] = Field(None, description="读取时的版本号，与当前版本不一致时更新失败")
 
 
-class UserResponse(UserBase, TimestampMixin):
+class UserResponse(UserBase, TimestampMixin, VersionMixin):
     """用户响应模型"""
     id: int = Field(..., description="用户ID")
     role: UserRole = Field(..., description="角色")
@@ -150,15 +156,21 @@ class PetUpdate(BaseSchema):
     health_status: Optional[str] = None
     special_notes: Optional[str] = None
     avatar: Optional[str] = None
+    version: Optional[int] = Field(None, description="读取时的版本号，与当前版本不一致时更新失败")
 
 
-class PetResponse(PetBase, TimestampMixin):
+class PetResponse(PetBase, TimestampMixin, VersionMixin):
     """宠物响应模型"""
     id: int = Field(..., description="宠物ID")
     owner_id: int = Field(..., description="主人ID")
     avatar: Optional[str] = Field(None, description="宠物照片URL")
 
 
+class OwnerLookupResponse(UserResponse):
+    """前台查找宠物主人响应模型（附带宠物）"""
+    pets: List[PetResponse] = Field(default_factory=list, description="宠物列表")
+
+
 # ==================== 服务相关 Schema ====================
 
 class ServiceBase(BaseSchema):
@@ -184,9 +196,10 @@ class ServiceUpdate(BaseSchema):
     duration: Optional[int] = None
     image: Optional[str] = None
     is_available: Optional[bool] = None
+    version: Optional[int] = Field(None, description="读取时的版本号，与当前版本不一致时更新失败")
 
 
-class ServiceResponse(ServiceBase, TimestampMixin):
+class ServiceResponse(ServiceBase, TimestampMixin, VersionMixin):
     """服务响应模型"""
     id: int = Field(..., description="服务ID")
     image: Optional[str] = Field(None, description="服务图片URL")
@@ -214,9 +227,10 @@ class OrderUpdate(BaseSchema):
     status: Optional[OrderStatus] = None
     appointment_time: Optional[datetime] = None
     notes: Optional[str] = None
+    version: Optional[int] = Field(None, description="读取时的版本号，与当前版本不一致时更新失败")
 
 
-class OrderResponse(OrderBase, TimestampMixin):
+class OrderResponse(OrderBase, TimestampMixin, VersionMixin):
     """订单响应模型"""
     id: int = Field(..., description="订单ID")
     order_no: str = Field(..., description="订单号")
@@ -226,6 +240,18 @@ class OrderResponse(OrderBase, TimestampMixin):
     total_amount: float = Field(..., description="订单总额")
 
 
+class AppointmentSlot(BaseSchema):
+    """可预约时段"""
+    start: datetime = Field(..., description="开始时间")
+    end: datetime = Field(..., description="结束时间（开始时间 + 服务时长）")
+    staff_ids: List[int] = Field(..., description="该时段空闲的员工ID")
+
+
+class SlotAvailability(AppointmentSlot):
+    """时段空闲查询结果"""
+    available: bool = Field(..., description="是否有员工空闲")
+
+
 # ==================== 寄养相关 Schema ====================
 
 class BoardingBase(BaseSchema):
@@ -247,15 +273,32 @@ class BoardingUpdate(BaseSchema):
     daily_notes: Optional[str] = None
     food_type: Optional[str] = None
     feeding_schedule: Optional[str] = None
+    version: Optional[int] = Field(None, description="读取时的版本号，与当前版本不一致时更新失败")
 
 
-class BoardingResponse(BoardingBase, TimestampMixin):
+class BoardingResponse(BoardingBase, TimestampMixin, VersionMixin):
     """寄养响应模型"""
     id: int = Field(..., description="寄养ID")
     order_id: int = Field(..., description="订单ID")
     status: BoardingStatus = Field(..., description="寄养状态")
 
 
+class BoardingBookingCreate(BaseSchema):
+    """寄养预订请求模型，一次请求同时创建订单和寄养记录"""
+    pet_id: int = Field(..., description="宠物ID")
+    service_id: int = Field(..., description="寄养服务ID")
+    staff_id: Optional[int] = Field(None, description="饲养员ID，不传时自动指派该时间段负责寄养最少的员工")
+    start_date: datetime = Field(..., description="寄养开始时间")
+    end_date: datetime = Field(..., description="寄养结束时间")
+    notes: Optional[str] = Field(None, description="订单备注")
+
+
+class BoardingBookingResponse(BaseSchema):
+    """寄养预订响应模型"""
+    order: OrderResponse = Field(..., description="订单信息")
+    boarding: BoardingResponse = Field(..., description="寄养信息")
+
+
 # ==================== 健康记录相关 Schema ====================
 
 class HealthRecordBase(BaseSchema):
@@ -283,13 +326,135 @@ class HealthRecordUpdate(BaseSchema):
     diagnosis: Optional[str] = None
     prescription: Optional[str] = None
     notes: Optional[str] = None
+    version: Optional[int] = Field(None, description="读取时的版本号，与当前版本不一致时更新失败")
 
 
-class HealthRecordResponse(HealthRecordBase, TimestampMixin):
+class HealthRecordResponse(HealthRecordBase, TimestampMixin, VersionMixin):
     """健康记录响应模型"""
     id: int = Field(..., description="健康记录ID")
 
 
+# ==================== 批量操作相关 Schema ====================
+
+class BulkIdsRequest(BaseSchema):
+    """批量操作请求模型"""
+    ids: List[int] = Field(..., min_length=1, max_length=1000, description="记录ID列表")
+
+
+class OrderBulkStatusUpdate(BulkIdsRequest):
+    """批量更新订单状态请求模型"""
+    status: OrderStatus = Field(..., description="目标订单状态")
+
+
+class BoardingBulkStatusUpdate(BulkIdsRequest):
+    """批量更新寄养状态请求模型"""
+    status: BoardingStatus = Field(..., description="目标寄养状态")
+
+
+class BulkResult(BaseSchema):
+    """批量操作结果模型"""
+    requested: int = Field(..., description="请求处理的记录数（已去重）")
+    affected: int = Field(..., description="实际影响的记录数")
+
+
+# ==================== 批量导入相关 Schema ====================
+
+class ImportRowError(BaseSchema):
+    """导入失败行"""
+    row: int = Field(..., description="文件中的行号")
+    msg: str = Field(..., description="失败原因")
+
+
+class ImportReport(BaseSchema):
+    """批量导入结果"""
+    entity: str = Field(..., description="导入类型")
+    total: int = Field(..., description="文件总行数")
+    imported: int = Field(..., description="成功导入行数")
+    failed: int = Field(..., description="失败行数")
+    chunks: int = Field(..., description="分块事务数")
+    errors: List[ImportRowError] = Field(default_factory=list, description="失败行明细（最多1000条）")
+
+
+# ==================== SQL 分析相关 Schema ====================
+
+class QueryStatementStat(BaseSchema):
+    """同形语句的执行统计"""
+    statement: str = Field(..., description="归一化后的 SQL 语句")
+    count: int = Field(..., description="执行次数")
+    total_ms: float = Field(..., description="累计耗时（毫秒）")
+    max_ms: float = Field(..., description="单次最大耗时（毫秒）")
+    rows: int = Field(..., description="累计影响/返回行数（驱动未提供时不计入）")
+
+
+class RequestQueryProfile(BaseSchema):
+    """单个请求的 SQL 汇总"""
+    method: str = Field(..., description="请求方法")
+    path: str = Field(..., description="路由模板")
+    started_at: float = Field(..., description="请求开始时间戳")
+    query_count: int = Field(..., description="执行的语句数")
+    total_ms: float = Field(..., description="SQL 累计耗时（毫秒）")
+    n_plus_one: List[QueryStatementStat] = Field(default_factory=list, description="疑似 N+1 的语句")
+
+
+class NPlusOneSuspect(BaseSchema):
+    """疑似 N+1 的语句"""
+    statement: str = Field(..., description="归一化后的 SQL 语句")
+    requests: int = Field(..., description="出现该问题的请求数")
+    max_count: int = Field(..., description="单个请求内的最大执行次数")
+    paths: List[str] = Field(default_factory=list, description="出现该问题的接口")
+
+
+class QueryProfileReport(BaseSchema):
+    """SQL 分析报表"""
+    enabled: bool = Field(..., description="分析器是否开启")
+    requests_sampled: int = Field(..., description="统计的最近请求数")
+    n_plus_one_threshold: int = Field(..., description="N+1 判定阈值")
+    worst_requests: List[RequestQueryProfile] = Field(default_factory=list, description="查询次数最多的请求")
+    top_statements: List[QueryStatementStat] = Field(default_factory=list, description="累计耗时最高的语句")
+    n_plus_one: List[NPlusOneSuspect] = Field(default_factory=list, description="疑似 N+1 的语句")
+
+
+# ==================== 慢查询日志相关 Schema ====================
+
+class SlowQueryStatement(BaseSchema):
+    """慢查询中执行的一条语句及其执行计划"""
+    sql: str = Field(..., description="驱动层 SQL")
+    params: List[str] = Field(default_factory=list, description="绑定参数")
+    duration_ms: float = Field(..., description="执行耗时（毫秒）")
+    plan: List[Dict[str, str]] = Field(default_factory=list, description="EXPLAIN 结果")
+    plan_error: Optional[str] = Field(None, description="EXPLAIN 失败原因")
+
+
+class SlowQueryEntry(BaseSchema):
+    """一次慢列表查询"""
+    id: int = Field(..., description="记录ID")
+    recorded_at: float = Field(..., description="记录时间戳")
+    query: str = Field(..., description="列表函数名")
+    filter_key: str = Field(..., description="筛选条件组合")
+    filters: Dict[str, str] = Field(default_factory=dict, description="筛选条件取值")
+    skip: Optional[int] = Field(None, description="分页偏移量")
+    limit: Optional[int] = Field(None, description="每页数量")
+    elapsed_ms: float = Field(..., description="列表函数总耗时（毫秒）")
+    statements: List[SlowQueryStatement] = Field(default_factory=list, description="执行的语句")
+
+
+class SlowQueryGroup(BaseSchema):
+    """按列表函数和筛选组合聚合的慢查询"""
+    query: str = Field(..., description="列表函数名")
+    filter_key: str = Field(..., description="筛选条件组合")
+    count: int = Field(..., description="出现次数")
+    max_ms: float = Field(..., description="最大耗时（毫秒）")
+    avg_ms: float = Field(..., description="平均耗时（毫秒）")
+    latest_id: int = Field(..., description="最近一条记录ID")
+
+
+class SlowQueryReport(BaseSchema):
+    """慢查询报表"""
+    threshold_ms: float = Field(..., description="慢查询阈值（毫秒）")
+    groups: List[SlowQueryGroup] = Field(default_factory=list, description="按筛选组合聚合")
+    entries: List[SlowQueryEntry] = Field(default_factory=list, description="最近的慢查询")
+
+
 # ==================== 仪表盘相关 Schema ====================
 
 class DashboardStats(BaseSchema):
@@ -3,35 +3,124 @@
 处理业务逻辑，调用CRUD层完成数据库操作
 """
 
-from typing import List, Optional, Tuple
+from typing import Iterator, List, Optional, Tuple
 from sqlalchemy.orm import Session
+import csv
+import enum
+import io
+import json
+from datetime import datetime
+from decimal import Decimal
 from app.crud import (
     # 用户 CRUD
-    get_user, get_user_by_username, get_users, create_user, update_user, delete_user,
+    get_user, lock_user, get_user_by_username, get_users, create_user, update_user, delete_user,
+    normalize_phone, normalize_email, get_contact_key_owners, lookup_owners,
     # 宠物 CRUD
-    get_pet, get_pets, create_pet, update_pet, delete_pet,
+    get_pet, lock_pet, get_pets, create_pet, update_pet, delete_pet,
     # 服务 CRUD
     get_service, get_services, create_service, update_service, delete_service,
     # 订单 CRUD
     get_order, get_orders, create_order, update_order, delete_order,
     # 寄养 CRUD
     get_boarding, get_boardings, create_boarding, update_boarding, delete_boarding,
+    has_overlapping_boarding, create_boarding_booking,
     # 健康记录 CRUD
     get_health_record, get_health_records, create_health_record, update_health_record, delete_health_record,
+    # 批量操作
+    bulk_soft_delete,
+    # 导出
+    iter_export_rows, EXPORT_COLUMNS,
     # 统计
     get_dashboard_stats
 )
-from app.db.models import User
+from app.db.models import User, Order, Boarding
 from app.core.security import verify_password
 from app.schemas import (
     UserCreate, UserUpdate,
     PetCreate, PetUpdate,
     ServiceCreate, ServiceUpdate,
     OrderCreate, OrderUpdate,
-    BoardingCreate, BoardingUpdate,
+    BoardingCreate, BoardingUpdate, BoardingBookingCreate,
     HealthRecordCreate, HealthRecordUpdate
 )
+from app.core.config import settings
+from app.core.database import SessionLocal, use_primary
 from app.core.exceptions import NotFoundError, ValidationError, ConflictError
+from app.service.unit_of_work import UnitOfWork
+from app.service.lifecycle import Lifecycle, order_lifecycle, boarding_lifecycle
+from app.service.events import (
+    event_bus, OrderCreated, OrderUpdated, OrderDeleted, BoardingCreated, BoardingDeleted, HealthRecordAdded
+)
+from app.service.importer import ImportService
+from app.service.slots import SlotService
+from app.service.assignment import AssignmentService
+
+
+# ==================== 乐观锁 ====================
+
+def _raise_update_failure(
+    db: Session,
+    getter,
+    record_id: int,
+    expected_version: Optional[int],
+    not_found_msg: str,
+    allowed_from: Optional[List[str]] = None
+):
+    """
+    条件更新未命中任何行时区分原因：记录不存在、当前状态不允许流转，或版本已被他人修改
+
+    Args:
+        db: 数据库会话
+        getter: 按ID查询记录的 CRUD 函数
+        record_id: 记录ID
+        expected_version: 期望的版本号
+        not_found_msg: 记录不存在时的提示
+        allowed_from: 本次更新包含状态流转时允许的来源状态
+
+    Raises:
+        ConflictError: 版本冲突或状态不允许流转
+        NotFoundError: 记录不存在
+    """
+    record = getter(db, record_id)
+    if record is None:
+        raise NotFoundError(not_found_msg)
+    current_status = getattr(getattr(record, "status", None), "value", None)
+    if allowed_from is not None and current_status not in allowed_from:
+        raise ConflictError(f"当前状态为 {current_status}，不允许执行该状态变更")
+    raise ConflictError("数据已被他人修改，请刷新后重试")
+
+
+def _update_with_lifecycle(
+    db: Session,
+    lifecycle: Lifecycle,
+    updater,
+    getter,
+    record_id: int,
+    update_data,
+    expected_version: Optional[int],
+    not_found_msg: str
+):
+    """
+    更新订单 / 寄养记录，修改状态时按生命周期流转
+
+    字段修改、版本校验和状态校验合并在同一条条件 UPDATE 中，成功后通知生命周期订阅者。
+
+    Raises:
+        ValidationError: 目标状态不能通过流转到达
+        ConflictError: 版本冲突或当前状态不允许流转
+        NotFoundError: 记录不存在
+    """
+    if expected_version is None:
+        expected_version = update_data.version
+    status = update_data.status
+    allowed_from = lifecycle.allowed_from(status) if status else None
+
+    record = updater(db, record_id, update_data, expected_version, allowed_from)
+    if not record:
+        _raise_update_failure(db, getter, record_id, expected_version, not_found_msg, allowed_from)
+    if status:
+        lifecycle.emit(db, status, [record_id])
+    return record
 
 
 # ==================== 用户服务 ====================
@@ -114,17 +203,79 @@ class UserService:
             User: 创建的用户对象
             
         Raises:
-            ConflictError: 用户名已存在时抛出
+            ConflictError: 用户名已存在、手机号或邮箱已被其他用户使用时抛出
         """
         # 检查用户名是否已存在
         existing_user = get_user_by_username(db, user.username)
         if existing_user:
             raise ConflictError("用户名已存在")
+        UserService._ensure_contacts_available(db, user.phone, user.email)
         
         return create_user(db, user)
     
     @staticmethod
-    def update_user_info(db: Session, user_id: int, user_update: UserUpdate) -> User:
+    def _ensure_contacts_available(
+        db: Session,
+        phone: Optional[str],
+        email: Optional[str],
+        user_id: Optional[int] = None
+    ) -> None:
+        """
+        校验手机号、邮箱规范化后没有被其他用户使用
+        
+        Args:
+            db: 数据库会话
+            phone: 手机号
+            email: 邮箱
+            user_id: 修改资料的用户ID（排除自身）
+            
+        Raises:
+            ConflictError: 手机号或邮箱已被其他用户使用时抛出
+        """
+        phone_key, email_key = normalize_phone(phone), normalize_email(email)
+        for owner_id, owner_phone_key, owner_email_key in get_contact_key_owners(
+            db, [phone_key] if phone_key else [], [email_key] if email_key else []
+        ):
+            if owner_id == user_id:
+                continue
+            if phone_key and owner_phone_key == phone_key:
+                raise ConflictError("手机号已被其他账号使用")
+            raise ConflictError("邮箱已被其他账号使用")
+    
+    @staticmethod
+    def lookup_owners(db: Session, query: str, limit: int = 10) -> List[User]:
+        """
+        前台按手机号或邮箱查找宠物主人（精确或前缀匹配），附带其宠物
+        
+        包含 @ 时按邮箱查找，否则按手机号查找；输入会先规范化，
+        "138 0013"、"+86 138-0013" 都按前缀 "1380013" 查找。
+        
+        Args:
+            db: 数据库会话
+            query: 手机号 / 邮箱或其前缀
+            limit: 最多返回的主人数
+            
+        Returns:
+            List[User]: 主人列表，按查找键排序，精确匹配在最前
+            
+        Raises:
+            ValidationError: 输入过短时抛出（手机号至少 4 位数字，邮箱至少 3 个字符）
+        """
+        if "@" in query:
+            key, column, min_length = normalize_email(query), User.email_key, 3
+        else:
+            key, column, min_length = normalize_phone(query), User.phone_key, 4
+        if not key or len(key) < min_length:
+            raise ValidationError("请输入至少 4 位手机号或 3 个字符的邮箱")
+        return lookup_owners(db, column, key, limit)
+    
+    @staticmethod
+    def update_user_info(
+        db: Session,
+        user_id: int,
+        user_update: UserUpdate,
+        expected_version: Optional[int] = None
+    ) -> User:
         """
         更新用户信息
         
@@ -132,16 +283,21 @@ class UserService:
             db: 数据库会话
             user_id: 用户ID
             user_update: 更新数据
+            expected_version: If-Match 请求头中的版本号，未提供时使用请求体中的 version
             
         Returns:
             User: 更新后的用户对象
             
         Raises:
             NotFoundError: 用户不存在时抛出
+            ConflictError: 版本号与当前版本不一致、手机号或邮箱已被其他用户使用时抛出
         """
-        user = update_user(db, user_id, user_update)
+        if expected_version is None:
+            expected_version = user_update.version
+        UserService._ensure_contacts_available(db, user_update.phone, user_update.email, user_id)
+        user = update_user(db, user_id, user_update, expected_version)
         if not user:
-            raise NotFoundError("用户不存在")
+            _raise_update_failure(db, get_user, user_id, expected_version, "用户不存在")
         return user
     
     @staticmethod
@@ -234,7 +390,12 @@ class PetService:
         return create_pet(db, pet, owner_id)
     
     @staticmethod
-    def update_pet_info(db: Session, pet_id: int, pet_update: PetUpdate):
+    def update_pet_info(
+        db: Session,
+        pet_id: int,
+        pet_update: PetUpdate,
+        expected_version: Optional[int] = None
+    ):
         """
         更新宠物信息
         
@@ -242,16 +403,20 @@ class PetService:
             db: 数据库会话
             pet_id: 宠物ID
             pet_update: 更新数据
+            expected_version: If-Match 请求头中的版本号，未提供时使用请求体中的 version
             
         Returns:
             Pet: 更新后的宠物对象
             
         Raises:
             NotFoundError: 宠物不存在时抛出
+            ConflictError: 版本号与当前版本不一致时抛出
         """
-        pet = update_pet(db, pet_id, pet_update)
+        if expected_version is None:
+            expected_version = pet_update.version
+        pet = update_pet(db, pet_id, pet_update, expected_version)
         if not pet:
-            raise NotFoundError("宠物不存在")
+            _raise_update_failure(db, get_pet, pet_id, expected_version, "宠物不存在")
         return pet
     
     @staticmethod
@@ -339,7 +504,12 @@ class ServiceService:
         return create_service(db, service)
     
     @staticmethod
-    def update_service_info(db: Session, service_id: int, service_update: ServiceUpdate):
+    def update_service_info(
+        db: Session,
+        service_id: int,
+        service_update: ServiceUpdate,
+        expected_version: Optional[int] = None
+    ):
         """
         更新服务信息
         
@@ -347,16 +517,20 @@ class ServiceService:
             db: 数据库会话
             service_id: 服务ID
             service_update: 更新数据
+            expected_version: If-Match 请求头中的版本号，未提供时使用请求体中的 version
             
         Returns:
             Service: 更新后的服务对象
             
         Raises:
             NotFoundError: 服务不存在时抛出
+            ConflictError: 版本号与当前版本不一致时抛出
         """
-        service = update_service(db, service_id, service_update)
+        if expected_version is None:
+            expected_version = service_update.version
+        service = update_service(db, service_id, service_update, expected_version)
         if not service:
-            raise NotFoundError("服务不存在")
+            _raise_update_failure(db, get_service, service_id, expected_version, "服务不存在")
         return service
     
     @staticmethod
@@ -447,10 +621,17 @@ class OrderService:
         Raises:
             ValueError: 服务不存在时抛出
         """
-        return create_order(db, order, user_id)
+        new_order = create_order(db, order, user_id)
+        event_bus.publish(db, OrderCreated.from_order(new_order))
+        return new_order
     
     @staticmethod
-    def update_order_info(db: Session, order_id: int, order_update: OrderUpdate):
+    def update_order_info(
+        db: Session,
+        order_id: int,
+        order_update: OrderUpdate,
+        expected_version: Optional[int] = None
+    ):
         """
         更新订单信息
         
@@ -458,18 +639,54 @@ class OrderService:
             db: 数据库会话
             order_id: 订单ID
             order_update: 更新数据
+            expected_version: If-Match 请求头中的版本号，未提供时使用请求体中的 version
             
         Returns:
             Order: 更新后的订单对象
             
         Raises:
             NotFoundError: 订单不存在时抛出
-        """
-        order = update_order(db, order_id, order_update)
-        if not order:
-            raise NotFoundError("订单不存在")
+            ValidationError: 目标状态不能通过流转到达时抛出
+            ConflictError: 版本号不一致、当前状态不允许流转到目标状态或员工时间冲突时抛出
+        """
+        if order_update.staff_id is not None or order_update.appointment_time is not None:
+            OrderService._ensure_staff_free(db, order_id, order_update)
+        order = _update_with_lifecycle(
+            db, order_lifecycle, update_order, get_order, order_id, order_update, expected_version, "订单不存在"
+        )
+        # 状态流转由生命周期发布 OrderStatusChanged，其余字段的修改发布 OrderUpdated（取写入后的值）
+        fields = order_update.model_dump(exclude_unset=True, exclude={"status", "version"})
+        if fields:
+            changes = {
+                name: value.isoformat() if isinstance(value, datetime) else value
+                for name, value in ((name, getattr(order, name)) for name in fields)
+            }
+            event_bus.publish(db, OrderUpdated(order_id=order_id, changes=changes))
         return order
     
+    @staticmethod
+    def _ensure_staff_free(db: Session, order_id: int, order_update: OrderUpdate) -> None:
+        """
+        指派员工或修改预约时间时，校验员工在新时段内没有其他预约
+
+        先在主库上锁定员工行，同一员工的指派依次执行，校验时段和写入订单之间
+        不会被其他事务插入重叠的预约（锁在事务提交时释放）。
+
+        Raises:
+            ConflictError: 与员工的其他预约重叠时抛出
+        """
+        use_primary(db)
+        order = get_order(db, order_id)
+        # 已结束（或本次更新为结束）的订单不再占用员工时间
+        ended = ("completed", "cancelled")
+        if not order or order.status.value in ended or order_update.status in ended:
+            return
+        staff_id = order_update.staff_id if order_update.staff_id is not None else order.staff_id
+        appointment_time = order_update.appointment_time or order.appointment_time
+        if staff_id is not None and appointment_time is not None:
+            lock_user(db, staff_id)
+            SlotService.ensure_staff_free(db, staff_id, order.service, appointment_time, exclude_order_id=order_id)
+    
     @staticmethod
     def remove_order(db: Session, order_id: int) -> bool:
         """
@@ -488,11 +705,53 @@ class OrderService:
         success = delete_order(db, order_id)
         if not success:
             raise NotFoundError("订单不存在")
+        event_bus.publish(db, OrderDeleted(order_id=order_id))
         return True
+    
+    @staticmethod
+    def bulk_remove_orders(db: Session, ids: List[int]) -> Tuple[int, int]:
+        """
+        批量删除订单（软删除）
+
+        Args:
+            db: 数据库会话
+            ids: 订单ID列表
+
+        Returns:
+            Tuple[int, int]: 去重后的请求数和实际删除数
+        """
+        ids = list(dict.fromkeys(ids))
+        deleted = bulk_soft_delete(db, Order, ids)
+        event_bus.publish(db, *[OrderDeleted(order_id=i) for i in deleted])
+        return len(ids), len(deleted)
+    
+    @staticmethod
+    def bulk_update_status(db: Session, ids: List[int], status: str) -> Tuple[int, int]:
+        """
+        批量更新订单状态
+        当前状态不满足流转规则的订单会被跳过
+
+        Args:
+            db: 数据库会话
+            ids: 订单ID列表
+            status: 目标状态
+
+        Returns:
+            Tuple[int, int]: 去重后的请求数和实际更新数
+
+        Raises:
+            ValidationError: 目标状态不允许批量流转时抛出
+        """
+        ids = list(dict.fromkeys(ids))
+        return len(ids), order_lifecycle.transition(db, ids, status)
 
 
 # ==================== 寄养服务 ====================
 
+# 可以用于预订寄养的服务类别
+BOARDING_SERVICE_CATEGORY = "寄养"
+
+
 class BoardingService:
     """寄养服务类，处理寄养相关业务逻辑"""
     
@@ -555,10 +814,72 @@ class BoardingService:
         Returns:
             Boarding: 创建的寄养记录对象
         """
-        return create_boarding(db, boarding, order_id)
+        new_boarding = create_boarding(db, boarding, order_id)
+        event_bus.publish(db, BoardingCreated.from_boarding(new_boarding))
+        return new_boarding
     
     @staticmethod
-    def update_boarding_info(db: Session, boarding_id: int, boarding_update: BoardingUpdate):
+    def book_boarding(db: Session, booking: BoardingBookingCreate):
+        """
+        预订寄养：校验宠物、服务价格和档期后，在同一事务中创建订单和寄养记录
+
+        Args:
+            db: 数据库会话
+            booking: 寄养预订数据
+
+        Returns:
+            Tuple[Order, Boarding]: 创建的订单和寄养记录
+
+        Raises:
+            ValidationError: 时间段无效、不是寄养服务、服务已下架或价格无效时抛出
+            NotFoundError: 宠物、服务或饲养员不存在（未指定饲养员时没有可指派的员工）时抛出
+            ConflictError: 宠物在该时间段已有寄养时抛出
+        """
+        if booking.end_date <= booking.start_date:
+            raise ValidationError("寄养结束时间必须晚于开始时间")
+
+        # 校验结果决定是否写入，全部走主库；锁住宠物后再检查档期，
+        # 同一宠物的并发预订排队执行，不会都通过重叠检查
+        use_primary(db)
+        pet = lock_pet(db, booking.pet_id)
+        if not pet:
+            raise NotFoundError("宠物不存在")
+
+        service = get_service(db, booking.service_id)
+        if not service:
+            raise NotFoundError("服务不存在")
+        if service.category != BOARDING_SERVICE_CATEGORY:
+            raise ValidationError("该服务不是寄养服务")
+        if not service.is_available:
+            raise ValidationError("服务已下架")
+        if service.price is None or service.price <= 0:
+            raise ValidationError("服务价格无效")
+
+        if booking.staff_id is None:
+            staff_id = AssignmentService.pick_boarding_staff(db, booking.start_date, booking.end_date)
+            if staff_id is None:
+                raise NotFoundError("没有可指派的饲养员")
+            booking = booking.model_copy(update={"staff_id": staff_id})
+        else:
+            staff = get_user(db, booking.staff_id)
+            if not staff or staff.role.value not in ("admin", "staff"):
+                raise NotFoundError("饲养员不存在")
+
+        if has_overlapping_boarding(db, booking.pet_id, booking.start_date, booking.end_date):
+            raise ConflictError("该宠物在此时间段已有寄养安排")
+
+        with UnitOfWork(db):
+            order, boarding = create_boarding_booking(db, booking, service, pet.owner_id)
+            event_bus.publish(db, OrderCreated.from_order(order), BoardingCreated.from_boarding(boarding))
+            return order, boarding
+    
+    @staticmethod
+    def update_boarding_info(
+        db: Session,
+        boarding_id: int,
+        boarding_update: BoardingUpdate,
+        expected_version: Optional[int] = None
+    ):
         """
         更新寄养记录信息
         
@@ -566,17 +887,19 @@ class BoardingService:
             db: 数据库会话
             boarding_id: 寄养记录ID
             boarding_update: 更新数据
+            expected_version: If-Match 请求头中的版本号，未提供时使用请求体中的 version
             
         Returns:
             Boarding: 更新后的寄养记录对象
             
         Raises:
             NotFoundError: 寄养记录不存在时抛出
+            ValidationError: 目标状态不能通过流转到达时抛出
+            ConflictError: 版本号不一致或当前状态不允许流转到目标状态时抛出
         """
-        boarding = update_boarding(db, boarding_id, boarding_update)
-        if not boarding:
-            raise NotFoundError("寄养记录不存在")
-        return boarding
+        return _update_with_lifecycle(
+            db, boarding_lifecycle, update_boarding, get_boarding, boarding_id, boarding_update, expected_version, "寄养记录不存在"
+        )
     
     @staticmethod
     def remove_boarding(db: Session, boarding_id: int) -> bool:
@@ -596,7 +919,45 @@ class BoardingService:
         success = delete_boarding(db, boarding_id)
         if not success:
             raise NotFoundError("寄养记录不存在")
+        event_bus.publish(db, BoardingDeleted(boarding_id=boarding_id))
         return True
+    
+    @staticmethod
+    def bulk_remove_boardings(db: Session, ids: List[int]) -> Tuple[int, int]:
+        """
+        批量删除寄养记录（软删除）
+
+        Args:
+            db: 数据库会话
+            ids: 寄养记录ID列表
+
+        Returns:
+            Tuple[int, int]: 去重后的请求数和实际删除数
+        """
+        ids = list(dict.fromkeys(ids))
+        deleted = bulk_soft_delete(db, Boarding, ids)
+        event_bus.publish(db, *[BoardingDeleted(boarding_id=i) for i in deleted])
+        return len(ids), len(deleted)
+    
+    @staticmethod
+    def bulk_update_status(db: Session, ids: List[int], status: str) -> Tuple[int, int]:
+        """
+        批量更新寄养状态
+        当前状态不满足流转规则的寄养记录会被跳过
+
+        Args:
+            db: 数据库会话
+            ids: 寄养记录ID列表
+            status: 目标状态
+
+        Returns:
+            Tuple[int, int]: 去重后的请求数和实际更新数
+
+        Raises:
+            ValidationError: 目标状态不允许批量流转时抛出
+        """
+        ids = list(dict.fromkeys(ids))
+        return len(ids), boarding_lifecycle.transition(db, ids, status)
 
 
 # ==================== 健康记录服务 ====================
@@ -662,10 +1023,17 @@ class HealthRecordService:
         Returns:
             HealthRecord: 创建的健康记录对象
         """
-        return create_health_record(db, record)
+        new_record = create_health_record(db, record)
+        event_bus.publish(db, HealthRecordAdded.from_record(new_record))
+        return new_record
     
     @staticmethod
-    def update_health_record_info(db: Session, record_id: int, record_update: HealthRecordUpdate):
+    def update_health_record_info(
+        db: Session,
+        record_id: int,
+        record_update: HealthRecordUpdate,
+        expected_version: Optional[int] = None
+    ):
         """
         更新健康记录信息
         
@@ -673,16 +1041,20 @@ class HealthRecordService:
             db: 数据库会话
             record_id: 健康记录ID
             record_update: 更新数据
+            expected_version: If-Match 请求头中的版本号，未提供时使用请求体中的 version
             
         Returns:
             HealthRecord: 更新后的健康记录对象
             
         Raises:
             NotFoundError: 健康记录不存在时抛出
+            ConflictError: 版本号与当前版本不一致时抛出
         """
-        record = update_health_record(db, record_id, record_update)
+        if expected_version is None:
+            expected_version = record_update.version
+        record = update_health_record(db, record_id, record_update, expected_version)
         if not record:
-            raise NotFoundError("健康记录不存在")
+            _raise_update_failure(db, get_health_record, record_id, expected_version, "健康记录不存在")
         return record
     
     @staticmethod
@@ -723,3 +1095,68 @@ class DashboardService:
             dict: 统计数据字典
         """
         return get_dashboard_stats(db)
+
+
+# ==================== 导出服务 ====================
+
+class ExportService:
+    """导出服务类，以 CSV / NDJSON 流式输出订单、宠物和健康记录"""
+    
+    @staticmethod
+    def _to_plain(value):
+        """将数据库值转换为可序列化的简单类型"""
+        if isinstance(value, enum.Enum):
+            return value.value
+        if hasattr(value, "isoformat"):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            # 金额等定点数保留原始精度，不转换为浮点数
+            return str(value)
+        return value
+    
+    @staticmethod
+    def stream(entity: str, fmt: str, filters: dict) -> Iterator[str]:
+        """
+        生成导出内容
+        
+        导出可能在请求依赖关闭后才开始读取，因此使用独立的数据库会话，
+        并以服务端游标分批读取、按批输出，内存占用保持恒定
+        
+        Args:
+            entity: 导出实体，orders / pets / health-records
+            fmt: 导出格式，csv / ndjson
+            filters: 与列表接口相同的筛选条件
+            
+        Yields:
+            str: 一批数据对应的文本块
+        """
+        batch_size = settings.EXPORT_BATCH_SIZE
+        header = [column.key for column in EXPORT_COLUMNS[entity]]
+        db = SessionLocal()
+        try:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            if fmt == "csv":
+                # 带 BOM，Excel 打开中文不乱码
+                buffer.write("\ufeff")
+                writer.writerow(header)
+            
+            count = 0
+            for row in iter_export_rows(db, entity, filters, batch_size):
+                values = [ExportService._to_plain(v) for v in row]
+                if fmt == "csv":
+                    writer.writerow(values)
+                else:
+                    buffer.write(json.dumps(dict(zip(header, values)), ensure_ascii=False))
+                    buffer.write("\n")
+                
+                count += 1
+                if count % batch_size == 0:
+                    yield buffer.getvalue()
+                    buffer.seek(0)
+                    buffer.truncate()
+            
+            if buffer.tell():
+                yield buffer.getvalue()
+        finally:
+            db.close()
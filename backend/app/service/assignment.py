@@ -0,0 +1,141 @@
+"""
+员工自动指派
+把待确认且未指派员工的订单分配给员工，使各员工的工作量尽量均衡。
+
+工作量 = 名下未结束订单的服务总时长 + 负责的未结束寄养数 × ASSIGNMENT_BOARDING_MINUTES，
+启动时用两条 GROUP BY 查询读出，放入按工作量排序的最小堆。每个订单弹出工作量最小的员工，
+有预约时间的订单跳过该时段已有预约的员工（忙碌区间见 slots.StaffCalendar），
+指派后把订单时长计入工作量再放回堆中。一批订单在内存中一次分配完，最后用一条
+UPDATE ... SET staff_id = CASE id ... END 写入。
+
+与手工指派（OrderService._ensure_staff_free）一样，整个过程读主库，并在读取忙碌区间之前
+按ID顺序锁定员工行，刚写入的预约不会因副本延迟被漏看，并发指派也不会给同一员工排入重叠的预约。
+"""
+
+import heapq
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import use_primary
+from app.crud import (
+    get_staff_ids, get_staff_order_minutes, get_staff_boarding_counts, get_unassigned_orders, bulk_assign_staff,
+    lock_users
+)
+from app.service.events import event_bus, OrderUpdated
+from app.service.slots import SlotService, StaffCalendar
+
+
+class AssignmentService:
+    """员工自动指派服务类"""
+
+    @staticmethod
+    def staff_loads(db: Session, staff_ids: List[int]) -> Dict[int, int]:
+        """
+        员工当前的工作量（分钟）
+
+        Args:
+            db: 数据库会话
+            staff_ids: 员工ID列表
+
+        Returns:
+            Dict[int, int]: 员工ID -> 工作量
+        """
+        order_minutes = get_staff_order_minutes(db, staff_ids, settings.SLOT_DEFAULT_DURATION_MINUTES)
+        boardings = get_staff_boarding_counts(db, staff_ids)
+        return {
+            staff_id: order_minutes.get(staff_id, 0) + boardings.get(staff_id, 0) * settings.ASSIGNMENT_BOARDING_MINUTES
+            for staff_id in staff_ids
+        }
+
+    @staticmethod
+    def plan(
+        orders: List[Tuple[int, Optional[datetime], Optional[int]]],
+        loads: Dict[int, int],
+        calendars: Dict[int, StaffCalendar]
+    ) -> Dict[int, int]:
+        """
+        在内存中为一批订单选择员工（不访问数据库）
+
+        Args:
+            orders: (订单ID, 预约时间, 服务时长) 列表，按处理顺序排列
+            loads: 员工ID -> 当前工作量（分钟）
+            calendars: 员工ID -> 忙碌区间，指派有预约时间的订单后同步更新
+
+        Returns:
+            Dict[int, int]: 订单ID -> 员工ID，所有员工在预约时段都忙的订单不在结果中
+        """
+        # 工作量相同时按员工ID，保证结果确定
+        heap = [(load, staff_id) for staff_id, load in loads.items()]
+        heapq.heapify(heap)
+        assignments = {}
+        for order_id, appointment_time, duration in orders:
+            minutes = duration or settings.SLOT_DEFAULT_DURATION_MINUTES
+            end = appointment_time + timedelta(minutes=minutes) if appointment_time else None
+            busy = []
+            while heap:
+                load, staff_id = heapq.heappop(heap)
+                if appointment_time is None or calendars[staff_id].is_free(appointment_time, end):
+                    assignments[order_id] = staff_id
+                    if appointment_time is not None:
+                        calendars[staff_id].add(appointment_time, end)
+                    heapq.heappush(heap, (load + minutes, staff_id))
+                    break
+                busy.append((load, staff_id))
+            for entry in busy:
+                heapq.heappush(heap, entry)
+        return assignments
+
+    @staticmethod
+    def assign_pending_orders(db: Session, limit: Optional[int] = None) -> Tuple[int, int]:
+        """
+        为一批待确认且未指派的订单自动指派员工
+
+        Args:
+            db: 数据库会话
+            limit: 本批最多处理的订单数，默认取配置
+
+        Returns:
+            Tuple[int, int]: 本批处理的订单数和实际指派的订单数
+        """
+        use_primary(db)
+        orders = get_unassigned_orders(db, limit or settings.ASSIGNMENT_BATCH_SIZE)
+        staff_ids = get_staff_ids(db)
+        if not orders or not staff_ids:
+            return len(orders), 0
+
+        times = [appointment_time for _, appointment_time, _ in orders if appointment_time]
+        if times:
+            # 锁在事务提交时释放，期间其他指派在同一员工上排队，读到的忙碌区间到写入时仍然有效
+            lock_users(db, staff_ids)
+            calendars = SlotService.build_calendars(
+                db, staff_ids, min(times),
+                max(times) + timedelta(minutes=max(d or settings.SLOT_DEFAULT_DURATION_MINUTES for _, _, d in orders))
+            )
+        else:
+            calendars = {staff_id: StaffCalendar() for staff_id in staff_ids}
+
+        assignments = AssignmentService.plan(orders, AssignmentService.staff_loads(db, staff_ids), calendars)
+        assigned = bulk_assign_staff(db, assignments)
+        event_bus.publish(db, *[OrderUpdated(order_id=i, changes={"staff_id": assignments[i]}) for i in assigned])
+        return len(orders), len(assigned)
+
+    @staticmethod
+    def pick_boarding_staff(db: Session, start: datetime, end: datetime) -> Optional[int]:
+        """
+        为新寄养选择员工：同一时间段内负责寄养最少的员工，相同时取总工作量最小的
+
+        Args:
+            db: 数据库会话
+            start: 寄养开始时间
+            end: 寄养结束时间
+
+        Returns:
+            Optional[int]: 员工ID，没有可指派的员工时返回None
+        """
+        staff_ids = get_staff_ids(db)
+        if not staff_ids:
+            return None
+        occupancy = get_staff_boarding_counts(db, staff_ids, start, end)
+        loads = AssignmentService.staff_loads(db, staff_ids)
+        return min(staff_ids, key=lambda staff_id: (occupancy.get(staff_id, 0), loads[staff_id], staff_id))
@@ -0,0 +1,460 @@
+"""
+领域事件
+业务层在写操作中发布类型化的领域事件（如 OrderStatusChanged），事件与写操作在同一事务中
+写入发件箱表 outbox_events（事务性发件箱），提交后由后台分发器分批投递给订阅者。
+缓存、计数器、通知等派生数据的维护因此移出请求的延迟路径，也不再需要轮询业务表。
+
+投递语义为至少一次：订阅者应当是幂等的（重复收到同一事件结果不变）。
+"""
+
+import asyncio
+import json
+import logging
+import threading
+from dataclasses import asdict, dataclass, fields
+from decimal import Decimal
+from typing import Any, Callable, ClassVar, Dict, List, Optional, Type
+from sqlalchemy import event as sa_event
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.crud import (
+    insert_outbox_events, claim_outbox_events, mark_outbox_dispatched, record_outbox_failure
+)
+from app.service.lifecycle import TransitionEvent, order_lifecycle, boarding_lifecycle
+from app.service.unit_of_work import UnitOfWork
+
+logger = logging.getLogger(__name__)
+
+# 会话上标记本事务发布过事件的键，提交后据此唤醒分发器
+_PUBLISHED_KEY = "outbox_published"
+
+
+# ==================== 事件类型 ====================
+
+def _plain(value):
+    """枚举取值，其余原样返回"""
+    return getattr(value, "value", value)
+
+
+@dataclass
+class DomainEvent:
+    """
+    领域事件基类
+
+    子类声明 aggregate_type（聚合类型）和 aggregate_field（保存聚合ID的字段名），
+    字段只使用可 JSON 序列化的简单类型。
+    """
+    aggregate_type: ClassVar[str] = ""
+    aggregate_field: ClassVar[str] = ""
+
+    @property
+    def event_type(self) -> str:
+        """事件类型，即类名"""
+        return type(self).__name__
+
+    @property
+    def aggregate_id(self) -> int:
+        """聚合ID"""
+        return getattr(self, self.aggregate_field)
+
+
+@dataclass
+class OrderCreated(DomainEvent):
+    """订单已创建"""
+    aggregate_type: ClassVar[str] = "order"
+    aggregate_field: ClassVar[str] = "order_id"
+
+    order_id: int
+    user_id: int
+    pet_id: int
+    service_id: int
+    status: str
+    # 金额以两位小数的字符串保存（与 Numeric(10, 2) 列一致），订阅者按 Decimal 解析，不经过浮点数
+    total_amount: str
+    appointment_time: Optional[str] = None
+
+    @classmethod
+    def from_order(cls, order) -> "OrderCreated":
+        """由订单对象构造"""
+        return cls(
+            order_id=order.id, user_id=order.user_id, pet_id=order.pet_id, service_id=order.service_id,
+            status=_plain(order.status), total_amount=f"{Decimal(str(order.total_amount or 0)):.2f}",
+            appointment_time=order.appointment_time.isoformat() if order.appointment_time else None
+        )
+
+
+@dataclass
+class OrderStatusChanged(DomainEvent):
+    """订单状态已流转"""
+    aggregate_type: ClassVar[str] = "order"
+    aggregate_field: ClassVar[str] = "order_id"
+
+    order_id: int
+    status: str
+
+
+@dataclass
+class OrderUpdated(DomainEvent):
+    """订单字段已修改（指派员工、修改预约时间或备注等，状态流转见 OrderStatusChanged）"""
+    aggregate_type: ClassVar[str] = "order"
+    aggregate_field: ClassVar[str] = "order_id"
+
+    order_id: int
+    changes: Dict[str, Any]
+
+
+@dataclass
+class OrderDeleted(DomainEvent):
+    """订单已删除（软删除）"""
+    aggregate_type: ClassVar[str] = "order"
+    aggregate_field: ClassVar[str] = "order_id"
+
+    order_id: int
+
+
+@dataclass
+class BoardingCreated(DomainEvent):
+    """寄养记录已创建"""
+    aggregate_type: ClassVar[str] = "boarding"
+    aggregate_field: ClassVar[str] = "boarding_id"
+
+    boarding_id: int
+    order_id: int
+    pet_id: int
+    staff_id: Optional[int]
+    start_date: str
+    end_date: str
+
+    @classmethod
+    def from_boarding(cls, boarding) -> "BoardingCreated":
+        """由寄养记录对象构造"""
+        return cls(
+            boarding_id=boarding.id, order_id=boarding.order_id, pet_id=boarding.pet_id,
+            staff_id=boarding.staff_id, start_date=boarding.start_date.isoformat(),
+            end_date=boarding.end_date.isoformat()
+        )
+
+
+@dataclass
+class BoardingStatusChanged(DomainEvent):
+    """寄养状态已流转"""
+    aggregate_type: ClassVar[str] = "boarding"
+    aggregate_field: ClassVar[str] = "boarding_id"
+
+    boarding_id: int
+    status: str
+
+
+@dataclass
+class BoardingDeleted(DomainEvent):
+    """寄养记录已删除（软删除）"""
+    aggregate_type: ClassVar[str] = "boarding"
+    aggregate_field: ClassVar[str] = "boarding_id"
+
+    boarding_id: int
+
+
+@dataclass
+class HealthRecordAdded(DomainEvent):
+    """健康记录已添加"""
+    aggregate_type: ClassVar[str] = "health_record"
+    aggregate_field: ClassVar[str] = "record_id"
+
+    record_id: int
+    pet_id: int
+    vet_id: Optional[int]
+    type: str
+    check_date: str
+
+    @classmethod
+    def from_record(cls, record) -> "HealthRecordAdded":
+        """由健康记录对象构造"""
+        return cls(
+            record_id=record.id, pet_id=record.pet_id, vet_id=record.vet_id,
+            type=_plain(record.type), check_date=record.check_date.isoformat()
+        )
+
+
+# 订阅者：在分发器的事务中被调用，抛出异常时该事件稍后重试
+EventHandler = Callable[[Session, DomainEvent], None]
+
+
+# ==================== 事件总线 ====================
+
+class EventBus:
+    """
+    进程内事件总线
+
+    使用示例:
+    ```python
+    @event_bus.on(OrderStatusChanged)
+    def refresh_counters(db: Session, event: OrderStatusChanged):
+        ...  # 由分发器在后台调用
+
+    event_bus.publish(db, OrderStatusChanged(order_id=1, status="confirmed"))
+    ```
+    """
+
+    def __init__(self):
+        """初始化事件总线"""
+        self._event_types: Dict[str, Type[DomainEvent]] = {}
+        self._handlers: Dict[str, List[EventHandler]] = {}
+        self._wakeups: List[Callable[[], None]] = []
+
+    def register(self, *event_classes: Type[DomainEvent]) -> None:
+        """
+        登记事件类型，分发器据此把发件箱中的记录还原为事件对象
+
+        Args:
+            event_classes: 事件类
+        """
+        for event_class in event_classes:
+            self._event_types[event_class.__name__] = event_class
+
+    def subscribe(self, event_class: Type[DomainEvent], handler: EventHandler) -> EventHandler:
+        """
+        订阅事件
+
+        Args:
+            event_class: 事件类
+            handler: 订阅者
+
+        Returns:
+            EventHandler: 传入的订阅者本身
+        """
+        self.register(event_class)
+        self._handlers.setdefault(event_class.__name__, []).append(handler)
+        return handler
+
+    def on(self, *event_classes: Type[DomainEvent]):
+        """订阅装饰器，可同时订阅多个事件类"""
+        def decorator(handler: EventHandler) -> EventHandler:
+            for event_class in event_classes:
+                self.subscribe(event_class, handler)
+            return handler
+        return decorator
+
+    def unsubscribe(self, handler: EventHandler) -> None:
+        """取消订阅"""
+        for event_type, handlers in self._handlers.items():
+            self._handlers[event_type] = [h for h in handlers if h is not handler]
+
+    def publish(self, db: Session, *events: DomainEvent) -> None:
+        """
+        发布事件：写入发件箱，随当前事务一起提交或回滚
+
+        Args:
+            db: 数据库会话
+            events: 领域事件
+        """
+        if not events:
+            return
+        insert_outbox_events(db, [
+            {
+                "event_type": e.event_type,
+                "aggregate_type": e.aggregate_type,
+                "aggregate_id": e.aggregate_id,
+                "payload": json.dumps(asdict(e), ensure_ascii=False, separators=(",", ":"), default=str),
+            }
+            for e in events
+        ])
+        db.info[_PUBLISHED_KEY] = True
+
+    def decode(self, event_type: str, payload: str) -> Optional[DomainEvent]:
+        """
+        把发件箱记录还原为事件对象
+
+        Args:
+            event_type: 事件类型
+            payload: 事件内容（JSON）
+
+        Returns:
+            Optional[DomainEvent]: 事件对象，未登记的类型返回None
+        """
+        event_class = self._event_types.get(event_type)
+        if event_class is None:
+            return None
+        data = json.loads(payload)
+        return event_class(**{f.name: data.get(f.name) for f in fields(event_class)})
+
+    def dispatch_batch(self, db: Session, batch_size: int, max_attempts: int) -> int:
+        """
+        投递一批待发送的事件
+
+        每个事件在独立的保存点中调用全部订阅者：订阅者抛出异常时只回滚该事件的派生写入
+        并记录失败次数，其余事件照常投递。派生写入与"已投递"标记在同一事务中提交。
+
+        Args:
+            db: 数据库会话
+            batch_size: 每批最多投递的事件数
+            max_attempts: 失败次数达到该值的事件不再投递
+
+        Returns:
+            int: 本批取出的事件数
+        """
+        rows = claim_outbox_events(db, batch_size, max_attempts)
+        dispatched = []
+        for row in rows:
+            domain_event = self.decode(row.event_type, row.payload)
+            handlers = self._handlers.get(row.event_type, []) if domain_event is not None else []
+            try:
+                with db.begin_nested():
+                    for handler in handlers:
+                        handler(db, domain_event)
+            except Exception as e:
+                logger.exception("事件 %s#%s 投递失败", row.event_type, row.id)
+                record_outbox_failure(db, row.id, f"{type(e).__name__}: {e}")
+            else:
+                dispatched.append(row.id)
+        mark_outbox_dispatched(db, dispatched)
+        return len(rows)
+
+    def add_wakeup(self, wakeup: Callable[[], None]) -> None:
+        """添加提交了新事件后的唤醒回调（分发器、实时推送等）"""
+        self._wakeups.append(wakeup)
+
+    def remove_wakeup(self, wakeup: Callable[[], None]) -> None:
+        """移除唤醒回调"""
+        self._wakeups = [w for w in self._wakeups if w is not wakeup]
+
+    def notify(self) -> None:
+        """有新事件提交，唤醒分发器等后台任务"""
+        for wakeup in list(self._wakeups):
+            wakeup()
+
+
+# 全局事件总线
+event_bus = EventBus()
+event_bus.register(
+    OrderCreated, OrderStatusChanged, OrderUpdated, OrderDeleted,
+    BoardingCreated, BoardingStatusChanged, BoardingDeleted, HealthRecordAdded
+)
+
+
+@sa_event.listens_for(Session, "after_commit")
+def _notify_after_commit(session):
+    """发布过事件的事务提交后立即唤醒分发器，不必等到下一次轮询"""
+    if session.info.pop(_PUBLISHED_KEY, False):
+        event_bus.notify()
+
+
+@sa_event.listens_for(Session, "after_soft_rollback")
+def _discard_after_rollback(session, previous_transaction):
+    """事务回滚时事件随之作废"""
+    if previous_transaction.parent is None:
+        session.info.pop(_PUBLISHED_KEY, None)
+
+
+# ==================== 状态流转事件 ====================
+# 状态机在流转所在的事务中通知，这里转换为发件箱事件
+
+@order_lifecycle.on()
+def _publish_order_status(db: Session, transition: TransitionEvent):
+    """订单状态流转写入发件箱"""
+    event_bus.publish(db, *[OrderStatusChanged(order_id=i, status=transition.status) for i in transition.ids])
+
+
+@boarding_lifecycle.on()
+def _publish_boarding_status(db: Session, transition: TransitionEvent):
+    """寄养状态流转写入发件箱"""
+    event_bus.publish(db, *[BoardingStatusChanged(boarding_id=i, status=transition.status) for i in transition.ids])
+
+
+# ==================== 后台分发器 ====================
+
+class OutboxDispatcher:
+    """
+    发件箱分发器
+    在应用进程内作为后台任务运行：取满一批时立即继续，否则等待唤醒或轮询间隔。
+    数据库操作在线程池中执行，不阻塞事件循环。
+    """
+
+    def __init__(
+        self,
+        bus: EventBus,
+        session_factory=None,
+        batch_size: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+        max_attempts: Optional[int] = None
+    ):
+        """
+        初始化分发器
+
+        Args:
+            bus: 事件总线
+            session_factory: 会话工厂，默认使用 SessionLocal
+            batch_size: 每批投递的事件数，默认取配置
+            poll_interval: 轮询间隔（秒），默认取配置
+            max_attempts: 最大失败次数，默认取配置
+        """
+        self.bus = bus
+        self.session_factory = session_factory or SessionLocal
+        self.batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+        self.poll_interval = poll_interval or settings.OUTBOX_POLL_INTERVAL_SECONDS
+        self.max_attempts = max_attempts or settings.OUTBOX_MAX_ATTEMPTS
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup_event: Optional[asyncio.Event] = None
+        self._wakeup: Optional[Callable[[], None]] = None
+        self._lock = threading.Lock()
+
+    def dispatch_once(self) -> int:
+        """
+        在独立的会话和事务中投递一批事件
+
+        Returns:
+            int: 本批取出的事件数
+        """
+        # 多个线程同时分发只会互相抢锁，同一进程内串行执行
+        with self._lock:
+            db = self.session_factory()
+            try:
+                with UnitOfWork(db):
+                    return self.bus.dispatch_batch(db, self.batch_size, self.max_attempts)
+            finally:
+                db.close()
+
+    async def _run(self) -> None:
+        """分发循环"""
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                count = await loop.run_in_executor(None, self.dispatch_once)
+            except Exception:
+                logger.exception("发件箱分发失败")
+                count = 0
+            if count >= self.batch_size:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup_event.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup_event.clear()
+
+    def start(self) -> None:
+        """在当前事件循环中启动分发器"""
+        if self._task is not None:
+            return
+        loop = asyncio.get_running_loop()
+        self._wakeup_event = asyncio.Event()
+        self._wakeup = lambda: loop.call_soon_threadsafe(self._wakeup_event.set)
+        self.bus.add_wakeup(self._wakeup)
+        self._task = loop.create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止分发器，未投递的事件留在发件箱中，下次启动后继续投递"""
+        if self._wakeup is not None:
+            self.bus.remove_wakeup(self._wakeup)
+            self._wakeup = None
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+# 全局分发器
+outbox_dispatcher = OutboxDispatcher(event_bus)
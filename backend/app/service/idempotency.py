@@ -0,0 +1,149 @@
+"""
+幂等请求
+客户端在写请求上携带 Idempotency-Key 请求头（如超时后重试），
+同一用户的同一个键只执行一次写操作，重试直接返回首次请求保存的响应
+"""
+
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.exceptions import ConflictError
+from app.crud import (
+    insert_idempotency_key, get_idempotency_key, save_idempotency_response, delete_idempotency_key
+)
+
+
+class IdempotentRequest:
+    """
+    一次携带（或未携带）幂等键的请求
+
+    使用示例:
+    ```python
+    @router.post("")
+    async def create_order(..., idempotency: IdempotentRequest = Depends(get_idempotent_request, scope="function")):
+        if idempotency.replay is not None:
+            return idempotency.replay
+        new_order = OrderService.create_order_info(db, order, user_id)
+        return idempotency.save(ApiResponse[OrderResponse](data=...))
+    ```
+    """
+
+    def __init__(self, db: Session, record_id: Optional[int] = None, replay: Optional[dict] = None):
+        """
+        初始化幂等请求
+
+        Args:
+            db: 数据库会话
+            record_id: 本次请求占用的幂等键记录ID，未携带键或为重放时为None
+            replay: 需要重放的已保存响应
+        """
+        self.db = db
+        self.record_id = record_id
+        self.replay = replay
+        self.saved = False
+
+    def save(self, response: BaseModel) -> BaseModel:
+        """
+        在当前事务中保存响应，随写操作一起提交
+
+        Args:
+            response: 接口响应
+
+        Returns:
+            BaseModel: 传入的响应本身
+        """
+        if self.record_id is not None:
+            IdempotencyService.save(self.db, self.record_id, response)
+            self.saved = True
+        return response
+
+
+class IdempotencyService:
+    """幂等键业务逻辑类"""
+
+    @staticmethod
+    def fingerprint(method: str, path: str, query: str, body: bytes) -> str:
+        """
+        计算请求指纹，同一个键被用于不同请求时据此拒绝
+
+        Returns:
+            str: SHA-256 十六进制摘要
+        """
+        digest = hashlib.sha256(f"{method} {path}?{query}\n".encode("utf-8"))
+        digest.update(body)
+        return digest.hexdigest()
+
+    @staticmethod
+    def begin(db: Session, user_id: int, key: str, request_hash: str) -> Tuple[Optional[int], Optional[dict]]:
+        """
+        占用幂等键，或取出已保存的响应
+
+        先插入再读取：插入成功即获得该键，写操作与响应在同一事务中提交；
+        插入被唯一约束拦下说明键已被使用，此时加锁读取已有记录。
+        过期的记录直接接管。
+
+        Args:
+            db: 数据库会话
+            user_id: 用户ID
+            key: 幂等键
+            request_hash: 请求指纹
+
+        Raises:
+            ConflictError: 键已用于不同的请求，或相同请求仍在处理中
+
+        Returns:
+            Tuple[Optional[int], Optional[dict]]: (占用的记录ID, 需要重放的响应)，二者恰有一个不为空
+        """
+        now = datetime.utcnow()
+        expires_at = now + timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+
+        record_id = insert_idempotency_key(db, user_id, key, request_hash, expires_at)
+        if record_id is not None:
+            return record_id, None
+
+        record = get_idempotency_key(db, user_id, key)
+        if record is None:
+            # 先到的请求已回滚，键被释放
+            raise ConflictError("相同幂等键的请求处理失败，请重试")
+
+        if record.expires_at <= now:
+            record.request_hash = request_hash
+            record.response_body = None
+            record.created_at = now
+            record.expires_at = expires_at
+            db.flush()
+            return record.id, None
+
+        if record.request_hash != request_hash:
+            raise ConflictError("幂等键已用于其他请求")
+        if record.response_body is None:
+            raise ConflictError("相同幂等键的请求正在处理中")
+        return None, json.loads(record.response_body)
+
+    @staticmethod
+    def save(db: Session, record_id: int, response: BaseModel) -> None:
+        """
+        以紧凑 JSON 保存响应
+
+        Args:
+            db: 数据库会话
+            record_id: 幂等键记录ID
+            response: 接口响应
+        """
+        body = json.dumps(response.model_dump(mode="json"), ensure_ascii=False, separators=(",", ":"))
+        save_idempotency_response(db, record_id, body)
+
+    @staticmethod
+    def release(db: Session, record_id: int) -> None:
+        """
+        释放未保存响应的幂等键（接口未执行写操作就返回了，如无权限）
+
+        Args:
+            db: 数据库会话
+            record_id: 幂等键记录ID
+        """
+        delete_idempotency_key(db, record_id)
@@ -0,0 +1,459 @@
+"""
+批量导入服务
+Bulk Import Service
+将 CSV / JSONL 文件中的宠物主人和宠物分块校验、分块写入数据库
+"""
+
+import codecs
+import csv
+import io
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from pydantic import ValidationError as PydanticValidationError
+from sqlalchemy import insert, or_
+from sqlalchemy.exc import IntegrityError
+from app.core.config import settings
+from app.core.database import SessionLocal, use_primary
+from app.core.exceptions import ValidationError
+from app.core.security import get_password_hash
+from app.crud import contact_keys, get_contact_key_owners
+from app.db.models import User, Pet
+from app.schemas import UserCreate, UserRole, PetCreate
+from app.service.unit_of_work import UnitOfWork
+
+logger = logging.getLogger(__name__)
+
+# 报告中最多保留的错误行数，避免超大文件的报告本身过大
+MAX_REPORTED_ERRORS = 1000
+
+# 编码预检每次读取的字节数
+_ENCODING_CHECK_BLOCK = 1 << 20
+
+# 进度回调：(已处理行数, 已导入行数, 失败行数)
+ProgressCallback = Callable[[int, int, int], None]
+
+# 密码哈希进程池，首次导入时创建
+_hash_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_hash_pool() -> ProcessPoolExecutor:
+    """
+    获取（必要时创建）密码哈希进程池
+
+    子进程以 spawn 方式启动：服务进程中有线程池、事件循环和数据库连接，
+    fork 会把其他线程持有的锁和已打开的连接一起复制到子进程中
+    """
+    global _hash_pool
+    if _hash_pool is None:
+        _hash_pool = ProcessPoolExecutor(
+            max_workers=settings.IMPORT_HASH_WORKERS or os.cpu_count(),
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _hash_pool
+
+
+def shutdown_hash_pool():
+    """关闭密码哈希进程池（应用关闭时调用）"""
+    global _hash_pool
+    if _hash_pool is not None:
+        _hash_pool.shutdown(wait=False, cancel_futures=True)
+        _hash_pool = None
+
+
+def check_encoding(stream) -> None:
+    """
+    导入前检查整个文件是否为 UTF-8 编码，检查后回到文件开头
+    避免处理到中途才发现编码错误，前面的块已经写入
+
+    Args:
+        stream: 可定位的二进制文件流
+
+    Raises:
+        ValidationError: 文件不是 UTF-8 编码时抛出
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        while True:
+            block = stream.read(_ENCODING_CHECK_BLOCK)
+            decoder.decode(block, final=not block)
+            if not block:
+                break
+    except UnicodeDecodeError:
+        raise ValidationError("文件不是 UTF-8 编码，请另存为 UTF-8 后重新上传")
+    finally:
+        stream.seek(0)
+
+
+def read_rows(stream, fmt: str) -> Iterator[Tuple[int, dict]]:
+    """
+    逐行读取上传文件
+
+    Args:
+        stream: 二进制文件流
+        fmt: 文件格式，csv / jsonl
+
+    Yields:
+        Tuple[int, dict]: (行号, 行数据)，CSV 行号从表头之后的 2 开始，空字符串视为未填写
+
+    Raises:
+        ValidationError: 文件不是 UTF-8 编码时抛出
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        if fmt == "csv":
+            for line_no, row in enumerate(csv.DictReader(text), start=2):
+                yield line_no, {k.strip(): (v.strip() or None) for k, v in row.items() if k and v is not None}
+        else:
+            for line_no, line in enumerate(text, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    row = None
+                # 非对象行标记出来，由调用方报告为失败行
+                yield line_no, row if isinstance(row, dict) else {"__invalid__": line.strip()}
+    except UnicodeDecodeError:
+        raise ValidationError("文件不是 UTF-8 编码，请另存为 UTF-8 后重新上传")
+    finally:
+        # 不关闭底层的上传文件
+        text.detach()
+
+
+def _chunks(rows: Iterable, size: int) -> Iterator[list]:
+    """按固定大小切分行迭代器"""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _format_validation_error(e: PydanticValidationError) -> str:
+    """将 Pydantic 校验错误压缩成一行说明"""
+    return "; ".join(
+        f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e.errors()
+    )
+
+
+class ImportReport:
+    """
+    导入结果报告
+    汇总总行数、成功数、失败数以及每个失败行的错误原因
+    """
+
+    def __init__(self, entity: str):
+        self.entity = entity
+        self.total = 0
+        self.imported = 0
+        self.failed = 0
+        self.chunks = 0
+        self.errors: List[Dict] = []
+
+    def add_error(self, line_no: int, msg: str):
+        """记录一行失败"""
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": line_no, "msg": msg})
+
+    def to_dict(self) -> dict:
+        """转换为响应字典"""
+        return {
+            "entity": self.entity,
+            "total": self.total,
+            "imported": self.imported,
+            "failed": self.failed,
+            "chunks": self.chunks,
+            "errors": sorted(self.errors, key=lambda e: e["row"]),
+        }
+
+
+class ImportService:
+    """批量导入服务类，处理宠物主人和宠物的大批量导入"""
+
+    @staticmethod
+    def _insert_chunk(model, rows: List[Tuple[int, dict]], report: ImportReport):
+        """
+        在一个独立事务中批量插入一块数据
+        整块插入失败（如并发写入导致唯一键冲突）时退化为逐行插入，定位具体失败行
+
+        Args:
+            model: 模型类
+            rows: (行号, 插入数据) 列表
+            report: 导入报告
+        """
+        if not rows:
+            return
+
+        db = SessionLocal()
+        try:
+            try:
+                with UnitOfWork(db):
+                    # 多行参数会被编译为 executemany / 多值 INSERT ... VALUES
+                    db.execute(insert(model), [values for _, values in rows])
+                report.imported += len(rows)
+                return
+            except IntegrityError:
+                logger.warning("批量插入 %s 失败，改为逐行插入定位冲突行", model.__tablename__)
+
+            for line_no, values in rows:
+                try:
+                    with UnitOfWork(db):
+                        db.execute(insert(model), [values])
+                    report.imported += 1
+                except IntegrityError as e:
+                    report.add_error(line_no, f"数据库约束冲突：{e.orig}")
+        finally:
+            db.close()
+
+    @staticmethod
+    def import_owners(
+        stream,
+        fmt: str,
+        chunk_size: Optional[int] = None,
+        on_progress: Optional[ProgressCallback] = None
+    ) -> dict:
+        """
+        批量导入宠物主人
+
+        每块数据先用 UserCreate 校验，再在进程池中并行计算密码哈希，
+        最后在独立事务中一次性插入
+
+        Args:
+            stream: 上传文件的二进制流
+            fmt: 文件格式，csv / jsonl
+            chunk_size: 每块行数，默认使用配置 IMPORT_CHUNK_SIZE
+            on_progress: 每块处理完成后的进度回调
+
+        Returns:
+            dict: 导入报告
+        """
+        report = ImportReport("owners")
+        seen_usernames = set()
+        seen_phone_keys = set()
+        seen_email_keys = set()
+
+        for chunk in _chunks(read_rows(stream, fmt), chunk_size or settings.IMPORT_CHUNK_SIZE):
+            report.total += len(chunk)
+            report.chunks += 1
+
+            # 1. 逐行校验
+            valid: List[Tuple[int, UserCreate, dict]] = []
+            for line_no, row in chunk:
+                if "__invalid__" in row:
+                    report.add_error(line_no, "不是合法的 JSON 对象")
+                    continue
+                try:
+                    user = UserCreate(**{**row, "role": UserRole.owner})
+                except (PydanticValidationError, TypeError) as e:
+                    msg = _format_validation_error(e) if isinstance(e, PydanticValidationError) else str(e)
+                    report.add_error(line_no, msg)
+                    continue
+                if user.username in seen_usernames:
+                    report.add_error(line_no, f"文件中用户名重复：{user.username}")
+                    continue
+                keys = contact_keys({"phone": user.phone, "email": user.email})
+                if keys["phone_key"] and keys["phone_key"] in seen_phone_keys:
+                    report.add_error(line_no, f"文件中手机号重复：{user.phone}")
+                    continue
+                if keys["email_key"] and keys["email_key"] in seen_email_keys:
+                    report.add_error(line_no, f"文件中邮箱重复：{user.email}")
+                    continue
+                seen_usernames.add(user.username)
+                seen_phone_keys.add(keys["phone_key"])
+                seen_email_keys.add(keys["email_key"])
+                valid.append((line_no, user, keys))
+
+            # 2. 一次查询过滤掉已存在的用户名，一次查询过滤掉已被使用的手机号、邮箱
+            if valid:
+                # 刚导入的数据可能尚未同步到副本，校验查询走主库
+                db = use_primary(SessionLocal())
+                try:
+                    existing = {
+                        username for (username,) in db.query(User.username).filter(
+                            User.username.in_([user.username for _, user, _ in valid])
+                        )
+                    }
+                    used = get_contact_key_owners(
+                        db,
+                        [keys["phone_key"] for _, _, keys in valid if keys["phone_key"]],
+                        [keys["email_key"] for _, _, keys in valid if keys["email_key"]]
+                    )
+                finally:
+                    db.close()
+                used_phone_keys = {phone_key for _, phone_key, _ in used if phone_key}
+                used_email_keys = {email_key for _, _, email_key in used if email_key}
+                remaining = []
+                for line_no, user, keys in valid:
+                    if user.username in existing:
+                        report.add_error(line_no, f"用户名已存在：{user.username}")
+                    elif keys["phone_key"] in used_phone_keys:
+                        report.add_error(line_no, f"手机号已被其他账号使用：{user.phone}")
+                    elif keys["email_key"] in used_email_keys:
+                        report.add_error(line_no, f"邮箱已被其他账号使用：{user.email}")
+                    else:
+                        remaining.append((line_no, user, keys))
+                valid = remaining
+
+            # 3. 进程池并行计算 bcrypt 哈希
+            passwords = [user.password for _, user, _ in valid]
+            hashes = list(_get_hash_pool().map(
+                get_password_hash, passwords, chunksize=max(1, len(passwords) // (os.cpu_count() or 1))
+            )) if passwords else []
+
+            # 4. 批量插入
+            rows = [
+                (line_no, {
+                    "username": user.username,
+                    "password": hashed,
+                    "email": user.email,
+                    "phone": user.phone,
+                    "real_name": user.real_name,
+                    "role": UserRole.owner.value,
+                    **keys,
+                })
+                for (line_no, user, keys), hashed in zip(valid, hashes)
+            ]
+            ImportService._insert_chunk(User, rows, report)
+
+            logger.info(
+                "导入宠物主人：已处理 %d 行，成功 %d 行，失败 %d 行",
+                report.total, report.imported, report.failed
+            )
+            if on_progress:
+                on_progress(report.total, report.imported, report.failed)
+
+        return report.to_dict()
+
+    @staticmethod
+    def import_pets(
+        stream,
+        fmt: str,
+        chunk_size: Optional[int] = None,
+        on_progress: Optional[ProgressCallback] = None
+    ) -> dict:
+        """
+        批量导入宠物
+
+        每行通过 owner_username 或 owner_id 指定主人，每块只用一次查询解析主人，
+        其余字段按 PetCreate 校验
+
+        Args:
+            stream: 上传文件的二进制流
+            fmt: 文件格式，csv / jsonl
+            chunk_size: 每块行数，默认使用配置 IMPORT_CHUNK_SIZE
+            on_progress: 每块处理完成后的进度回调
+
+        Returns:
+            dict: 导入报告
+        """
+        report = ImportReport("pets")
+
+        for chunk in _chunks(read_rows(stream, fmt), chunk_size or settings.IMPORT_CHUNK_SIZE):
+            report.total += len(chunk)
+            report.chunks += 1
+
+            # 1. 逐行校验
+            valid: List[Tuple[int, PetCreate, Optional[str], Optional[int]]] = []
+            for line_no, row in chunk:
+                if "__invalid__" in row:
+                    report.add_error(line_no, "不是合法的 JSON 对象")
+                    continue
+                owner_username = row.pop("owner_username", None)
+                owner_id = row.pop("owner_id", None)
+                if not owner_username and not owner_id:
+                    report.add_error(line_no, "缺少 owner_username 或 owner_id")
+                    continue
+                try:
+                    pet = PetCreate(**row)
+                    owner_id = int(owner_id) if owner_id is not None else None
+                except (PydanticValidationError, TypeError, ValueError) as e:
+                    msg = _format_validation_error(e) if isinstance(e, PydanticValidationError) else str(e)
+                    report.add_error(line_no, msg)
+                    continue
+                valid.append((line_no, pet, owner_username, owner_id))
+
+            # 2. 一次查询解析本块涉及的所有主人
+            owners_by_name, owner_ids = {}, set()
+            if valid:
+                usernames = {name for _, _, name, _ in valid if name}
+                ids = {oid for _, _, _, oid in valid if oid}
+                # 刚导入的数据可能尚未同步到副本，校验查询走主库
+                db = use_primary(SessionLocal())
+                try:
+                    conditions = []
+                    if usernames:
+                        conditions.append(User.username.in_(usernames))
+                    if ids:
+                        conditions.append(User.id.in_(ids))
+                    for uid, username in db.query(User.id, User.username).filter(
+                        User.is_deleted == False, or_(*conditions)
+                    ):
+                        owners_by_name[username] = uid
+                        owner_ids.add(uid)
+                finally:
+                    db.close()
+
+            # 3. 批量插入
+            rows = []
+            for line_no, pet, owner_username, owner_id in valid:
+                resolved = owners_by_name.get(owner_username) if owner_username else owner_id
+                if resolved is None or resolved not in owner_ids:
+                    report.add_error(line_no, f"主人不存在：{owner_username or owner_id}")
+                    continue
+                rows.append((line_no, {
+                    "owner_id": resolved,
+                    "name": pet.name,
+                    "species": pet.species,
+                    "breed": pet.breed,
+                    "gender": pet.gender,
+                    "birth_date": pet.birth_date.date() if pet.birth_date else None,
+                    "weight": pet.weight,
+                    "color": pet.color,
+                    "health_status": pet.health_status,
+                    "special_notes": pet.special_notes,
+                }))
+            ImportService._insert_chunk(Pet, rows, report)
+
+            logger.info(
+                "导入宠物：已处理 %d 行，成功 %d 行，失败 %d 行",
+                report.total, report.imported, report.failed
+            )
+            if on_progress:
+                on_progress(report.total, report.imported, report.failed)
+
+        return report.to_dict()
+
+    @staticmethod
+    def run(entity: str, stream, fmt: str, on_progress: Optional[ProgressCallback] = None) -> dict:
+        """
+        按实体类型执行导入
+
+        Args:
+            entity: 导入实体，owners / pets
+            stream: 上传文件的二进制流
+            fmt: 文件格式，csv / jsonl
+            on_progress: 进度回调
+
+        Returns:
+            dict: 导入报告
+
+        Raises:
+            ValidationError: 实体或格式不支持、文件不是 UTF-8 编码时抛出
+        """
+        if fmt not in ("csv", "jsonl"):
+            raise ValidationError(f"不支持的文件格式：{fmt}")
+        if stream.seekable():
+            check_encoding(stream)
+        if entity == "owners":
+            return ImportService.import_owners(stream, fmt, on_progress=on_progress)
+        if entity == "pets":
+            return ImportService.import_pets(stream, fmt, on_progress=on_progress)
+        raise ValidationError(f"不支持的导入类型：{entity}")
@@ -0,0 +1,545 @@
+"""
+后台任务
+报表、清理、通知等不应阻塞请求的工作以任务的形式写入持久化队列（jobs 表），
+由独立的工作进程（python -m app.worker run）按优先级领取执行，失败后按指数退避重试。
+
+任务队列默认与业务数据在同一个库中，此时在请求内入队与业务写操作同一事务提交；
+配置 JOBS_DATABASE_URL 后队列使用独立的库（如本地 SQLite 文件），入队立即提交。
+"""
+
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal, JobsSessionLocal, engine, jobs_engine, replica_engines
+from app.core.exceptions import ValidationError
+from app.crud import (
+    create_jobs, claim_jobs, release_jobs, complete_job, fail_job, requeue_stale_jobs, has_pending_job, delete_jobs,
+    delete_expired_idempotency_keys, delete_dispatched_outbox_events
+)
+from app.db.models import Job
+from app.service.assignment import AssignmentService
+from app.service.unit_of_work import UnitOfWork
+
+logger = logging.getLogger(__name__)
+
+# 执行池中保留的任务数（执行中 + 等待执行）相对并发数的倍数
+PREFETCH_FACTOR = 2
+
+
+# ==================== 任务注册 ====================
+
+# 任务函数：在业务库的独立工作单元中执行，返回值（可 JSON 序列化）保存为执行结果
+TaskFunc = Callable[[Session, dict], Optional[dict]]
+
+
+@dataclass
+class JobTask:
+    """
+    已注册的任务
+
+    Attributes:
+        name: 任务名称
+        func: 任务函数
+        max_attempts: 最多执行次数（含首次）
+        concurrency: 每个工作进程内同时执行的上限，为None时不单独限制
+    """
+    name: str
+    func: TaskFunc
+    max_attempts: int
+    concurrency: Optional[int] = None
+
+
+# 任务名称 -> 任务
+job_registry: Dict[str, JobTask] = {}
+
+
+def job_task(name: str, max_attempts: Optional[int] = None, concurrency: Optional[int] = None):
+    """
+    注册任务的装饰器
+
+    任务可能被重试，也可能在工作进程崩溃后被重新执行，应当是幂等的。
+    进程池模式下任务在子进程中按名称查找，需定义在工作进程启动时已导入的模块中。
+
+    使用示例:
+    ```python
+    @job_task("send_reminder", max_attempts=5, concurrency=2)
+    def send_reminder(db: Session, payload: dict):
+        ...
+
+    JobService.enqueue(db, "send_reminder", {"order_id": 1})
+    ```
+
+    Args:
+        name: 任务名称
+        max_attempts: 最多执行次数，默认取配置
+        concurrency: 每个工作进程内的并发上限
+    """
+    def decorator(func: TaskFunc) -> TaskFunc:
+        job_registry[name] = JobTask(name, func, max_attempts or settings.JOBS_MAX_ATTEMPTS, concurrency)
+        return func
+    return decorator
+
+
+def execute_job(name: str, payload: dict, session_factory=None):
+    """
+    在独立的会话和工作单元中执行任务
+
+    Args:
+        name: 任务名称
+        payload: 任务参数
+        session_factory: 业务库会话工厂，默认使用 SessionLocal
+
+    Raises:
+        LookupError: 任务未注册
+
+    Returns:
+        任务函数的返回值
+    """
+    task = job_registry.get(name)
+    if task is None:
+        raise LookupError(f"未注册的任务：{name}")
+    db = (session_factory or SessionLocal)()
+    try:
+        with UnitOfWork(db):
+            return task.func(db, payload)
+    finally:
+        db.close()
+
+
+def _init_process() -> None:
+    """进程池子进程初始化：丢弃从父进程继承的连接，各进程使用自己的连接"""
+    for inherited in {engine, jobs_engine, *replica_engines}:
+        inherited.dispose(close=False)
+
+
+# ==================== 任务业务逻辑 ====================
+
+class JobService:
+    """后台任务业务逻辑类"""
+
+    @staticmethod
+    def shares_database() -> bool:
+        """任务队列是否与业务数据在同一个库中"""
+        return jobs_engine is engine
+
+    @staticmethod
+    def enqueue(
+        db: Session,
+        name: str,
+        payload: Optional[dict] = None,
+        priority: int = 0,
+        queue: str = "default",
+        delay_seconds: float = 0,
+        max_attempts: Optional[int] = None
+    ) -> int:
+        """
+        任务入队
+
+        队列与业务数据同库时写入当前会话，随当前事务提交（业务回滚则任务不会入队）；
+        否则在队列库中立即提交。
+
+        Args:
+            db: 数据库会话
+            name: 任务名称
+            payload: 任务参数
+            priority: 优先级，数值越大越先执行
+            queue: 队列名称
+            delay_seconds: 延迟执行的秒数
+            max_attempts: 最多执行次数，默认取任务注册时的设置
+
+        Raises:
+            ValidationError: 任务未注册
+
+        Returns:
+            int: 任务ID
+        """
+        return JobService.enqueue_many(
+            db, name, [payload or {}], priority, queue, delay_seconds, max_attempts
+        )[0]
+
+    @staticmethod
+    def enqueue_many(
+        db: Session,
+        name: str,
+        payloads: List[dict],
+        priority: int = 0,
+        queue: str = "default",
+        delay_seconds: float = 0,
+        max_attempts: Optional[int] = None
+    ) -> List[int]:
+        """
+        同一任务批量入队，参数与 enqueue 相同
+
+        Returns:
+            List[int]: 任务ID列表
+        """
+        rows = JobService._job_rows(name, payloads, priority, queue, delay_seconds, max_attempts)
+        return JobService._in_jobs_database(db, create_jobs, rows)
+
+    @staticmethod
+    def enqueue_once(db: Session, name: str, payload: Optional[dict] = None, priority: int = 0) -> Optional[int]:
+        """
+        队列中没有同名的待执行或执行中任务时入队，用于定期触发的清理任务
+
+        多个进程同时检查时仍可能各入队一次，定期任务应当是幂等的。
+
+        Args:
+            db: 数据库会话
+            name: 任务名称
+            payload: 任务参数
+            priority: 优先级
+
+        Returns:
+            Optional[int]: 任务ID，已有同名任务时为None
+        """
+        rows = JobService._job_rows(name, [payload or {}], priority, "default", 0, None)
+
+        def _enqueue(jobs_db: Session) -> Optional[int]:
+            if has_pending_job(jobs_db, name):
+                return None
+            return create_jobs(jobs_db, rows)[0]
+        return JobService._in_jobs_database(db, _enqueue)
+
+    @staticmethod
+    def delete_queue(db: Session, queue: str) -> int:
+        """
+        删除指定队列中的全部任务（如吞吐量测试使用的临时队列）
+
+        Args:
+            db: 数据库会话，队列使用独立的库时只用于判断，删除在队列库中执行并立即提交
+            queue: 队列名称
+
+        Returns:
+            int: 删除的任务数
+        """
+        return JobService._in_jobs_database(db, delete_jobs, queue)
+
+    @staticmethod
+    def _job_rows(
+        name: str,
+        payloads: List[dict],
+        priority: int,
+        queue: str,
+        delay_seconds: float,
+        max_attempts: Optional[int]
+    ) -> List[dict]:
+        """
+        构造任务行，参数与 enqueue_many 相同
+
+        Raises:
+            ValidationError: 任务未注册
+        """
+        task = job_registry.get(name)
+        if task is None:
+            raise ValidationError(f"未注册的任务：{name}")
+        run_at = datetime.utcnow() + timedelta(seconds=delay_seconds)
+        return [
+            {
+                "name": name,
+                "payload": json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=str),
+                "priority": priority,
+                "queue": queue,
+                "run_at": run_at,
+                "max_attempts": max_attempts or task.max_attempts,
+            }
+            for payload in payloads
+        ]
+
+    @staticmethod
+    def _in_jobs_database(db: Session, func, *args):
+        """队列与业务数据同库时在当前会话中执行，否则在队列库的独立工作单元中执行并立即提交"""
+        if JobService.shares_database():
+            return func(db, *args)
+
+        jobs_db = JobsSessionLocal()
+        try:
+            with UnitOfWork(jobs_db):
+                return func(jobs_db, *args)
+        finally:
+            jobs_db.close()
+
+    @staticmethod
+    def retry_at(attempts: int, now: Optional[datetime] = None) -> datetime:
+        """
+        计算第 attempts 次失败后的重试时间（指数退避）
+
+        Args:
+            attempts: 已执行次数
+            now: 当前时间
+
+        Returns:
+            datetime: 重试时间
+        """
+        delay = settings.JOBS_RETRY_BACKOFF_SECONDS * (2 ** max(attempts - 1, 0))
+        return (now or datetime.utcnow()) + timedelta(seconds=delay)
+
+    @staticmethod
+    def record_result(db: Session, job: Job, error: Optional[BaseException], result=None) -> bool:
+        """
+        记录一次执行的结果
+
+        Args:
+            db: 数据库会话（任务队列所在的库）
+            job: 已领取的任务
+            error: 执行抛出的异常，成功时为None
+            result: 执行结果
+
+        Returns:
+            bool: 是否执行成功
+        """
+        if error is None:
+            recorded = complete_job(db, job.id, job.locked_by, None if result is None else json.dumps(
+                result, ensure_ascii=False, separators=(",", ":"), default=str
+            ))
+        else:
+            message = f"{type(error).__name__}: {error}"
+            # 未注册的任务重试也不会成功
+            retryable = job.attempts < job.max_attempts and not isinstance(error, LookupError)
+            recorded = fail_job(db, job.id, job.locked_by, message,
+                                JobService.retry_at(job.attempts) if retryable else None)
+            logger.warning("任务 %s#%s 第 %s 次执行失败：%s", job.name, job.id, job.attempts, message)
+        if not recorded:
+            # 执行超过 JOBS_LOCK_TIMEOUT_SECONDS 已被回收，结果以重新领取后的执行为准
+            logger.warning("任务 %s#%s 已超时被回收，忽略本次执行结果", job.name, job.id)
+        return error is None
+
+
+# ==================== 工作进程 ====================
+
+class WorkerPool:
+    """
+    任务工作池
+
+    单个调度线程负责领取任务、提交到线程池或进程池、记录结果；
+    只领取空闲槽位数量的任务，并遵守每个任务注册时的并发上限。
+
+    使用示例:
+    ```python
+    pool = WorkerPool(concurrency=8, mode="process")
+    pool.run()            # 阻塞运行，另一线程或信号处理中调用 pool.stop() 退出
+    print(pool.stats())   # 吞吐量（任务/秒）
+    ```
+    """
+
+    def __init__(
+        self,
+        concurrency: Optional[int] = None,
+        mode: Optional[str] = None,
+        queues: Optional[List[str]] = None,
+        poll_interval: Optional[float] = None,
+        jobs_session_factory=None,
+        session_factory=None
+    ):
+        """
+        初始化工作池
+
+        Args:
+            concurrency: 同时执行的任务数，默认取配置
+            mode: thread 或 process，默认取配置
+            queues: 处理的队列名称，默认只处理 default
+            poll_interval: 队列为空时的轮询间隔（秒），默认取配置
+            jobs_session_factory: 任务队列会话工厂，默认使用 JobsSessionLocal
+            session_factory: 执行任务的业务库会话工厂，默认使用 SessionLocal（进程池模式下固定为默认值）
+        """
+        self.concurrency = concurrency or settings.JOBS_CONCURRENCY
+        self.mode = mode or settings.JOBS_MODE
+        if self.mode not in ("thread", "process"):
+            raise ValueError(f"不支持的执行方式：{self.mode}")
+        self.queues = queues or ["default"]
+        self.poll_interval = poll_interval if poll_interval is not None else settings.JOBS_POLL_INTERVAL_SECONDS
+        self.jobs_session_factory = jobs_session_factory or JobsSessionLocal
+        self.session_factory = session_factory
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._stopping = False
+        self._counts = {"succeeded": 0, "failed": 0}
+        self._started_at: Optional[float] = None
+        self._elapsed = 0.0
+
+    def _create_executor(self) -> Executor:
+        """创建执行任务的线程池或进程池"""
+        if self.mode == "process":
+            return ProcessPoolExecutor(max_workers=self.concurrency, initializer=_init_process)
+        return ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="job-worker")
+
+    def _submit(self, executor: Executor, job: Job) -> Future:
+        """提交一个任务到执行池"""
+        payload = json.loads(job.payload) if job.payload else {}
+        if self.mode == "process":
+            return executor.submit(execute_job, job.name, payload)
+        return executor.submit(execute_job, job.name, payload, self.session_factory)
+
+    def _limits(self, running: Dict[Future, Job]) -> Tuple[Dict[str, int], List[str]]:
+        """统计各任务执行中的数量，以及已达到并发上限的任务名称"""
+        in_flight: Dict[str, int] = {}
+        for job in running.values():
+            in_flight[job.name] = in_flight.get(job.name, 0) + 1
+        saturated = [
+            name for name, count in in_flight.items()
+            if name in job_registry and job_registry[name].concurrency is not None
+            and count >= job_registry[name].concurrency
+        ]
+        return in_flight, saturated
+
+    def _exchange(self, done: Dict[Future, Job], running: Dict[Future, Job]) -> List[Job]:
+        """
+        在一个事务中记录已完成任务的结果并领取新任务
+
+        执行池中最多保留 2 倍并发数的任务（执行中 + 等待执行），
+        执行池空出槽位时不必等待下一次领取，领取与记录也合并为一次提交。
+
+        Args:
+            done: 已完成的任务
+            running: 仍在执行池中的任务
+
+        Returns:
+            List[Job]: 新领取的任务
+        """
+        capacity = 0 if self._stopping else self.concurrency * PREFETCH_FACTOR - len(running)
+        if not done and capacity <= 0:
+            return []
+        in_flight, saturated = self._limits(running)
+
+        db = self.jobs_session_factory()
+        try:
+            with UnitOfWork(db):
+                for future, job in done.items():
+                    error = future.exception()
+                    ok = JobService.record_result(db, job, error, None if error else future.result())
+                    self._counts["succeeded" if ok else "failed"] += 1
+                if capacity <= 0:
+                    return []
+
+                token = f"{self.worker_id}:{uuid.uuid4().hex[:12]}"
+                jobs = claim_jobs(db, token, self.queues, capacity, saturated)
+                db.expunge_all()
+
+                # 同一批中同一任务可能超过并发上限，超出的放回队列
+                accepted, overflow = [], []
+                for job in jobs:
+                    limit = job_registry[job.name].concurrency if job.name in job_registry else None
+                    if limit is not None and in_flight.get(job.name, 0) >= limit:
+                        overflow.append(job.id)
+                        continue
+                    in_flight[job.name] = in_flight.get(job.name, 0) + 1
+                    accepted.append(job)
+                if overflow:
+                    release_jobs(db, overflow)
+                return accepted
+        finally:
+            db.close()
+
+    def _requeue_stale(self) -> None:
+        """回收崩溃的工作进程遗留的任务"""
+        db = self.jobs_session_factory()
+        try:
+            with UnitOfWork(db):
+                before = datetime.utcnow() - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT_SECONDS)
+                count = requeue_stale_jobs(db, before)
+            if count:
+                logger.warning("回收了 %s 个超时未完成的任务", count)
+        finally:
+            db.close()
+
+    def run(self, drain: bool = False) -> dict:
+        """
+        阻塞运行，直到调用 stop()；drain=True 时队列中没有到期任务即退出
+
+        Args:
+            drain: 队列处理完后是否退出（基准测试、一次性执行）
+
+        Returns:
+            dict: 运行统计，见 stats()
+        """
+        self._stopping = False
+        self._started_at = time.perf_counter()
+        last_requeue = 0.0
+        running: Dict[Future, Job] = {}
+        executor = self._create_executor()
+        try:
+            while True:
+                now = time.perf_counter()
+                if now - last_requeue >= settings.JOBS_LOCK_TIMEOUT_SECONDS / 2:
+                    self._requeue_stale()
+                    last_requeue = now
+
+                finished = []
+                if running:
+                    # 执行池已满时等待任务完成，否则只收取已完成的任务、尽快继续领取
+                    full = len(running) >= self.concurrency * PREFETCH_FACTOR
+                    finished, _ = wait(list(running), timeout=self.poll_interval if full else 0,
+                                       return_when=FIRST_COMPLETED)
+                claimed = self._exchange({future: running.pop(future) for future in finished}, running)
+                for job in claimed:
+                    running[self._submit(executor, job)] = job
+
+                if not running:
+                    if self._stopping or drain:
+                        break
+                    time.sleep(self.poll_interval)
+                elif not claimed and not finished:
+                    # 队列暂时为空：等待执行中的任务完成或下一次轮询
+                    wait(list(running), timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+        finally:
+            executor.shutdown(wait=True)
+            self._elapsed = time.perf_counter() - self._started_at
+            self._started_at = None
+        return self.stats()
+
+    def stop(self) -> None:
+        """停止领取新任务，等待执行中的任务完成后 run() 返回"""
+        self._stopping = True
+
+    def stats(self) -> dict:
+        """
+        运行统计
+
+        Returns:
+            dict: 成功数、失败数、耗时（秒）和吞吐量（任务/秒）
+        """
+        elapsed = time.perf_counter() - self._started_at if self._started_at is not None else self._elapsed
+        processed = self._counts["succeeded"] + self._counts["failed"]
+        return {
+            "mode": self.mode,
+            "concurrency": self.concurrency,
+            "processed": processed,
+            **self._counts,
+            "elapsed_seconds": round(elapsed, 3),
+            "jobs_per_second": round(processed / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+
+# ==================== 内置任务 ====================
+
+@job_task("purge_expired_idempotency_keys", concurrency=1)
+def purge_expired_idempotency_keys(db: Session, payload: dict) -> dict:
+    """清理过期的幂等键"""
+    return {"deleted": delete_expired_idempotency_keys(db)}
+
+
+@job_task("purge_dispatched_outbox_events", concurrency=1)
+def purge_dispatched_outbox_events(db: Session, payload: dict) -> dict:
+    """清理超过保留天数的已投递事件，payload 可用 days 覆盖保留天数"""
+    days = payload.get("days", settings.OUTBOX_RETENTION_DAYS)
+    return {"deleted": delete_dispatched_outbox_events(db, datetime.utcnow() - timedelta(days=days))}
+
+
+@job_task("assign_pending_orders", concurrency=1)
+def assign_pending_orders(db: Session, payload: dict) -> dict:
+    """为待确认且未指派的订单自动指派员工，payload 可用 limit 覆盖每批数量"""
+    requested, assigned = AssignmentService.assign_pending_orders(db, payload.get("limit"))
+    return {"requested": requested, "assigned": assigned}
+
+
+@job_task("noop", max_attempts=1)
+def noop(db: Session, payload: dict) -> None:
+    """空任务，用于测量队列本身的吞吐量"""
+    return None
@@ -0,0 +1,185 @@
+"""
+状态生命周期
+订单、寄养的状态流转以声明的流转表为准，每次流转都是一条条件 UPDATE：
+WHERE status IN (允许的来源状态)，校验与写入在一次往返中原子完成。
+流转成功后在同一事务中通知订阅者（计数器、汇总表等），订阅者抛出异常时整个工作单元回滚。
+"""
+
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.core.exceptions import ValidationError
+from app.crud import transition_status, ORDER_STATUS_TRANSITIONS, BOARDING_STATUS_TRANSITIONS
+from app.db.models import Order, Boarding
+
+
+@dataclass
+class TransitionEvent:
+    """
+    状态流转事件
+
+    Attributes:
+        entity: 实体名称，如 order、boarding
+        status: 流转后的状态
+        ids: 实际完成流转的记录ID
+    """
+    entity: str
+    status: str
+    ids: List[int]
+
+
+# 订阅者：在流转所在的事务中被调用
+TransitionHandler = Callable[[Session, TransitionEvent], None]
+
+
+class Lifecycle:
+    """
+    声明式状态机
+
+    使用示例:
+    ```python
+    @order_lifecycle.on("completed")
+    def add_revenue(db: Session, event: TransitionEvent):
+        ...  # 与状态变更同一事务
+
+    affected = order_lifecycle.transition(db, [1, 2, 3], "confirmed")
+    ```
+    """
+
+    def __init__(self, entity: str, model, transitions: Dict[str, List[str]]):
+        """
+        初始化状态机
+
+        Args:
+            entity: 实体名称
+            model: 模型类，需要包含 status、version、is_deleted 字段
+            transitions: 流转表（目标状态 -> 允许的来源状态列表）
+        """
+        self.entity = entity
+        self.model = model
+        self.transitions = transitions
+        self._handlers: List[Tuple[Optional[frozenset], TransitionHandler]] = []
+
+    def allowed_from(self, status: str) -> List[str]:
+        """
+        允许流转到目标状态的来源状态
+
+        Args:
+            status: 目标状态
+
+        Raises:
+            ValidationError: 目标状态不能通过流转到达（如初始状态或未知状态）
+
+        Returns:
+            List[str]: 来源状态列表
+        """
+        allowed = self.transitions.get(status)
+        if not allowed:
+            raise ValidationError(f"不允许流转到状态：{status}")
+        return allowed
+
+    def can_transition(self, from_status: str, to_status: str) -> bool:
+        """判断两个状态之间是否允许流转"""
+        return from_status in self.transitions.get(to_status, ())
+
+    def subscribe(self, handler: TransitionHandler, statuses: Optional[Iterable[str]] = None) -> TransitionHandler:
+        """
+        订阅状态流转事件
+
+        Args:
+            handler: 订阅者
+            statuses: 只关注的目标状态，为None时订阅全部
+
+        Returns:
+            TransitionHandler: 传入的订阅者本身
+        """
+        self._handlers.append((frozenset(statuses) if statuses else None, handler))
+        return handler
+
+    def on(self, *statuses: str):
+        """订阅装饰器，不传状态时订阅全部流转"""
+        def decorator(handler: TransitionHandler) -> TransitionHandler:
+            return self.subscribe(handler, statuses or None)
+        return decorator
+
+    def unsubscribe(self, handler: TransitionHandler) -> None:
+        """取消订阅"""
+        self._handlers = [(s, h) for s, h in self._handlers if h is not handler]
+
+    def has_subscribers(self, status: str) -> bool:
+        """目标状态是否有订阅者"""
+        return any(statuses is None or status in statuses for statuses, _ in self._handlers)
+
+    def emit(self, db: Session, status: str, ids: List[int]) -> None:
+        """
+        通知订阅者
+
+        Args:
+            db: 数据库会话
+            status: 流转后的状态
+            ids: 实际完成流转的记录ID
+        """
+        if not ids:
+            return
+        event = TransitionEvent(self.entity, status, list(ids))
+        for statuses, handler in list(self._handlers):
+            if statuses is None or status in statuses:
+                handler(db, event)
+
+    def transition(self, db: Session, ids: List[int], status: str) -> int:
+        """
+        批量状态流转，当前状态不允许流转的记录被跳过
+
+        没有订阅者时只执行一条 UPDATE；有订阅者时需要知道实际流转的记录ID，
+        由 transition_status 按数据库能力选择 RETURNING 或加锁查询。
+
+        Args:
+            db: 数据库会话
+            ids: 记录ID列表
+            status: 目标状态
+
+        Raises:
+            ValidationError: 目标状态不能通过流转到达
+
+        Returns:
+            int: 实际完成流转的记录数
+        """
+        allowed_from = self.allowed_from(status)
+        affected, matched = transition_status(
+            db, self.model, ids, status, allowed_from,
+            returning_ids=self.has_subscribers(status)
+        )
+        if matched:
+            self.emit(db, status, matched)
+        return affected
+
+    def transition_where(self, db: Session, status: str, *criteria) -> int:
+        """
+        按条件批量流转，用于定时流转（如开始时间已到的寄养全部转为进行中）
+
+        Args:
+            db: 数据库会话
+            status: 目标状态
+            criteria: 选取记录的过滤条件
+
+        Raises:
+            ValidationError: 目标状态不能通过流转到达
+
+        Returns:
+            int: 实际完成流转的记录数
+        """
+        affected, matched = transition_status(
+            db, self.model, None, status, self.allowed_from(status),
+            returning_ids=self.has_subscribers(status), criteria=criteria
+        )
+        if matched:
+            self.emit(db, status, matched)
+        return affected
+
+
+# ==================== 生命周期定义 ====================
+# 订单：pending → confirmed → in_progress → completed，pending / confirmed 可取消
+order_lifecycle = Lifecycle("order", Order, ORDER_STATUS_TRANSITIONS)
+
+# 寄养：scheduled → in_progress → completed，scheduled 可取消
+boarding_lifecycle = Lifecycle("boarding", Boarding, BOARDING_STATUS_TRANSITIONS)
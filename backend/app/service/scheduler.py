@@ -0,0 +1,312 @@
+"""
+定时状态流转
+寄养开始时间已到自动转为进行中、结束时间已到自动完成，订单预约时间已到自动转为进行中。
+
+调度器在内存中用最小堆保存近期（一个时间窗口内）的流转时间点，睡眠到最早的时间点后
+按规则执行一条条件 UPDATE（status IN 来源状态 AND 时间列 <= 当前时间），一次处理所有到期记录，
+不做周期性的全表扫描。时间点来自 (status, 时间列) 复合索引上的范围查询：启动时先补做停机期间
+到期的流转再加载窗口，之后每半个窗口重新加载一次；新建的订单、寄养通过领域事件即时加入堆中。
+条件 UPDATE 天然幂等，多个进程同时运行调度器也不会重复流转。
+
+调度器同时按 SCHEDULER_PURGE_INTERVAL_SECONDS 把清理任务放入后台任务队列，由工作进程执行；
+队列中已有同名任务时不再入队。
+"""
+
+import asyncio
+import heapq
+import logging
+import threading
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.crud import get_due_times
+from app.db.models import Boarding, Order
+from app.service.events import event_bus, BoardingCreated, OrderCreated, OrderUpdated
+from app.service.jobs import JobService
+from app.service.lifecycle import Lifecycle, order_lifecycle, boarding_lifecycle
+from app.service.unit_of_work import UnitOfWork
+
+logger = logging.getLogger(__name__)
+
+# 执行失败后重新加载的等待时间
+RETRY_DELAY = timedelta(seconds=5)
+
+# 定期放入后台任务队列的清理任务
+PURGE_JOBS: Tuple[str, ...] = ("purge_expired_idempotency_keys", "purge_dispatched_outbox_events")
+
+
+@dataclass(frozen=True)
+class TimedTransition:
+    """
+    定时流转规则
+
+    Attributes:
+        name: 规则名称
+        lifecycle: 所属状态机
+        column: 触发时间列
+        status: 目标状态
+        pending_statuses: 加载时间点时记录可能处于的状态（包括之后会先流转到来源状态的前置状态）
+    """
+    name: str
+    lifecycle: Lifecycle
+    column: object
+    status: str
+    pending_statuses: Tuple[str, ...]
+
+
+# 按执行顺序排列：同一时刻到期时先开始再结束，停机期间两个时间都已过去的寄养依次流转到完成
+TIMED_TRANSITIONS: List[TimedTransition] = [
+    TimedTransition("order_start", order_lifecycle, Order.appointment_time, "in_progress", ("pending", "confirmed")),
+    TimedTransition("boarding_start", boarding_lifecycle, Boarding.start_date, "in_progress", ("scheduled",)),
+    TimedTransition("boarding_end", boarding_lifecycle, Boarding.end_date, "completed", ("scheduled", "in_progress")),
+]
+
+
+class TransitionScheduler:
+    """
+    定时流转调度器
+
+    使用示例:
+    ```python
+    scheduler = TransitionScheduler()
+    scheduler.start()                 # 在事件循环中运行
+    scheduler.add("boarding_start", datetime(2025, 2, 10, 9))
+    ```
+    """
+
+    def __init__(
+        self,
+        transitions: Optional[List[TimedTransition]] = None,
+        window_seconds: Optional[float] = None,
+        purge_interval_seconds: Optional[float] = None,
+        session_factory=None,
+        clock: Callable[[], datetime] = datetime.now
+    ):
+        """
+        初始化调度器
+
+        Args:
+            transitions: 定时流转规则，默认 TIMED_TRANSITIONS
+            window_seconds: 预先加载多长时间内的时间点（秒），默认取配置
+            purge_interval_seconds: 清理任务的入队间隔（秒），默认取配置，0 表示不入队
+            session_factory: 会话工厂，默认使用 SessionLocal
+            clock: 当前时间（与业务时间列一致，使用本地时间）
+        """
+        self.transitions = transitions or TIMED_TRANSITIONS
+        self.window = timedelta(seconds=window_seconds or settings.SCHEDULER_WINDOW_SECONDS)
+        if purge_interval_seconds is None:
+            purge_interval_seconds = settings.SCHEDULER_PURGE_INTERVAL_SECONDS
+        self.purge_interval = timedelta(seconds=purge_interval_seconds) if purge_interval_seconds > 0 else None
+        self.session_factory = session_factory or SessionLocal
+        self.clock = clock
+        self._heap: List[Tuple[datetime, str]] = []
+        self._queued: Set[Tuple[datetime, str]] = set()
+        self._loaded_until: Optional[datetime] = None
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[Callable[[], None]] = None
+
+    # ==================== 时间点堆 ====================
+
+    def add(self, name: str, due_at: Optional[datetime]) -> None:
+        """
+        加入一个流转时间点，超出已加载窗口的留给下一次加载（线程安全）
+
+        Args:
+            name: 规则名称
+            due_at: 时间点
+        """
+        if due_at is None:
+            return
+        entry = (due_at, name)
+        with self._lock:
+            # 尚未加载（调度器未运行）或超出窗口：由下一次加载负责
+            if self._loaded_until is None or due_at > self._loaded_until:
+                return
+            if entry in self._queued:
+                return
+            self._queued.add(entry)
+            is_earliest = not self._heap or entry < self._heap[0]
+            heapq.heappush(self._heap, entry)
+        if is_earliest and self._wakeup is not None:
+            self._wakeup()
+
+    def pop_due(self, now: datetime) -> Set[str]:
+        """
+        取出所有已到期的时间点
+
+        Args:
+            now: 当前时间
+
+        Returns:
+            Set[str]: 需要执行的规则名称
+        """
+        names = set()
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                entry = heapq.heappop(self._heap)
+                self._queued.discard(entry)
+                names.add(entry[1])
+        return names
+
+    def next_due(self) -> Optional[datetime]:
+        """最早的时间点，堆为空时返回None"""
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+
+    def __len__(self) -> int:
+        """堆中的时间点数量"""
+        with self._lock:
+            return len(self._heap)
+
+    # ==================== 数据库操作 ====================
+
+    def fire(self, db: Session, names: Set[str], now: datetime) -> Dict[str, int]:
+        """
+        执行到期的规则：每条规则一条条件 UPDATE
+
+        Args:
+            db: 数据库会话
+            names: 规则名称
+            now: 当前时间
+
+        Returns:
+            Dict[str, int]: 规则名称 -> 流转的记录数
+        """
+        affected = {}
+        for rule in self.transitions:
+            if rule.name in names:
+                affected[rule.name] = rule.lifecycle.transition_where(db, rule.status, rule.column <= now)
+        return affected
+
+    def reload(self, db: Session, now: datetime) -> Dict[str, int]:
+        """
+        补做已到期的流转，并重新加载 (now, now + 窗口] 内的时间点
+
+        Args:
+            db: 数据库会话
+            now: 当前时间
+
+        Returns:
+            Dict[str, int]: 补做的流转记录数
+        """
+        affected = self.fire(db, {rule.name for rule in self.transitions}, now)
+        until = now + self.window
+        entries = [
+            (due_at, rule.name)
+            for rule in self.transitions
+            for due_at in get_due_times(db, rule.column, list(rule.pending_statuses), now, until)
+        ]
+        with self._lock:
+            self._heap = entries
+            heapq.heapify(self._heap)
+            self._queued = set(entries)
+            self._loaded_until = until
+        return affected
+
+    def enqueue_purges(self, db: Session, now: datetime) -> Dict[str, int]:
+        """
+        把清理任务放入后台任务队列，队列中已有同名任务的跳过
+
+        Args:
+            db: 数据库会话
+            now: 当前时间
+
+        Returns:
+            Dict[str, int]: 任务名称 -> 入队的任务数
+        """
+        return {name: int(JobService.enqueue_once(db, name) is not None) for name in PURGE_JOBS}
+
+    def _in_session(self, method, *args) -> Dict[str, int]:
+        """在独立的会话和工作单元中执行 fire / reload"""
+        db = self.session_factory()
+        try:
+            with UnitOfWork(db):
+                affected = method(db, *args)
+        finally:
+            db.close()
+        if any(affected.values()):
+            logger.info("定时状态流转：%s", affected)
+        return affected
+
+    # ==================== 后台运行 ====================
+
+    async def _run(self) -> None:
+        """调度循环：睡眠到最早的时间点或下一次加载"""
+        loop = asyncio.get_running_loop()
+        wake = asyncio.Event()
+        self._wakeup = lambda: loop.call_soon_threadsafe(wake.set)
+        next_reload = self.clock()
+        next_purge = self.clock() if self.purge_interval else None
+        while True:
+            now = self.clock()
+            try:
+                if next_purge is not None and now >= next_purge:
+                    next_purge = now + self.purge_interval
+                    await loop.run_in_executor(None, self._in_session, self.enqueue_purges, now)
+                if now >= next_reload:
+                    await loop.run_in_executor(None, self._in_session, self.reload, now)
+                    next_reload = now + self.window / 2
+                else:
+                    due = self.pop_due(now)
+                    if due:
+                        await loop.run_in_executor(None, self._in_session, self.fire, due, now)
+            except Exception:
+                logger.exception("定时状态流转失败")
+                # 稍后重新加载，加载时会补做本次未完成的流转
+                next_reload = now + RETRY_DELAY
+
+            wake_at = min(filter(None, [self.next_due(), next_reload, next_purge]))
+            timeout = max((wake_at - self.clock()).total_seconds(), 0)
+            try:
+                await asyncio.wait_for(wake.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            wake.clear()
+
+    def start(self) -> None:
+        """在当前事件循环中启动调度器"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """停止调度器"""
+        self._wakeup = None
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+# 全局调度器
+transition_scheduler = TransitionScheduler()
+
+
+# ==================== 新建记录即时加入 ====================
+
+@event_bus.on(OrderCreated)
+def _schedule_order(db: Session, event: OrderCreated):
+    """新订单的预约时间加入调度"""
+    if event.appointment_time:
+        transition_scheduler.add("order_start", datetime.fromisoformat(event.appointment_time))
+
+
+@event_bus.on(OrderUpdated)
+def _reschedule_order(db: Session, event: OrderUpdated):
+    """修改后的预约时间加入调度（原时间点到期时条件 UPDATE 不会命中该订单）"""
+    if event.changes.get("appointment_time"):
+        transition_scheduler.add("order_start", datetime.fromisoformat(event.changes["appointment_time"]))
+
+
+@event_bus.on(BoardingCreated)
+def _schedule_boarding(db: Session, event: BoardingCreated):
+    """新寄养的开始、结束时间加入调度"""
+    transition_scheduler.add("boarding_start", datetime.fromisoformat(event.start_date))
+    transition_scheduler.add("boarding_end", datetime.fromisoformat(event.end_date))
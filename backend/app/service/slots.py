@@ -0,0 +1,275 @@
+"""
+预约时段
+订单的预约按服务时长占用员工时间，同一员工的预约不能重叠。
+
+每次查询用一条走 (staff_id, appointment_time) 复合索引的范围查询取出搜索范围内的未结束预约，
+在内存中为每个员工构建按开始时间排序、已合并的忙碌区间（StaffCalendar），
+"某个时段是否空闲"和"某个时间之后最早的空闲时间"都用二分查找完成，不再逐条扫描订单。
+"""
+
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.exceptions import ConflictError, NotFoundError
+from app.crud import get_service, get_staff_ids, get_max_service_duration, get_staff_appointments
+
+
+class StaffCalendar:
+    """
+    单个员工的忙碌区间
+    区间为左闭右开 [开始, 结束)，构建时合并重叠和相接的区间，starts 与 ends 均严格递增。
+    """
+
+    def __init__(self, intervals: Iterable[Tuple[datetime, datetime]] = ()):
+        """
+        构建忙碌区间
+
+        Args:
+            intervals: (开始, 结束) 区间，顺序任意
+        """
+        self.starts: List[datetime] = []
+        self.ends: List[datetime] = []
+        for start, end in sorted(intervals):
+            if self.ends and start <= self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+    def is_free(self, start: datetime, end: datetime) -> bool:
+        """
+        [start, end) 是否与忙碌区间不重叠
+
+        第一个结束时间晚于 start 的区间是唯一可能重叠的区间，二分查找定位。
+        """
+        i = bisect_right(self.ends, start)
+        return i == len(self.starts) or self.starts[i] >= end
+
+    def next_free(self, start: datetime, duration: timedelta) -> datetime:
+        """
+        start 之后（含）最早能容纳 duration 的空闲时间
+
+        Args:
+            start: 最早开始时间
+            duration: 需要的时长
+
+        Returns:
+            datetime: 空闲时段的开始时间
+        """
+        i = bisect_right(self.ends, start)
+        while i < len(self.starts) and self.starts[i] < start + duration:
+            start = max(start, self.ends[i])
+            i += 1
+        return start
+
+    def add(self, start: datetime, end: datetime) -> None:
+        """
+        加入一个忙碌区间，与重叠或相接的区间合并
+
+        Args:
+            start: 开始时间
+            end: 结束时间
+        """
+        lo = bisect_left(self.ends, start)
+        hi = bisect_right(self.starts, end)
+        if lo < hi:
+            start = min(start, self.starts[lo])
+            end = max(end, self.ends[hi - 1])
+        self.starts[lo:hi] = [start]
+        self.ends[lo:hi] = [end]
+
+    def __len__(self) -> int:
+        """合并后的忙碌区间数"""
+        return len(self.starts)
+
+
+@dataclass
+class Slot:
+    """
+    可预约时段
+
+    Attributes:
+        start: 开始时间
+        end: 结束时间（开始时间 + 服务时长）
+        staff_ids: 该时段空闲的员工ID
+    """
+    start: datetime
+    end: datetime
+    staff_ids: List[int] = field(default_factory=list)
+
+
+class SlotService:
+    """预约时段服务类，查询空闲时段和校验员工时间冲突"""
+
+    @staticmethod
+    def service_duration(service) -> timedelta:
+        """服务占用员工的时长，未设置时使用默认时长"""
+        return timedelta(minutes=service.duration or settings.SLOT_DEFAULT_DURATION_MINUTES)
+
+    @staticmethod
+    def build_calendars(
+        db: Session,
+        staff_ids: List[int],
+        start: datetime,
+        end: datetime,
+        exclude_order_id: Optional[int] = None
+    ) -> Dict[int, StaffCalendar]:
+        """
+        构建员工在 [start, end) 范围内的忙碌区间
+
+        开始时间早于 start 的预约也可能延续到范围内，按服务的最长时长向前多取一段。
+
+        Args:
+            db: 数据库会话
+            staff_ids: 员工ID列表
+            start: 范围开始时间
+            end: 范围结束时间
+            exclude_order_id: 排除的订单ID（修改订单时排除自身）
+
+        Returns:
+            Dict[int, StaffCalendar]: 员工ID -> 忙碌区间
+        """
+        default_minutes = settings.SLOT_DEFAULT_DURATION_MINUTES
+        lookback = timedelta(minutes=max(get_max_service_duration(db) or 0, default_minutes))
+        intervals: Dict[int, List[Tuple[datetime, datetime]]] = {staff_id: [] for staff_id in staff_ids}
+        for staff_id, appointment_time, duration in get_staff_appointments(
+            db, staff_ids, start - lookback, end, exclude_order_id
+        ):
+            intervals[staff_id].append(
+                (appointment_time, appointment_time + timedelta(minutes=duration or default_minutes))
+            )
+        return {staff_id: StaffCalendar(items) for staff_id, items in intervals.items()}
+
+    @staticmethod
+    def candidate_starts(start: datetime, until: datetime, duration: timedelta) -> Iterator[datetime]:
+        """
+        按时段间隔列出营业时间内的候选开始时间（时段需在当天营业结束前完成）
+
+        Args:
+            start: 最早开始时间
+            until: 搜索结束时间
+            duration: 服务时长
+
+        Yields:
+            datetime: 候选开始时间
+        """
+        step = timedelta(minutes=settings.SLOT_STEP_MINUTES)
+        day = start.replace(hour=0, minute=0, second=0, microsecond=0)
+        while day < until:
+            opening = day.replace(hour=settings.SLOT_OPEN_HOUR)
+            closing = day.replace(hour=settings.SLOT_CLOSE_HOUR)
+            candidate = opening
+            if candidate < start:
+                # 向上取整到时段间隔
+                candidate += -((opening - start) // step) * step
+            while candidate + duration <= closing and candidate < until:
+                yield candidate
+                candidate += step
+            day += timedelta(days=1)
+
+    @staticmethod
+    def _get_service(db: Session, service_id: int):
+        """获取可预约的服务"""
+        service = get_service(db, service_id)
+        if not service or not service.is_available:
+            raise NotFoundError("服务不存在")
+        return service
+
+    @staticmethod
+    def find_slots(
+        db: Session,
+        service_id: int,
+        start: Optional[datetime] = None,
+        count: int = 10,
+        staff_id: Optional[int] = None
+    ) -> List[Slot]:
+        """
+        查找最近的 count 个可预约时段
+
+        Args:
+            db: 数据库会话
+            service_id: 服务ID
+            start: 最早开始时间，默认当前时间
+            count: 返回的时段数
+            staff_id: 只查该员工的空闲时段，为None时查全部员工
+
+        Raises:
+            NotFoundError: 服务或员工不存在时抛出
+
+        Returns:
+            List[Slot]: 按开始时间升序的可预约时段
+        """
+        duration = SlotService.service_duration(SlotService._get_service(db, service_id))
+        staff_ids = get_staff_ids(db, [staff_id] if staff_id is not None else None)
+        if staff_id is not None and not staff_ids:
+            raise NotFoundError("员工不存在")
+
+        start = start or datetime.now()
+        until = start + timedelta(days=settings.SLOT_SEARCH_DAYS)
+        calendars = SlotService.build_calendars(db, staff_ids, start, until)
+
+        slots = []
+        for candidate in SlotService.candidate_starts(start, until, duration):
+            end = candidate + duration
+            free = [sid for sid, calendar in calendars.items() if calendar.is_free(candidate, end)]
+            if free:
+                slots.append(Slot(candidate, end, free))
+                if len(slots) >= count:
+                    break
+        return slots
+
+    @staticmethod
+    def check_slot(
+        db: Session,
+        service_id: int,
+        start: datetime,
+        staff_id: Optional[int] = None
+    ) -> Slot:
+        """
+        查询某个时段哪些员工空闲（不限制营业时间和时段间隔）
+
+        Args:
+            db: 数据库会话
+            service_id: 服务ID
+            start: 开始时间
+            staff_id: 只查该员工，为None时查全部员工
+
+        Raises:
+            NotFoundError: 服务不存在时抛出
+
+        Returns:
+            Slot: 时段及其空闲员工，staff_ids 为空表示无人可接
+        """
+        end = start + SlotService.service_duration(SlotService._get_service(db, service_id))
+        staff_ids = get_staff_ids(db, [staff_id] if staff_id is not None else None)
+        calendars = SlotService.build_calendars(db, staff_ids, start, end)
+        return Slot(start, end, [sid for sid, calendar in calendars.items() if calendar.is_free(start, end)])
+
+    @staticmethod
+    def ensure_staff_free(
+        db: Session,
+        staff_id: int,
+        service,
+        start: datetime,
+        exclude_order_id: Optional[int] = None
+    ) -> None:
+        """
+        校验员工在预约时段内没有其他预约
+
+        Args:
+            db: 数据库会话
+            staff_id: 员工ID
+            service: 订单的服务
+            start: 预约时间
+            exclude_order_id: 排除的订单ID（修改订单时排除自身）
+
+        Raises:
+            ConflictError: 与员工的其他预约重叠时抛出
+        """
+        end = start + SlotService.service_duration(service)
+        calendar = SlotService.build_calendars(db, [staff_id], start, end, exclude_order_id)[staff_id]
+        if not calendar.is_free(start, end):
+            raise ConflictError("该员工在此时间段已有预约")
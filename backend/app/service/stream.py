@@ -0,0 +1,407 @@
+"""
+实时推送
+员工端的仪表盘和订单看板通过 Server-Sent Events 接收订单、寄养变更和统计数据增量，不再轮询。
+
+每个进程只有一个数据来源：推送中心在后台按ID顺序读取发件箱 outbox_events 中的新事件
+（一次查询，本进程提交事件后立即唤醒，其他进程的事件按轮询间隔读取），有影响统计的订单事件
+（创建、状态变化、删除）时重新统计一次仪表盘数据，再分发到每个连接的内存队列。打开一百个仪表盘与打开一个的数据库开销相同。
+
+发件箱事件ID的分配顺序与提交顺序可能不一致（并发事务），读取位置只推进到连续已读的ID，
+空缺超过等待时间后视为已回滚的事务跳过。
+"""
+
+import asyncio
+import contextvars
+import json
+import logging
+import time
+from dataclasses import dataclass
+from typing import AsyncIterator, List, Optional, Set
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.crud import get_latest_outbox_event_id, get_outbox_events_after
+from app.service import DashboardService
+from app.service.events import EventBus, event_bus
+
+logger = logging.getLogger(__name__)
+
+# 推送的聚合类型，同时作为 SSE 事件名
+STREAM_AGGREGATE_TYPES = ["order", "boarding"]
+
+# 影响仪表盘统计数据的事件类型（OrderUpdated 只修改员工、预约时间等，不影响统计）
+STATS_EVENT_TYPES = {"OrderCreated", "OrderStatusChanged", "OrderDeleted"}
+
+# 每次最多读取的发件箱事件数
+POLL_BATCH_SIZE = 500
+
+# ID 空缺的等待时间（秒），超过后视为事务已回滚
+GAP_TIMEOUT_SECONDS = 5.0
+
+# 客户端断线后的重连间隔（毫秒）
+RECONNECT_MS = 3000
+
+
+@dataclass
+class StreamMessage:
+    """
+    推送消息
+
+    Attributes:
+        event: SSE 事件名：order、boarding、stats
+        data: 消息内容
+        id: 发件箱事件ID，客户端重连时通过 Last-Event-ID 带回；统计消息没有ID
+    """
+    event: str
+    data: dict
+    id: Optional[int] = None
+
+    def encode(self) -> str:
+        """编码为 SSE 文本"""
+        lines = []
+        if self.id is not None:
+            lines.append(f"id: {self.id}")
+        lines.append(f"event: {self.event}")
+        lines.append(f"data: {json.dumps(self.data, ensure_ascii=False, separators=(',', ':'))}")
+        return "\n".join(lines) + "\n\n"
+
+
+class Subscription:
+    """
+    单个连接的消息队列
+    队列满（客户端读取太慢）时不再接收消息并关闭连接，不拖慢其他连接。
+    """
+
+    def __init__(self, maxsize: int):
+        """
+        初始化队列
+
+        Args:
+            maxsize: 最多积压的消息数
+        """
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+        self.closed = False
+
+    def put(self, message: StreamMessage) -> None:
+        """放入一条消息，队列已满时关闭"""
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.closed = True
+
+    def close(self) -> None:
+        """关闭连接，唤醒正在等待消息的读取方"""
+        self.closed = True
+        try:
+            self.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+    async def get(self, timeout: float) -> Optional[StreamMessage]:
+        """
+        等待下一条消息
+
+        Args:
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            Optional[StreamMessage]: 消息，超时或已关闭时返回None
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+def _stats_message(stats: dict, previous: Optional[dict]) -> StreamMessage:
+    """
+    构造统计消息：完整数据和相对上一次推送的增量
+
+    Args:
+        stats: 当前统计数据
+        previous: 上一次推送的统计数据，为None时增量为空
+
+    Returns:
+        StreamMessage: 统计消息
+    """
+    delta = {}
+    if previous is not None:
+        for key, value in stats.items():
+            change = value - previous.get(key, 0)
+            if change:
+                delta[key] = round(change, 2) if isinstance(change, float) else change
+    return StreamMessage("stats", {"stats": stats, "delta": delta})
+
+
+class EventStreamHub:
+    """
+    推送中心（每个进程一个）
+    第一个连接订阅时启动后台读取任务，最后一个连接断开后停止。
+
+    使用示例:
+    ```python
+    async def endpoint():
+        return StreamingResponse(event_stream_hub.stream(), media_type="text/event-stream")
+    ```
+    """
+
+    def __init__(
+        self,
+        bus: EventBus,
+        session_factory=None,
+        poll_interval: Optional[float] = None,
+        queue_size: Optional[int] = None,
+        heartbeat: Optional[float] = None,
+        stats_refresh: Optional[float] = None,
+        replay_limit: Optional[int] = None
+    ):
+        """
+        初始化推送中心
+
+        Args:
+            bus: 事件总线，本进程提交事件后通过它唤醒
+            session_factory: 会话工厂，默认使用 SessionLocal
+            poll_interval: 轮询间隔（秒），默认取配置
+            queue_size: 每个连接最多积压的消息数，默认取配置
+            heartbeat: 心跳间隔（秒），默认取配置
+            stats_refresh: 统计数据的定时刷新间隔（秒），默认取配置
+            replay_limit: 重连时最多补发的事件数，默认取配置
+        """
+        self.bus = bus
+        self.session_factory = session_factory or SessionLocal
+        self.poll_interval = poll_interval or settings.EVENT_STREAM_POLL_INTERVAL_SECONDS
+        self.queue_size = queue_size or settings.EVENT_STREAM_QUEUE_SIZE
+        self.heartbeat = heartbeat or settings.EVENT_STREAM_HEARTBEAT_SECONDS
+        self.stats_refresh = stats_refresh or settings.EVENT_STREAM_STATS_REFRESH_SECONDS
+        self.replay_limit = replay_limit or settings.EVENT_STREAM_REPLAY_LIMIT
+        self._subscribers: Set[Subscription] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        """清空读取位置和统计数据，下次启动时重新初始化"""
+        self._cursor: Optional[int] = None
+        self._seen: Set[int] = set()
+        self._gap_since: Optional[float] = None
+        self._stats: Optional[dict] = None
+        self._stats_at = 0.0
+
+    # ==================== 连接管理 ====================
+
+    def subscribe(self) -> Subscription:
+        """
+        新连接订阅，必要时启动后台读取任务（在事件循环中调用）
+
+        已有统计数据时立即放入一条完整的统计消息，否则由后台任务初始化后推送。
+
+        Returns:
+            Subscription: 连接的消息队列
+        """
+        subscription = Subscription(self.queue_size)
+        self._subscribers.add(subscription)
+        if self._stats is not None:
+            subscription.put(_stats_message(self._stats, None))
+        if self._task is None:
+            # 在空的上下文中运行，不继承首个连接的请求级上下文变量（如请求期限）
+            self._task = asyncio.get_running_loop().create_task(self._run(), context=contextvars.Context())
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """连接断开，最后一个连接断开后后台任务在下一轮退出"""
+        self._subscribers.discard(subscription)
+
+    def broadcast(self, messages: List[StreamMessage]) -> None:
+        """
+        分发消息到所有连接
+
+        Args:
+            messages: 消息列表
+        """
+        for subscription in list(self._subscribers):
+            for message in messages:
+                subscription.put(message)
+
+    def __len__(self) -> int:
+        """当前连接数"""
+        return len(self._subscribers)
+
+    # ==================== 数据库操作 ====================
+
+    def initialize(self, db: Session, now: float) -> List[StreamMessage]:
+        """
+        从发件箱当前末尾开始读取，并统计一次仪表盘数据
+
+        Args:
+            db: 数据库会话
+            now: 当前时间（time.monotonic）
+
+        Returns:
+            List[StreamMessage]: 完整的统计消息
+        """
+        self._reset()
+        self._cursor = get_latest_outbox_event_id(db)
+        self._stats = DashboardService.get_stats(db)
+        self._stats_at = now
+        return [_stats_message(self._stats, None)]
+
+    def poll(self, db: Session, now: float) -> List[StreamMessage]:
+        """
+        读取新事件，有订单事件或到了定时刷新时间时重新统计
+
+        Args:
+            db: 数据库会话
+            now: 当前时间（time.monotonic）
+
+        Returns:
+            List[StreamMessage]: 需要推送的消息（事件按ID升序，统计消息在最后）
+        """
+        rows = get_outbox_events_after(db, self._cursor, POLL_BATCH_SIZE + len(self._seen))
+        messages = []
+        stats_changed = False
+        for row in rows:
+            if row.id in self._seen:
+                continue
+            self._seen.add(row.id)
+            if row.aggregate_type in STREAM_AGGREGATE_TYPES:
+                messages.append(self._event_message(row))
+                stats_changed = stats_changed or row.event_type in STATS_EVENT_TYPES
+        self._advance(now)
+
+        if stats_changed or now - self._stats_at >= self.stats_refresh:
+            stats = DashboardService.get_stats(db)
+            self._stats_at = now
+            if stats != self._stats:
+                messages.append(_stats_message(stats, self._stats))
+                self._stats = stats
+        return messages
+
+    def replay(self, db: Session, after_id: int) -> List[StreamMessage]:
+        """
+        补发断线期间的事件
+
+        Args:
+            db: 数据库会话
+            after_id: 客户端收到的最后一个事件ID（Last-Event-ID）
+
+        Returns:
+            List[StreamMessage]: 事件消息，最多 replay_limit 条
+        """
+        rows = get_outbox_events_after(db, after_id, self.replay_limit, STREAM_AGGREGATE_TYPES)
+        return [self._event_message(row) for row in rows]
+
+    @staticmethod
+    def _event_message(row) -> StreamMessage:
+        """发件箱记录转换为推送消息"""
+        return StreamMessage(
+            row.aggregate_type,
+            {"type": row.event_type, **json.loads(row.payload)},
+            id=row.id
+        )
+
+    def _advance(self, now: float) -> None:
+        """读取位置推进到连续已读的最大ID，等待超时的空缺直接跳过"""
+        while self._seen:
+            following = self._cursor + 1
+            if following in self._seen:
+                self._seen.remove(following)
+                self._cursor = following
+                self._gap_since = None
+                continue
+            if self._gap_since is None:
+                self._gap_since = now
+            if now - self._gap_since < GAP_TIMEOUT_SECONDS:
+                break
+            self._cursor = min(self._seen) - 1
+            self._gap_since = None
+
+    def _in_session(self, method, *args):
+        """在独立的只读会话中执行 initialize / poll / replay"""
+        db = self.session_factory()
+        try:
+            return method(db, *args)
+        finally:
+            db.close()
+
+    # ==================== 后台读取 ====================
+
+    async def _run(self) -> None:
+        """读取循环：没有连接时退出"""
+        loop = asyncio.get_running_loop()
+        wake = asyncio.Event()
+        wakeup = lambda: loop.call_soon_threadsafe(wake.set)
+        self.bus.add_wakeup(wakeup)
+        try:
+            while self._subscribers:
+                try:
+                    if self._cursor is None:
+                        method = self.initialize
+                    else:
+                        method = self.poll
+                    messages = await loop.run_in_executor(None, self._in_session, method, time.monotonic())
+                    self.broadcast(messages)
+                except Exception:
+                    logger.exception("实时推送读取事件失败")
+                try:
+                    await asyncio.wait_for(wake.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                wake.clear()
+        finally:
+            self.bus.remove_wakeup(wakeup)
+            self._task = None
+            self._reset()
+
+    async def stream(self, last_event_id: Optional[int] = None) -> AsyncIterator[str]:
+        """
+        单个连接的 SSE 文本流
+
+        先补发 Last-Event-ID 之后的事件，再持续输出推送中心分发的消息；
+        长时间没有消息时输出心跳注释。客户端断开时由框架取消，随即退订。
+
+        Args:
+            last_event_id: 客户端收到的最后一个事件ID，首次连接为None
+
+        Yields:
+            str: SSE 文本
+        """
+        subscription = self.subscribe()
+        try:
+            yield f"retry: {RECONNECT_MS}\n\n"
+            last_sent = 0
+            if last_event_id is not None:
+                loop = asyncio.get_running_loop()
+                for message in await loop.run_in_executor(None, self._in_session, self.replay, last_event_id):
+                    yield message.encode()
+                    last_sent = message.id
+            while not subscription.closed:
+                message = await subscription.get(self.heartbeat)
+                if message is None:
+                    if not subscription.closed:
+                        yield ": ping\n\n"
+                    continue
+                # 补发过的事件不再重复输出
+                if message.id is not None and message.id <= last_sent:
+                    continue
+                yield message.encode()
+        finally:
+            self.unsubscribe(subscription)
+
+    async def stop(self) -> None:
+        """关闭所有连接并停止后台任务"""
+        for subscription in list(self._subscribers):
+            subscription.close()
+        self._subscribers.clear()
+        task = self._task
+        if task is None:
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+
+# 全局推送中心
+event_stream_hub = EventStreamHub(event_bus)
@@ -0,0 +1,62 @@
+"""
+工作单元 (Unit of Work)
+统一管理事务边界：CRUD 层只负责 flush，提交由最外层工作单元完成
+"""
+
+from sqlalchemy.orm import Session
+
+# 会话上记录工作单元嵌套深度的键
+_DEPTH_KEY = "uow_depth"
+
+
+class UnitOfWork:
+    """
+    事务工作单元
+    可嵌套使用，只有最外层工作单元退出时才提交或回滚，
+    内层工作单元退出时仅 flush，使多个 CRUD 调用合并为一次提交。
+
+    使用示例:
+    ```python
+    with UnitOfWork(db):
+        order = create_order(db, order_data, user_id)
+        create_boarding(db, boarding_data, order.id)
+    # 此处统一提交，任一步失败则整体回滚
+    ```
+    """
+
+    def __init__(self, db: Session):
+        """
+        初始化工作单元
+
+        Args:
+            db: 数据库会话
+        """
+        self.db = db
+
+    @property
+    def is_outermost(self) -> bool:
+        """当前是否为最外层工作单元"""
+        return self.db.info.get(_DEPTH_KEY, 0) == 1
+
+    def __enter__(self) -> "UnitOfWork":
+        self.db.info[_DEPTH_KEY] = self.db.info.get(_DEPTH_KEY, 0) + 1
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        outermost = self.is_outermost
+        self.db.info[_DEPTH_KEY] -= 1
+
+        if exc_type is not None:
+            # 异常继续向外抛出，由最外层负责回滚
+            if outermost:
+                self.db.rollback()
+            return False
+
+        if not outermost:
+            self.db.flush()
+        elif self.db.is_active:
+            self.db.commit()
+        else:
+            # 事务已因 flush 失败失效（异常已被调用方捕获），只能回滚
+            self.db.rollback()
+        return False
@@ -0,0 +1,108 @@
+"""
+后台任务工作进程入口
+Background Job Worker
+
+用法（在 backend 目录下）:
+    python -m app.worker run                              # 按配置启动工作池
+    python -m app.worker run -c 8 --mode process -q default -q reports
+    python -m app.worker enqueue purge_expired_idempotency_keys --priority 5
+    python -m app.worker bench -n 5000 -c 8               # 测量队列吞吐量（任务/秒）
+"""
+
+import argparse
+import json
+import signal
+import sys
+import uuid
+
+from app.core.database import SessionLocal, jobs_engine
+from app.db.models import Job
+from app.service.jobs import JobService, WorkerPool, job_registry
+from app.service.unit_of_work import UnitOfWork
+
+
+def _ensure_jobs_table() -> None:
+    """任务队列使用独立的库（如本地 SQLite 文件）时按需建表"""
+    if not JobService.shares_database():
+        Job.__table__.create(jobs_engine, checkfirst=True)
+
+
+def _run(args) -> None:
+    """启动工作池，收到 SIGINT / SIGTERM 后等待执行中的任务完成再退出"""
+    pool = WorkerPool(concurrency=args.concurrency, mode=args.mode, queues=args.queue)
+
+    def _stop(signum, frame):
+        print("收到退出信号，等待执行中的任务完成...", file=sys.stderr)
+        pool.stop()
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+
+    print(f"工作进程 {pool.worker_id} 启动：{pool.mode} x {pool.concurrency}，队列 {', '.join(pool.queues)}")
+    print(f"已注册任务：{', '.join(sorted(job_registry))}")
+    stats = pool.run()
+    print(json.dumps(stats, ensure_ascii=False))
+
+
+def _enqueue(args) -> None:
+    """任务入队并立即提交"""
+    db = SessionLocal()
+    try:
+        with UnitOfWork(db):
+            job_id = JobService.enqueue(
+                db, args.name, json.loads(args.payload), priority=args.priority,
+                queue=args.queue, delay_seconds=args.delay
+            )
+    finally:
+        db.close()
+    print(job_id)
+
+
+def _bench(args) -> None:
+    """在临时队列中写入一批空任务并执行完，输出吞吐量"""
+    queue = f"bench-{uuid.uuid4().hex[:8]}"
+    db = SessionLocal()
+    try:
+        with UnitOfWork(db):
+            JobService.enqueue_many(db, "noop", [{} for _ in range(args.jobs)], queue=queue)
+
+        stats = WorkerPool(concurrency=args.concurrency, mode=args.mode, queues=[queue], poll_interval=0).run(drain=True)
+        print(json.dumps(stats, ensure_ascii=False))
+    finally:
+        # 队列使用独立的库时任务写在队列库中，删除也要在那里执行
+        with UnitOfWork(db):
+            JobService.delete_queue(db, queue)
+        db.close()
+
+
+def main(argv=None) -> None:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(prog="python -m app.worker", description="后台任务工作进程")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="启动工作池")
+    run.add_argument("-c", "--concurrency", type=int, help="同时执行的任务数（默认 JOBS_CONCURRENCY）")
+    run.add_argument("--mode", choices=["thread", "process"], help="执行方式（默认 JOBS_MODE）")
+    run.add_argument("-q", "--queue", action="append", help="处理的队列，可重复指定（默认 default）")
+    run.set_defaults(handler=_run)
+
+    enqueue = commands.add_parser("enqueue", help="任务入队")
+    enqueue.add_argument("name", choices=sorted(job_registry), help="任务名称")
+    enqueue.add_argument("--payload", default="{}", help="任务参数（JSON）")
+    enqueue.add_argument("--priority", type=int, default=0, help="优先级，数值越大越先执行")
+    enqueue.add_argument("--queue", default="default", help="队列名称")
+    enqueue.add_argument("--delay", type=float, default=0, help="延迟执行的秒数")
+    enqueue.set_defaults(handler=_enqueue)
+
+    bench = commands.add_parser("bench", help="测量队列吞吐量")
+    bench.add_argument("-n", "--jobs", type=int, default=2000, help="任务数")
+    bench.add_argument("-c", "--concurrency", type=int, help="同时执行的任务数（默认 JOBS_CONCURRENCY）")
+    bench.add_argument("--mode", choices=["thread", "process"], help="执行方式（默认 JOBS_MODE）")
+    bench.set_defaults(handler=_bench)
+
+    args = parser.parse_args(argv)
+    _ensure_jobs_table()
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
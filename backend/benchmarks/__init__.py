@@ -0,0 +1,10 @@
+"""
+性能基准测试
+Benchmark Suite
+
+在进程内运行 FastAPI 应用（httpx ASGI 客户端），对预先填充数据的本地数据库
+以固定并发执行典型请求组合，输出延迟分位数与吞吐量 JSON，便于跨提交对比
+
+- run: 基准测试运行器
+- datagen: 可复现的合成数据生成器
+"""
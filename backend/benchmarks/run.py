@@ -0,0 +1,412 @@
+"""
+基准测试运行器
+Benchmark Runner
+
+在进程内启动应用（httpx ASGI 传输，不经过网络），对由 benchmarks.datagen 生成数据的 SQLite 库
+以固定并发执行各场景，输出 p50/p95/p99 延迟和吞吐量 JSON。
+
+用法（在 backend 目录下）:
+    python -m benchmarks.run                                   # 全部场景
+    python -m benchmarks.run -s list_pages -c 32 -n 2000       # 单个场景
+    python -m benchmarks.run -o results/abc123.json            # 保存结果
+    python -m benchmarks.run --compare results/baseline.json   # 与基线对比
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+# 准入控制的路由类别（与 app.core.admission.DEFAULT_LIMITS 一致；应用在设置环境变量之后才能导入）
+ADMISSION_CLASSES = ("interactive", "dashboard", "export", "auth")
+
+
+# ==================== 统计工具 ====================
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """
+    最近秩法计算分位数
+
+    Args:
+        sorted_values: 升序排列的样本
+        p: 分位（0-100）
+
+    Returns:
+        float: 分位数，样本为空时返回 0
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(p / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float, concurrency: int) -> dict:
+    """
+    汇总一个场景的结果
+
+    Args:
+        latencies: 每个请求的耗时（秒）
+        errors: 失败请求数（HTTP 状态码 >= 400 或响应 code != 200）
+        elapsed: 场景总耗时（秒）
+        concurrency: 并发数
+
+    Returns:
+        dict: 请求数、错误数、吞吐量和延迟分位数（毫秒）
+    """
+    values = sorted(latencies)
+    ms = lambda v: round(v * 1000, 3)
+    return {
+        "requests": len(values),
+        "errors": errors,
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(values) / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "p50": ms(percentile(values, 50)),
+            "p95": ms(percentile(values, 95)),
+            "p99": ms(percentile(values, 99)),
+            "max": ms(values[-1]) if values else 0.0,
+            "mean": ms(sum(values) / len(values)) if values else 0.0,
+        },
+    }
+
+
+# ==================== 场景定义 ====================
+
+class Context:
+    """场景共享的登录态和数据规模"""
+
+    def __init__(self, counts: dict, password: str, service_count: int, single_writer: bool = False):
+        self.counts = counts
+        self.password = password
+        self.service_count = service_count
+        # SQLite 同一时刻只允许一个写事务，而端点在事件循环线程中同步访问数据库，
+        # 两个写请求交错时后者会阻塞事件循环直到 busy timeout。
+        # 因此 SQLite 下写请求在客户端排队执行，读请求仍保持并发
+        self.write_lock = asyncio.Lock() if single_writer else None
+        self.admin_headers: Dict[str, str] = {}
+        self.staff_headers: Dict[str, str] = {}
+        self.active_owners: List[str] = []          # 可登录的主人用户名
+        self.owner_sessions: List[tuple] = []       # (请求头, 该主人的宠物ID列表)
+
+
+async def login_burst(client, ctx: Context, rng: random.Random):
+    """登录洪峰：随机主人账号登录（包含 bcrypt 校验）"""
+    return await client.post("/api/auth/login", json={
+        "username": rng.choice(ctx.active_owners), "password": ctx.password
+    })
+
+
+async def list_pages(client, ctx: Context, rng: random.Random):
+    """列表翻页：员工按不同偏移量翻订单和宠物列表，偏浅页、少量深页"""
+    size = 20
+    path, total = rng.choice([("/api/orders", ctx.counts["orders"]), ("/api/pets", ctx.counts["pets"])])
+    last_page = max(total // size, 1)
+    # 80% 请求落在前 10 页，其余均匀分布到深页
+    page = rng.randint(1, min(10, last_page)) if rng.random() < 0.8 else rng.randint(1, last_page)
+    params = {"page": page, "size": size}
+    if path == "/api/orders" and rng.random() < 0.3:
+        params["status"] = rng.choice(["pending", "confirmed", "completed"])
+    return await client.get(path, params=params, headers=ctx.staff_headers)
+
+
+async def dashboard_polling(client, ctx: Context, rng: random.Random):
+    """仪表盘轮询：员工反复拉取统计数据"""
+    return await client.get("/api/dashboard/stats", headers=ctx.staff_headers)
+
+
+async def order_creation(client, ctx: Context, rng: random.Random):
+    """下单：主人为自己的宠物预约服务"""
+    headers, pet_ids = rng.choice(ctx.owner_sessions)
+    pet_id = rng.choice(pet_ids)
+    appointment = datetime(2026, 6, 1) + timedelta(minutes=30 * rng.randint(0, 5000))
+    payload = {
+        "pet_id": pet_id,
+        "service_id": rng.randint(1, ctx.service_count),
+        "appointment_time": appointment.isoformat(),
+    }
+    if ctx.write_lock is None:
+        return await client.post("/api/orders", headers=headers, json=payload)
+    async with ctx.write_lock:
+        return await client.post("/api/orders", headers=headers, json=payload)
+
+
+# 混合场景中各场景的权重
+MIXED_WEIGHTS = [(list_pages, 55), (dashboard_polling, 25), (order_creation, 15), (login_burst, 5)]
+
+
+async def mixed(client, ctx: Context, rng: random.Random):
+    """混合流量：按权重随机选择其他场景"""
+    funcs, weights = zip(*MIXED_WEIGHTS)
+    return await rng.choices(funcs, weights=weights)[0](client, ctx, rng)
+
+
+SCENARIOS: Dict[str, Callable] = {
+    "login_burst": login_burst,
+    "list_pages": list_pages,
+    "dashboard_polling": dashboard_polling,
+    "order_creation": order_creation,
+    "mixed": mixed,
+}
+
+# 登录开销远高于其他场景，默认请求数按比例缩小
+DEFAULT_REQUESTS = {"login_burst": 0.1}
+
+
+# ==================== 执行 ====================
+
+def _failed(response) -> bool:
+    """HTTP 错误或业务错误（统一响应格式中 code != 200）都计为失败"""
+    if response.status_code >= 400:
+        return True
+    try:
+        body = response.json()
+    except ValueError:
+        return False
+    return isinstance(body, dict) and body.get("code", 200) != 200
+
+
+async def run_scenario(client, ctx: Context, name: str, concurrency: int, total: int,
+                       warmup: int, seed_value: int) -> dict:
+    """
+    以固定并发执行一个场景
+
+    concurrency 个协程从共享计数器领取请求，直到完成 total 个；
+    每个协程使用独立的随机数生成器，保证同一种子下请求序列可复现。
+
+    Returns:
+        dict: summarize() 的结果
+    """
+    func = SCENARIOS[name]
+    warm_rng = random.Random(seed_value)
+    for _ in range(warmup):
+        await func(client, ctx, warm_rng)
+
+    latencies: List[float] = []
+    errors = 0
+    remaining = total
+
+    async def worker(worker_id: int):
+        nonlocal remaining, errors
+        rng = random.Random(f"{seed_value}:{name}:{worker_id}")
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            response = await func(client, ctx, rng)
+            latencies.append(time.perf_counter() - start)
+            if _failed(response):
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started, concurrency)
+
+
+async def _login(client, username: str, password: str) -> Dict[str, str]:
+    response = await client.post("/api/auth/login", json={"username": username, "password": password})
+    token = response.json()["data"]["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def _pick_owners(engine, owners: int, seed_value: int, limit: int = 200) -> List[tuple]:
+    """
+    随机挑选可登录（启用且未删除）且有宠物的主人
+
+    Returns:
+        List[tuple]: (用户名, 宠物ID列表)
+    """
+    from sqlalchemy import select
+    from app.db.models import User, Pet
+    from benchmarks.datagen import owner_username
+
+    indexes = random.Random(seed_value).sample(range(1, owners + 1), min(limit, owners))
+    usernames = [owner_username(i) for i in indexes]
+    with engine.connect() as conn:
+        rows = conn.execute(
+            select(User.username, Pet.id)
+            .join(Pet, Pet.owner_id == User.id)
+            .where(User.username.in_(usernames), User.is_active == True, User.is_deleted == False,
+                   Pet.is_deleted == False)
+            .order_by(User.id, Pet.id)
+        ).all()
+    pets: Dict[str, List[int]] = {}
+    for username, pet_id in rows:
+        pets.setdefault(username, []).append(pet_id)
+    return [(u, pets[u]) for u in usernames if u in pets]
+
+
+async def run(args) -> dict:
+    """填充数据、登录并依次执行选定场景"""
+    import httpx
+    from app.core.database import engine
+    from app.main import app
+    from benchmarks.datagen import BENCH_PASSWORD, SERVICES, generate
+
+    if args.reuse_db:
+        from sqlalchemy import func, select
+        from app.db.models import User, Pet, Order
+        with engine.connect() as conn:
+            counts = {
+                "users": conn.execute(select(func.count()).select_from(User)).scalar(),
+                "pets": conn.execute(select(func.count()).select_from(Pet)).scalar(),
+                "orders": conn.execute(select(func.count()).select_from(Order)).scalar(),
+            }
+            owners = conn.execute(select(func.count()).select_from(User).where(User.role == "owner")).scalar()
+    else:
+        counts = generate(engine, owners=args.owners, orders=args.orders, seed_value=args.seed)
+        owners = args.owners
+
+    ctx = Context(counts, BENCH_PASSWORD, len(SERVICES), single_writer=engine.dialect.name == "sqlite")
+    candidates = _pick_owners(engine, owners, args.seed)
+    ctx.active_owners = [username for username, _ in candidates]
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        ctx.admin_headers = await _login(client, "admin", BENCH_PASSWORD)
+        ctx.staff_headers = await _login(client, "staff001", BENCH_PASSWORD)
+        for username, pet_ids in candidates[:20]:
+            ctx.owner_sessions.append((await _login(client, username, BENCH_PASSWORD), pet_ids))
+
+        results = {}
+        for name in args.scenarios:
+            total = max(int(args.requests * DEFAULT_REQUESTS.get(name, 1)), 1)
+            results[name] = await run_scenario(client, ctx, name, args.concurrency, total, args.warmup, args.seed)
+            print(f"{name:<18} {results[name]['throughput_rps']:>9.1f} req/s  "
+                  f"p50 {results[name]['latency_ms']['p50']:>8.2f}ms  "
+                  f"p95 {results[name]['latency_ms']['p95']:>8.2f}ms  "
+                  f"p99 {results[name]['latency_ms']['p99']:>8.2f}ms  "
+                  f"errors {results[name]['errors']}", file=sys.stderr)
+
+    return {"meta": {**_meta(args, counts), **_limits_meta(args)}, "scenarios": results}
+
+
+def _limits_meta(args) -> dict:
+    """记录限流和准入控制的实际设置，以及准入控制拒绝的请求数（不同设置的结果不可直接对比）"""
+    from app.core.admission import admission_controller
+    from app.core.config import settings
+
+    gates = admission_controller.gates
+    return {
+        "rate_limit_enabled": settings.RATE_LIMIT_ENABLED,
+        "admission": {
+            "mode": args.admission,
+            "enabled": settings.ADMISSION_CONTROL_ENABLED,
+            "limits": {name: asdict(gate.limit) for name, gate in gates.items()},
+            "rejected": {name: sum(gate.rejected.values()) for name, gate in gates.items()},
+        },
+    }
+
+
+def _meta(args, counts: dict) -> dict:
+    """记录结果对应的代码版本和环境，便于跨提交对比"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "seed": args.seed,
+        "dataset": counts,
+    }
+
+
+def compare(current: dict, baseline: dict) -> List[str]:
+    """
+    与基线结果逐场景对比
+
+    Returns:
+        List[str]: 每个场景一行，列出 p50/p95/p99 和吞吐量的变化百分比
+    """
+    def delta(new, old):
+        return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+    lines = []
+    for name, result in current["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(name)
+        if old is None:
+            continue
+        parts = [f"{q} {delta(result['latency_ms'][q], old['latency_ms'][q])}" for q in ("p50", "p95", "p99")]
+        parts.append(f"rps {delta(result['throughput_rps'], old['throughput_rps'])}")
+        lines.append(f"{name:<18} " + "  ".join(parts))
+    return lines
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="宠物管理系统 API 基准测试")
+    parser.add_argument("-s", "--scenario", dest="scenarios", action="append", choices=sorted(SCENARIOS),
+                        help="要执行的场景，可重复指定，默认全部")
+    parser.add_argument("-c", "--concurrency", type=int, default=16, help="并发数")
+    parser.add_argument("-n", "--requests", type=int, default=1000, help="每个场景的请求数")
+    parser.add_argument("--warmup", type=int, default=20, help="每个场景的预热请求数")
+    parser.add_argument("--seed", type=int, default=42, help="随机种子")
+    parser.add_argument("--owners", type=int, default=2000, help="生成的宠物主人数，其余各表按比例推算")
+    parser.add_argument("--orders", type=int, help="生成的订单数，默认约为宠物数 × 2.5")
+    parser.add_argument("--db", help="SQLite 数据库文件，默认使用临时文件")
+    parser.add_argument("--database-url", help="改用指定数据库（如本地 MySQL 空库），优先于 --db")
+    parser.add_argument("--reuse-db", action="store_true", help="复用已有数据，不重新填充")
+    parser.add_argument("-o", "--output", help="结果 JSON 输出文件，默认输出到标准输出")
+    parser.add_argument("--compare", help="基线结果 JSON 文件")
+    parser.add_argument("--admission", choices=["sized", "configured", "off"], default="sized",
+                        help="准入控制：sized（默认）按并发数放宽限额，configured 使用配置的限额，off 关闭")
+    args = parser.parse_args(argv)
+    args.scenarios = args.scenarios or list(SCENARIOS)
+
+    if args.database_url:
+        database_url = args.database_url
+    else:
+        db_path = args.db or os.path.join(tempfile.mkdtemp(prefix="pet-bench-"), "bench.db")
+        if not args.reuse_db and os.path.exists(db_path):
+            os.remove(db_path)
+        database_url = f"sqlite:///{db_path}"
+    # 必须在导入 app 之前设置，配置在导入时读取
+    os.environ["DATABASE_URL"] = database_url
+    os.environ["DATABASE_REPLICA_URLS"] = ""
+    os.environ["DEBUG"] = "False"
+    # 所有请求来自同一个进程内客户端地址，按 IP 限流会让登录洪峰场景几乎全部返回 429
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "False")
+    # 默认的准入限额按生产连接池设置，基准并发数超出时多出的请求会被 503 削峰，结果反映的是限额而不是代码；
+    # sized 让每个类别都能容纳全部并发、排队不超时，连接池同步放大，中间件仍在请求路径上
+    if args.admission == "off":
+        os.environ["ADMISSION_CONTROL_ENABLED"] = "False"
+    elif args.admission == "sized":
+        os.environ["ADMISSION_CONTROL_ENABLED"] = "True"
+        os.environ["ADMISSION_LIMITS"] = ",".join(
+            f"{name}={args.concurrency}/{args.concurrency}/60" for name in ADMISSION_CLASSES
+        )
+        os.environ["DATABASE_POOL_SIZE"] = str(args.concurrency * len(ADMISSION_CLASSES))
+
+    result = asyncio.run(run(args))
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\n对比基线 {baseline.get('meta', {}).get('commit')}:", file=sys.stderr)
+        for line in compare(result, baseline):
+            print(line, file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
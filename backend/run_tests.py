@@ -16,18 +16,13 @@ def run_tests():
     print("=" * 70)
     print()
     
-    # 检查后端服务是否运行
+    # 测试在进程内运行，无需启动后端服务；安装了 pytest-xdist 时并行运行
+    args = [sys.executable, "-m", "pytest", "tests/", "-v", "--tb=short"]
     try:
-        import requests
-        response = requests.get("http://localhost:8000/health", timeout=2)
-        if response.status_code == 200:
-            print("✅ 后端服务运行正常")
-        else:
-            print("⚠️  后端服务状态异常，测试可能会失败")
-    except:
-        print("❌ 后端服务未运行，请先启动：")
-        print("   python -m uvicorn app.main:app --reload")
-        sys.exit(1)
+        import xdist  # noqa: F401
+        args += ["-n", "auto"]
+    except ImportError:
+        pass
     
     print()
     print("=" * 70)
@@ -37,7 +32,7 @@ def run_tests():
     
     # 运行 pytest
     result = subprocess.run(
-        [sys.executable, "-m", "pytest", "tests/", "-v", "--tb=short"],
+        args,
         cwd=".",
         capture_output=False
     )
@@ -0,0 +1,352 @@
+"""
+测试夹具
+Test Fixtures
+
+进程内测试：应用通过依赖覆盖 get_db 使用测试数据库，不再依赖已启动的后端服务。
+每个测试运行在一个外层事务中，请求内工作单元的提交只会释放保存点，
+测试结束时整体回滚，测试之间互不影响，可以用 pytest -n auto 并行运行。
+
+默认每个 xdist worker 使用独立的 SQLite 文件；设置 TEST_DATABASE_URL 可改用 MySQL，
+此时每个 worker 使用独立的数据库（库名追加 worker 编号，不存在时自动创建）。
+"""
+
+import itertools
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+import pytest
+from sqlalchemy.engine import make_url
+
+# ==================== 测试数据库地址 ====================
+# 必须在导入 app 之前设置，使全局引擎指向测试数据库
+
+WORKER_ID = os.environ.get("PYTEST_XDIST_WORKER", "main")
+
+
+def _worker_database_url() -> str:
+    """
+    当前 worker 使用的测试数据库地址
+
+    Returns:
+        str: 数据库连接地址
+    """
+    url = os.environ.get("TEST_DATABASE_URL")
+    if not url:
+        return f"sqlite:///{os.path.join(tempfile.gettempdir(), f'pet_management_test_{WORKER_ID}.db')}"
+    parsed = make_url(url)
+    if parsed.get_backend_name() == "sqlite":
+        return url
+    return parsed.set(database=f"{parsed.database}_{WORKER_ID}").render_as_string(hide_password=False)
+
+
+TEST_DATABASE_URL = _worker_database_url()
+os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+os.environ["DATABASE_REPLICA_URLS"] = ""
+os.environ["DEBUG"] = "False"
+
+import bcrypt  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import create_engine, event, text  # noqa: E402
+from app.core.database import Base, RoutingSession, engine, get_db  # noqa: E402
+from app.core.rate_limit import MemoryBucketStore, RateLimiter, set_rate_limiter  # noqa: E402
+from app.core.security import create_access_token, get_password_hash  # noqa: E402
+from app.db.models import Boarding, Order, Pet, Service, User  # noqa: E402
+from app.main import app  # noqa: E402
+from app.service import UnitOfWork  # noqa: E402
+
+# 种子账号的统一密码
+TEST_PASSWORD = "admin123"
+
+# 种子账号：用户名 -> 角色
+SEED_USERS = {"admin": "admin", "owner001": "owner", "staff001": "staff"}
+
+# make_boardings 默认的第一段寄养开始时间，远离当前时间，之后每条顺延一周
+BOARDING_START = datetime(2031, 6, 1, 9, 0)
+
+
+def pytest_addoption(parser):
+    """注册命令行选项"""
+    parser.addoption(
+        "--run-benchmarks", action="store_true", default=False,
+        help="运行标记为 benchmark 的微基准测试（默认跳过）"
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    """未指定 --run-benchmarks 时跳过微基准测试"""
+    if config.getoption("--run-benchmarks"):
+        return
+    skip = pytest.mark.skip(reason="需要 --run-benchmarks")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+# ==================== 数据库 ====================
+
+def _create_database(url: str) -> None:
+    """MySQL 测试库不存在时创建"""
+    parsed = make_url(url)
+    server = create_engine(parsed.set(database=None))
+    with server.connect() as conn:
+        conn.execute(text(f"CREATE DATABASE IF NOT EXISTS `{parsed.database}` DEFAULT CHARACTER SET utf8mb4"))
+    server.dispose()
+
+
+if engine.dialect.name == "sqlite":
+    # pysqlite 默认不发出 BEGIN，导致 SAVEPOINT 无法正确嵌套，
+    # 这里改为由 SQLAlchemy 显式开启事务
+    @event.listens_for(engine, "connect")
+    def _sqlite_disable_autobegin(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _sqlite_explicit_begin(conn):
+        conn.exec_driver_sql("BEGIN")
+
+
+@pytest.fixture(scope="session", autouse=True)
+def fast_password_hash():
+    """测试期间降低 bcrypt 轮数，注册 / 登录类测试不再被哈希耗时拖慢"""
+    original = bcrypt.gensalt
+    bcrypt.gensalt = lambda rounds=4, prefix=b"2b": original(rounds, prefix)
+    yield
+    bcrypt.gensalt = original
+
+
+@pytest.fixture(autouse=True)
+def rate_limiter():
+    """每个测试使用独立的进程内限流器，所有请求都来自同一个客户端地址，计数不能跨测试累积"""
+    limiter = RateLimiter(MemoryBucketStore())
+    set_rate_limiter(limiter)
+    yield limiter
+    set_rate_limiter(None)
+
+
+@pytest.fixture(scope="session")
+def db_engine(fast_password_hash):
+    """
+    建表并写入种子账号的测试数据库引擎（每个 worker 只执行一次）
+
+    种子数据在外层事务之外提交，所有测试共享。
+    """
+    if engine.dialect.name != "sqlite":
+        _create_database(TEST_DATABASE_URL)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    password = get_password_hash(TEST_PASSWORD)
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {"username": username, "password": password, "role": role,
+             "email": f"{username}@example.com", "email_key": f"{username}@example.com", "real_name": username}
+            for username, role in SEED_USERS.items()
+        ])
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(db_engine):
+    """
+    测试用数据库会话
+
+    会话绑定到一个已开启外层事务的连接上，并以 create_savepoint 方式加入该事务：
+    工作单元的 commit 只释放保存点，测试结束时外层事务回滚，所有写入都被撤销。
+    """
+    connection = db_engine.connect()
+    transaction = connection.begin()
+    session = RoutingSession(
+        primary=connection, replicas=[],
+        autoflush=False, join_transaction_mode="create_savepoint"
+    )
+    yield session
+    session.close()
+    transaction.rollback()
+    connection.close()
+
+
+# ==================== 客户端 ====================
+
+@pytest.fixture
+def client(db):
+    """
+    进程内 API 客户端（基于 httpx 的 TestClient，直接调用 ASGI 应用）
+
+    请求与测试共享同一个会话，测试中可以直接用 db 准备数据或校验写入结果。
+    """
+    def override_get_db():
+        with UnitOfWork(db):
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield TestClient(app)
+    app.dependency_overrides.pop(get_db, None)
+
+
+@pytest.fixture
+def seed_users(db) -> dict:
+    """种子账号：用户名 -> User"""
+    users = db.query(User).filter(User.username.in_(SEED_USERS)).all()
+    return {user.username: user for user in users}
+
+
+@pytest.fixture
+def auth_headers(seed_users):
+    """
+    生成认证请求头的工厂
+
+    直接签发 Token，不走登录接口，避免每个测试都执行一次密码校验。
+
+    使用示例:
+    ```python
+    def test_xxx(client, auth_headers):
+        client.get("/api/users", headers=auth_headers("admin"))
+    ```
+    """
+    def make(user) -> dict:
+        if isinstance(user, str):
+            user = seed_users[user]
+        return {"Authorization": f"Bearer {create_access_token(data={'sub': str(user.id)})}"}
+    return make
+
+
+@pytest.fixture
+def admin_headers(auth_headers) -> dict:
+    """管理员认证请求头"""
+    return auth_headers("admin")
+
+
+@pytest.fixture
+def staff_headers(auth_headers) -> dict:
+    """员工认证请求头"""
+    return auth_headers("staff001")
+
+
+@pytest.fixture
+def owner_headers(auth_headers) -> dict:
+    """宠物主人认证请求头"""
+    return auth_headers("owner001")
+
+
+# ==================== 业务数据 ====================
+# 以下夹具写入后立即 commit：只释放保存点，请求失败回滚时这些记录仍然保留，
+# 测试结束时随外层事务一起回滚
+
+@pytest.fixture
+def pet(db, seed_users) -> Pet:
+    """种子宠物主人 owner001 的宠物"""
+    pet = Pet(owner_id=seed_users["owner001"].id, name="豆豆", species="狗", gender="male")
+    db.add(pet)
+    db.commit()
+    return pet
+
+
+@pytest.fixture
+def service(db) -> Service:
+    """60 分钟的美容服务，价格 88"""
+    service = Service(name="宠物美容", category="美容", price=88, duration=60)
+    db.add(service)
+    db.commit()
+    return service
+
+
+@pytest.fixture
+def boarding_service(db) -> Service:
+    """寄养服务，价格 100"""
+    service = Service(name="宠物寄养", category="寄养", price=100)
+    db.add(service)
+    db.commit()
+    return service
+
+
+@pytest.fixture
+def make_orders(db, pet, service):
+    """
+    按给定状态为 pet 创建 service 的订单，返回订单ID列表
+
+    其余字段以关键字参数传入，作用于本批全部订单（如 staff_id、appointment_time、is_deleted）。
+
+    使用示例:
+    ```python
+    def test_xxx(make_orders):
+        pending, confirmed = make_orders("pending", "confirmed")
+        deleted, = make_orders("pending", is_deleted=True)
+    ```
+    """
+    counter = itertools.count()
+
+    def make(*statuses, **values) -> List[int]:
+        orders = [
+            Order(**{
+                "order_no": f"TEST{pet.id}-{next(counter)}", "user_id": pet.owner_id, "pet_id": pet.id,
+                "service_id": service.id, "status": status, "total_amount": service.price, **values
+            })
+            for status in statuses
+        ]
+        db.add_all(orders)
+        db.commit()
+        return [order.id for order in orders]
+    return make
+
+
+@pytest.fixture
+def make_boardings(db, seed_users, pet, make_orders):
+    """
+    按给定状态为 pet 创建寄养记录，返回寄养ID列表
+
+    每条寄养对应一个新的已确认订单，默认由 staff001 负责，从 BOARDING_START 起每条顺延一周、
+    为期两天；其余字段以关键字参数传入，作用于本批全部寄养（如 start_date、end_date、is_deleted）。
+    """
+    counter = itertools.count()
+
+    def make(*statuses, **values) -> List[int]:
+        boardings = []
+        for order_id, status in zip(make_orders(*["confirmed"] * len(statuses)), statuses):
+            start = BOARDING_START + timedelta(weeks=next(counter))
+            boardings.append(Boarding(**{
+                "order_id": order_id, "pet_id": pet.id, "staff_id": seed_users["staff001"].id, "status": status,
+                "start_date": start, "end_date": start + timedelta(days=2), **values
+            }))
+        db.add_all(boardings)
+        db.commit()
+        return [boarding.id for boarding in boardings]
+    return make
+
+
+# ==================== 微基准 ====================
+
+@pytest.fixture
+def bench(request):
+    """
+    微基准测量工具，与 API 测试共用同一套夹具
+
+    使用示例:
+    ```python
+    @pytest.mark.benchmark
+    def test_list_orders(client, admin_headers, bench):
+        stats = bench(lambda: client.get("/api/orders", headers=admin_headers))
+    ```
+
+    结果写入 user_properties，可通过 --junitxml 导出。
+    """
+    from benchmarks.run import summarize
+
+    def run(func, rounds: int = 200, warmup: int = 10) -> dict:
+        for _ in range(warmup):
+            func()
+        latencies = []
+        start = time.perf_counter()
+        for _ in range(rounds):
+            t0 = time.perf_counter()
+            func()
+            latencies.append(time.perf_counter() - t0)
+        stats = summarize(latencies, 0, time.perf_counter() - start, 1)
+        request.node.user_properties.append(("benchmark", stats))
+        print(f"\n{request.node.name}: {stats['latency_ms']}")
+        return stats
+
+    return run
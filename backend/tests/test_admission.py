@@ -0,0 +1,160 @@
+"""
+准入控制测试
+Admission Control Tests
+"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+from app.core.admission import (
+    BACKGROUND_CONNECTIONS, AdmissionController, AdmissionGate, AdmissionLimit, AdmissionMiddleware, Rejected,
+    admission_controller, cap_limits, classify, parse_limits
+)
+from app.core.database import engine
+from app.core.deadline import deadline_scope
+
+
+def _slow_app(controller: AdmissionController):
+    """每个请求处理 0.1 秒的测试应用"""
+    async def handler(request):
+        await asyncio.sleep(0.1)
+        return PlainTextResponse("ok")
+
+    app = Starlette(routes=[
+        Route("/api/dashboard/stats", handler),
+        Route("/api/pets", handler),
+    ])
+    return AdmissionMiddleware(app, controller)
+
+
+@pytest.mark.unit
+class TestAdmissionGate:
+    """并发闸门测试类"""
+
+    def test_classify(self):
+        """测试按路径前缀分类，SSE 与非 /api 路径不受控制"""
+        assert classify("/api/auth/login") == "auth"
+        assert classify("/api/export/orders") == "export"
+        assert classify("/api/import/users") == "export"
+        assert classify("/api/orders/1") == "interactive"
+        assert classify("/api/events/stream") is None
+        assert classify("/health") is None
+
+    def test_parse_limits(self):
+        """测试按类别覆盖默认限额"""
+        limits = parse_limits("export=1/2/10")
+
+        assert limits["export"] == AdmissionLimit(1, 2, 10.0)
+        assert limits["interactive"].concurrency == 8
+        with pytest.raises(ValueError):
+            parse_limits("reports=1/2/3")
+
+    def test_limits_fit_connection_pool(self):
+        """测试各类别并发数之和加上后台任务连接不超过连接池容量，请求不会阻塞在等待连接上"""
+        concurrency = sum(gate.limit.concurrency for gate in admission_controller.gates.values())
+
+        assert concurrency + BACKGROUND_CONNECTIONS <= engine.pool.size() + engine.pool._max_overflow
+
+    def test_cap_limits(self):
+        """测试并发数之和超过连接数时按比例缩减，每类至少保留一个名额"""
+        limits = cap_limits(parse_limits("interactive=40/64/2"), 12)
+
+        assert {name: limit.concurrency for name, limit in limits.items()} == {
+            "interactive": 8, "dashboard": 1, "export": 1, "auth": 1
+        }
+        assert limits["interactive"].queue_size == 64
+        assert cap_limits(parse_limits(""), 12) == parse_limits("")
+
+    def test_queue_full_and_timeout(self):
+        """测试名额用完后排队，队列已满立即拒绝，排队超时拒绝"""
+        async def scenario():
+            gate = AdmissionGate("test", AdmissionLimit(concurrency=1, queue_size=1, max_wait=0.05))
+            await gate.acquire()
+            queued = asyncio.ensure_future(gate.acquire())
+            await asyncio.sleep(0)
+            with pytest.raises(Rejected, match="queue_full"):
+                await gate.acquire()
+            with pytest.raises(Rejected, match="timeout"):
+                await queued
+            return gate
+
+        gate = asyncio.run(scenario())
+
+        assert (gate.in_flight, gate.queued, gate.rejected) == (1, 0, {"queue_full": 1, "timeout": 1})
+
+    def test_wait_bounded_by_deadline(self):
+        """测试排队时间不超过请求的剩余期限"""
+        async def scenario():
+            gate = AdmissionGate("test", AdmissionLimit(concurrency=1, queue_size=1, max_wait=5))
+            await gate.acquire()
+            with deadline_scope(0.05):
+                started = time.perf_counter()
+                with pytest.raises(Rejected, match="timeout"):
+                    await gate.acquire()
+                return time.perf_counter() - started
+
+        assert asyncio.run(scenario()) < 1
+
+    def test_handoff_in_order(self):
+        """测试释放的名额按排队顺序交给等待的请求，不被新请求插队"""
+        async def scenario():
+            gate = AdmissionGate("test", AdmissionLimit(concurrency=1, queue_size=5, max_wait=1))
+            order = []
+
+            async def request(name):
+                await gate.acquire()
+                order.append(name)
+                await asyncio.sleep(0.01)
+                gate.release()
+
+            await asyncio.gather(*(request(i) for i in range(4)))
+            return gate, order
+
+        gate, order = asyncio.run(scenario())
+
+        assert order == [0, 1, 2, 3]
+        assert (gate.in_flight, gate.queued) == (0, 0)
+
+
+@pytest.mark.api
+class TestAdmissionMiddleware:
+    """准入控制中间件测试类"""
+
+    def test_saturated_class_sheds_load(self):
+        """测试仪表盘类别饱和时返回 503 和 Retry-After，其他类别不受影响"""
+        controller = AdmissionController({
+            "dashboard": AdmissionLimit(concurrency=1, queue_size=1, max_wait=2),
+            "interactive": AdmissionLimit(concurrency=4, queue_size=4, max_wait=2),
+        })
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=_slow_app(controller))
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await asyncio.gather(
+                    *(client.get("/api/dashboard/stats") for _ in range(4)),
+                    *(client.get("/api/pets") for _ in range(4)),
+                )
+
+        responses = asyncio.run(scenario())
+
+        dashboard, interactive = responses[:4], responses[4:]
+        assert sorted(r.status_code for r in dashboard) == [200, 200, 503, 503]
+        rejected = next(r for r in dashboard if r.status_code == 503)
+        assert rejected.headers["Retry-After"] == "2"
+        assert rejected.headers["X-Admission-Reason"] == "queue_full"
+        assert [r.status_code for r in interactive] == [200] * 4
+        assert all(gate.in_flight == 0 for gate in controller.gates.values())
+
+    def test_metrics(self, client):
+        """测试准入指标输出到 /metrics"""
+        client.get("/api/services")
+
+        text = client.get("/metrics").text
+
+        assert 'http_admission_in_flight{class="interactive"} 0' in text
+        assert 'http_admission_rejected_total{class="export",reason="queue_full"}' in text
@@ -0,0 +1,62 @@
+"""
+API 微基准测试
+API Micro-benchmarks
+
+与 API 测试共用进程内夹具，默认跳过，使用 pytest --run-benchmarks -m benchmark -s 运行
+"""
+
+import pytest
+from app.db.models import Order, User
+
+# 基准数据量
+ORDER_COUNT = 500
+
+
+@pytest.fixture
+def orders(db, pet, service):
+    """为种子宠物主人准备一批订单（一条批量 INSERT，随测试事务回滚）"""
+    db.execute(Order.__table__.insert(), [
+        {"order_no": f"BENCH{i:08d}", "user_id": pet.owner_id, "pet_id": pet.id,
+         "service_id": service.id, "status": "pending", "total_amount": service.price}
+        for i in range(ORDER_COUNT)
+    ])
+    db.flush()
+    return ORDER_COUNT
+
+
+@pytest.mark.benchmark
+class TestListBenchmarks:
+    """列表接口微基准测试类"""
+
+    def test_orders_first_page(self, client, admin_headers, orders, bench):
+        """测试订单列表首页延迟"""
+        response = client.get("/api/orders", headers=admin_headers)
+        assert response.json()["data"]["total"] == orders
+
+        stats = bench(lambda: client.get("/api/orders", headers=admin_headers))
+        assert stats["requests"] == 200
+
+    def test_orders_deep_page(self, client, admin_headers, orders, bench):
+        """测试订单列表深分页延迟"""
+        stats = bench(lambda: client.get("/api/orders?page=25&size=20", headers=admin_headers))
+        assert stats["requests"] == 200
+
+
+@pytest.mark.benchmark
+class TestLookupBenchmarks:
+    """查找接口微基准测试类"""
+
+    def test_owner_phone_prefix(self, client, db, staff_headers, bench):
+        """测试按手机号前缀查找主人（附带宠物）的延迟"""
+        db.execute(User.__table__.insert(), [
+            {"username": f"bench_owner{i}", "password": "x", "role": "owner",
+             "phone": f"138{i:08d}", "phone_key": f"138{i:08d}"}
+            for i in range(ORDER_COUNT)
+        ])
+        db.flush()
+
+        response = client.get("/api/users/lookup?q=138 0000 01", headers=staff_headers)
+        assert len(response.json()["data"]) == 10
+
+        stats = bench(lambda: client.get("/api/users/lookup?q=138 0000 01", headers=staff_headers))
+        assert stats["requests"] == 200
@@ -0,0 +1,143 @@
+"""
+员工自动指派测试
+Staff Auto-assignment Tests
+"""
+
+import json
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+from app.core.database import RoutingSession
+from app.db.models import Order, OutboxEvent, User
+from app.service.assignment import AssignmentService
+from app.service.slots import StaffCalendar
+
+# 远离当前时间的预约日
+DAY = datetime(2030, 1, 7)
+
+
+@pytest.fixture
+def staff(db, seed_users):
+    """种子员工 staff001 之外再加两名员工，按ID升序"""
+    extra = [
+        User(username=f"assign{i}", password="x", role="staff", email=f"assign{i}@example.com")
+        for i in range(2)
+    ]
+    db.add_all(extra)
+    db.flush()
+    return [seed_users["staff001"].id] + [user.id for user in extra]
+
+
+@pytest.mark.unit
+class TestAssignmentPlan:
+    """内存分配测试类"""
+
+    def test_least_loaded_first(self):
+        """测试每次分配给工作量最小的员工，相同时按员工ID"""
+        orders = [(1, None, 60), (2, None, 60), (3, None, 60)]
+
+        plan = AssignmentService.plan(orders, {1: 0, 2: 30}, {1: StaffCalendar(), 2: StaffCalendar()})
+
+        assert plan == {1: 1, 2: 2, 3: 1}
+
+    def test_skips_busy_staff(self):
+        """测试有预约时间的订单跳过该时段已有预约的员工，同批订单之间也不重叠"""
+        at10 = DAY.replace(hour=10)
+        calendars = {1: StaffCalendar([(at10, at10 + timedelta(hours=1))]), 2: StaffCalendar()}
+        orders = [(1, at10, 60), (2, at10 + timedelta(minutes=30), 60), (3, at10 + timedelta(hours=2), 60)]
+
+        plan = AssignmentService.plan(orders, {1: 0, 2: 500}, calendars)
+
+        # 订单2 与员工1 的已有预约、员工2 新接的订单1 都重叠，无人可接
+        assert plan == {1: 2, 3: 1}
+
+
+@pytest.mark.api
+@pytest.mark.orders
+class TestAutoAssignApi:
+    """自动指派接口测试类"""
+
+    def test_balances_pending_orders(self, client, db, staff_headers, staff, make_orders):
+        """测试按现有工作量均衡指派，已指派的订单不变并计入工作量"""
+        make_orders("confirmed", "confirmed", staff_id=staff[0])
+        pending = make_orders(*["pending"] * 7)
+
+        response = client.post("/api/orders/auto-assign", headers=staff_headers)
+
+        assert response.json()["data"] == {"requested": 7, "affected": 7}
+        orders = db.query(Order).filter(Order.id.in_(pending)).all()
+        assert Counter(order.staff_id for order in orders) == {staff[0]: 1, staff[1]: 3, staff[2]: 3}
+        assert all(order.version == 2 for order in orders)
+        events = db.query(OutboxEvent).filter(OutboxEvent.event_type == "OrderUpdated").all()
+        assert {event.aggregate_id: json.loads(event.payload)["changes"]["staff_id"] for event in events} == {
+            order.id: order.staff_id for order in orders
+        }
+
+    def test_reads_primary_and_locks_staff(self, db, db_engine, staff, make_orders):
+        """测试指派在主库上读取并按ID顺序锁定员工：刚写入、副本上还看不到的预约也会被避开"""
+        at10 = DAY.replace(hour=10)
+        make_orders("confirmed", staff_id=staff[0], appointment_time=at10)
+        pending = make_orders("pending", "pending", "pending", appointment_time=at10)
+        # 副本连接在测试事务之外，看不到上面刚写入的订单和员工，相当于存在复制延迟
+        replica = db_engine.connect()
+        session = RoutingSession(primary=db.primary, replicas=[replica], autoflush=False,
+                                 join_transaction_mode="create_savepoint")
+        locked = []
+
+        @event.listens_for(session, "do_orm_execute")
+        def record(state):
+            if state.is_select and state.statement._for_update_arg is not None:
+                locked.append(str(state.statement.compile(compile_kwargs={"literal_binds": True})))
+
+        try:
+            requested, assigned = AssignmentService.assign_pending_orders(session)
+            session.commit()
+        finally:
+            session.close()
+            replica.close()
+
+        assert (requested, assigned) == (3, 2)
+        db.expire_all()
+        assert sorted(db.get(Order, i).staff_id or 0 for i in pending) == [0, staff[1], staff[2]]
+        assert len(locked) == 1 and "ORDER BY users.id" in locked[0]
+
+    def test_booking_without_staff(self, client, staff_headers, staff, pet, boarding_service, make_boardings):
+        """测试预订寄养不指定饲养员时分配给该时间段负责寄养最少的员工"""
+        start, end = DAY, DAY + timedelta(days=3)
+        for staff_id in staff[:2]:
+            make_boardings("scheduled", staff_id=staff_id, start_date=start, end_date=end)
+
+        response = client.post("/api/boardings/book", headers=staff_headers, json={
+            "pet_id": pet.id, "service_id": boarding_service.id,
+            "start_date": (end + timedelta(days=1)).isoformat(), "end_date": (end + timedelta(days=2)).isoformat()
+        })
+
+        assert response.json()["data"]["boarding"]["staff_id"] == staff[2]
+
+
+@pytest.mark.benchmark
+class TestAssignmentBenchmarks:
+    """自动指派基准测试类"""
+
+    def test_assign_thousands(self, db, staff, pet, service):
+        """测试一批 5000 个待确认订单（一半有预约时间）的指派耗时与均衡程度"""
+        count = 5000
+        db.execute(Order.__table__.insert(), [
+            {"order_no": f"ASSIGN{i:08d}", "user_id": pet.owner_id, "pet_id": pet.id,
+             "service_id": service.id, "status": "pending", "total_amount": service.price,
+             "appointment_time": DAY + timedelta(minutes=30 * (i // 2)) if i % 2 else None}
+            for i in range(count)
+        ])
+        db.flush()
+
+        start = time.perf_counter()
+        requested, assigned = AssignmentService.assign_pending_orders(db, limit=count)
+        elapsed = time.perf_counter() - start
+
+        loads = AssignmentService.staff_loads(db, staff)
+        print(f"\n指派 {assigned} 个订单耗时 {elapsed * 1000:.1f} ms，各员工工作量 {sorted(loads.values())}")
+        assert (requested, assigned) == (count, count)
+        assert max(loads.values()) - min(loads.values()) <= 60
@@ -0,0 +1,92 @@
+"""
+寄养预订测试
+Boarding Booking Tests
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+from app.db.models import Boarding, Order, Pet
+
+BASE_URL = "/api/boardings/book"
+
+START = datetime(2031, 5, 1, 9, 0)
+
+
+@pytest.fixture
+def catalog(pet, boarding_service, service):
+    """预订用到的宠物、寄养服务和美容服务"""
+    return {"pet_id": pet.id, "service_id": boarding_service.id, "grooming_id": service.id, "owner_id": pet.owner_id}
+
+
+def _booking(catalog, seed_users, days=(0, 3), **values) -> dict:
+    """预订请求体，默认由 staff001 负责"""
+    return {
+        "pet_id": catalog["pet_id"], "service_id": catalog["service_id"], "staff_id": seed_users["staff001"].id,
+        "start_date": (START + timedelta(days=days[0])).isoformat(),
+        "end_date": (START + timedelta(days=days[1])).isoformat(),
+        **values,
+    }
+
+
+@pytest.mark.api
+class TestBookBoarding:
+    """预订寄养 API 测试类"""
+
+    def test_book_creates_order_and_boarding(self, client, db, staff_headers, catalog, seed_users):
+        """测试一次请求创建订单和寄养记录，订单属于宠物主人、金额取服务价格"""
+        result = client.post(BASE_URL, headers=staff_headers, json=_booking(catalog, seed_users, notes="怕生")).json()
+
+        assert result["code"] == 200
+        order, boarding = result["data"]["order"], result["data"]["boarding"]
+        assert (order["user_id"], float(order["total_amount"]), order["notes"]) == (catalog["owner_id"], 100, "怕生")
+        assert boarding["order_id"] == order["id"]
+        assert db.query(Boarding).filter(Boarding.pet_id == catalog["pet_id"]).count() == 1
+
+    def test_overlapping_booking_rejected(self, client, db, staff_headers, catalog, seed_users):
+        """测试同一宠物时间段重叠的预订返回冲突，相邻时间段可以预订"""
+        assert client.post(BASE_URL, headers=staff_headers, json=_booking(catalog, seed_users)).json()["code"] == 200
+
+        overlap = client.post(BASE_URL, headers=staff_headers, json=_booking(catalog, seed_users, days=(2, 5))).json()
+        adjacent = client.post(BASE_URL, headers=staff_headers, json=_booking(catalog, seed_users, days=(3, 5))).json()
+
+        assert overlap["code"] == 409
+        assert adjacent["code"] == 200
+        assert db.query(Order).filter(Order.pet_id == catalog["pet_id"]).count() == 2
+
+    @pytest.mark.parametrize("values, code, msg", [
+        (lambda catalog, users: {"service_id": catalog["grooming_id"]}, 400, "不是寄养服务"),
+        (lambda catalog, users: {"pet_id": 0}, 404, "宠物不存在"),
+        (lambda catalog, users: {"staff_id": users["owner001"].id}, 404, "饲养员不存在"),
+        (lambda catalog, users: {"end_date": START.isoformat()}, 400, "结束时间"),
+    ])
+    def test_invalid_booking(self, client, db, staff_headers, catalog, seed_users, values, code, msg):
+        """测试非寄养服务、宠物或饲养员不存在、时间段无效时不创建任何记录"""
+        body = _booking(catalog, seed_users, **values(catalog, seed_users))
+
+        result = client.post(BASE_URL, headers=staff_headers, json=body).json()
+
+        assert result["code"] == code
+        assert msg in result["msg"]
+        assert db.query(Order).filter(Order.pet_id == catalog["pet_id"]).count() == 0
+
+    def test_owner_forbidden(self, client, owner_headers, catalog, seed_users):
+        """测试宠物主人不能直接预订寄养"""
+        response = client.post(BASE_URL, headers=owner_headers, json=_booking(catalog, seed_users))
+
+        assert response.status_code == 403
+
+    def test_pet_locked_on_primary(self, client, db, staff_headers, catalog, seed_users):
+        """测试预订时加锁读取宠物，并发预订在检查档期前排队"""
+        locked = []
+
+        @event.listens_for(db, "do_orm_execute")
+        def record(state):
+            if state.is_select and state.statement._for_update_arg is not None:
+                locked.extend(desc["entity"] for desc in state.statement.column_descriptions)
+
+        client.post(BASE_URL, headers=staff_headers, json=_booking(catalog, seed_users))
+
+        assert locked == [Pet]
+        assert db.info["use_primary"] is True
@@ -0,0 +1,124 @@
+"""
+批量操作测试
+Bulk Delete and Bulk Status Tests
+"""
+
+import pytest
+from app.db.models import Boarding, Order
+
+# 数据库中不存在的记录ID
+MISSING_ID = 999999
+
+
+def _states(db, model, ids):
+    """按ID顺序列出 (状态, 是否已删除, 版本号)"""
+    db.expire_all()
+    return [(db.get(model, i).status.value, db.get(model, i).is_deleted, db.get(model, i).version) for i in ids]
+
+
+@pytest.mark.api
+@pytest.mark.orders
+class TestBulkOrders:
+    """订单批量操作 API 测试类"""
+
+    def test_bulk_delete_mixed_ids(self, client, db, staff_headers, make_orders):
+        """测试批量删除：重复ID去重，不存在和已删除的记录不计入实际删除数"""
+        ids = make_orders("pending", "completed")
+        deleted, = make_orders("pending", is_deleted=True)
+
+        response = client.post("/api/orders/bulk-delete", headers=staff_headers,
+                               json={"ids": ids + [ids[0], MISSING_ID, deleted]})
+
+        assert response.json()["data"] == {"requested": 4, "affected": 2}
+        assert _states(db, Order, ids + [deleted]) == [
+            ("pending", True, 2), ("completed", True, 2), ("pending", True, 1)
+        ]
+
+    def test_bulk_status_skips_disallowed(self, client, db, staff_headers, make_orders):
+        """测试批量流转：不允许流转、已删除和不存在的记录被跳过"""
+        ids = make_orders("pending", "confirmed", "completed", "cancelled")
+        deleted, = make_orders("pending", is_deleted=True)
+
+        response = client.post("/api/orders/bulk-status", headers=staff_headers,
+                               json={"ids": ids + [deleted, MISSING_ID], "status": "cancelled"})
+
+        assert response.json()["data"] == {"requested": 6, "affected": 2}
+        assert [state for state, _, _ in _states(db, Order, ids + [deleted])] == [
+            "cancelled", "cancelled", "completed", "cancelled", "pending"
+        ]
+
+    def test_bulk_status_unreachable(self, client, db, staff_headers, make_orders):
+        """测试目标状态不能通过流转到达时返回400，记录不变"""
+        ids = make_orders("confirmed")
+
+        response = client.post("/api/orders/bulk-status", headers=staff_headers,
+                               json={"ids": ids, "status": "pending"})
+
+        assert response.json()["code"] == 400
+        assert _states(db, Order, ids) == [("confirmed", False, 1)]
+
+    def test_requires_staff(self, client, db, owner_headers, make_orders):
+        """测试宠物主人不能批量删除或批量流转"""
+        ids = make_orders("pending")
+
+        delete = client.post("/api/orders/bulk-delete", headers=owner_headers, json={"ids": ids})
+        status = client.post("/api/orders/bulk-status", headers=owner_headers,
+                             json={"ids": ids, "status": "cancelled"})
+
+        assert (delete.status_code, status.status_code) == (403, 403)
+        assert _states(db, Order, ids) == [("pending", False, 1)]
+
+    def test_empty_ids_rejected(self, client, staff_headers):
+        """测试ID列表为空时请求校验失败"""
+        response = client.post("/api/orders/bulk-delete", headers=staff_headers, json={"ids": []})
+
+        assert response.status_code == 422
+
+
+@pytest.mark.api
+@pytest.mark.boardings
+class TestBulkBoardings:
+    """寄养批量操作 API 测试类"""
+
+    def test_bulk_delete_mixed_ids(self, client, db, staff_headers, make_boardings):
+        """测试批量删除：不存在和已删除的记录不计入实际删除数"""
+        ids = make_boardings("scheduled", "completed")
+        deleted, = make_boardings("scheduled", is_deleted=True)
+
+        response = client.post("/api/boardings/bulk-delete", headers=staff_headers,
+                               json={"ids": ids + [MISSING_ID, deleted]})
+
+        assert response.json()["data"] == {"requested": 4, "affected": 2}
+        assert [is_deleted for _, is_deleted, _ in _states(db, Boarding, ids + [deleted])] == [True, True, True]
+
+    def test_bulk_status_skips_disallowed(self, client, db, staff_headers, make_boardings):
+        """测试批量流转：不允许流转、已删除和不存在的记录被跳过"""
+        ids = make_boardings("scheduled", "in_progress", "completed", "cancelled")
+        deleted, = make_boardings("in_progress", is_deleted=True)
+
+        response = client.post("/api/boardings/bulk-status", headers=staff_headers,
+                               json={"ids": ids + [deleted, MISSING_ID], "status": "completed"})
+
+        assert response.json()["data"] == {"requested": 6, "affected": 1}
+        assert [state for state, _, _ in _states(db, Boarding, ids + [deleted])] == [
+            "scheduled", "completed", "completed", "cancelled", "in_progress"
+        ]
+
+    def test_bulk_status_unreachable(self, client, db, staff_headers, make_boardings):
+        """测试目标状态不能通过流转到达时返回400"""
+        ids = make_boardings("in_progress")
+
+        response = client.post("/api/boardings/bulk-status", headers=staff_headers,
+                               json={"ids": ids, "status": "scheduled"})
+
+        assert response.json()["code"] == 400
+        assert _states(db, Boarding, ids) == [("in_progress", False, 1)]
+
+    def test_requires_staff(self, client, db, owner_headers, make_boardings):
+        """测试宠物主人不能批量删除寄养"""
+        ids = make_boardings("scheduled")
+
+        response = client.post("/api/boardings/bulk-delete", headers=owner_headers, json={"ids": ids})
+
+        assert response.status_code == 403
+        assert _states(db, Boarding, ids) == [("scheduled", False, 1)]
@@ -0,0 +1,73 @@
+"""
+读写分离路由测试
+Read/Write Splitting Tests
+
+使用两个本地 SQLite 文件分别模拟主库和只读副本
+"""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.database import Base, RoutingSession, use_primary
+from app.db.models import User
+from app.crud import get_user, get_users, update_user
+from app.schemas import UserUpdate
+
+
+@pytest.fixture
+def engines(tmp_path):
+    """创建主库和副本两个 SQLite 数据库，并写入内容不同的同一用户"""
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    replica = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    for eng, real_name in ((primary, "主库"), (replica, "副本")):
+        Base.metadata.create_all(eng)
+        with eng.begin() as conn:
+            conn.execute(User.__table__.insert().values(
+                id=1, username="alice", password="x", real_name=real_name, role="owner"
+            ))
+    yield primary, replica
+    primary.dispose()
+    replica.dispose()
+
+
+@pytest.fixture
+def db(engines):
+    """读写分离会话"""
+    primary, replica = engines
+    session = sessionmaker(class_=RoutingSession, primary=primary, replicas=[replica])()
+    yield session
+    session.close()
+
+
+@pytest.mark.unit
+class TestRoutingSession:
+    """读写分离会话测试类"""
+
+    def test_reads_go_to_replica(self, db):
+        """测试详情和列表查询走副本"""
+        assert get_user(db, 1).real_name == "副本"
+        users, total = get_users(db)
+        assert total == 1
+        assert users[0].real_name == "副本"
+
+    def test_read_your_writes_after_update(self, db, engines):
+        """测试写入后同一会话的读取粘在主库上"""
+        update_user(db, 1, UserUpdate(phone="13800000000"))
+        db.expire_all()
+
+        assert get_user(db, 1).real_name == "主库"
+        assert get_user(db, 1).phone == "13800000000"
+
+    def test_use_primary(self, db):
+        """测试显式强制走主库"""
+        use_primary(db)
+        assert get_user(db, 1).real_name == "主库"
+
+    def test_without_replicas_uses_primary(self, engines):
+        """测试未配置副本时全部走主库"""
+        primary, _ = engines
+        session = sessionmaker(class_=RoutingSession, primary=primary, replicas=[])()
+        try:
+            assert get_user(session, 1).real_name == "主库"
+        finally:
+            session.close()
@@ -0,0 +1,86 @@
+"""
+请求期限测试
+Request Deadline Tests
+"""
+
+import time
+
+import pytest
+from sqlalchemy import text
+from app.core.config import settings
+from app.core.deadline import deadline_scope, request_timeout, with_max_execution_time
+from app.core.exceptions import DeadlineExceededError
+
+# 执行时间远超测试期限的 SQLite 查询
+SLOW_QUERY = text(
+    "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 100000000) SELECT count(*) FROM n"
+)
+
+
+@pytest.mark.unit
+class TestDeadline:
+    """截止时间测试类"""
+
+    def test_request_timeout(self, monkeypatch):
+        """测试按最长路径前缀取期限，请求头只能缩短期限"""
+        monkeypatch.setattr(settings, "REQUEST_TIMEOUT_SECONDS", 30)
+        monkeypatch.setattr(settings, "REQUEST_TIMEOUTS", "/api/export/=600,/api/export/orders=60,/api/events/stream=0")
+
+        assert request_timeout("/api/pets") == 30
+        assert request_timeout("/api/export/users") == 600
+        assert request_timeout("/api/export/orders") == 60
+        assert request_timeout("/api/events/stream") is None
+        assert request_timeout("/api/pets", "5") == 5
+        assert request_timeout("/api/pets", "300") == 30
+        assert request_timeout("/api/pets", "abc") == 30
+
+    def test_nested_scope_keeps_earlier_deadline(self):
+        """测试嵌套设置期限时保留更早的截止时间"""
+        with deadline_scope(1) as outer:
+            with deadline_scope(10) as inner:
+                assert inner is outer
+            with deadline_scope(0.5) as inner:
+                assert inner.remaining() < outer.remaining()
+
+    def test_mysql_hint(self):
+        """测试只给 SELECT 语句加执行时间上限提示"""
+        assert with_max_execution_time("SELECT id FROM orders", 250) == (
+            "SELECT /*+ MAX_EXECUTION_TIME(250) */ id FROM orders"
+        )
+        assert with_max_execution_time("UPDATE orders SET status = 'x'", 250) == "UPDATE orders SET status = 'x'"
+
+
+@pytest.mark.services
+class TestStatementTimeout:
+    """数据库语句超时测试类"""
+
+    def test_runaway_query_interrupted(self, db_engine):
+        """测试超过期限的查询被中断，连接随后仍可正常使用"""
+        with db_engine.connect() as conn:
+            start = time.perf_counter()
+            with pytest.raises(DeadlineExceededError), deadline_scope(0.05):
+                conn.execute(SLOW_QUERY)
+            elapsed = time.perf_counter() - start
+            conn.rollback()
+
+            assert elapsed < 1
+            assert conn.execute(text("SELECT 1")).scalar() == 1
+
+    def test_expired_deadline_skips_statement(self, db_engine):
+        """测试截止时间已过时不再执行语句"""
+        statements = []
+        with db_engine.connect() as conn:
+            with deadline_scope(0.001):
+                time.sleep(0.002)
+                with pytest.raises(DeadlineExceededError):
+                    conn.execute(text("SELECT 1"))
+            statements.append(conn.execute(text("SELECT 2")).scalar())
+
+        assert statements == [2]
+
+    def test_request_timeout_header(self, client, staff_headers):
+        """测试请求头的期限传递到数据库查询，超时返回504"""
+        response = client.get("/api/orders", headers={**staff_headers, "X-Request-Timeout": "0.000001"})
+
+        assert response.json()["code"] == 504
+        assert client.get("/api/orders", headers=staff_headers).json()["code"] == 200
@@ -0,0 +1,116 @@
+"""
+实时推送测试
+Event Stream Tests
+"""
+
+import pytest
+from app.core.security import create_access_token
+from app.service import DashboardService
+from app.service.events import (
+    event_bus, BoardingStatusChanged, HealthRecordAdded, OrderDeleted, OrderStatusChanged, OrderUpdated
+)
+from app.service.stream import EventStreamHub, StreamMessage, Subscription
+
+
+@pytest.fixture
+def hub():
+    """独立的推送中心，统计数据不定时刷新"""
+    return EventStreamHub(event_bus, stats_refresh=3600)
+
+
+@pytest.mark.api
+class TestStreamEndpoint:
+    """推送接口测试类"""
+
+    def test_requires_token(self, client):
+        """测试未携带 Token 时返回401"""
+        assert client.get("/api/events/stream").status_code == 401
+
+    def test_requires_staff(self, client, seed_users):
+        """测试查询参数中的 Token 同样校验角色，宠物主人无权订阅"""
+        token = create_access_token(data={"sub": str(seed_users["owner001"].id)})
+
+        response = client.get("/api/events/stream", params={"access_token": token})
+
+        assert response.status_code == 403
+
+
+@pytest.mark.services
+class TestEventStreamHub:
+    """推送中心测试类"""
+
+    def test_poll_new_events(self, db, hub):
+        """测试从初始化位置之后读取订单、寄养事件，其他聚合类型不推送"""
+        event_bus.publish(db, OrderStatusChanged(order_id=1, status="confirmed"))
+        initial = hub.initialize(db, now=0)
+        event_bus.publish(
+            db,
+            OrderStatusChanged(order_id=2, status="confirmed"),
+            HealthRecordAdded(record_id=1, pet_id=1, vet_id=None, type="checkup", check_date="2025-01-01"),
+            BoardingStatusChanged(boarding_id=3, status="completed"),
+        )
+
+        messages = hub.poll(db, now=1)
+
+        assert [m.event for m in initial] == ["stats"]
+        assert [(m.event, m.data) for m in messages] == [
+            ("order", {"type": "OrderStatusChanged", "order_id": 2, "status": "confirmed"}),
+            ("boarding", {"type": "BoardingStatusChanged", "boarding_id": 3, "status": "completed"}),
+        ]
+        assert hub.poll(db, now=2) == []
+        assert [m.id for m in hub.replay(db, messages[0].id - 1)] == [m.id for m in messages]
+
+    def test_stats_delta(self, client, db, hub, owner_headers, pet, service):
+        """测试订单事件触发重新统计，推送完整数据和增量"""
+        before = hub.initialize(db, now=0)[0].data["stats"]
+
+        client.post("/api/orders", json={"pet_id": pet.id, "service_id": service.id}, headers=owner_headers)
+        stats = hub.poll(db, now=1)[-1]
+
+        assert stats.event == "stats"
+        assert stats.data["stats"]["total_orders"] == before["total_orders"] + 1
+        assert stats.data["delta"] == {"total_orders": 1}
+
+    def test_stats_only_for_counting_events(self, db, hub, monkeypatch):
+        """测试只有影响统计的订单事件才重新统计：修改字段不统计，删除订单重新统计"""
+        hub.initialize(db, now=0)
+        calls = []
+        get_stats = DashboardService.get_stats
+        monkeypatch.setattr(DashboardService, "get_stats", lambda db: calls.append(1) or get_stats(db))
+
+        event_bus.publish(db, OrderUpdated(order_id=1, changes={"staff_id": 2}))
+        updated = hub.poll(db, now=1)
+        event_bus.publish(db, OrderDeleted(order_id=1))
+        deleted = hub.poll(db, now=2)
+
+        assert [m.data["type"] for m in updated] == ["OrderUpdated"]
+        assert [m.data["type"] for m in deleted] == ["OrderDeleted"]
+        assert len(calls) == 1
+
+    def test_cursor_waits_for_gap(self, hub):
+        """测试读取位置只推进到连续的ID，空缺超时后跳过"""
+        hub._cursor = 10
+        hub._seen = {11, 13, 14}
+
+        hub._advance(now=100)
+        assert (hub._cursor, hub._seen) == (11, {13, 14})
+
+        hub._advance(now=103)
+        assert hub._cursor == 11
+
+        hub._advance(now=106)
+        assert (hub._cursor, hub._seen) == (14, set())
+
+    def test_slow_subscriber_closed(self, hub):
+        """测试积压超过上限的连接被关闭，不影响其他连接"""
+        slow, fast = Subscription(2), Subscription(2)
+        hub._subscribers = {slow, fast}
+
+        for i in range(1, 4):
+            hub.broadcast([StreamMessage("order", {"order_id": i}, id=i)])
+            if i < 3:
+                fast.queue.get_nowait()
+
+        assert slow.closed
+        assert not fast.closed
+        assert fast.queue.qsize() == 1
@@ -0,0 +1,119 @@
+"""
+领域事件与发件箱测试
+Domain Event and Outbox Tests
+"""
+
+import json
+
+import pytest
+from app.db.models import OutboxEvent
+from app.service.events import event_bus, OrderCreated, OrderStatusChanged
+
+
+@pytest.fixture
+def order_payload(pet, service):
+    """创建订单的请求体"""
+    return {"pet_id": pet.id, "service_id": service.id}
+
+
+@pytest.fixture
+def received():
+    """订阅订单事件，测试结束后取消订阅"""
+    events = []
+
+    def handler(db, event):
+        events.append(event)
+    event_bus.subscribe(OrderCreated, handler)
+    event_bus.subscribe(OrderStatusChanged, handler)
+    yield events
+    event_bus.unsubscribe(handler)
+
+
+def _outbox(db):
+    """按顺序列出发件箱中的 (事件类型, 事件内容)"""
+    return [(row.event_type, json.loads(row.payload)) for row in db.query(OutboxEvent).order_by(OutboxEvent.id)]
+
+
+@pytest.mark.api
+@pytest.mark.orders
+class TestOutbox:
+    """发件箱测试类"""
+
+    def test_events_written_with_order(self, client, db, owner_headers, staff_headers, order_payload):
+        """测试创建订单和状态流转在同一事务中写入事件"""
+        order_id = client.post("/api/orders", json=order_payload, headers=owner_headers).json()["data"]["id"]
+        client.put(f"/api/orders/{order_id}", json={"status": "confirmed"}, headers=staff_headers)
+
+        events = _outbox(db)
+        assert [event_type for event_type, _ in events] == ["OrderCreated", "OrderStatusChanged"]
+        assert events[0][1]["status"] == "pending"
+        assert events[0][1]["total_amount"] == "88.00"
+        assert events[1][1] == {"order_id": order_id, "status": "confirmed"}
+
+    def test_no_event_when_write_fails(self, client, db, staff_headers, make_orders):
+        """测试写操作失败回滚时不留下事件"""
+        order_id, = make_orders("completed")
+
+        response = client.put(f"/api/orders/{order_id}", json={"status": "cancelled"}, headers=staff_headers)
+
+        assert response.json()["code"] == 409
+        assert _outbox(db) == []
+
+    def test_edit_and_delete_events(self, client, db, staff_headers, make_orders, make_boardings, seed_users):
+        """测试修改订单字段发布 OrderUpdated（状态另发 OrderStatusChanged），单条和批量删除发布删除事件"""
+        ids = make_orders("pending", "pending", "pending")
+        boarding_id, = make_boardings("scheduled")
+
+        client.put(f"/api/orders/{ids[0]}", headers=staff_headers, json={
+            "status": "confirmed", "notes": "加急", "staff_id": seed_users["staff001"].id
+        })
+        client.delete(f"/api/orders/{ids[0]}", headers=staff_headers)
+        client.post("/api/orders/bulk-delete", headers=staff_headers, json={"ids": ids + [999999]})
+        client.post("/api/boardings/bulk-delete", headers=staff_headers, json={"ids": [boarding_id]})
+
+        assert _outbox(db) == [
+            ("OrderStatusChanged", {"order_id": ids[0], "status": "confirmed"}),
+            ("OrderUpdated", {"order_id": ids[0], "changes": {"notes": "加急", "staff_id": seed_users["staff001"].id}}),
+            ("OrderDeleted", {"order_id": ids[0]}),
+            ("OrderDeleted", {"order_id": ids[1]}),
+            ("OrderDeleted", {"order_id": ids[2]}),
+            ("BoardingDeleted", {"boarding_id": boarding_id}),
+        ]
+
+    def test_dispatch_batch(self, db, received):
+        """测试分批投递给订阅者并标记已投递"""
+        event_bus.publish(db, *[OrderStatusChanged(order_id=i, status="confirmed") for i in range(1, 4)])
+
+        assert event_bus.dispatch_batch(db, batch_size=2, max_attempts=5) == 2
+        assert event_bus.dispatch_batch(db, batch_size=2, max_attempts=5) == 1
+        assert event_bus.dispatch_batch(db, batch_size=2, max_attempts=5) == 0
+        assert [e.order_id for e in received] == [1, 2, 3]
+        assert db.query(OutboxEvent).filter(OutboxEvent.dispatched_at.is_(None)).count() == 0
+
+    def test_failed_handler_retried(self, db, received):
+        """测试订阅者失败时只回滚该事件，记录失败次数后稍后重试"""
+        def flaky(db, event):
+            if event.order_id == 1 and not flaky.failed:
+                flaky.failed = True
+                raise RuntimeError("下游不可用")
+        flaky.failed = False
+        event_bus.subscribe(OrderStatusChanged, flaky)
+        try:
+            event_bus.publish(db, *[OrderStatusChanged(order_id=i, status="confirmed") for i in (1, 2)])
+
+            event_bus.dispatch_batch(db, batch_size=10, max_attempts=5)
+            failed = db.query(OutboxEvent).filter(OutboxEvent.dispatched_at.is_(None)).one()
+            assert (failed.aggregate_id, failed.attempts) == (1, 1)
+            assert "下游不可用" in failed.last_error
+
+            event_bus.dispatch_batch(db, batch_size=10, max_attempts=5)
+            assert db.query(OutboxEvent).filter(OutboxEvent.dispatched_at.is_(None)).count() == 0
+        finally:
+            event_bus.unsubscribe(flaky)
+
+    def test_max_attempts(self, db):
+        """测试失败次数达到上限的事件不再投递"""
+        event_bus.publish(db, OrderStatusChanged(order_id=1, status="confirmed"))
+        db.query(OutboxEvent).update({"attempts": 5})
+
+        assert event_bus.dispatch_batch(db, batch_size=10, max_attempts=5) == 0
@@ -0,0 +1,97 @@
+"""
+数据导出测试
+Data Export Tests
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from app import service
+from app.core.database import RoutingSession
+from app.db.models import HealthRecord, Pet
+
+BASE_URL = "/api/export"
+
+
+@pytest.fixture
+def export_db(db, pet, make_orders, seed_users, monkeypatch):
+    """
+    导出服务使用的会话绑定到测试连接（随测试事务回滚），
+    并准备两只宠物、两个订单（金额带两位小数）和一条健康记录
+    """
+    monkeypatch.setattr(service, "SessionLocal", lambda: RoutingSession(
+        primary=db.primary, replicas=[], autoflush=False, join_transaction_mode="create_savepoint"
+    ))
+    cat = Pet(owner_id=pet.owner_id, name="导出咪咪", species="猫", gender="female")
+    db.add(cat)
+    db.flush()
+    db.add(HealthRecord(pet_id=cat.id, vet_id=seed_users["staff001"].id, type="checkup",
+                        check_date=datetime(2030, 1, 7), description="年度体检"))
+    db.commit()
+    order_ids = make_orders("pending", total_amount=Decimal("88.10")) + \
+        make_orders("completed", total_amount=Decimal("0.30"))
+    return {"owner_id": pet.owner_id, "pets": [pet, cat], "order_ids": order_ids}
+
+
+def _csv_rows(response) -> list:
+    """解析 CSV 响应（去掉 BOM）为字典列表"""
+    return list(csv.DictReader(io.StringIO(response.text.lstrip("﻿"))))
+
+
+@pytest.mark.api
+class TestExportApi:
+    """导出接口测试类"""
+
+    def test_orders_csv(self, client, staff_headers, export_db):
+        """测试订单 CSV 带 BOM 和表头，金额按原始精度输出，筛选条件与列表接口一致"""
+        response = client.get(f"{BASE_URL}/orders", headers=staff_headers,
+                              params={"user_id": export_db["owner_id"]})
+
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        assert "attachment" in response.headers["content-disposition"]
+        assert response.text.startswith("﻿id,")
+        rows = _csv_rows(response)
+        assert [(int(row["id"]), row["status"], row["total_amount"]) for row in rows] == [
+            (export_db["order_ids"][0], "pending", "88.10"), (export_db["order_ids"][1], "completed", "0.30")
+        ]
+
+        completed = _csv_rows(client.get(f"{BASE_URL}/orders", headers=staff_headers,
+                                         params={"user_id": export_db["owner_id"], "status": "completed"}))
+        assert [int(row["id"]) for row in completed] == [export_db["order_ids"][1]]
+
+    def test_orders_ndjson(self, client, staff_headers, export_db):
+        """测试 NDJSON 每行一个对象，金额为字符串而不是浮点数"""
+        response = client.get(f"{BASE_URL}/orders", headers=staff_headers,
+                              params={"format": "ndjson", "user_id": export_db["owner_id"]})
+
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert [row["total_amount"] for row in rows] == ["88.10", "0.30"]
+        assert rows[0]["status"] == "pending"
+
+    def test_pets_and_health_records(self, client, staff_headers, export_db):
+        """测试宠物和健康记录导出及各自的筛选条件"""
+        pets = _csv_rows(client.get(f"{BASE_URL}/pets", headers=staff_headers,
+                                    params={"owner_id": export_db["owner_id"], "species": "猫"}))
+        records = client.get(f"{BASE_URL}/health-records", headers=staff_headers,
+                             params={"format": "ndjson", "pet_id": export_db["pets"][1].id})
+
+        assert [pet["name"] for pet in pets] == ["导出咪咪"]
+        assert [json.loads(line)["description"] for line in records.text.splitlines()] == ["年度体检"]
+
+    def test_requires_staff(self, client, owner_headers):
+        """测试宠物主人不能导出"""
+        response = client.get(f"{BASE_URL}/orders", headers=owner_headers)
+
+        assert response.status_code == 403
+
+    def test_unknown_entity(self, client, staff_headers):
+        """测试不支持的实体或格式返回参数校验错误"""
+        assert client.get(f"{BASE_URL}/users", headers=staff_headers).status_code == 422
+        assert client.get(f"{BASE_URL}/orders", headers=staff_headers,
+                          params={"format": "xlsx"}).status_code == 422
@@ -0,0 +1,74 @@
+"""
+幂等键测试
+Idempotency Key Tests
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from app.db.models import IdempotencyKey, Order
+
+
+@pytest.fixture
+def order_payload(pet, service):
+    """创建订单的请求体"""
+    return {"pet_id": pet.id, "service_id": service.id, "notes": "首次美容"}
+
+
+@pytest.mark.api
+@pytest.mark.orders
+class TestIdempotencyKey:
+    """幂等键测试类"""
+
+    def test_retry_replays_original_response(self, client, db, owner_headers, order_payload):
+        """测试相同键重试返回首次响应且只创建一个订单"""
+        headers = {**owner_headers, "Idempotency-Key": "retry-1"}
+
+        first = client.post("/api/orders", json=order_payload, headers=headers)
+        second = client.post("/api/orders", json=order_payload, headers=headers)
+
+        assert first.json()["code"] == 200
+        assert second.json() == first.json()
+        assert second.headers["Idempotent-Replayed"] == "true"
+        assert "Idempotent-Replayed" not in first.headers
+        assert db.query(Order).count() == 1
+
+    def test_without_key_not_deduplicated(self, client, db, owner_headers, order_payload):
+        """测试未携带键的请求照常执行"""
+        client.post("/api/orders", json=order_payload, headers=owner_headers)
+        client.post("/api/orders", json=order_payload, headers=owner_headers)
+
+        assert db.query(Order).count() == 2
+
+    def test_key_reused_for_different_request(self, client, db, owner_headers, order_payload):
+        """测试同一个键用于不同请求体时返回冲突"""
+        headers = {**owner_headers, "Idempotency-Key": "retry-2"}
+        client.post("/api/orders", json=order_payload, headers=headers)
+
+        response = client.post("/api/orders", json={**order_payload, "notes": "改了备注"}, headers=headers)
+
+        assert response.json()["code"] == 409
+        assert db.query(Order).count() == 1
+
+    def test_key_released_when_nothing_saved(self, client, db, auth_headers, make_orders, seed_users):
+        """测试接口未保存响应就返回时释放键"""
+        order_id, = make_orders("pending", user_id=seed_users["admin"].id)
+        headers = {**auth_headers("owner001"), "Idempotency-Key": "retry-3"}
+
+        response = client.put(f"/api/orders/{order_id}", json={"notes": "x"}, headers=headers)
+
+        assert response.json()["code"] == 403
+        assert db.query(IdempotencyKey).count() == 0
+
+    def test_expired_key_is_reused(self, client, db, owner_headers, order_payload):
+        """测试过期的键可以重新使用"""
+        headers = {**owner_headers, "Idempotency-Key": "retry-4"}
+        client.post("/api/orders", json=order_payload, headers=headers)
+        db.query(IdempotencyKey).update({"expires_at": datetime.utcnow() - timedelta(seconds=1)})
+        db.flush()
+
+        response = client.post("/api/orders", json=order_payload, headers=headers)
+
+        assert "Idempotent-Replayed" not in response.headers
+        assert db.query(Order).count() == 2
+        assert db.query(IdempotencyKey).one().expires_at > datetime.utcnow()
@@ -0,0 +1,200 @@
+"""
+批量导入测试
+Bulk Import Tests
+"""
+
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from app.core.database import RoutingSession
+from app.core.exceptions import ValidationError
+from app.core.security import get_password_hash, verify_password
+from app.crud import create_user
+from app.db.models import Pet, User
+from app.schemas import UserCreate, UserRole
+from app.service import importer
+from app.service.importer import ImportReport, ImportService, check_encoding, read_rows
+
+
+def _jsonl(*rows) -> io.BytesIO:
+    """JSONL 上传文件"""
+    return io.BytesIO("".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows).encode())
+
+
+def _owners(count: int, prefix: str = "imp") -> io.BytesIO:
+    """包含 count 个宠物主人的 JSONL 文件"""
+    return _jsonl(*({"username": f"{prefix}{i}", "password": "password123"} for i in range(count)))
+
+
+@pytest.fixture
+def import_db(db, monkeypatch):
+    """
+    导入服务使用的会话绑定到测试连接（随测试事务回滚），
+    密码哈希改用线程池，使用测试夹具降低后的 bcrypt 轮数
+    """
+    monkeypatch.setattr(importer, "SessionLocal", lambda: RoutingSession(
+        primary=db.primary, replicas=[], autoflush=False, join_transaction_mode="create_savepoint"
+    ))
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        monkeypatch.setattr(importer, "_get_hash_pool", lambda: pool)
+        yield db
+
+
+@pytest.mark.unit
+class TestReadRows:
+    """上传文件解析测试类"""
+
+    def test_csv(self):
+        """测试 CSV 行号从表头之后的 2 开始，空字符串视为未填写，带 BOM 的表头可以识别"""
+        stream = io.BytesIO("\ufeffusername,phone\nalice, \nbob,138\n".encode())
+
+        assert list(read_rows(stream, "csv")) == [
+            (2, {"username": "alice", "phone": None}), (3, {"username": "bob", "phone": "138"})
+        ]
+        assert not stream.closed
+
+    def test_jsonl_invalid_line(self):
+        """测试跳过空行，非 JSON 对象的行标记为无效"""
+        stream = io.BytesIO(b'{"username": "alice"}\n\n[1, 2]\nnot json\n')
+
+        assert list(read_rows(stream, "jsonl")) == [
+            (1, {"username": "alice"}), (3, {"__invalid__": "[1, 2]"}), (4, {"__invalid__": "not json"})
+        ]
+
+    def test_not_utf8(self):
+        """测试非 UTF-8 文件在导入前被拒绝，检查后回到文件开头"""
+        stream = io.BytesIO("username,real_name\nalice,张三\n".encode("gbk"))
+
+        with pytest.raises(ValidationError, match="UTF-8"):
+            check_encoding(stream)
+        assert stream.tell() == 0
+        with pytest.raises(ValidationError, match="UTF-8"):
+            list(read_rows(stream, "csv"))
+        check_encoding(io.BytesIO("username\n张三\n".encode()))
+
+
+@pytest.mark.api
+class TestImportAPI:
+    """批量导入 API 测试类"""
+
+    def test_not_utf8_upload(self, client, admin_headers):
+        """测试上传 GBK 编码的文件返回参数错误而不是 500"""
+        response = client.post(
+            "/api/import/owners", headers=admin_headers,
+            files={"file": ("owners.csv", "username,password,real_name\nalice,password123,张三\n".encode("gbk"))}
+        )
+
+        assert response.json()["code"] == 400
+        assert "UTF-8" in response.json()["msg"]
+
+    def test_admin_only(self, client, staff_headers):
+        """测试只有管理员可以导入"""
+        response = client.post("/api/import/owners", headers=staff_headers, files={"file": ("owners.csv", b"username\n")})
+
+        assert response.status_code == 403
+
+
+@pytest.mark.services
+class TestImportOwners:
+    """导入宠物主人测试类"""
+
+    def test_contact_conflicts(self, import_db):
+        """测试已被使用或文件中重复的手机号、邮箱被拒绝，未填写的不受已有用户影响"""
+        create_user(import_db, UserCreate(
+            username="mail_only", password="password123", email="taken@example.com", role=UserRole.owner
+        ))
+        import_db.flush()
+
+        report = ImportService.import_owners(_jsonl(
+            {"username": "imp_taken", "password": "password123", "email": "Taken@example.com"},
+            {"username": "imp_new", "password": "password123", "email": "new@example.com"},
+            {"username": "imp_no_contact", "password": "password123"},
+            {"username": "imp_phone", "password": "password123", "phone": "138 0013 8000"},
+            {"username": "imp_phone_dup", "password": "password123", "phone": "+86 13800138000"},
+        ), "jsonl")
+
+        assert (report["imported"], report["failed"]) == (3, 2)
+        assert [error["row"] for error in report["errors"]] == [1, 5]
+        assert "邮箱已被其他账号使用" in report["errors"][0]["msg"]
+        assert "文件中手机号重复" in report["errors"][1]["msg"]
+        imported = import_db.query(User).filter(User.username == "imp_phone").one()
+        assert imported.phone_key == "13800138000"
+
+    def test_chunks_and_progress(self, import_db):
+        """测试按块写入，每块结束后回调进度"""
+        progress = []
+
+        report = ImportService.import_owners(_owners(5), "jsonl", chunk_size=2, on_progress=lambda *p: progress.append(p))
+
+        assert (report["total"], report["imported"], report["chunks"]) == (5, 5, 3)
+        assert progress == [(2, 2, 0), (4, 4, 0), (5, 5, 0)]
+        assert import_db.query(User).filter(User.username.like("imp%")).count() == 5
+
+    def test_validation_and_duplicates(self, import_db):
+        """测试校验失败、文件中重复和已存在的用户名逐行报告，不影响其他行"""
+        report = ImportService.import_owners(_jsonl(
+            {"username": "imp_ok", "password": "password123"},
+            {"username": "imp_short", "password": "123"},
+            {"username": "imp_ok", "password": "password123"},
+            {"username": "admin", "password": "password123"},
+        ), "jsonl")
+
+        assert (report["imported"], report["failed"]) == (1, 3)
+        assert [error["row"] for error in report["errors"]] == [2, 3, 4]
+        assert "文件中用户名重复" in report["errors"][1]["msg"]
+        assert "用户名已存在" in report["errors"][2]["msg"]
+
+    def test_integrity_error_falls_back_to_rows(self, import_db):
+        """测试整块插入遇到约束冲突（如并发写入）时逐行插入，只有冲突行失败"""
+        report = ImportReport("owners")
+        rows = [
+            (line_no, {"username": username, "password": "x", "role": "owner"})
+            for line_no, username in enumerate(["imp_a", "admin", "imp_b"], start=1)
+        ]
+
+        ImportService._insert_chunk(User, rows, report)
+
+        assert (report.imported, report.failed) == (2, 1)
+        assert report.errors[0]["row"] == 2
+        assert "数据库约束冲突" in report.errors[0]["msg"]
+        assert import_db.query(User).filter(User.username.in_(["imp_a", "imp_b"])).count() == 2
+
+
+@pytest.mark.services
+class TestImportPets:
+    """导入宠物测试类"""
+
+    def test_owner_resolution(self, import_db, seed_users):
+        """测试按用户名或ID解析主人，主人不存在或缺少主人的行报告失败"""
+        owner = seed_users["owner001"]
+
+        report = ImportService.import_pets(_jsonl(
+            {"owner_username": "owner001", "name": "豆豆", "species": "狗", "gender": "male"},
+            {"owner_id": owner.id, "name": "咪咪", "species": "猫", "gender": "female"},
+            {"owner_username": "nobody", "name": "旺财", "species": "狗", "gender": "male"},
+            {"name": "无主", "species": "猫", "gender": "female"},
+        ), "jsonl")
+
+        assert (report["imported"], report["failed"]) == (2, 2)
+        assert "主人不存在" in report["errors"][0]["msg"]
+        assert "缺少 owner_username" in report["errors"][1]["msg"]
+        names = {pet.name for pet in import_db.query(Pet).filter(Pet.owner_id == owner.id)}
+        assert {"豆豆", "咪咪"} <= names
+
+
+@pytest.mark.unit
+class TestHashPool:
+    """密码哈希进程池测试类"""
+
+    def test_spawn_pool(self):
+        """测试进程池以 spawn 方式启动子进程，哈希结果可以校验"""
+        try:
+            pool = importer._get_hash_pool()
+            assert pool._mp_context.get_start_method() == "spawn"
+            hashed, = pool.map(get_password_hash, ["password123"])
+        finally:
+            importer.shutdown_hash_pool()
+
+        assert verify_password("password123", hashed)
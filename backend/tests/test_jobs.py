@@ -0,0 +1,192 @@
+"""
+后台任务队列测试
+Background Job Queue Tests
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import Session
+from app.core.exceptions import ValidationError
+from app.crud import claim_jobs, complete_job, requeue_stale_jobs
+from app.db.models import Job, JobStatus
+from app.service import jobs
+from app.service.jobs import JobService, WorkerPool, job_registry, job_task
+
+
+@pytest.fixture
+def session_factory(db):
+    """工作池使用的会话工厂：绑定到测试连接，随测试事务回滚"""
+    connection = db.connection()
+    return lambda: Session(bind=connection, join_transaction_mode="create_savepoint", autoflush=False)
+
+
+@pytest.fixture
+def pool(session_factory):
+    """线程池模式的工作池，队列为空时立即返回"""
+    def _pool(concurrency=4):
+        return WorkerPool(concurrency=concurrency, mode="thread", poll_interval=0,
+                          jobs_session_factory=session_factory, session_factory=session_factory)
+    return _pool
+
+
+@pytest.fixture
+def tasks():
+    """注册测试任务，测试结束后注销"""
+    calls = []
+    state = {"active": 0, "peak": 0}
+    lock = threading.Lock()
+
+    @job_task("test_echo")
+    def echo(db, payload):
+        calls.append(payload["n"])
+        return {"n": payload["n"]}
+
+    @job_task("test_flaky", max_attempts=2)
+    def flaky(db, payload):
+        raise RuntimeError("下游不可用")
+
+    @job_task("test_serial", concurrency=1)
+    def serial(db, payload):
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+        time.sleep(0.01)
+        with lock:
+            state["active"] -= 1
+
+    yield {"calls": calls, "state": state}
+    for name in ("test_echo", "test_flaky", "test_serial"):
+        job_registry.pop(name, None)
+
+
+@pytest.mark.unit
+class TestJobQueue:
+    """任务队列测试类"""
+
+    def test_claim_by_priority(self, db, tasks):
+        """测试按优先级降序、同优先级按入队顺序领取，未到期的任务不领取"""
+        low = JobService.enqueue(db, "test_echo", {"n": 1})
+        high = JobService.enqueue(db, "test_echo", {"n": 2}, priority=10)
+        JobService.enqueue(db, "test_echo", {"n": 3}, delay_seconds=60)
+
+        claimed = claim_jobs(db, "worker-1", ["default"], 10)
+
+        assert [job.id for job in claimed] == [high, low]
+        assert all(job.status == JobStatus.running and job.attempts == 1 for job in claimed)
+        assert claim_jobs(db, "worker-2", ["default"], 10) == []
+
+    def test_unknown_task_rejected(self, db):
+        """测试未注册的任务不能入队"""
+        with pytest.raises(ValidationError):
+            JobService.enqueue(db, "no_such_task")
+
+    def test_pool_runs_jobs(self, db, pool, tasks):
+        """测试工作池执行任务并保存结果"""
+        ids = JobService.enqueue_many(db, "test_echo", [{"n": i} for i in range(10)])
+        db.flush()
+
+        stats = pool().run(drain=True)
+
+        assert stats["succeeded"] == 10
+        assert sorted(tasks["calls"]) == list(range(10))
+        db.expire_all()
+        job = db.get(Job, ids[3])
+        assert (job.status, job.result) == (JobStatus.succeeded, '{"n":3}')
+
+    def test_failed_job_retried_then_failed(self, db, pool, tasks):
+        """测试失败后按退避时间重新排队，执行次数用尽后标记失败"""
+        job_id = JobService.enqueue(db, "test_flaky")
+        db.flush()
+
+        pool().run(drain=True)
+        db.expire_all()
+        job = db.get(Job, job_id)
+        assert (job.status, job.attempts) == (JobStatus.queued, 1)
+        assert job.run_at > datetime.utcnow()
+        assert "下游不可用" in job.last_error
+
+        job.run_at = datetime.utcnow()
+        db.flush()
+        pool().run(drain=True)
+        db.expire_all()
+        assert db.get(Job, job_id).status == JobStatus.failed
+
+    def test_task_concurrency_limit(self, db, pool, tasks):
+        """测试任务的并发上限在工作池内生效"""
+        JobService.enqueue_many(db, "test_serial", [{} for _ in range(6)])
+        db.flush()
+
+        stats = pool(concurrency=4).run(drain=True)
+
+        assert stats["succeeded"] == 6
+        assert tasks["state"]["peak"] == 1
+
+    def test_requeue_stale(self, db, tasks):
+        """测试回收崩溃的工作进程遗留的任务"""
+        JobService.enqueue(db, "test_echo", {"n": 1})
+        job, = claim_jobs(db, "crashed", ["default"], 1)
+        job.locked_at = datetime.utcnow() - timedelta(hours=1)
+        db.flush()
+
+        assert requeue_stale_jobs(db, datetime.utcnow() - timedelta(minutes=10)) == 1
+        db.expire_all()
+        assert db.get(Job, job.id).status == JobStatus.queued
+
+    def test_result_ignored_after_requeue(self, db, tasks):
+        """测试任务超时被回收并由其他工作进程重新领取后，原工作进程的结果不覆盖新的执行"""
+        JobService.enqueue(db, "test_echo", {"n": 1})
+        job, = claim_jobs(db, "slow", ["default"], 1)
+        job.locked_at = datetime.utcnow() - timedelta(hours=1)
+        db.flush()
+        requeue_stale_jobs(db, datetime.utcnow() - timedelta(minutes=10))
+        claim_jobs(db, "fresh", ["default"], 1)
+
+        assert complete_job(db, job.id, "slow", None) is False
+        assert JobService.record_result(db, _claimed(job.id, "slow"), RuntimeError("超时")) is False
+        db.expire_all()
+        assert (db.get(Job, job.id).status, db.get(Job, job.id).locked_by) == (JobStatus.running, "fresh")
+        assert complete_job(db, job.id, "fresh", None) is True
+
+    def test_enqueue_once(self, db, tasks):
+        """测试已有同名的待执行任务时不再入队"""
+        first = JobService.enqueue_once(db, "test_echo", {"n": 1})
+
+        assert first is not None
+        assert JobService.enqueue_once(db, "test_echo", {"n": 2}) is None
+        claim_jobs(db, "worker-1", ["default"], 1)
+        assert JobService.enqueue_once(db, "test_echo", {"n": 3}) is None
+
+    def test_delete_queue_in_jobs_database(self, db, session_factory, tasks, monkeypatch):
+        """测试队列使用独立的库时，删除临时队列在队列库中执行，不访问业务会话"""
+        monkeypatch.setattr(JobService, "shares_database", staticmethod(lambda: False))
+        monkeypatch.setattr(jobs, "JobsSessionLocal", session_factory)
+        business_db = object()
+        JobService.enqueue_many(business_db, "test_echo", [{"n": 1}, {"n": 2}], queue="bench-test")
+        JobService.enqueue(db, "test_echo", {"n": 3})
+        db.flush()
+
+        assert JobService.delete_queue(business_db, "bench-test") == 2
+        assert [job.queue for job in db.query(Job)] == ["default"]
+
+
+def _claimed(job_id: int, token: str) -> Job:
+    """构造工作进程内存中持有的任务（领取时的状态）"""
+    return Job(id=job_id, name="test_echo", locked_by=token, attempts=1, max_attempts=3)
+
+
+@pytest.mark.benchmark
+class TestJobBenchmarks:
+    """任务队列吞吐量基准测试类"""
+
+    def test_noop_throughput(self, db, pool):
+        """测试空任务的吞吐量（任务/秒）"""
+        JobService.enqueue_many(db, "noop", [{} for _ in range(500)])
+        db.flush()
+
+        stats = pool().run(drain=True)
+
+        print(f"\n队列吞吐量: {stats['jobs_per_second']} 任务/秒")
+        assert stats["succeeded"] == 500
@@ -0,0 +1,109 @@
+"""
+请求计时与指标测试
+Request Timing Metrics Tests
+"""
+
+import pytest
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from app.core.database import get_db
+from app.core.metrics import (
+    Histogram, TimedRoute, TimingMiddleware, REQUEST_LATENCY, add_query_listener, remove_query_listener,
+    render_metrics
+)
+
+
+@pytest.fixture
+def client(tmp_path):
+    """挂载计时路由和中间件的最小应用"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'metrics.db'}")
+    router = APIRouter(route_class=TimedRoute)
+
+    @router.get("/items/{item_id}")
+    def get_item(item_id: int):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        return {"id": item_id}
+
+    @router.post("/items")
+    def create_item(db=Depends(get_db, scope="function")):
+        db.execute(text("SELECT 1"))
+        return {"id": 1}
+
+    app = FastAPI()
+    app.add_middleware(TimingMiddleware)
+    app.include_router(router, prefix="/api")
+    REQUEST_LATENCY.clear()
+    yield TestClient(app)
+    engine.dispose()
+
+
+@pytest.mark.unit
+class TestMetrics:
+    """请求计时测试类"""
+
+    def test_histogram_render(self):
+        """测试直方图累计分桶与 Prometheus 文本格式"""
+        histogram = Histogram("demo_seconds", "demo", ("route",), buckets=(0.1, 1.0))
+        histogram.observe(("/a",), 0.05)
+        histogram.observe(("/a",), 0.5)
+        histogram.observe(("/a",), 3)
+
+        lines = histogram.render()
+        assert 'demo_seconds_bucket{route="/a",le="0.1"} 1' in lines
+        assert 'demo_seconds_bucket{route="/a",le="1.0"} 2' in lines
+        assert 'demo_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+        assert 'demo_seconds_count{route="/a"} 3' in lines
+
+    def test_server_timing_header(self, client):
+        """测试响应携带分阶段的 Server-Timing 头"""
+        response = client.get("/api/items/7")
+        assert response.status_code == 200
+
+        timing = response.headers["server-timing"]
+        for phase in ("deps;", "db;", "handler;", "serialize;", "app;"):
+            assert phase in timing
+        assert 'desc="1 queries"' in timing
+        assert "commit;" not in timing
+
+    def test_commit_phase(self, client):
+        """测试请求工作单元的提交计入单独的 commit 阶段，不计入 serialize"""
+        response = client.post("/api/items")
+
+        phases = [part.split(";")[0] for part in response.headers["server-timing"].split(", ")]
+        assert phases == ["deps", "db", "handler", "serialize", "commit", "app"]
+        assert 'route="/api/items",phase="commit"' in render_metrics()
+
+    def test_metrics_use_route_template(self, client):
+        """测试指标以带前缀的路由模板作为标签"""
+        client.get("/api/items/1")
+        client.get("/api/items/2")
+        client.get("/missing")
+
+        output = render_metrics()
+        assert 'http_request_duration_seconds_count{method="GET",route="/api/items/{item_id}",status="200"} 2' in output
+        assert 'route="unmatched",status="404"' in output
+
+    def test_failed_statement_not_left_on_connection(self, tmp_path):
+        """测试语句执行失败后开始时间被弹出，语句耗时回调只收到成功的语句"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'failed.db'}")
+        seen = []
+
+        def listener(conn, cursor, statement, parameters, elapsed):
+            seen.append(statement)
+
+        add_query_listener(listener)
+        try:
+            with engine.connect() as conn:
+                for _ in range(3):
+                    with pytest.raises(OperationalError):
+                        conn.execute(text("SELECT * FROM missing_table"))
+                conn.execute(text("SELECT 1"))
+                assert conn.info["query_start"] == []
+        finally:
+            remove_query_listener(listener)
+            engine.dispose()
+
+        assert seen == ["SELECT 1"]
@@ -0,0 +1,73 @@
+"""
+乐观锁更新测试
+Optimistic Concurrency Tests
+"""
+
+import pytest
+from app.db.models import Service
+
+
+@pytest.mark.api
+@pytest.mark.services
+class TestOptimisticLock:
+    """乐观锁更新测试类"""
+
+    def test_if_match_current_version(self, client, staff_headers, service):
+        """测试 If-Match 与当前版本一致时更新成功并递增版本号"""
+        response = client.put(
+            f"/api/services/{service.id}", json={"price": 58},
+            headers={**staff_headers, "If-Match": 'W/"1"'}
+        )
+
+        result = response.json()
+        assert result["code"] == 200
+        assert result["data"]["price"] == 58
+        assert result["data"]["version"] == 2
+
+    def test_stale_version_conflicts(self, client, db, staff_headers, service):
+        """测试两人基于同一版本修改时，后提交的一方收到 409 且不覆盖前者"""
+        first = client.put(f"/api/services/{service.id}", json={"price": 58, "version": 1}, headers=staff_headers)
+        second = client.put(f"/api/services/{service.id}", json={"price": 68, "version": 1}, headers=staff_headers)
+
+        assert first.json()["code"] == 200
+        assert second.json()["code"] == 409
+        db.expire_all()
+        assert float(db.get(Service, service.id).price) == 58
+
+    def test_if_match_overrides_body_version(self, client, staff_headers, service):
+        """测试 If-Match 请求头优先于请求体中的 version"""
+        response = client.put(
+            f"/api/services/{service.id}", json={"price": 58, "version": 1},
+            headers={**staff_headers, "If-Match": "7"}
+        )
+
+        assert response.json()["code"] == 409
+
+    def test_without_version_last_write_wins(self, client, staff_headers, service):
+        """测试未提供版本号时照常更新"""
+        client.put(f"/api/services/{service.id}", json={"price": 58}, headers=staff_headers)
+        response = client.put(f"/api/services/{service.id}", json={"price": 68}, headers=staff_headers)
+
+        assert response.json()["data"]["version"] == 3
+
+    def test_missing_record_with_version(self, client, staff_headers):
+        """测试记录不存在时返回 404 而不是冲突"""
+        response = client.put("/api/services/999999", json={"price": 58, "version": 1}, headers=staff_headers)
+
+        assert response.json()["code"] == 404
+
+    def test_invalid_if_match(self, client, staff_headers, service):
+        """测试 If-Match 不是版本号时返回 400"""
+        response = client.put(
+            f"/api/services/{service.id}", json={"price": 58},
+            headers={**staff_headers, "If-Match": "*"}
+        )
+
+        assert response.status_code == 400
+
+    def test_enum_field_update(self, client, owner_headers, pet):
+        """测试枚举字段（性别）通过单条 UPDATE 写入"""
+        response = client.put(f"/api/pets/{pet.id}", json={"gender": "female", "version": 1}, headers=owner_headers)
+
+        assert response.json()["data"]["gender"] == "female"
+        assert response.json()["data"]["version"] == 2
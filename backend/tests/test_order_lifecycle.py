@@ -0,0 +1,72 @@
+"""
+订单生命周期测试
+Order Lifecycle Tests
+"""
+
+import pytest
+from app.db.models import Order
+from app.service.lifecycle import order_lifecycle
+
+
+@pytest.fixture
+def events():
+    """订阅订单流转事件，测试结束后取消订阅"""
+    received = []
+
+    def handler(db, event):
+        received.append(event)
+    order_lifecycle.subscribe(handler)
+    yield received
+    order_lifecycle.unsubscribe(handler)
+
+
+@pytest.mark.api
+@pytest.mark.orders
+class TestOrderLifecycle:
+    """订单生命周期测试类"""
+
+    def test_allowed_transition(self, client, staff_headers, make_orders, events):
+        """测试允许的流转成功并通知订阅者"""
+        order_id, = make_orders("pending")
+
+        response = client.put(f"/api/orders/{order_id}", json={"status": "confirmed"}, headers=staff_headers)
+
+        assert response.json()["data"]["status"] == "confirmed"
+        assert [(e.status, e.ids) for e in events] == [("confirmed", [order_id])]
+
+    def test_disallowed_transition_conflicts(self, client, db, staff_headers, make_orders, events):
+        """测试当前状态不允许流转时返回 409 且状态不变"""
+        order_id, = make_orders("pending")
+
+        response = client.put(f"/api/orders/{order_id}", json={"status": "in_progress"}, headers=staff_headers)
+
+        assert response.json()["code"] == 409
+        db.expire_all()
+        assert db.get(Order, order_id).status.value == "pending"
+        assert events == []
+
+    def test_initial_status_unreachable(self, client, staff_headers, make_orders):
+        """测试不能流转回初始状态"""
+        order_id, = make_orders("completed")
+
+        response = client.put(f"/api/orders/{order_id}", json={"status": "pending"}, headers=staff_headers)
+
+        assert response.json()["code"] == 400
+
+    def test_bulk_skips_disallowed(self, client, db, staff_headers, make_orders, events):
+        """测试批量流转跳过状态不允许的订单，事件只包含实际流转的订单"""
+        ids = make_orders("pending", "confirmed", "completed", "in_progress")
+
+        response = client.post("/api/orders/bulk-status",
+                               json={"ids": ids, "status": "completed"}, headers=staff_headers)
+
+        assert response.json()["data"] == {"requested": 4, "affected": 2}
+        assert sorted(events[0].ids) == [ids[1], ids[3]]
+        db.expire_all()
+        assert [db.get(Order, i).status.value for i in ids] == ["pending", "completed", "completed", "completed"]
+
+    def test_without_subscribers(self, db, make_orders):
+        """测试没有订阅者时只执行条件 UPDATE"""
+        ids = make_orders("pending", "cancelled")
+
+        assert order_lifecycle.transition(db, ids, "cancelled") == 1
@@ -0,0 +1,108 @@
+"""
+前台查找宠物主人测试
+Owner Lookup Tests
+"""
+
+import pytest
+from app.core.exceptions import ConflictError
+from app.crud import create_user, delete_user, normalize_email, normalize_phone
+from app.db.models import Pet
+from app.schemas import UserCreate, UserRole, UserUpdate
+from app.service import UserService
+
+BASE_URL = "/api/users/lookup"
+
+
+def _owner(db, username: str, phone: str = None, email: str = None):
+    """创建宠物主人"""
+    return create_user(db, UserCreate(
+        username=username, password="password123", phone=phone, email=email, role=UserRole.owner
+    ))
+
+
+@pytest.mark.unit
+class TestContactKeys:
+    """查找键规范化测试类"""
+
+    def test_normalize_phone(self):
+        """测试去掉空格、横线和国家码，只保留数字"""
+        assert normalize_phone("138 0013 8000") == "13800138000"
+        assert normalize_phone("+86 138-0013-8000") == "13800138000"
+        assert normalize_phone("0086 13800138000") == "13800138000"
+        assert normalize_phone("8613800138000") == "13800138000"
+        assert normalize_phone("021-1234") == "0211234"
+        assert normalize_phone(" - ") is None
+        assert normalize_phone(None) is None
+
+    def test_normalize_email(self):
+        """测试去掉首尾空白并转为小写"""
+        assert normalize_email("  Alice@Example.COM ") == "alice@example.com"
+        assert normalize_email("") is None
+
+
+@pytest.mark.api
+class TestOwnerLookupAPI:
+    """查找宠物主人 API 测试类"""
+
+    def test_lookup_by_phone_prefix(self, client, db, staff_headers):
+        """测试按手机号前缀查找，精确匹配排在最前，只返回未删除的宠物"""
+        exact = _owner(db, "lookup_exact", phone="1380013")
+        longer = _owner(db, "lookup_longer", phone="+86 138-0013-8000")
+        _owner(db, "lookup_other", phone="13900139000")
+        db.add_all([
+            Pet(owner_id=longer.id, name="豆豆", species="狗", gender="male"),
+            Pet(owner_id=longer.id, name="旧档案", species="猫", gender="female", is_deleted=True),
+        ])
+        db.flush()
+
+        result = client.get(BASE_URL, params={"q": "138 0013"}, headers=staff_headers).json()
+
+        assert result["code"] == 200
+        assert [owner["id"] for owner in result["data"]] == [exact.id, longer.id]
+        assert result["data"][0]["pets"] == []
+        assert [pet["name"] for pet in result["data"][1]["pets"]] == ["豆豆"]
+        assert result["data"][1]["phone"] == "+86 138-0013-8000"
+
+    def test_lookup_by_email(self, client, db, staff_headers):
+        """测试按邮箱查找不区分大小写，已删除的主人不出现在结果中"""
+        owner = _owner(db, "lookup_mail", email="Front.Desk@Example.com")
+        deleted = _owner(db, "lookup_deleted", email="front.desk2@example.com")
+        delete_user(db, deleted.id)
+
+        result = client.get(BASE_URL, params={"q": "FRONT.desk@"}, headers=staff_headers).json()
+
+        assert [o["id"] for o in result["data"]] == [owner.id]
+        assert deleted.email_key is None
+
+    def test_lookup_validation_and_permission(self, client, staff_headers, owner_headers):
+        """测试输入过短时返回参数错误，宠物主人无权查找"""
+        assert client.get(BASE_URL, params={"q": "13-8"}, headers=staff_headers).json()["code"] == 400
+        assert client.get(BASE_URL, params={"q": "13800"}, headers=owner_headers).status_code == 403
+
+
+@pytest.mark.services
+class TestContactUniqueness:
+    """手机号 / 邮箱唯一性测试类"""
+
+    def test_register_duplicate_phone(self, client, db):
+        """测试注册时规范化后相同的手机号被拒绝"""
+        _owner(db, "phone_holder", phone="13800138000")
+
+        result = client.post("/api/auth/register", json={
+            "username": "phone_taker", "password": "password123", "confirm_password": "password123",
+            "phone": "+86 138 0013 8000"
+        }).json()
+
+        assert result["code"] == 400
+        assert "手机号" in result["msg"]
+
+    def test_update_duplicate_email(self, db):
+        """测试修改为他人已使用的邮箱时冲突，修改为自己的邮箱不受影响"""
+        _owner(db, "mail_holder", email="taken@example.com")
+        owner = _owner(db, "mail_taker", email="mine@example.com")
+
+        with pytest.raises(ConflictError, match="邮箱"):
+            UserService.update_user_info(db, owner.id, UserUpdate(email="TAKEN@example.com"))
+        updated = UserService.update_user_info(db, owner.id, UserUpdate(email="Mine@example.com"))
+
+        assert updated.email_key == "mine@example.com"
@@ -0,0 +1,60 @@
+"""
+SQL 查询分析器测试
+SQL Query Profiler Tests
+"""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from app.core.database import Base
+from app.core.profiler import QueryProfiler, normalize_statement
+from app.db.models import User
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """带三个用户的 SQLite 引擎"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'profiler.db'}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for i in range(1, 4):
+            conn.execute(User.__table__.insert().values(
+                id=i, username=f"user{i:03d}", password="x", role="owner"
+            ))
+    yield engine
+    engine.dispose()
+
+
+@pytest.mark.unit
+class TestQueryProfiler:
+    """SQL 查询分析器测试类"""
+
+    def test_normalize_statement(self):
+        """测试字面量、空白和 IN 列表归一化"""
+        assert normalize_statement("SELECT *  FROM users\n WHERE id = 42 AND name = 'bob'") == \
+            "SELECT * FROM users WHERE id = ? AND name = ?"
+        assert normalize_statement("SELECT * FROM pets WHERE id IN (?, ?, ?)") == \
+            "SELECT * FROM pets WHERE id IN (?...)"
+        assert normalize_statement("SELECT * FROM pets WHERE id IN (__[POSTCOMPILE_id_1])") == \
+            "SELECT * FROM pets WHERE id IN (?...)"
+
+    def test_flags_n_plus_one(self, engine):
+        """测试同一请求内反复执行的同形查询被标记为疑似 N+1"""
+        profiler = QueryProfiler(n_plus_one_threshold=3)
+        profiler.attach(engine)
+        try:
+            token = profiler.start("GET", "/api/users")
+            with Session(engine) as db:
+                for user_id in (1, 2, 3):
+                    db.get(User, user_id)
+            summary = profiler.finish(token)
+        finally:
+            profiler.detach()
+
+        assert summary["query_count"] == 3
+        assert len(summary["n_plus_one"]) == 1
+        assert summary["n_plus_one"][0]["count"] == 3
+
+        report = profiler.report()
+        assert report["requests_sampled"] == 1
+        assert report["n_plus_one"][0]["paths"] == ["GET /api/users"]
@@ -0,0 +1,173 @@
+"""
+接口限流测试
+Rate Limiting Tests
+"""
+
+import multiprocessing
+
+import pytest
+from app.core.config import settings
+from app.core.rate_limit import (
+    Limit, MemoryBucketStore, RateLimiter, RedisBucketStore, SharedMemoryBucketStore, parse_limit
+)
+from app.service import UserService
+
+BASE_URL = "/api/auth"
+
+# 容量 2、每秒补充 1 个令牌
+LIMIT = Limit(capacity=2, rate=1)
+
+
+def _take_many(path: str, count: int, queue) -> None:
+    """子进程：从共享存储取 count 次令牌，返回允许的次数"""
+    store = SharedMemoryBucketStore(path, slots=64)
+    queue.put(sum(store.take("shared", Limit(capacity=100, rate=0.001))[0] for _ in range(count)))
+
+
+@pytest.fixture
+def shm_store(tmp_path):
+    """临时文件上的共享内存存储"""
+    store = SharedMemoryBucketStore(str(tmp_path / "buckets"), slots=64)
+    yield store
+    store.close()
+
+
+@pytest.mark.unit
+class TestTokenBucket:
+    """令牌桶存储测试类"""
+
+    def test_parse_limit(self):
+        """测试限额解析"""
+        assert parse_limit("10/minute") == Limit(capacity=10, rate=10 / 60)
+        assert parse_limit(" OFF ") is None
+        with pytest.raises(ValueError):
+            parse_limit("10/fortnight")
+
+    @pytest.mark.parametrize("store_name", ["memory", "shm"])
+    def test_refill(self, store_name, shm_store):
+        """测试用完容量后拒绝并给出等待时间，按速率补充后恢复"""
+        store = shm_store if store_name == "shm" else MemoryBucketStore()
+
+        results = [store.take("ip:1", LIMIT, now=100.0) for _ in range(3)]
+
+        assert [allowed for allowed, _ in results] == [True, True, False]
+        assert results[2][1] == pytest.approx(1.0)
+        assert store.take("ip:2", LIMIT, now=100.0)[0]
+        assert store.take("ip:1", LIMIT, now=101.0)[0]
+        assert not store.take("ip:1", LIMIT, now=101.0)[0]
+
+    def test_shared_across_processes(self, tmp_path):
+        """测试多个进程共用同一个桶，总放行次数不超过容量"""
+        path = str(tmp_path / "buckets")
+        context = multiprocessing.get_context("fork")
+        queue = context.Queue()
+        workers = [context.Process(target=_take_many, args=(path, 40, queue)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(10)
+
+        assert sum(queue.get(timeout=1) for _ in workers) == 100
+
+    def test_full_slot_reused(self, shm_store):
+        """测试探测范围占满时复用已补满的槽位，不会与未补满的桶共用"""
+        shm_store.PROBE = 1
+        shm_store.slots = 1
+        shm_store.take("a", LIMIT, now=100.0)
+        shm_store.take("a", LIMIT, now=100.0)
+
+        assert not shm_store.take("b", LIMIT, now=100.5)[0]
+        assert shm_store.take("c", LIMIT, now=110.0)[0]
+        assert shm_store.take("c", LIMIT, now=110.0)[0]
+
+    def test_redis_store(self):
+        """测试 Redis 存储（使用 fakeredis 代替 Redis 服务）"""
+        fakeredis = pytest.importorskip("fakeredis")
+        try:
+            store = RedisBucketStore(fakeredis.FakeRedis())
+            store.take("probe", LIMIT)
+        except Exception as exc:  # 未安装 lupa 时 fakeredis 不支持 Lua 脚本
+            pytest.skip(f"fakeredis 不支持 Lua: {exc}")
+
+        results = [store.take("ip:1", LIMIT, now=100.0) for _ in range(3)]
+
+        assert [allowed for allowed, _ in results] == [True, True, False]
+        assert results[2][1] == pytest.approx(1.0)
+        assert store.take("ip:1", LIMIT, now=101.0)[0]
+
+    def test_fallback(self):
+        """测试主存储出错时退回备用存储"""
+        class BrokenStore:
+            remote = True
+
+            def take(self, *args, **kwargs):
+                raise ConnectionError("redis down")
+
+        limiter = RateLimiter(BrokenStore(), fallback=MemoryBucketStore())
+
+        assert [limiter.hit("ip:1", LIMIT)[0] for _ in range(3)] == [True, True, False]
+
+
+@pytest.mark.api
+@pytest.mark.auth
+class TestRateLimitApi:
+    """接口限流测试类"""
+
+    def test_login_limited_before_authentication(self, client, monkeypatch):
+        """测试同一用户名超出限额后返回429，且不再校验密码；其他用户名不受影响"""
+        monkeypatch.setattr(settings, "RATE_LIMITS", "auth.login.username=2/minute")
+        calls = []
+        authenticate = UserService.authenticate
+        monkeypatch.setattr(UserService, "authenticate", lambda *args: calls.append(args) or authenticate(*args))
+        wrong = {"username": "owner001", "password": "wrong"}
+
+        responses = [client.post(f"{BASE_URL}/login", json=wrong) for _ in range(3)]
+        other = client.post(f"{BASE_URL}/login", json={"username": "OWNER001 ", "password": "wrong"})
+        allowed = client.post(f"{BASE_URL}/login", json={"username": "staff001", "password": "wrong"})
+
+        assert [r.status_code for r in responses] == [200, 200, 429]
+        assert int(responses[2].headers["Retry-After"]) >= 1
+        assert other.status_code == 429
+        assert allowed.json()["code"] == 401
+        assert len(calls) == 3
+
+    def test_login_username_limited_per_client(self, client, monkeypatch):
+        """测试用户名限额按客户端计数：一个客户端刷满后，其他客户端仍可用该用户名登录"""
+        monkeypatch.setattr(settings, "RATE_LIMITS", "auth.login.username=2/minute")
+        monkeypatch.setattr(settings, "RATE_LIMIT_TRUST_FORWARDED", True)
+        wrong = {"username": "owner001", "password": "wrong"}
+        attacker = {"X-Forwarded-For": "10.0.0.1"}
+
+        responses = [client.post(f"{BASE_URL}/login", json=wrong, headers=attacker) for _ in range(3)]
+        victim = client.post(
+            f"{BASE_URL}/login", json={"username": "owner001", "password": "admin123"},
+            headers={"X-Forwarded-For": "10.0.0.2"},
+        )
+
+        assert [r.status_code for r in responses] == [200, 200, 429]
+        assert victim.status_code == 200
+        assert victim.json()["code"] == 200
+
+    def test_register_limited_per_ip(self, client, monkeypatch):
+        """测试按客户端IP限制注册，信任代理时按 X-Forwarded-For 区分客户端"""
+        monkeypatch.setattr(settings, "RATE_LIMITS", "auth.register=1/minute")
+        monkeypatch.setattr(settings, "RATE_LIMIT_TRUST_FORWARDED", True)
+        data = {"username": "limited", "password": "password123", "confirm_password": "password123"}
+
+        first = client.post(f"{BASE_URL}/register", json=data, headers={"X-Forwarded-For": "10.0.0.1"})
+        second = client.post(f"{BASE_URL}/register", json=data, headers={"X-Forwarded-For": "10.0.0.1, 10.0.0.9"})
+        third = client.post(f"{BASE_URL}/register", json=data, headers={"X-Forwarded-For": "10.0.0.2"})
+
+        assert first.json()["code"] == 200
+        assert second.status_code == 429
+        assert third.json()["code"] == 400
+
+    def test_disabled(self, client, monkeypatch):
+        """测试关闭限流或限额为 off 时不限流"""
+        monkeypatch.setattr(settings, "RATE_LIMITS", "auth.login=off,auth.login.username=1/minute")
+        monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", False)
+        wrong = {"username": "owner001", "password": "wrong"}
+
+        responses = [client.post(f"{BASE_URL}/login", json=wrong) for _ in range(3)]
+
+        assert {r.status_code for r in responses} == {200}
@@ -0,0 +1,112 @@
+"""
+定时状态流转测试
+Timed Transition Scheduler Tests
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from app.db.models import Boarding, Job, JobStatus, Order, OutboxEvent
+from app.service.scheduler import PURGE_JOBS, TransitionScheduler
+
+NOW = datetime(2025, 3, 1, 9, 0)
+
+
+@pytest.fixture
+def scheduler():
+    """窗口为 10 分钟的调度器"""
+    return TransitionScheduler(window_seconds=600, clock=lambda: NOW)
+
+
+def _status(db, model, record_id):
+    """读取最新状态"""
+    db.expire_all()
+    return db.get(model, record_id).status.value
+
+
+@pytest.mark.unit
+class TestTransitionScheduler:
+    """定时状态流转测试类"""
+
+    def test_reload_catches_up(self, db, scheduler, make_orders, make_boardings):
+        """测试启动时补做停机期间到期的流转"""
+        finished, = make_boardings("scheduled", start_date=NOW - timedelta(days=3), end_date=NOW - timedelta(hours=1))
+        started, = make_boardings("scheduled", start_date=NOW - timedelta(hours=1), end_date=NOW + timedelta(days=2))
+        due_order, = make_orders("confirmed", appointment_time=NOW - timedelta(minutes=5))
+        pending_order, = make_orders("pending", appointment_time=NOW - timedelta(minutes=5))
+
+        affected = scheduler.reload(db, NOW)
+
+        assert affected == {"order_start": 1, "boarding_start": 2, "boarding_end": 1}
+        assert _status(db, Boarding, finished) == "completed"
+        assert _status(db, Boarding, started) == "in_progress"
+        assert _status(db, Order, due_order) == "in_progress"
+        assert _status(db, Order, pending_order) == "pending"
+
+    def test_loads_window_only(self, db, scheduler, make_orders, make_boardings):
+        """测试只加载窗口内的时间点"""
+        make_boardings("scheduled", start_date=NOW + timedelta(minutes=5), end_date=NOW + timedelta(days=1))
+        make_orders("confirmed", appointment_time=NOW + timedelta(minutes=8))
+        make_orders("confirmed", appointment_time=NOW + timedelta(hours=2))
+
+        scheduler.reload(db, NOW)
+
+        assert len(scheduler) == 2
+        assert scheduler.next_due() == NOW + timedelta(minutes=5)
+
+    def test_fire_at_due_time(self, db, scheduler, make_boardings):
+        """测试到达时间点后以一条条件 UPDATE 流转所有到期记录"""
+        first, = make_boardings("scheduled", start_date=NOW + timedelta(minutes=5), end_date=NOW + timedelta(days=1))
+        second, = make_boardings("scheduled", start_date=NOW + timedelta(minutes=5), end_date=NOW + timedelta(days=1))
+        later, = make_boardings("scheduled", start_date=NOW + timedelta(minutes=9), end_date=NOW + timedelta(days=1))
+        scheduler.reload(db, NOW)
+
+        assert scheduler.pop_due(NOW + timedelta(minutes=4)) == set()
+        due = scheduler.pop_due(NOW + timedelta(minutes=5))
+        assert scheduler.fire(db, due, NOW + timedelta(minutes=5)) == {"boarding_start": 2}
+        assert [_status(db, Boarding, b) for b in (first, second, later)] == ["in_progress", "in_progress", "scheduled"]
+
+    def test_fire_skips_changed_records(self, db, scheduler, make_boardings):
+        """测试时间点加载后记录被取消或改期时不会误流转"""
+        cancelled, = make_boardings("scheduled", start_date=NOW + timedelta(minutes=5), end_date=NOW + timedelta(days=1))
+        moved, = make_boardings("scheduled", start_date=NOW + timedelta(minutes=5), end_date=NOW + timedelta(days=1))
+        scheduler.reload(db, NOW)
+        db.get(Boarding, cancelled).status = "cancelled"
+        boarding = db.get(Boarding, moved)
+        boarding.start_date, boarding.end_date = NOW + timedelta(days=1), NOW + timedelta(days=2)
+        db.flush()
+
+        due = scheduler.pop_due(NOW + timedelta(minutes=5))
+
+        assert scheduler.fire(db, due, NOW + timedelta(minutes=5)) == {"boarding_start": 0}
+
+    def test_add(self, db, scheduler):
+        """测试新时间点加入堆：窗口外和重复的忽略"""
+        scheduler.add("order_start", NOW + timedelta(minutes=1))
+        assert len(scheduler) == 0
+
+        scheduler.reload(db, NOW)
+        scheduler.add("order_start", NOW + timedelta(minutes=1))
+        scheduler.add("order_start", NOW + timedelta(minutes=1))
+        scheduler.add("order_start", NOW + timedelta(hours=1))
+
+        assert len(scheduler) == 1
+
+    def test_transitions_publish_events(self, db, scheduler, make_boardings):
+        """测试定时流转同样写入状态变更事件"""
+        boarding, = make_boardings("scheduled", start_date=NOW - timedelta(minutes=1), end_date=NOW + timedelta(days=1))
+
+        scheduler.reload(db, NOW)
+
+        event = db.query(OutboxEvent).filter(OutboxEvent.event_type == "BoardingStatusChanged").one()
+        assert event.aggregate_id == boarding
+
+    def test_enqueue_purges(self, db, scheduler):
+        """测试清理任务放入后台任务队列，已在队列中的不重复入队"""
+        assert scheduler.enqueue_purges(db, NOW) == {
+            "purge_expired_idempotency_keys": 1, "purge_dispatched_outbox_events": 1
+        }
+        assert scheduler.enqueue_purges(db, NOW) == {
+            "purge_expired_idempotency_keys": 0, "purge_dispatched_outbox_events": 0
+        }
+        assert db.query(Job).filter(Job.name.in_(PURGE_JOBS), Job.status == JobStatus.queued).count() == 2
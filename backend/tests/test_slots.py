@@ -0,0 +1,119 @@
+"""
+预约时段测试
+Appointment Slot Tests
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+from app.db.models import User
+from app.service.slots import SlotService, StaffCalendar
+
+# 2030-01-07 是周一，远离当前时间，不受已有数据影响
+DAY = datetime(2030, 1, 7)
+
+
+def at(hour: int, minute: int = 0) -> datetime:
+    """测试日当天的时间"""
+    return DAY.replace(hour=hour, minute=minute)
+
+
+@pytest.fixture
+def booking(service, make_orders, seed_users):
+    """一小时的服务、员工 staff001 在 10:00 的预约和一个未指派的待确认订单"""
+    staff_id = seed_users["staff001"].id
+    make_orders("confirmed", staff_id=staff_id, appointment_time=at(10))
+    other_id, = make_orders("pending")
+    return {"service_id": service.id, "other_id": other_id, "staff_id": staff_id}
+
+
+@pytest.mark.unit
+class TestStaffCalendar:
+    """忙碌区间测试类"""
+
+    def test_merge_and_is_free(self):
+        """测试重叠、相接的区间合并，相接的时段不算冲突"""
+        calendar = StaffCalendar([(at(13), at(14)), (at(10), at(11)), (at(10, 30), at(12)), (at(12), at(12, 30))])
+
+        assert (calendar.starts, calendar.ends) == ([at(10), at(13)], [at(12, 30), at(14)])
+        assert calendar.is_free(at(9), at(10))
+        assert calendar.is_free(at(12, 30), at(13))
+        assert not calendar.is_free(at(9, 30), at(10, 30))
+        assert not calendar.is_free(at(13, 59), at(15))
+
+    def test_next_free(self):
+        """测试跳过放不下服务时长的空隙"""
+        calendar = StaffCalendar([(at(10), at(11)), (at(11, 30), at(12)), (at(13), at(14))])
+
+        assert calendar.next_free(at(9), timedelta(hours=1)) == at(9)
+        assert calendar.next_free(at(10), timedelta(minutes=30)) == at(11)
+        assert calendar.next_free(at(10), timedelta(hours=1)) == at(12)
+        assert calendar.next_free(at(12), timedelta(hours=2)) == at(14)
+
+    def test_candidate_starts(self):
+        """测试候选时间对齐到时段间隔，并在营业结束前完成"""
+        starts = list(SlotService.candidate_starts(at(16, 10), at(16, 10) + timedelta(days=1), timedelta(hours=1)))
+
+        assert starts[:3] == [at(16, 30), at(17), at(9) + timedelta(days=1)]
+
+
+@pytest.mark.api
+@pytest.mark.orders
+class TestSlotApi:
+    """预约时段接口测试类"""
+
+    def test_find_slots(self, client, owner_headers, booking):
+        """测试返回员工空闲的前 N 个时段"""
+        response = client.get("/api/orders/slots", headers=owner_headers, params={
+            "service_id": booking["service_id"], "staff_id": booking["staff_id"],
+            "start": at(9).isoformat(), "count": 3
+        })
+
+        slots = response.json()["data"]
+        assert [slot["start"] for slot in slots] == [t.isoformat() for t in (at(9), at(11), at(11, 30))]
+        assert slots[0]["end"] == at(10).isoformat()
+        assert slots[0]["staff_ids"] == [booking["staff_id"]]
+
+    def test_check_slot(self, client, owner_headers, booking):
+        """测试与已有预约重叠的时段不可用"""
+        params = {"service_id": booking["service_id"], "staff_id": booking["staff_id"]}
+
+        busy = client.get("/api/orders/slots/check", headers=owner_headers, params={**params, "start": at(10, 30).isoformat()})
+        free = client.get("/api/orders/slots/check", headers=owner_headers, params={**params, "start": at(11).isoformat()})
+
+        assert busy.json()["data"]["available"] is False
+        assert free.json()["data"] == {
+            "start": at(11).isoformat(), "end": at(12).isoformat(),
+            "staff_ids": [booking["staff_id"]], "available": True
+        }
+
+    def test_double_booking_rejected(self, client, staff_headers, booking):
+        """测试给员工指派重叠的预约时返回409，不重叠时正常指派"""
+        url = f"/api/orders/{booking['other_id']}"
+
+        conflict = client.put(url, headers=staff_headers, json={
+            "staff_id": booking["staff_id"], "appointment_time": at(10, 30).isoformat()
+        })
+        assigned = client.put(url, headers=staff_headers, json={
+            "staff_id": booking["staff_id"], "appointment_time": at(11).isoformat()
+        })
+
+        assert conflict.json()["code"] == 409
+        assert assigned.json()["data"]["staff_id"] == booking["staff_id"]
+
+    def test_staff_locked_on_primary(self, client, db, staff_headers, booking):
+        """测试指派员工时在主库上锁定员工行，同一员工的并发指派在校验时段前排队"""
+        locked = []
+
+        @event.listens_for(db, "do_orm_execute")
+        def record(state):
+            if state.is_select and state.statement._for_update_arg is not None:
+                locked.extend(desc["entity"] for desc in state.statement.column_descriptions)
+
+        client.put(f"/api/orders/{booking['other_id']}", headers=staff_headers, json={
+            "staff_id": booking["staff_id"], "appointment_time": at(11).isoformat()
+        })
+
+        assert locked == [User]
+        assert db.info["use_primary"] is True
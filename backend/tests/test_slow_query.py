@@ -0,0 +1,52 @@
+"""
+慢查询日志测试
+Slow Query Log Tests
+"""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from app.core.database import Base
+from app.core.slow_query import slow_query_log
+from app.crud import get_orders
+
+
+@pytest.fixture
+def db(tmp_path):
+    """SQLite 会话"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'slow.db'}")
+    Base.metadata.create_all(engine)
+    session = Session(engine)
+    slow_query_log.clear()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+@pytest.mark.unit
+class TestSlowQueryLog:
+    """慢查询日志测试类"""
+
+    def test_records_filters_and_plan(self, db, monkeypatch):
+        """测试超过阈值的列表查询记录筛选组合、SQL 与执行计划"""
+        monkeypatch.setattr(slow_query_log, "threshold_ms", 0)
+        get_orders(db, pet_id=3, status="pending", skip=20)
+        slow_query_log.wait()
+
+        entry = slow_query_log.entries("get_orders")[0]
+        assert entry["filter_key"] == "pet_id+status"
+        assert entry["filters"] == {"pet_id": "3", "status": "pending"}
+        assert entry["skip"] == 20
+        assert len(entry["statements"]) == 2
+        assert all(s["plan"] and s["plan_error"] is None for s in entry["statements"])
+
+        group = slow_query_log.summary()[0]
+        assert (group["query"], group["filter_key"], group["count"]) == ("get_orders", "pet_id+status", 1)
+
+    def test_fast_queries_not_recorded(self, db, monkeypatch):
+        """测试未超过阈值的查询不记录"""
+        monkeypatch.setattr(slow_query_log, "threshold_ms", 60_000)
+        get_orders(db, status="pending")
+        slow_query_log.wait()
+
+        assert slow_query_log.entries() == []
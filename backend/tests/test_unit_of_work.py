@@ -0,0 +1,114 @@
+"""
+工作单元测试
+Unit of Work Tests
+"""
+
+import pytest
+from fastapi.routing import APIRoute
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from app.core.database import Base, RoutingSession, get_db
+from app.core.security import create_access_token
+from app.db.models import Service, User
+from app.main import app
+from app.crud import create_service, get_service, update_service
+from app.schemas import ServiceCreate, ServiceUpdate
+from app.service import UnitOfWork
+
+
+@pytest.fixture
+def db(tmp_path):
+    """SQLite 会话，并统计提交次数"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'uow.db'}")
+    Base.metadata.create_all(engine)
+    session = Session(engine)
+    session.info["commits"] = 0
+
+    @event.listens_for(session, "after_commit")
+    def count_commit(s):
+        s.info["commits"] += 1
+
+    yield session
+    session.close()
+    engine.dispose()
+
+
+@pytest.mark.unit
+class TestUnitOfWork:
+    """工作单元测试类"""
+
+    def test_multiple_crud_calls_commit_once(self, db):
+        """测试嵌套工作单元中的多次写入只提交一次"""
+        with UnitOfWork(db):
+            service = create_service(db, ServiceCreate(name="洗澡", category="美容", price=48))
+            with UnitOfWork(db):
+                update_service(db, service.id, ServiceUpdate(price=58))
+            assert db.info["commits"] == 0
+
+        assert db.info["commits"] == 1
+        db.expire_all()
+        assert float(get_service(db, service.id).price) == 58
+
+    def test_exception_rolls_back_everything(self, db):
+        """测试异常时整个工作单元回滚"""
+        with pytest.raises(RuntimeError):
+            with UnitOfWork(db):
+                create_service(db, ServiceCreate(name="洗澡", category="美容", price=48))
+                raise RuntimeError("boom")
+
+        assert db.info["commits"] == 0
+        assert db.query(Service).count() == 0
+
+
+def _api_routes(routes):
+    """路由表中的所有接口（展开 include_router 包含的子路由）"""
+    for route in routes:
+        if isinstance(route, APIRoute):
+            yield route
+        elif hasattr(route, "original_router"):
+            yield from _api_routes(route.original_router.routes)
+
+
+def _dependants(dependant):
+    """依赖树中的所有依赖"""
+    for sub in dependant.dependencies:
+        yield sub
+        yield from _dependants(sub)
+
+
+@pytest.mark.api
+class TestRequestUnitOfWork:
+    """请求级工作单元测试类（使用真实的 get_db，不经过测试夹具的依赖覆盖）"""
+
+    def test_get_db_function_scope(self):
+        """测试所有接口都以 function 作用域注入 get_db，保证在发送响应前提交"""
+        routes = list(_api_routes(app.routes))
+        assert len(routes) > 50
+        for route in routes:
+            for dependant in _dependants(route.dependant):
+                if dependant.call is get_db:
+                    assert dependant.scope == "function", f"{route.path} {dependant.name}"
+
+    def test_commit_failure_not_reported_as_success(self, db_engine, monkeypatch):
+        """测试提交失败时客户端收到错误响应，数据没有写入"""
+        with db_engine.connect() as conn:
+            admin_id = conn.execute(select(User.id).where(User.username == "admin")).scalar_one()
+
+        def fail_commit(session):
+            raise OperationalError("COMMIT", {}, Exception("disk I/O error"))
+
+        monkeypatch.setattr(RoutingSession, "commit", fail_commit)
+        response = TestClient(app).post(
+            "/api/services",
+            json={"name": "提交失败的服务", "category": "美容", "price": 48},
+            headers={"Authorization": f"Bearer {create_access_token(data={'sub': str(admin_id)})}"},
+        )
+
+        assert response.json()["code"] == 500
+        with db_engine.connect() as conn:
+            count = conn.execute(
+                select(func.count()).select_from(Service).where(Service.name == "提交失败的服务")
+            ).scalar()
+        assert count == 0
@@ -17,18 +17,21 @@ CREATE TABLE `users` (
   `username` VARCHAR(50) NOT NULL COMMENT '用户名，唯一，用于登录',
   `password` VARCHAR(255) NOT NULL COMMENT '密码，bcrypt加密存储',
   `email` VARCHAR(100) DEFAULT NULL COMMENT '邮箱地址，用于通知',
+  `email_key` VARCHAR(100) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin DEFAULT NULL COMMENT '规范化邮箱（去空白、小写），用于查找',
   `phone` VARCHAR(20) DEFAULT NULL COMMENT '手机号，用于联系',
+  `phone_key` VARCHAR(20) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin DEFAULT NULL COMMENT '规范化手机号（只保留数字，去掉 +86），用于查找',
   `real_name` VARCHAR(50) DEFAULT NULL COMMENT '真实姓名',
   `role` ENUM('admin', 'owner', 'staff') NOT NULL DEFAULT 'owner' COMMENT '角色：admin-管理员，owner-宠物主人，staff-员工',
   `avatar` VARCHAR(255) DEFAULT NULL COMMENT '头像URL',
   `is_active` TINYINT(1) NOT NULL DEFAULT 1 COMMENT '是否启用：1-启用，0-禁用',
   `is_deleted` TINYINT(1) NOT NULL DEFAULT 0 COMMENT '是否删除：1-已删除，0-未删除（软删除）',
+  `version` INT UNSIGNED NOT NULL DEFAULT 1 COMMENT '版本号（乐观锁），每次更新加一',
   `created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
   `updated_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
   PRIMARY KEY (`id`),
   UNIQUE KEY `uk_username` (`username`),
-  KEY `idx_email` (`email`),
-  KEY `idx_phone` (`phone`),
+  UNIQUE KEY `uk_email_key` (`email_key`),
+  UNIQUE KEY `uk_phone_key` (`phone_key`),
   KEY `idx_role` (`role`),
   KEY `idx_created_at` (`created_at`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='用户表';
@@ -51,6 +54,7 @@ CREATE TABLE `pets` (
   `special_notes` TEXT COMMENT '特殊备注（如过敏史、习惯等）',
   `avatar` VARCHAR(255) DEFAULT NULL COMMENT '宠物照片URL',
   `is_deleted` TINYINT(1) NOT NULL DEFAULT 0 COMMENT '是否删除：1-已删除，0-未删除（软删除）',
+  `version` INT UNSIGNED NOT NULL DEFAULT 1 COMMENT '版本号（乐观锁），每次更新加一',
   `created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
   `updated_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
   PRIMARY KEY (`id`),
@@ -74,6 +78,7 @@ CREATE TABLE `services` (
   `image` VARCHAR(255) DEFAULT NULL COMMENT '服务图片URL',
   `is_available` TINYINT(1) NOT NULL DEFAULT 1 COMMENT '是否上架：1-上架，0-下架',
   `is_deleted` TINYINT(1) NOT NULL DEFAULT 0 COMMENT '是否删除：1-已删除，0-未删除（软删除）',
+  `version` INT UNSIGNED NOT NULL DEFAULT 1 COMMENT '版本号（乐观锁），每次更新加一',
   `created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
   `updated_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
   PRIMARY KEY (`id`),
@@ -98,6 +103,7 @@ CREATE TABLE `orders` (
   `total_amount` DECIMAL(10,2) NOT NULL COMMENT '订单总额',
   `notes` TEXT COMMENT '订单备注',
   `is_deleted` TINYINT(1) NOT NULL DEFAULT 0 COMMENT '是否删除：1-已删除，0-未删除（软删除）',
+  `version` INT UNSIGNED NOT NULL DEFAULT 1 COMMENT '版本号（乐观锁），每次更新加一',
   `created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
   `updated_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
   PRIMARY KEY (`id`),
@@ -105,9 +111,10 @@ CREATE TABLE `orders` (
   KEY `idx_user_id` (`user_id`),
   KEY `idx_pet_id` (`pet_id`),
   KEY `idx_service_id` (`service_id`),
-  KEY `idx_staff_id` (`staff_id`),
   KEY `idx_status` (`status`),
   KEY `idx_appointment_time` (`appointment_time`),
+  KEY `idx_status_appointment` (`status`, `appointment_time`),
+  KEY `idx_staff_appointment` (`staff_id`, `appointment_time`),
   CONSTRAINT `fk_orders_user` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`) ON DELETE CASCADE,
   CONSTRAINT `fk_orders_pet` FOREIGN KEY (`pet_id`) REFERENCES `pets` (`id`) ON DELETE CASCADE,
   CONSTRAINT `fk_orders_service` FOREIGN KEY (`service_id`) REFERENCES `services` (`id`) ON DELETE RESTRICT,
@@ -130,6 +137,7 @@ CREATE TABLE `boardings` (
   `food_type` VARCHAR(100) DEFAULT NULL COMMENT '食物类型',
   `feeding_schedule` VARCHAR(100) DEFAULT NULL COMMENT '喂食计划',
   `is_deleted` TINYINT(1) NOT NULL DEFAULT 0 COMMENT '是否删除：1-已删除，0-未删除（软删除）',
+  `version` INT UNSIGNED NOT NULL DEFAULT 1 COMMENT '版本号（乐观锁），每次更新加一',
   `created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
   `updated_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
   PRIMARY KEY (`id`),
@@ -138,6 +146,8 @@ CREATE TABLE `boardings` (
   KEY `idx_staff_id` (`staff_id`),
   KEY `idx_dates` (`start_date`, `end_date`),
   KEY `idx_status` (`status`),
+  KEY `idx_status_start` (`status`, `start_date`),
+  KEY `idx_status_end` (`status`, `end_date`),
   CONSTRAINT `fk_boardings_order` FOREIGN KEY (`order_id`) REFERENCES `orders` (`id`) ON DELETE CASCADE,
   CONSTRAINT `fk_boardings_pet` FOREIGN KEY (`pet_id`) REFERENCES `pets` (`id`) ON DELETE CASCADE,
   CONSTRAINT `fk_boardings_staff` FOREIGN KEY (`staff_id`) REFERENCES `users` (`id`) ON DELETE CASCADE
@@ -158,6 +168,7 @@ CREATE TABLE `health_records` (
   `prescription` TEXT COMMENT '处方信息',
   `notes` TEXT COMMENT '备注',
   `is_deleted` TINYINT(1) NOT NULL DEFAULT 0 COMMENT '是否删除：1-已删除，0-未删除（软删除）',
+  `version` INT UNSIGNED NOT NULL DEFAULT 1 COMMENT '版本号（乐观锁），每次更新加一',
   `created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
   `updated_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
   PRIMARY KEY (`id`),
@@ -169,15 +180,76 @@ CREATE TABLE `health_records` (
   CONSTRAINT `fk_health_vet` FOREIGN KEY (`vet_id`) REFERENCES `users` (`id`) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='健康记录表';
 
+-- ============================================
+-- 7. 幂等键表 (idempotency_keys)
+-- 说明：保存客户端 Idempotency-Key 及首次请求的响应，超时重试时直接重放
+-- ============================================
+CREATE TABLE `idempotency_keys` (
+  `id` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT COMMENT '主键ID，自增',
+  `user_id` BIGINT UNSIGNED NOT NULL COMMENT '用户ID，外键关联users表',
+  `idempotency_key` VARCHAR(100) NOT NULL COMMENT '客户端提供的幂等键',
+  `request_hash` CHAR(64) NOT NULL COMMENT '请求指纹（方法、路径和请求体的 SHA-256）',
+  `response_body` MEDIUMTEXT COMMENT '首次请求的响应（紧凑 JSON），处理中为空',
+  `created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+  `expires_at` DATETIME NOT NULL COMMENT '过期时间',
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uk_user_key` (`user_id`, `idempotency_key`),
+  KEY `idx_expires_at` (`expires_at`),
+  CONSTRAINT `fk_idempotency_user` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='幂等键表';
+
+-- ============================================
+-- 8. 事件发件箱表 (outbox_events)
+-- 说明：领域事件与业务写操作同一事务写入，由后台分发器分批投递
+-- ============================================
+CREATE TABLE `outbox_events` (
+  `id` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT COMMENT '主键ID，即事件的全局顺序',
+  `event_type` VARCHAR(100) NOT NULL COMMENT '事件类型，如 OrderStatusChanged',
+  `aggregate_type` VARCHAR(50) NOT NULL COMMENT '聚合类型，如 order、boarding',
+  `aggregate_id` BIGINT UNSIGNED NOT NULL COMMENT '聚合ID',
+  `payload` TEXT NOT NULL COMMENT '事件内容（紧凑 JSON）',
+  `created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+  `dispatched_at` DATETIME DEFAULT NULL COMMENT '投递完成时间，未投递为空',
+  `attempts` INT NOT NULL DEFAULT 0 COMMENT '投递失败次数',
+  `last_error` VARCHAR(500) DEFAULT NULL COMMENT '最近一次投递失败的原因',
+  PRIMARY KEY (`id`),
+  KEY `idx_dispatched_id` (`dispatched_at`, `id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='事件发件箱表';
+
+-- ============================================
+-- 9. 后台任务表 (jobs)
+-- 说明：持久化的任务队列，由 python -m app.worker run 启动的工作进程领取执行
+-- ============================================
+CREATE TABLE `jobs` (
+  `id` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT COMMENT '主键ID',
+  `queue` VARCHAR(50) NOT NULL DEFAULT 'default' COMMENT '队列名称',
+  `name` VARCHAR(100) NOT NULL COMMENT '任务名称，对应已注册的任务函数',
+  `payload` TEXT COMMENT '任务参数（紧凑 JSON）',
+  `priority` INT NOT NULL DEFAULT 0 COMMENT '优先级，数值越大越先执行',
+  `status` ENUM('queued', 'running', 'succeeded', 'failed') NOT NULL DEFAULT 'queued' COMMENT '任务状态',
+  `attempts` INT NOT NULL DEFAULT 0 COMMENT '已执行次数',
+  `max_attempts` INT NOT NULL DEFAULT 3 COMMENT '最多执行次数',
+  `run_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '最早执行时间',
+  `locked_by` VARCHAR(100) DEFAULT NULL COMMENT '领取任务的工作进程标识',
+  `locked_at` DATETIME DEFAULT NULL COMMENT '领取时间',
+  `last_error` VARCHAR(500) DEFAULT NULL COMMENT '最近一次失败的原因',
+  `result` TEXT COMMENT '执行结果（紧凑 JSON）',
+  `created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+  `finished_at` DATETIME DEFAULT NULL COMMENT '完成时间',
+  PRIMARY KEY (`id`),
+  KEY `idx_queue_status_priority` (`queue`, `status`, `priority`, `id`),
+  KEY `idx_status_locked_at` (`status`, `locked_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='后台任务表';
+
 -- ============================================
 -- 插入初始数据
 -- ============================================
 
 -- 插入管理员用户（密码：admin123，已bcrypt加密）
-INSERT INTO `users` (`username`, `password`, `email`, `real_name`, `role`, `is_active`) VALUES
-('admin', '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/X4.VTtYqWqxVbJ.', 'admin@pet.com', '系统管理员', 'admin', 1),
-('owner001', '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/X4.VTtYqWqxVbJ.', 'owner001@pet.com', '张三', 'owner', 1),
-('staff001', '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/X4.VTtYqWqxVbJ.', 'staff001@pet.com', '李四', 'staff', 1);
+INSERT INTO `users` (`username`, `password`, `email`, `email_key`, `real_name`, `role`, `is_active`) VALUES
+('admin', '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/X4.VTtYqWqxVbJ.', 'admin@pet.com', 'admin@pet.com', '系统管理员', 'admin', 1),
+('owner001', '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/X4.VTtYqWqxVbJ.', 'owner001@pet.com', 'owner001@pet.com', '张三', 'owner', 1),
+('staff001', '$2b$12$LQv3c1yqBWVHxkd0LHAkCOYz6TtxMQJqhN8/X4.VTtYqWqxVbJ.', 'staff001@pet.com', 'staff001@pet.com', '李四', 'staff', 1);
 
 -- 插入测试宠物数据
 INSERT INTO `pets` (`owner_id`, `name`, `species`, `breed`, `gender`, `birth_date`, `weight`, `color`, `health_status`) VALUES
@@ -0,0 +1,20 @@
+-- ============================================
+-- 迁移 001：新增幂等键表 (idempotency_keys)
+-- 已按旧版 init.sql 建库的环境执行本脚本
+-- ============================================
+
+USE pet_management;
+
+CREATE TABLE IF NOT EXISTS `idempotency_keys` (
+  `id` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT COMMENT '主键ID，自增',
+  `user_id` BIGINT UNSIGNED NOT NULL COMMENT '用户ID，外键关联users表',
+  `idempotency_key` VARCHAR(100) NOT NULL COMMENT '客户端提供的幂等键',
+  `request_hash` CHAR(64) NOT NULL COMMENT '请求指纹（方法、路径和请求体的 SHA-256）',
+  `response_body` MEDIUMTEXT COMMENT '首次请求的响应（紧凑 JSON），处理中为空',
+  `created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+  `expires_at` DATETIME NOT NULL COMMENT '过期时间',
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uk_user_key` (`user_id`, `idempotency_key`),
+  KEY `idx_expires_at` (`expires_at`),
+  CONSTRAINT `fk_idempotency_user` FOREIGN KEY (`user_id`) REFERENCES `users` (`id`) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='幂等键表';
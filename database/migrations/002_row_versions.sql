@@ -0,0 +1,24 @@
+-- ============================================
+-- 迁移 002：业务表新增乐观锁版本号 (version)
+-- 已按旧版 init.sql 建库的环境执行本脚本
+-- ============================================
+
+USE pet_management;
+
+ALTER TABLE `users`
+  ADD COLUMN `version` INT UNSIGNED NOT NULL DEFAULT 1 COMMENT '版本号（乐观锁），每次更新加一' AFTER `is_deleted`;
+
+ALTER TABLE `pets`
+  ADD COLUMN `version` INT UNSIGNED NOT NULL DEFAULT 1 COMMENT '版本号（乐观锁），每次更新加一' AFTER `is_deleted`;
+
+ALTER TABLE `services`
+  ADD COLUMN `version` INT UNSIGNED NOT NULL DEFAULT 1 COMMENT '版本号（乐观锁），每次更新加一' AFTER `is_deleted`;
+
+ALTER TABLE `orders`
+  ADD COLUMN `version` INT UNSIGNED NOT NULL DEFAULT 1 COMMENT '版本号（乐观锁），每次更新加一' AFTER `is_deleted`;
+
+ALTER TABLE `boardings`
+  ADD COLUMN `version` INT UNSIGNED NOT NULL DEFAULT 1 COMMENT '版本号（乐观锁），每次更新加一' AFTER `is_deleted`;
+
+ALTER TABLE `health_records`
+  ADD COLUMN `version` INT UNSIGNED NOT NULL DEFAULT 1 COMMENT '版本号（乐观锁），每次更新加一' AFTER `is_deleted`;
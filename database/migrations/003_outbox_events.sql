@@ -0,0 +1,20 @@
+-- ============================================
+-- 迁移 003：新增事件发件箱表 (outbox_events)
+-- 已按旧版 init.sql 建库的环境执行本脚本
+-- ============================================
+
+USE pet_management;
+
+CREATE TABLE IF NOT EXISTS `outbox_events` (
+  `id` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT COMMENT '主键ID，即事件的全局顺序',
+  `event_type` VARCHAR(100) NOT NULL COMMENT '事件类型，如 OrderStatusChanged',
+  `aggregate_type` VARCHAR(50) NOT NULL COMMENT '聚合类型，如 order、boarding',
+  `aggregate_id` BIGINT UNSIGNED NOT NULL COMMENT '聚合ID',
+  `payload` TEXT NOT NULL COMMENT '事件内容（紧凑 JSON）',
+  `created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+  `dispatched_at` DATETIME DEFAULT NULL COMMENT '投递完成时间，未投递为空',
+  `attempts` INT NOT NULL DEFAULT 0 COMMENT '投递失败次数',
+  `last_error` VARCHAR(500) DEFAULT NULL COMMENT '最近一次投递失败的原因',
+  PRIMARY KEY (`id`),
+  KEY `idx_dispatched_id` (`dispatched_at`, `id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='事件发件箱表';
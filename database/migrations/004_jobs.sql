@@ -0,0 +1,27 @@
+-- ============================================
+-- 迁移 004：新增后台任务表 (jobs)
+-- 已按旧版 init.sql 建库的环境执行本脚本
+-- ============================================
+
+USE pet_management;
+
+CREATE TABLE IF NOT EXISTS `jobs` (
+  `id` BIGINT UNSIGNED NOT NULL AUTO_INCREMENT COMMENT '主键ID',
+  `queue` VARCHAR(50) NOT NULL DEFAULT 'default' COMMENT '队列名称',
+  `name` VARCHAR(100) NOT NULL COMMENT '任务名称，对应已注册的任务函数',
+  `payload` TEXT COMMENT '任务参数（紧凑 JSON）',
+  `priority` INT NOT NULL DEFAULT 0 COMMENT '优先级，数值越大越先执行',
+  `status` ENUM('queued', 'running', 'succeeded', 'failed') NOT NULL DEFAULT 'queued' COMMENT '任务状态',
+  `attempts` INT NOT NULL DEFAULT 0 COMMENT '已执行次数',
+  `max_attempts` INT NOT NULL DEFAULT 3 COMMENT '最多执行次数',
+  `run_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '最早执行时间',
+  `locked_by` VARCHAR(100) DEFAULT NULL COMMENT '领取任务的工作进程标识',
+  `locked_at` DATETIME DEFAULT NULL COMMENT '领取时间',
+  `last_error` VARCHAR(500) DEFAULT NULL COMMENT '最近一次失败的原因',
+  `result` TEXT COMMENT '执行结果（紧凑 JSON）',
+  `created_at` DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+  `finished_at` DATETIME DEFAULT NULL COMMENT '完成时间',
+  PRIMARY KEY (`id`),
+  KEY `idx_queue_status_priority` (`queue`, `status`, `priority`, `id`),
+  KEY `idx_status_locked_at` (`status`, `locked_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='后台任务表';
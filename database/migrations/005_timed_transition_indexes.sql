@@ -0,0 +1,13 @@
+-- ============================================
+-- 迁移 005：定时状态流转使用的复合索引
+-- 已按旧版 init.sql 建库的环境执行本脚本
+-- ============================================
+
+USE pet_management;
+
+ALTER TABLE `orders`
+  ADD KEY `idx_status_appointment` (`status`, `appointment_time`);
+
+ALTER TABLE `boardings`
+  ADD KEY `idx_status_start` (`status`, `start_date`),
+  ADD KEY `idx_status_end` (`status`, `end_date`);
@@ -0,0 +1,12 @@
+-- ============================================
+-- 迁移 006：预约时段使用的复合索引
+-- 已按旧版 init.sql 建库的环境执行本脚本
+-- (staff_id, appointment_time) 的最左列同样满足外键 fk_orders_staff，
+-- 原单列索引 idx_staff_id 随之删除
+-- ============================================
+
+USE pet_management;
+
+ALTER TABLE `orders`
+  ADD KEY `idx_staff_appointment` (`staff_id`, `appointment_time`),
+  DROP KEY `idx_staff_id`;
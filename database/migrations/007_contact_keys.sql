@@ -0,0 +1,43 @@
+-- ============================================
+-- 迁移 007：用户表新增规范化的手机号 / 邮箱查找键
+-- 已按旧版 init.sql 建库的环境执行本脚本
+-- phone_key 只保留数字并去掉 +86 / 0086，email_key 去空白并转小写，
+-- 使用二进制排序规则，前台按精确或前缀查找时走唯一索引的范围扫描。
+-- 已删除用户不回填；规范化后重复的键只保留给最早注册的用户，其余置空。
+-- 原 idx_phone / idx_email 不再被查询使用，随之删除
+-- ============================================
+
+USE pet_management;
+
+ALTER TABLE `users`
+  ADD COLUMN `email_key` VARCHAR(100) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin DEFAULT NULL COMMENT '规范化邮箱（去空白、小写），用于查找' AFTER `email`,
+  ADD COLUMN `phone_key` VARCHAR(20) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin DEFAULT NULL COMMENT '规范化手机号（只保留数字，去掉 +86），用于查找' AFTER `phone`;
+
+-- 回填查找键（与 app.crud.normalize_phone / normalize_email 的规则一致）
+UPDATE `users`
+SET
+  `email_key` = NULLIF(LOWER(TRIM(`email`)), ''),
+  `phone_key` = NULLIF(REGEXP_REPLACE(REGEXP_REPLACE(`phone`, '^[[:space:]]*(\\+|00)86', ''), '[^0-9]', ''), '')
+WHERE `is_deleted` = 0;
+
+UPDATE `users`
+SET `phone_key` = SUBSTRING(`phone_key`, 3)
+WHERE CHAR_LENGTH(`phone_key`) = 13 AND `phone_key` LIKE '86%';
+
+-- 规范化后重复的键只保留给 id 最小的用户
+UPDATE `users` u
+JOIN (SELECT `phone_key`, MIN(`id`) AS `keep_id` FROM `users` WHERE `phone_key` IS NOT NULL GROUP BY `phone_key` HAVING COUNT(*) > 1) d
+  ON u.`phone_key` = d.`phone_key` AND u.`id` <> d.`keep_id`
+SET u.`phone_key` = NULL;
+
+UPDATE `users` u
+JOIN (SELECT `email_key`, MIN(`id`) AS `keep_id` FROM `users` WHERE `email_key` IS NOT NULL GROUP BY `email_key` HAVING COUNT(*) > 1) d
+  ON u.`email_key` = d.`email_key` AND u.`id` <> d.`keep_id`
+SET u.`email_key` = NULL;
+
+ALTER TABLE `users`
+  ADD UNIQUE KEY `uk_phone_key` (`phone_key`),
+  ADD UNIQUE KEY `uk_email_key` (`email_key`),
+  DROP KEY `idx_phone`,
+  DROP KEY `idx_email`;
+
@@ -15,19 +15,23 @@ export const getOrderDetail = (id) => {
   })
 }
 
-export const createOrder = (data) => {
+// idempotencyKey：由表单在打开时通过 newIdempotencyKey 生成一次，
+// 同一份表单超时后再次提交时传入同一个键，后端只会创建一次订单
+export const createOrder = (data, idempotencyKey) => {
   return request({
     url: '/orders',
     method: 'post',
-    data
+    data,
+    headers: idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {}
   })
 }
 
-export const updateOrder = (id, data) => {
+export const updateOrder = (id, data, idempotencyKey) => {
   return request({
     url: `/orders/${id}`,
     method: 'put',
-    data
+    data,
+    headers: idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {}
   })
 }
 
@@ -37,3 +41,30 @@ export const deleteOrder = (id) => {
     method: 'delete'
   })
 }
+
+// 为待确认且未指派的订单自动指派员工：{ limit? }
+export const autoAssignOrders = (params) => {
+  return request({
+    url: '/orders/auto-assign',
+    method: 'post',
+    params
+  })
+}
+
+// 最近的可预约时段：{ service_id, start?, count?, staff_id? }
+export const getOrderSlots = (params) => {
+  return request({
+    url: '/orders/slots',
+    method: 'get',
+    params
+  })
+}
+
+// 某个时段是否有员工空闲：{ service_id, start, staff_id? }
+export const checkOrderSlot = (params) => {
+  return request({
+    url: '/orders/slots/check',
+    method: 'get',
+    params
+  })
+}
@@ -37,3 +37,12 @@ export const deleteUser = (id) => {
     method: 'delete'
   })
 }
+
+// 前台按手机号或邮箱（可只输入前几位）查找主人及其宠物
+export const lookupOwners = (q, limit = 10) => {
+  return request({
+    url: '/users/lookup',
+    method: 'get',
+    params: { q, limit }
+  })
+}
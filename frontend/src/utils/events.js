@@ -0,0 +1,18 @@
+// 订阅后端实时推送（Server-Sent Events）
+// EventSource 无法设置请求头，Token 通过 access_token 查询参数传递；
+// 断线后浏览器自动重连，并通过 Last-Event-ID 补发断线期间的事件
+
+// handlers：事件名 -> 回调，如 { stats: data => ..., order: data => ... }
+// 返回取消订阅的函数，组件卸载时调用
+export const subscribeEvents = (handlers) => {
+  const token = localStorage.getItem('token')
+  if (!token || typeof EventSource === 'undefined') {
+    return () => {}
+  }
+
+  const source = new EventSource(`/api/events/stream?access_token=${encodeURIComponent(token)}`)
+  Object.entries(handlers).forEach(([event, handler]) => {
+    source.addEventListener(event, (e) => handler(JSON.parse(e.data)))
+  })
+  return () => source.close()
+}
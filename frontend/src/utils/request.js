@@ -14,6 +14,10 @@ request.interceptors.request.use(
     if (token) {
       config.headers.Authorization = `Bearer ${token}`
     }
+    // 告知后端本请求的等待时间，超时后后端不再继续执行查询
+    if (config.timeout) {
+      config.headers['X-Request-Timeout'] = config.timeout / 1000
+    }
     return config
   },
   error => {
@@ -42,6 +46,10 @@ request.interceptors.response.use(
         localStorage.removeItem('token')
         localStorage.removeItem('user')
         router.push('/login')
+      } else if (status === 429 || status === 503) {
+        // 限流或服务繁忙，Retry-After 为建议等待的秒数
+        const retryAfter = error.response.headers['retry-after']
+        ElMessage.warning(`${data?.detail || '服务繁忙，请稍后重试'}${retryAfter ? `（${retryAfter} 秒后可重试）` : ''}`)
       } else {
         ElMessage.error(data?.msg || '请求失败')
       }
@@ -53,4 +61,16 @@ request.interceptors.response.use(
   }
 )
 
+/**
+ * 生成幂等键
+ * 在打开表单时生成一次，保存在表单状态中；超时或网络错误后再次提交时复用同一个键，
+ * 后端只会执行一次写操作。关闭表单后下一次打开再生成新的键
+ */
+export const newIdempotencyKey = () => {
+  if (window.crypto?.randomUUID) {
+    return window.crypto.randomUUID()
+  }
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`
+}
+
 export default request